@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+搜尋 API 的滑動視窗速率限制（限制 /api/search 觸發的 LLM 呼叫量）
+演算法共用 project/utils/rate_limit.py（不依賴 Django，部署映像另外複製該檔案）
+設定 RATE_LIMIT_REDIS_URL 時以 Redis 共用計數，否則使用單一程序的記憶體計數
+"""
+import logging
+import os
+import sys
+
+from fastapi import HTTPException, Request
+
+try:
+    import redis
+except ImportError:  # 未安裝時只能使用記憶體計數
+    redis = None
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'project')
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from utils.rate_limit import MemoryCounterStore, Rate, SlidingWindowLimiter  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCounterStore:
+    """以 Redis INCR 共用計數（多個 uvicorn worker 或多台主機時使用）"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def incr(self, key, delta=1, timeout=None):
+        pipe = self.client.pipeline()
+        pipe.incrby(key, delta)
+        if timeout:
+            # 鍵名已包含視窗編號，延長到期時間不影響計數
+            pipe.expire(key, timeout)
+        return pipe.execute()[0]
+
+    def get(self, key, default=None):
+        value = self.client.get(key)
+        return default if value is None else int(value)
+
+
+def build_counter_store():
+    redis_url = os.getenv('RATE_LIMIT_REDIS_URL', '')
+    if redis_url:
+        if redis is None:
+            logger.warning("已設定 RATE_LIMIT_REDIS_URL 但未安裝 redis 套件，改用記憶體計數")
+        else:
+            return RedisCounterStore(redis.Redis.from_url(redis_url))
+    return MemoryCounterStore()
+
+
+def client_ip(request):
+    forwarded = request.headers.get('x-forwarded-for')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+
+def rate_limit_dependency(rate, scope, limiter=None):
+    """FastAPI 相依項：超過限制時回應 429 並附上 Retry-After"""
+    rate = Rate.parse(rate)
+    limiter = limiter or SlidingWindowLimiter(build_counter_store(), key_prefix='rate_limit:')
+
+    async def dependency(request: Request):
+        decision = limiter.hit(f'{client_ip(request)}:{scope}', rate)
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=429,
+                detail='請求過於頻繁，請稍後再試',
+                headers={'Retry-After': str(decision.retry_after)},
+            )
+
+    return dependency
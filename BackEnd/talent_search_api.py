@@ -5,7 +5,7 @@
 支援環境變數配置（本地開發 + 雲端部署）
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -21,6 +21,7 @@ import asyncio
 from interview_api import router as interview_router
 from talent_analysis_service import TalentAnalysisService
 from conversation_manager import conversation_manager
+from rate_limiter import rate_limit_dependency
 
 # ============================================
 # 環境配置
@@ -67,6 +68,14 @@ else:
     }
     print("🌐 使用 SiliconFlow API")
 
+# 搜尋 API 速率限制（每個 IP，格式 "次數/單位"）：每次搜尋都會呼叫 LLM
+SEARCH_RATE_LIMIT = os.getenv('SEARCH_RATE_LIMIT', '10/m')
+
+# 分數分佈區間寬度（需與 Django 設定 SCORE_HISTOGRAM_BIN_WIDTH 一致）
+SCORE_HISTOGRAM_BIN_WIDTH = float(os.getenv('SCORE_HISTOGRAM_BIN_WIDTH', '0.5'))
+# 樣本數少於此值時不提供百分位（需與 Django 設定 SCORE_PERCENTILE_MIN_SAMPLES 一致）
+SCORE_PERCENTILE_MIN_SAMPLES = int(os.getenv('SCORE_PERCENTILE_MIN_SAMPLES', '10'))
+
 # FastAPI 應用
 app = FastAPI(title="人才聊天搜索 API v2.0", version="2.0.0")
 
@@ -520,15 +529,21 @@ class TalentSearchEngine:
         where_conditions = []
         params = []
         
+        # 使用 result_trait_score 索引表：每個條件為 (trait_id, score) 索引上的範圍查詢，
+        # 不再逐列解析 trait_results JSONB
         for trait in matched_traits:
             system_name = trait['system_name']
             min_score = trait['min_score']
-            where_conditions.append(
-                f"(tpr.trait_results->%s->>'score')::float >= %s"
-            )
+            where_conditions.append("(t.system_name = %s AND rts.score >= %s)")
             params.extend([system_name, min_score])
         
-        where_clause = ' OR '.join(where_conditions)
+        where_clause = f"""tpr.id IN (
+                SELECT rts.project_result_id
+                FROM result_trait_score rts
+                INNER JOIN trait t ON t.id = rts.trait_id
+                WHERE rts.project_result_id IS NOT NULL
+                  AND ({' OR '.join(where_conditions)})
+            )"""
         
         # 如果有上一輪的候選人 ID，只在這些候選人中搜索
         if previous_candidate_ids:
@@ -548,18 +563,31 @@ class TalentSearchEngine:
                 tpr.category_results,
                 tpr.score_value,
                 tpr.prediction_value,
-                tpr.crawled_at
+                tpr.crawled_at,
+                ci_rank.percentile
             FROM test_project_result tpr
             INNER JOIN test_invitation ti ON tpr.test_invitation_id = ti.id
             INNER JOIN test_invitee tiv ON ti.invitee_id = tiv.id
             INNER JOIN test_project tp ON tpr.test_project_id = tp.id
+            LEFT JOIN LATERAL (
+                -- 與 Django 的 score_percentiles.percentile_rank 相同：低於分數的區間全數計入、
+                -- 所在區間依位置線性內插（其餘區間的比例夾在 0 與 1）；樣本數不足時為 NULL
+                SELECT CASE WHEN SUM(b.count) >= %s THEN
+                           100.0 * SUM(b.count * LEAST(GREATEST(tpr.ci_score / %s - b.bin, 0), 1))
+                           / SUM(b.count)
+                       END AS percentile
+                FROM score_histogram_bin b
+                WHERE b.test_project_id = tpr.test_project_id AND b.metric = 'ci' AND b.count > 0
+            ) ci_rank ON tpr.ci_score IS NOT NULL
             WHERE tpr.trait_results IS NOT NULL
               AND tpr.trait_results != '{{}}'::jsonb
               AND ({where_clause})
-            ORDER BY tpr.crawled_at DESC
+            ORDER BY ci_rank.percentile DESC NULLS LAST, tpr.crawled_at DESC
             LIMIT %s;
         """
         
+        # 依 CI 分數在同測驗項目中的百分位排序（讀取 score_histogram_bin，不掃描整個母體）
+        params[0:0] = [SCORE_PERCENTILE_MIN_SAMPLES, SCORE_HISTOGRAM_BIN_WIDTH]
         params.append(limit)
         
         print(f"\n📊 執行特質搜索:")
@@ -587,7 +615,8 @@ class TalentSearchEngine:
                 'category_results': row[8] if row[8] else {},
                 'score_value': row[9],
                 'prediction_value': row[10],
-                'test_date': row[11].isoformat() if row[11] else None
+                'test_date': row[11].isoformat() if row[11] else None,
+                'ci_percentile': round(float(row[12]), 1) if row[12] is not None else None
             }
             candidates.append(candidate)
         
@@ -810,7 +839,11 @@ async def health_check():
             "error": str(e)
         }
 
-@app.post("/api/search", response_model=SearchResponse)
+@app.post(
+    "/api/search",
+    response_model=SearchResponse,
+    dependencies=[Depends(rate_limit_dependency(SEARCH_RATE_LIMIT, 'search'))],
+)
 async def search_talents(query: SearchQuery):
     """智能搜索人才 - 使用 LLM 分析查詢（支援多輪對話）"""
     try:
@@ -336,16 +336,18 @@ class TalentSearchEngineFixed:
         """
         生成特質查詢的 SQL 條件
         
-        支持兩種查詢方式:
-        1. 直接查詢 system_name
-        2. 查詢 chinese_name
+        使用 result_trait_score 索引表（由 Django 在結果儲存時寫入），
+        以 system_name 或 chinese_name 比對特質，分數條件走 (trait_id, score) 索引範圍查詢
         """
-        conditions = [
-            # 方式1: 直接查詢 trait_results
-            f"((trait_results->>'{trait_name}')::jsonb->>'score')::float >= {min_score}",
-            
-            # 方式2: 查詢中文名稱
-            f"EXISTS (SELECT 1 FROM jsonb_each(trait_results) WHERE (value->>'chinese_name' = '{trait_name}' AND (value->>'score')::float >= {min_score}))"
-        ]
+        escaped_name = str(trait_name).replace("'", "''")
+        min_score = float(min_score)
         
-        return f"({' OR '.join(conditions)})"
+        return (
+            "(itr.id IN ("
+            "SELECT rts.individual_result_id FROM result_trait_score rts "
+            "JOIN trait t ON t.id = rts.trait_id "
+            "WHERE rts.individual_result_id IS NOT NULL "
+            f"AND (t.system_name = '{escaped_name}' OR t.chinese_name = '{escaped_name}') "
+            f"AND rts.score >= {min_score}"
+            "))"
+        )
@@ -16,6 +16,7 @@ from core.models import (
     User, TestProject, TestInvitation, TestInvitee, 
     TestProjectResult, InvitationTemplate, UserPointBalance
 )
+from core.services.invitation_rollup import get_daily_series, get_status_totals
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, LoginSerializer,
     TestProjectSerializer, TestInvitationSerializer, TestInviteeSerializer,
@@ -199,16 +200,13 @@ class StatisticsView(APIView):
     def get(self, request):
         user = request.user
         
-        # 基本統計
+        # 基本統計（邀請數來自每日彙總）
+        status_totals = get_status_totals(user)
         stats = {
-            'total_invitations': TestInvitation.objects.filter(enterprise=user).count(),
+            'total_invitations': status_totals['total'],
             'total_invitees': TestInvitee.objects.filter(enterprise=user).count(),
-            'completed_tests': TestInvitation.objects.filter(
-                enterprise=user, status='completed'
-            ).count(),
-            'pending_tests': TestInvitation.objects.filter(
-                enterprise=user, status='pending'
-            ).count(),
+            'completed_tests': status_totals['completed'],
+            'pending_tests': status_totals['pending'],
         }
         
         # 完成率
@@ -218,7 +216,7 @@ class StatisticsView(APIView):
         
         # 近7天趨勢
         daily_trend = self.get_daily_trend(user)
-        status_distribution = self.get_status_distribution(user)
+        status_distribution = self.get_status_distribution(user, status_totals)
         
         stats['daily_trend'] = daily_trend
         stats['status_distribution'] = status_distribution
@@ -228,26 +226,10 @@ class StatisticsView(APIView):
     
     def get_daily_trend(self, user):
         """獲取每日趨勢數據"""
-        days_data = []
-        invitations_data = []
-        completions_data = []
-        
-        for i in range(7):
-            date = timezone.now().date() - timedelta(days=6-i)
-            days_data.append(date.strftime('%m/%d'))
-            
-            day_invitations = TestInvitation.objects.filter(
-                enterprise=user,
-                invited_at__date=date
-            ).count()
-            invitations_data.append(day_invitations)
-            
-            day_completions = TestInvitation.objects.filter(
-                enterprise=user,
-                completed_at__date=date,
-                status='completed'
-            ).count()
-            completions_data.append(day_completions)
+        series = get_daily_series(user, timezone.localdate() - timedelta(days=6), 7)
+        days_data = [item['date'].strftime('%m/%d') for item in series]
+        invitations_data = [item['invitations'] for item in series]
+        completions_data = [item['completions'] for item in series]
         
         return {
             'labels': days_data,
@@ -255,11 +237,14 @@ class StatisticsView(APIView):
             'completions': completions_data
         }
     
-    def get_status_distribution(self, user):
+    def get_status_distribution(self, user, status_totals=None):
         """獲取狀態分佈數據"""
-        status_distribution = TestInvitation.objects.filter(
-            enterprise=user
-        ).values('status').annotate(count=Count('id'))
+        status_totals = status_totals or get_status_totals(user)
+        status_distribution = [
+            {'status': status, 'count': status_totals[status]}
+            for status, _ in TestInvitation.STATUS_CHOICES
+            if status_totals[status]
+        ]
         
         status_labels = []
         status_data = []
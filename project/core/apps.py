@@ -7,3 +7,7 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         import core.signals
+        from django.core import checks
+        from utils.tiered_cache import check_l2_backend
+
+        checks.register(check_l2_backend, checks.Tags.caches)
@@ -3,6 +3,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import TestProject, TestInvitee, TestInvitation
+from .services.bulk_invitations import MAX_ROWS
 from datetime import datetime, timedelta
 from django.utils import timezone
 import csv
@@ -101,8 +102,8 @@ class BulkInvitationForm(forms.Form):
             if len(rows) == 0:
                 raise ValidationError('CSV檔案沒有數據行')
             
-            if len(rows) > 500:  # 限制批量處理數量
-                raise ValidationError('一次最多只能處理500筆資料')
+            if len(rows) > MAX_ROWS:  # 限制批量處理數量
+                raise ValidationError(f'一次最多只能處理{MAX_ROWS}筆資料')
             
             # 驗證每行數據
             errors = []
@@ -1,22 +1,20 @@
 # core/bulk_invitation_views.py
 
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-import uuid
 import csv
 import logging
 
 from .decorators import enterprise_required
-from .models import TestInvitee, TestInvitation, TestProject, TestProjectAssignment
-from .purchase_services import log_quota_usage
+from .models import InvitationEmailJob
 from .bulk_invitation_forms import BulkInvitationForm, CSVTemplateForm
-from utils.email_service import EmailService
-from utils.url_shortener import URLShortenerService
+from .services.bulk_invitations import create_bulk_invitations, enqueue_invitation_emails
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +40,7 @@ def bulk_invitation(request):
 
 
 def process_bulk_invitation(request, form):
-    """處理批量邀請邏輯"""
+    """處理批量邀請邏輯（資料庫批次寫入，邀請信交由背景任務寄送）"""
     
     try:
         with transaction.atomic():
@@ -53,132 +51,45 @@ def process_bulk_invitation(request, form):
             skip_duplicates = form.cleaned_data['skip_duplicates']
             
             csv_data = form.get_parsed_data()
-            
-            assignment = TestProjectAssignment.objects.select_for_update().filter(
-                test_project=test_project,
-                enterprise_user=request.user
-            ).first()
-
             expires_at = timezone.now() + timedelta(days=expires_in_days)
             
-            # 處理結果統計
-            stats = {
-                'total': len(csv_data),
-                'created': 0,
-                'updated': 0,
-                'skipped': 0,
-                'invited': 0,
-                'errors': []
-            }
-            
-            created_invitations = []
+            stats, created_invitations = create_bulk_invitations(
+                request.user,
+                test_project,
+                csv_data,
+                expires_at=expires_at,
+                custom_message=custom_message,
+                skip_duplicates=skip_duplicates,
+            )
             
-            consumed_slots = 0
-            for row_data in csv_data:
-                try:
-                    # 處理受測者資料
-                    invitee_result = process_invitee_data(
-                        request.user, row_data, skip_duplicates
-                    )
-                    
-                    if invitee_result['action'] == 'skipped':
-                        stats['skipped'] += 1
-                        continue
-                    elif invitee_result['action'] == 'created':
-                        stats['created'] += 1
-                    elif invitee_result['action'] == 'updated':
-                        stats['updated'] += 1
-                    
-                    invitee = invitee_result['invitee']
-                    
-                    # 檢查是否已有相同測驗項目的邀請
-                    existing_invitation = TestInvitation.objects.filter(
-                        enterprise=request.user,
-                        invitee=invitee,
-                        test_project=test_project,
-                        status__in=['pending', 'in_progress']
-                    ).first()
-                    
-                    if existing_invitation:
-                        stats['errors'].append(f'{invitee.name}({invitee.email}) 已有進行中的邀請')
-                        continue
-                    
-                    if assignment and not assignment.has_available_quota(consumed_slots + 1):
-                        remaining = assignment.remaining_quota if assignment.remaining_quota is not None else 0
-                        stats['errors'].append(f'可用份數不足（剩餘 {remaining} 份），停止後續邀請。')
-                        break
-
-                    invitation_code = uuid.uuid4()
-                    
-                    # 建立邀請
-                    invitation = TestInvitation.objects.create(
-                        enterprise=request.user,
-                        invitee=invitee,
-                        test_project=test_project,
-                        invitation_code=invitation_code,
-                        custom_message=custom_message,
-                        expires_at=expires_at,
-                        points_consumed=1,
-                        status='pending'
-                    )
-                    
-                    # 生成短網址
-                    short_url_data = URLShortenerService.generate_short_url(
-                        original_url=test_project.test_link,
-                        invitation_id=invitation.id
-                    )
-                    
-                    invitation.result_data = {
-                        'short_url': short_url_data['short_url'],
-                        'short_code': short_url_data['short_code'],
-                        'original_url': short_url_data['original_url']
-                    }
-                    invitation.save()
-                    
-                    # 更新受測者統計
-                    invitee.invited_count += 1
-                    invitee.save()
-                    
-                    created_invitations.append(invitation)
-                    stats['invited'] += 1
-                    consumed_slots += 1
-                    if assignment:
-                        assignment.consume_quota()
-                        log_quota_usage(
-                            assignment=assignment,
-                            invitation=invitation,
-                            action='consume',
-                            created_by=request.user,
-                        )
-
-                except Exception as e:
-                    logger.error(f"處理受測者 {row_data.get('name', 'Unknown')} 時發生錯誤：{str(e)}")
-                    stats['errors'].append(f"{row_data.get('name', 'Unknown')}：{str(e)}")
-            # 發送邀請信
+            email_job = None
             if send_immediately and created_invitations:
-                email_stats = send_bulk_invitations(created_invitations)
-                stats.update(email_stats)
-            
-            # 顯示處理結果
-            success_message = f"批量邀請處理完成！"
-            if stats['invited'] > 0:
-                success_message += f" 成功邀請 {stats['invited']} 人"
-            if stats['created'] > 0:
-                success_message += f"，新增 {stats['created']} 位受測者"
-            if stats['updated'] > 0:
-                success_message += f"，更新 {stats['updated']} 位受測者"
-            if stats['skipped'] > 0:
-                success_message += f"，跳過 {stats['skipped']} 位重複受測者"
+                email_job = enqueue_invitation_emails(request.user, created_invitations)
             
-            messages.success(request, success_message)
-            
-            if stats['errors']:
-                error_message = f"發生 {len(stats['errors'])} 個錯誤：" + "；".join(stats['errors'][:5])
-                if len(stats['errors']) > 5:
-                    error_message += f"...等共{len(stats['errors'])}個錯誤"
-                messages.warning(request, error_message)
-            
-            return redirect('invitation_list')
+        # 顯示處理結果
+        success_message = f"批量邀請處理完成！"
+        if stats['invited'] > 0:
+            success_message += f" 成功邀請 {stats['invited']} 人"
+        if stats['created'] > 0:
+            success_message += f"，新增 {stats['created']} 位受測者"
+        if stats['updated'] > 0:
+            success_message += f"，更新 {stats['updated']} 位受測者"
+        if stats['skipped'] > 0:
+            success_message += f"，跳過 {stats['skipped']} 位重複受測者"
+        if email_job:
+            success_message += f"。邀請信將於背景寄送（共 {email_job.total_count} 封）"
+        
+        messages.success(request, success_message)
+        
+        if stats['errors']:
+            error_message = f"發生 {len(stats['errors'])} 個錯誤：" + "；".join(stats['errors'][:5])
+            if len(stats['errors']) > 5:
+                error_message += f"...等共{len(stats['errors'])}個錯誤"
+            messages.warning(request, error_message)
+        
+        if email_job:
+            return redirect(f"{reverse('invitation_list')}?email_job={email_job.pk}")
+        return redirect('invitation_list')
             
     except Exception as e:
         logger.error(f"批量邀請處理失敗：{str(e)}")
@@ -190,64 +101,22 @@ def process_bulk_invitation(request, form):
         })
 
 
-def process_invitee_data(enterprise_user, row_data, skip_duplicates):
-    """處理單個受測者數據"""
-    
-    name = row_data.get('name', '').strip()
-    email = row_data.get('email', '').strip().lower()
-    phone = row_data.get('phone', '').strip()
-    position = row_data.get('position', '').strip()
-    company = row_data.get('company', '').strip()
-    
-    # 檢查是否已存在
-    existing_invitee = TestInvitee.objects.filter(
-        enterprise=enterprise_user,
-        email=email
-    ).first()
-    
-    if existing_invitee:
-        if skip_duplicates:
-            return {'action': 'skipped', 'invitee': existing_invitee}
-        else:
-            # 更新現有受測者資料
-            existing_invitee.name = name
-            existing_invitee.phone = phone or existing_invitee.phone
-            existing_invitee.position = position or existing_invitee.position
-            existing_invitee.company = company or existing_invitee.company
-            existing_invitee.save()
-            return {'action': 'updated', 'invitee': existing_invitee}
-    else:
-        # 建立新受測者
-        new_invitee = TestInvitee.objects.create(
-            enterprise=enterprise_user,
-            name=name,
-            email=email,
-            phone=phone,
-            position=position,
-            company=company
-        )
-        return {'action': 'created', 'invitee': new_invitee}
-
-
-def send_bulk_invitations(invitations):
-    """批量發送邀請信"""
-    
-    email_stats = {
-        'email_sent': 0,
-        'email_failed': 0
-    }
-    
-    for invitation in invitations:
-        try:
-            if EmailService.send_test_invitation_email(invitation):
-                email_stats['email_sent'] += 1
-            else:
-                email_stats['email_failed'] += 1
-        except Exception as e:
-            logger.error(f"發送邀請信失敗 {invitation.invitee.email}：{str(e)}")
-            email_stats['email_failed'] += 1
-    
-    return email_stats
+@login_required
+@enterprise_required
+def invitation_email_job_status(request, job_id):
+    """邀請信寄送任務進度（供邀請列表輪詢）"""
+    
+    job = get_object_or_404(InvitationEmailJob, pk=job_id, requested_by=request.user)
+    return JsonResponse({
+        'job_id': str(job.pk),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'total_count': job.total_count,
+        'sent_count': job.sent_count,
+        'failed_count': job.failed_count,
+        'error': job.error_message or None,
+    })
 
 
 @login_required
@@ -13,6 +13,8 @@ from .models import (
     TestProjectAssignment, InvitationTemplate, PointTransaction, UserPointBalance, Notification, User
 )
 from django.urls import reverse
+from .services.dashboard_metrics import get_admin_metrics, get_enterprise_metrics
+from .services.invitation_rollup import get_daily_series, get_status_totals
 import json
 
 class CustomDashboardView(LoginRequiredMixin, TemplateView):
@@ -42,28 +44,10 @@ class CustomDashboardView(LoginRequiredMixin, TemplateView):
     def get_enterprise_dashboard_data(self, user):
         """企業用戶儀表板數據"""
         
-        # 時間範圍
-        today = timezone.now().date()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        # 基本統計
-        stats = {
-            'total_invitations': TestInvitation.objects.filter(enterprise=user).order_by().count(),
-            'total_invitees': TestInvitee.objects.filter(enterprise=user).order_by().count(),
-            'completed_tests': TestInvitation.objects.filter(enterprise=user, status='completed').order_by().count(),
-            'pending_tests': TestInvitation.objects.filter(enterprise=user, status='pending').order_by().count(),
-        }
-        
-        # 完成率
-        stats['completion_rate'] = (stats['completed_tests'] / stats['total_invitations'] * 100) if stats['total_invitations'] > 0 else 0
-        
-        # 本週統計
-        week_stats = {
-            'invitations': TestInvitation.objects.filter(enterprise=user, invited_at__date__gte=week_ago).order_by().count(),
-            'completions': TestInvitation.objects.filter(enterprise=user, completed_at__date__gte=week_ago, status='completed').order_by().count(),
-            'new_invitees': TestInvitee.objects.filter(enterprise=user, created_at__date__gte=week_ago).order_by().count(),
-        }
+        # 計數統計（快取，資料異動時失效）
+        metrics = get_enterprise_metrics(user)
+        stats = dict(metrics['stats'])
+        week_stats = dict(metrics['week_stats'])
         
         # 點數資訊
         try:
@@ -91,29 +75,17 @@ class CustomDashboardView(LoginRequiredMixin, TemplateView):
             invited_count__gt=0
         ).order_by('-invited_count')[:5]
         
-        # 模板統計
-        template_count = 0
-        try:
-            template_count = InvitationTemplate.objects.filter(enterprise=user, is_active=True).order_by().count()
-        except:
-            pass
-        
-        # 測驗項目統計
-        available_projects = TestProject.get_available_projects_for_user(user).order_by().count()
-
         project_blocks = []
         assignments = TestProjectAssignment.objects.filter(
             enterprise_user=user,
             is_active=True
         ).select_related('test_project')
 
-        invitation_qs = TestInvitation.objects.filter(enterprise=user)
-
         for assignment in assignments:
             project = assignment.test_project
-            project_invitations = invitation_qs.filter(test_project=project)
-            pending_count = project_invitations.filter(status__in=['pending', 'in_progress']).order_by().count()
-            completed_count = project_invitations.filter(status='completed').order_by().count()
+            progress = metrics['project_progress'].get(project.id, {})
+            pending_count = progress.get('pending_count', 0)
+            completed_count = progress.get('completed_count', 0)
 
             total_slots_display = '不限' if assignment.assigned_quota == 0 else assignment.assigned_quota
             remaining_slots_display = '不限' if assignment.assigned_quota == 0 else max(assignment.assigned_quota - assignment.used_quota, 0)
@@ -138,8 +110,8 @@ class CustomDashboardView(LoginRequiredMixin, TemplateView):
             'point_info': point_info,
             'recent_invitations': recent_invitations,
             'active_invitees': active_invitees,
-            'template_count': template_count,
-            'available_projects': available_projects,
+            'template_count': metrics['template_count'],
+            'available_projects': metrics['available_projects'],
             'project_blocks': project_blocks,
             'chart_data': json.dumps(chart_data),
         }
@@ -183,56 +155,17 @@ class CustomDashboardView(LoginRequiredMixin, TemplateView):
     def get_admin_dashboard_data(self, user):
         """管理員儀表板數據"""
         
-        # 系統總覽統計
-        stats = {
-            'total_users': User.objects.order_by().count(),
-            'enterprise_users': User.objects.filter(user_type='enterprise').order_by().count(),
-            'individual_users': User.objects.filter(user_type='individual').order_by().count(),
-            'total_projects': TestProject.objects.order_by().count(),
-            'total_invitations': TestInvitation.objects.order_by().count(),
-            'total_invitees': TestInvitee.objects.order_by().count(),
-        }
-        
-        # 本月統計
-        month_start = timezone.now().replace(day=1)
-        month_stats = {
-            'new_users': User.objects.filter(date_joined__gte=month_start).order_by().count(),
-            'new_invitations': TestInvitation.objects.filter(invited_at__gte=month_start).order_by().count(),
-            'completed_tests': TestInvitation.objects.filter(completed_at__gte=month_start, status='completed').order_by().count(),
-        }
-        
-        # 待審核企業
-        pending_enterprises = User.objects.filter(
-            user_type='enterprise',
-            enterprise_profile__verification_status='pending'
-        ).order_by().count()
+        # 系統總覽與本月統計（快取，資料異動時失效）
+        metrics = get_admin_metrics()
+        stats = dict(metrics['stats'])
+        month_stats = dict(metrics['month_stats'])
+        pending_enterprises = metrics['pending_enterprises']
         
         # 最近註冊的用戶
         recent_users = User.objects.order_by('-date_joined')[:5]
         
         # 活躍企業排行
-        top_enterprise_counts = list(
-            User.objects.filter(user_type='enterprise')
-            .values('id')
-            .annotate(invitation_count=Count('sent_invitations'))
-            .order_by('-invitation_count', 'id')[:5]
-        )
-        enterprise_map = User.objects.filter(
-            id__in=[item['id'] for item in top_enterprise_counts]
-        ).in_bulk()
-        active_enterprises = []
-        for entry in top_enterprise_counts:
-            user_obj = enterprise_map.get(entry['id'])
-            if not user_obj:
-                continue
-            active_enterprises.append(
-                SimpleNamespace(
-                    id=user_obj.id,
-                    username=user_obj.username,
-                    email=user_obj.email,
-                    invitation_count=entry['invitation_count'],
-                )
-            )
+        active_enterprises = [SimpleNamespace(**entry) for entry in metrics['top_enterprises']]
         
         return {
             'stats': stats,
@@ -245,32 +178,19 @@ class CustomDashboardView(LoginRequiredMixin, TemplateView):
     def get_enterprise_chart_data(self, user):
         """企業用戶圖表數據"""
         
-        # 近7天的邀請趨勢
-        days_data = []
-        invitations_data = []
-        completions_data = []
-        
-        for i in range(7):
-            date = timezone.now().date() - timedelta(days=6-i)
-            days_data.append(date.strftime('%m/%d'))
-            
-            day_invitations = TestInvitation.objects.filter(
-                enterprise=user,
-                invited_at__date=date
-            ).order_by().count()
-            invitations_data.append(day_invitations)
-            
-            day_completions = TestInvitation.objects.filter(
-                enterprise=user,
-                completed_at__date=date,
-                status='completed'
-            ).order_by().count()
-            completions_data.append(day_completions)
+        # 近7天的邀請趨勢（每日彙總，一次查詢）
+        series = get_daily_series(user, timezone.localdate() - timedelta(days=6), 7)
+        days_data = [item['date'].strftime('%m/%d') for item in series]
+        invitations_data = [item['invitations'] for item in series]
+        completions_data = [item['completions'] for item in series]
         
         # 狀態分布
-        status_distribution = TestInvitation.objects.filter(
-            enterprise=user
-        ).order_by().values('status').annotate(count=Count('id'))
+        status_totals = get_status_totals(user)
+        status_distribution = [
+            {'status': status, 'count': status_totals[status]}
+            for status, _ in TestInvitation.STATUS_CHOICES
+            if status_totals[status]
+        ]
         
         status_labels = []
         status_data = []
@@ -8,8 +8,7 @@ def check_permission(permission_code):
     def decorator(view_func):
         @wraps(view_func)
         def wrapped_view(request, *args, **kwargs):
-            user_type = request.COOKIES.get('user_type', '')
-            if PermissionHandler.has_permission(user_type, permission_code):
+            if PermissionHandler.request_has_permission(request, permission_code):
                 return view_func(request, *args, **kwargs)
             else:
                 raise PermissionDenied
@@ -0,0 +1,97 @@
+# core/export_job_views.py
+"""測驗結果匯出：資料量大時改由背景任務產生檔案"""
+import logging
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .models import ExportJob
+from .services.test_result_export import (
+    ASYNC_THRESHOLD,
+    EXPORT_FORMATS,
+    enqueue_export_job,
+    filter_export_invitations,
+    normalize_format,
+)
+from .test_result_views import enterprise_required
+from utils.pdf_report_generator import build_content_disposition
+
+logger = logging.getLogger(__name__)
+
+
+def _job_payload(job):
+    payload = {
+        'success': job.status != 'failed',
+        'job_id': str(job.pk),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'row_count': job.row_count,
+        'status_url': reverse('export_job_status', args=[job.pk]),
+        'download_url': None,
+        'error': job.error_message or None,
+    }
+    if job.status == 'completed':
+        payload['download_url'] = reverse('export_job_download', args=[job.pk])
+    return payload
+
+
+@login_required
+@enterprise_required
+@require_POST
+def request_test_result_export_job(request):
+    """依資料量決定匯出方式：筆數少時直接串流下載，超過門檻時建立背景任務"""
+    export_format = normalize_format(request.GET.get('format'))
+    row_count = filter_export_invitations(request.user, request.GET).count()
+
+    if row_count <= ASYNC_THRESHOLD:
+        return JsonResponse({
+            'success': True,
+            'job_id': None,
+            'status': 'completed',
+            'progress': 100,
+            'row_count': row_count,
+            'download_url': f"{reverse('export_filtered_test_results')}?{request.GET.urlencode()}",
+        })
+
+    job = enqueue_export_job(request.user, request.GET.dict(), export_format)
+    logger.info(f"匯出任務 job={job.pk} user={request.user.pk} rows={row_count} format={export_format}")
+    return JsonResponse(_job_payload(job), status=202)
+
+
+def _get_own_job(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.requested_by_id != request.user.pk:
+        return None
+    return job
+
+
+@login_required
+@require_GET
+def export_job_status(request, job_id):
+    """查詢匯出進度"""
+    job = _get_own_job(request, job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': '無權限查看此任務'}, status=403)
+    return JsonResponse(_job_payload(job))
+
+
+@login_required
+@require_GET
+def export_job_download(request, job_id):
+    """下載已完成的匯出檔案"""
+    job = _get_own_job(request, job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': '無權限下載此檔案'}, status=403)
+    if job.status != 'completed' or not job.file:
+        return JsonResponse({'success': False, 'error': '匯出檔案尚未產生完成', **_job_payload(job)}, status=409)
+
+    response = FileResponse(job.file.open('rb'), content_type=EXPORT_FORMATS[job.export_format][1])
+    response['Content-Disposition'] = build_content_disposition(
+        job.download_filename or f'export.{job.export_format}',
+        job.display_filename or job.download_filename or f'export.{job.export_format}',
+    )
+    return response
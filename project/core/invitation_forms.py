@@ -77,7 +77,7 @@ class TestInvitationForm(forms.Form):
         
         # 設定受測人員查詢集
         if enterprise_user:
-            queryset = TestInvitee.objects.filter(enterprise=enterprise_user).order_by('name')
+            queryset = TestInvitee.objects.filter(enterprise=enterprise_user).with_progress().order_by('name')
             self.fields['invitees'].queryset = queryset
 
             # Debug 輸出
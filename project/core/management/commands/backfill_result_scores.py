@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.models import TestInvitation, TestProjectResult
+from core.services.test_result_listing import refresh_listing_sort_keys, refresh_result_scores
+
+
+class Command(BaseCommand):
+    help = '回填測驗結果的預測分數與 CI 分數欄位，以及邀請的結果列表排序鍵'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='只處理指定的測驗項目ID')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批更新筆數')
+
+    def handle(self, *args, **options):
+        results = TestProjectResult.objects.all()
+        invitations = TestInvitation.objects.all()
+        if options['project']:
+            results = results.filter(test_project_id=options['project'])
+            invitations = invitations.filter(test_project_id=options['project'])
+
+        updated = refresh_result_scores(results, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已更新 {updated} 筆測驗結果的分數欄位'))
+        updated = refresh_listing_sort_keys(invitations, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已更新 {updated} 筆邀請的排序鍵'))
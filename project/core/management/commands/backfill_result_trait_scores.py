@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.services.trait_search_index import rebuild_trait_search_index
+
+
+class Command(BaseCommand):
+    help = '回填特質分數搜尋索引（result_trait_score），供特質門檻搜尋與統計使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='只處理指定的測驗項目ID')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批處理筆數')
+
+    def handle(self, *args, **options):
+        totals = rebuild_trait_search_index(
+            project_id=options['project'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"已處理 {totals['project_results']} 筆企業測驗結果、"
+            f"{totals['individual_results']} 筆個人測驗結果，寫入 {totals['rows']} 筆特質分數"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.services.score_percentiles import rebuild_score_histograms
+
+
+class Command(BaseCommand):
+    help = '重新計算測驗項目分數分佈（score_histogram_bin），供百分位與前 X% 查詢使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='只處理指定的測驗項目ID')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批讀取筆數')
+
+    def handle(self, *args, **options):
+        totals = rebuild_score_histograms(
+            project_id=options['project'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"已處理 {totals['results']} 筆測驗結果（{totals['changed']} 筆異動），寫入 {totals['bins']} 個分數區間"
+        ))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.services.invitation_rollup import rebuild_invitation_rollups
+
+
+class Command(BaseCommand):
+    help = '重新計算測驗邀請每日彙總（統計圖表資料來源）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, help='只重建指定的企業用戶ID')
+        parser.add_argument('--days', type=int, help='只重建最近 N 天的彙總')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        rows = rebuild_invitation_rollups(enterprise_id=options['enterprise'], since=since)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {rows} 筆每日彙總'))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.services.point_rollup import rebuild_point_rollups
+
+
+class Command(BaseCommand):
+    help = '重新計算點數交易每日彙總（消費統計資料來源）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='只重建指定的用戶ID')
+        parser.add_argument('--days', type=int, help='只重建最近 N 天的彙總')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        rows = rebuild_point_rollups(user_id=options['user'], since=since)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {rows} 筆每日彙總'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.models import TestProjectResult
+from core.services.role_index_stats import update_project_role_index_stats
+
+
+class Command(BaseCommand):
+    help = '更新測驗項目的角色指數分佈統計（預設只處理有異動的結果）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='只更新指定的測驗項目ID')
+        parser.add_argument('--full', action='store_true', help='歸零後重新累計所有結果')
+
+    def handle(self, *args, **options):
+        if options['project']:
+            project_ids = [options['project']]
+        else:
+            project_ids = list(
+                TestProjectResult.objects.values_list('test_project_id', flat=True).distinct()
+            )
+
+        for project_id in project_ids:
+            stats = update_project_role_index_stats(project_id, full=options['full'])
+            std_text = f'{stats.std:.2f}' if stats.std is not None else '-'
+            self.stdout.write(
+                f'測驗項目 {project_id}: 樣本數={stats.sample_count}, 平均={stats.mean:.2f}, 標準差={std_text}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'已更新 {len(project_ids)} 個測驗項目的角色指數統計'))
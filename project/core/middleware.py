@@ -1,14 +1,40 @@
 # core/middleware.py
 import logging
 from django.utils.deprecation import MiddlewareMixin
-from django.http import HttpResponseForbidden
-from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseForbidden
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import re
+import time
+from urllib.parse import unquote_plus
+
+from utils.ip_blocklist import IPBlocklist, normalize_entry
+from utils.rate_limit import PrefixTrie, Rate, SlidingWindowLimiter
+from utils.tiered_cache import namespace
+from utils.view_metrics import METRICS_HEADER, build_view_metrics, format_metrics_header, record_queries
 
 logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger('view_metrics')
+
+# 封鎖名單變動少，由各程序定期載入；速率限制計數需所有 worker 一致，只存放在 L2
+security_cache = namespace('security')
+ratelimit_cache = namespace('ratelimit', use_l1=False, versioned=False)
+
+BLOCKED_IPS_KEY = 'blocked_ips'
+
+
+# 常見的惡意用戶代理與參數內容，合併為單一正規表示式，每個值只需掃描一次
+SUSPICIOUS_USER_AGENT = re.compile(
+    r'sqlmap|nmap|nikto|curl.*bot|python-requests|wget|<script', re.IGNORECASE
+)
+SUSPICIOUS_PARAM = re.compile(r'<script|javascript:|union select|drop table', re.IGNORECASE)
+
+
+def set_blocked_ips(ips):
+    """更新 IP 封鎖名單（單一 IP 或 CIDR 網段，寫入共用的 L2，各 worker 在下次重新載入時生效）"""
+    security_cache.set(BLOCKED_IPS_KEY, sorted({normalize_entry(ip) for ip in ips}), None)
 
 class SecurityMiddleware(MiddlewareMixin):
     """安全中間件"""
@@ -16,16 +42,26 @@ class SecurityMiddleware(MiddlewareMixin):
     def __init__(self, get_response):
         self.get_response = get_response
         super().__init__(get_response)
+        # 靜態與媒體檔案不檢查用戶代理與參數
+        self.skip_prefixes = tuple(
+            url for url in (settings.STATIC_URL, settings.MEDIA_URL) if url and url.startswith('/')
+        )
+        self.refresh_interval = getattr(settings, 'IP_BLOCKLIST_REFRESH_SECONDS', 30)
+        self.blocklist = IPBlocklist()
+        self.blocklist_loaded_at = None
     
     def process_request(self, request):
-        # 記錄可疑的請求
-        self.log_suspicious_requests(request)
-        
         # 檢查IP黑名單
         if self.is_ip_blocked(request):
             logger.warning(f"Blocked request from IP: {self.get_client_ip(request)}")
             return HttpResponseForbidden("IP 被封鎖")
         
+        if request.path.startswith(self.skip_prefixes):
+            return None
+        
+        # 記錄可疑的請求
+        self.log_suspicious_requests(request)
+        
         # 檢查用戶代理
         if self.is_suspicious_user_agent(request):
             logger.warning(f"Suspicious user agent: {request.META.get('HTTP_USER_AGENT', 'Unknown')}")
@@ -50,78 +86,75 @@ class SecurityMiddleware(MiddlewareMixin):
         """獲取客戶端真實 IP"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
+            ip = x_forwarded_for.split(',')[0].strip()
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
+    def get_blocklist(self):
+        """封鎖名單在程序內保留 refresh_interval 秒，之後由共用快取重新載入"""
+        now = time.monotonic()
+        if self.blocklist_loaded_at is None or now - self.blocklist_loaded_at >= self.refresh_interval:
+            entries = security_cache.get(BLOCKED_IPS_KEY) or []
+            try:
+                self.blocklist = IPBlocklist(entries)
+            except ValueError as e:
+                logger.error(f"IP 封鎖名單格式錯誤，沿用先前的名單：{str(e)}")
+            self.blocklist_loaded_at = now
+        return self.blocklist
+    
     def is_ip_blocked(self, request):
         """檢查 IP 是否被封鎖"""
-        client_ip = self.get_client_ip(request)
-        blocked_ips = cache.get('blocked_ips', [])
-        return client_ip in blocked_ips
+        return self.get_client_ip(request) in self.get_blocklist()
     
     def is_suspicious_user_agent(self, request):
         """檢查是否為可疑的用戶代理"""
         user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
-        # 常見的惡意用戶代理模式
-        suspicious_patterns = [
-            r'sqlmap',
-            r'nmap',
-            r'nikto',
-            r'curl.*bot',
-            r'python-requests',
-            r'wget',
-            r'<script',
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.search(pattern, user_agent, re.IGNORECASE):
-                return True
-        
-        return False
+        return bool(user_agent) and SUSPICIOUS_USER_AGENT.search(user_agent) is not None
     
     def log_suspicious_requests(self, request):
         """記錄可疑請求"""
-        # 檢查是否包含惡意參數
-        suspicious_params = ['<script', 'javascript:', 'union select', 'drop table']
-        
-        for param_name, param_value in request.GET.items():
-            for suspicious in suspicious_params:
-                if suspicious.lower() in str(param_value).lower():
-                    logger.warning(f"Suspicious GET parameter: {param_name}={param_value} from IP: {self.get_client_ip(request)}")
-        
+        params = []
+        # 先以整段查詢字串篩選，只有可能相符時才逐一檢查參數
+        query_string = request.META.get('QUERY_STRING', '')
+        if query_string and SUSPICIOUS_PARAM.search(unquote_plus(query_string)):
+            params.append(('GET', request.GET))
         if request.method == 'POST':
-            for param_name, param_value in request.POST.items():
-                for suspicious in suspicious_params:
-                    if suspicious.lower() in str(param_value).lower():
-                        logger.warning(f"Suspicious POST parameter: {param_name}={param_value} from IP: {self.get_client_ip(request)}")
+            params.append(('POST', request.POST))
+        
+        for method, query_dict in params:
+            for param_name, values in query_dict.lists():
+                for param_value in values:
+                    if SUSPICIOUS_PARAM.search(str(param_value)):
+                        logger.warning(f"Suspicious {method} parameter: {param_name}={param_value} from IP: {self.get_client_ip(request)}")
 
 class RateLimitMiddleware(MiddlewareMixin):
-    """速率限制中間件"""
+    """速率限制中間件：依路徑前綴套用 RATE_LIMIT_RULES 的滑動視窗限制"""
     
     def __init__(self, get_response):
         self.get_response = get_response
         super().__init__(get_response)
+        # 規則在啟動時編譯為前綴樹，每個請求只需一次查詢
+        self.rules = PrefixTrie({
+            prefix: Rate.parse(rate)
+            for prefix, rate in getattr(settings, 'RATE_LIMIT_RULES', {}).items()
+        })
+        self.limiter = SlidingWindowLimiter(ratelimit_cache)
     
     def process_request(self, request):
-        # 對於某些敏感端點進行額外的速率限制
-        sensitive_paths = [
-            '/auth/login/',
-            '/auth/register/',
-            '/api/auth/login/',
-            '/api/auth/register/',
-            '/forgot-password/',
-        ]
-        
-        for path in sensitive_paths:
-            if request.path.startswith(path):
-                if self.is_rate_limited(request, path):
-                    logger.warning(f"Rate limit exceeded for path: {path} from IP: {self.get_client_ip(request)}")
-                    return HttpResponseForbidden("請求過於頻繁，請稍後再試")
-        
-        return None
+        matched = self.rules.match(request.path)
+        if matched is None:
+            return None
+        
+        prefix, rate = matched
+        decision = self.limiter.hit(f"{self.get_client_ip(request)}:{prefix}", rate)
+        if decision.allowed:
+            return None
+        
+        logger.warning(f"Rate limit exceeded for path: {prefix} from IP: {self.get_client_ip(request)}")
+        response = HttpResponse("請求過於頻繁，請稍後再試", status=429)
+        response['Retry-After'] = str(decision.retry_after)
+        return response
     
     def get_client_ip(self, request):
         """獲取客戶端真實 IP"""
@@ -131,20 +164,6 @@ class RateLimitMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
-    
-    def is_rate_limited(self, request, path):
-        """檢查是否達到速率限制"""
-        client_ip = self.get_client_ip(request)
-        cache_key = f"rate_limit:{client_ip}:{path}"
-        
-        # 每分鐘最多 5 次請求
-        current_count = cache.get(cache_key, 0)
-        if current_count >= 5:
-            return True
-        
-        # 增加計數
-        cache.set(cache_key, current_count + 1, timeout=60)
-        return False
 
 class AuditMiddleware(MiddlewareMixin):
     """審計中間件"""
@@ -181,4 +200,40 @@ class AuditMiddleware(MiddlewareMixin):
             ip = x_forwarded_for.split(',')[0]
         else:
             ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        return ip
+
+
+class ViewMetricsMiddleware:
+    """效能量測中間件：記錄每個請求的 SQL 次數、資料庫時間、Python 時間與回應大小
+
+    結果以 view_metrics logger 輸出（extra 帶有結構化欄位）；開啟 VIEW_METRICS_HEADER 時
+    另附加 X-View-Metrics 回應標頭。串流回應在視圖返回後才執行的查詢不列入計算。
+    """
+    
+    def __init__(self, get_response):
+        if not getattr(settings, 'VIEW_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.expose_header = getattr(settings, 'VIEW_METRICS_HEADER', settings.DEBUG)
+        self.query_warning = getattr(settings, 'VIEW_METRICS_QUERY_WARNING', 50)
+        self.slow_ms = getattr(settings, 'VIEW_METRICS_SLOW_MS', 1000)
+    
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        metrics = build_view_metrics(request, response, recorder, time.perf_counter() - start)
+        
+        if self.expose_header:
+            response[METRICS_HEADER] = format_metrics_header(metrics)
+        
+        # 超過查詢次數或耗時門檻時以 WARNING 記錄，其餘為 DEBUG
+        exceeded = metrics['queries'] > self.query_warning or metrics['total_ms'] > self.slow_ms
+        metrics_logger.log(
+            logging.WARNING if exceeded else logging.DEBUG,
+            "view_metrics view=%s method=%s status=%s queries=%s db_ms=%s python_ms=%s total_ms=%s bytes=%s",
+            metrics['view'] or metrics['path'], metrics['method'], metrics['status'], metrics['queries'],
+            metrics['db_ms'], metrics['python_ms'], metrics['total_ms'], metrics['response_bytes'],
+            extra={'view_metrics': metrics},
+        )
+        return response
@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_testproject_name_abbreviation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectRoleIndexStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sample_count', models.PositiveIntegerField(default=0, verbose_name='樣本數')),
+                ('mean', models.FloatField(default=0.0, verbose_name='平均值')),
+                ('m2', models.FloatField(default=0.0, verbose_name='離均差平方和')),
+                ('synced_through', models.DateTimeField(blank=True, null=True, verbose_name='已同步至')),
+                ('needs_rebuild', models.BooleanField(default=False, verbose_name='需要重新計算')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('test_project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='role_index_stats', to='core.testproject', verbose_name='測驗項目')),
+            ],
+            options={
+                'verbose_name': '角色指數統計',
+                'verbose_name_plural': '角色指數統計',
+                'db_table': 'project_role_index_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResultRoleIndexContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('values', models.JSONField(default=dict, verbose_name='角色指數')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('test_project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.testproject', verbose_name='測驗項目')),
+                ('test_result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='role_index_contribution', to='core.testprojectresult', verbose_name='測驗結果')),
+            ],
+            options={
+                'verbose_name': '角色指數統計明細',
+                'verbose_name_plural': '角色指數統計明細',
+                'db_table': 'result_role_index_contribution',
+            },
+        ),
+    ]
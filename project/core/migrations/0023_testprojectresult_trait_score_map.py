@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_projectroleindexstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testprojectresult',
+            name='trait_score_map',
+            field=models.JSONField(blank=True, default=dict, verbose_name='特質分數對照'),
+        ),
+    ]
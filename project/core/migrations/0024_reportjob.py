@@ -0,0 +1,42 @@
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_testprojectresult_trait_score_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('result_type', models.CharField(choices=[('project', '企業測驗結果'), ('individual', '個人測驗結果')], max_length=20, verbose_name='結果類型')),
+                ('result_id', models.BigIntegerField(verbose_name='結果ID')),
+                ('source_updated_at', models.DateTimeField(blank=True, null=True, verbose_name='結果更新時間')),
+                ('status', models.CharField(choices=[('pending', '排隊中'), ('running', '生成中'), ('completed', '已完成'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='狀態')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='進度')),
+                ('file', models.FileField(blank=True, upload_to='report_jobs/%Y/%m/', verbose_name='報告檔案')),
+                ('download_filename', models.CharField(blank=True, max_length=255, verbose_name='下載檔名')),
+                ('display_filename', models.CharField(blank=True, max_length=255, verbose_name='顯示檔名')),
+                ('error_message', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='建立時間')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='請求者')),
+            ],
+            options={
+                'verbose_name': '報告生成任務',
+                'verbose_name_plural': '報告生成任務',
+                'db_table': 'report_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['result_type', 'result_id', 'status'], name='report_job_result_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('result_type', 'result_id'), name='report_job_single_active')],
+            },
+        ),
+    ]
@@ -0,0 +1,116 @@
+import re
+
+from django.db import migrations, models
+
+# 以下分數解析凍結自建立本遷移時的 core.services.test_result_listing；之後服務程式的修改不會影響本遷移
+
+
+def _parse_numeric(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = value.strip()
+        if not cleaned:
+            return None
+        match = re.search(r'-?\d+(?:\.\d+)?', cleaned.replace(',', ''))
+        if match:
+            try:
+                return float(match.group(0))
+            except ValueError:
+                return None
+    return None
+
+
+def _first_numeric(candidates):
+    for candidate in candidates:
+        numeric = _parse_numeric(candidate)
+        if numeric is not None:
+            return numeric
+    return None
+
+
+def extract_prediction_score(result, project):
+    """依序嘗試 performance_metrics、raw_data 與 prediction_value"""
+    prediction_key = (project.prediction_field_system or '').strip()
+    raw_data = result.raw_data if isinstance(result.raw_data, dict) else {}
+    performance = raw_data.get('performance_metrics')
+
+    candidates = []
+    if isinstance(performance, dict):
+        if prediction_key:
+            candidates.append(performance.get(prediction_key))
+        candidates.append(performance.get('Prediction'))
+        candidates.append(performance.get('prediction'))
+        candidates.append(performance.get('CI_Prediction_Value'))
+    if raw_data:
+        if prediction_key:
+            candidates.append(raw_data.get(prediction_key))
+        candidates.append(raw_data.get('Prediction'))
+        candidates.append(raw_data.get('prediction'))
+    if result.prediction_value:
+        candidates.append(result.prediction_value)
+    return _first_numeric(candidates)
+
+
+def extract_ci_score(result, project):
+    """依序嘗試 CI_Raw_Value、評分欄位與 score_value"""
+    score_key = (project.score_field_system or '').strip()
+    raw_data = result.raw_data if isinstance(result.raw_data, dict) else {}
+    performance = raw_data.get('performance_metrics')
+
+    candidates = []
+    if isinstance(performance, dict):
+        candidates.append(performance.get('CI_Raw_Value'))
+        if score_key:
+            candidates.append(performance.get(score_key))
+    if raw_data:
+        candidates.append(raw_data.get('CI_Raw_Value'))
+        if score_key:
+            candidates.append(raw_data.get(score_key))
+    candidates.append(result.score_value)
+    return _first_numeric(candidates)
+
+
+def backfill_result_scores(apps, schema_editor):
+    """由既有測驗結果的 raw_data 等欄位解析預測分數與 CI 分數"""
+    TestProjectResult = apps.get_model('core', 'TestProjectResult')
+
+    results = TestProjectResult.objects.select_related('test_project').only(
+        'id', 'raw_data', 'score_value', 'prediction_value',
+        'test_project__prediction_field_system', 'test_project__score_field_system',
+    ).order_by('id')
+    batch = []
+    for result in results.iterator(chunk_size=500):
+        result.prediction_score = extract_prediction_score(result, result.test_project)
+        result.ci_score = extract_ci_score(result, result.test_project)
+        if result.prediction_score is None and result.ci_score is None:
+            continue
+        batch.append(result)
+        if len(batch) >= 500:
+            TestProjectResult.objects.bulk_update(batch, ['prediction_score', 'ci_score'])
+            batch = []
+    if batch:
+        TestProjectResult.objects.bulk_update(batch, ['prediction_score', 'ci_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testprojectresult',
+            name='prediction_score',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='預測分數'),
+        ),
+        migrations.AddField(
+            model_name='testprojectresult',
+            name='ci_score',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='CI分數'),
+        ),
+        migrations.RunPython(backfill_result_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+# 以下彙總邏輯凍結自建立本遷移時的 core.services.invitation_rollup；之後服務程式的修改不會影響本遷移
+STATUS_FIELDS = {
+    'pending': 'pending_count',
+    'in_progress': 'in_progress_count',
+    'completed': 'invited_completed_count',
+    'expired': 'expired_count',
+    'cancelled': 'cancelled_count',
+}
+
+
+def backfill_invitation_rollups(apps, schema_editor):
+    """由既有邀請建立每日彙總列"""
+    TestInvitation = apps.get_model('core', 'TestInvitation')
+    InvitationDailyStats = apps.get_model('core', 'InvitationDailyStats')
+
+    invited = TestInvitation.objects.order_by()
+    completed = invited.filter(status='completed', completed_at__isnull=False)
+    # 與既有統計一致：分數為 0 或空值不列入平均
+    scored = Q(status='completed', score__isnull=False) & ~Q(score=0)
+    status_counts = {
+        field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+    }
+
+    rows = defaultdict(dict)
+    for item in (
+        invited.annotate(day=TruncDate('invited_at'))
+        .values('enterprise_id', 'test_project_id', 'day')
+        .annotate(
+            invited_count=Count('id'),
+            score_sum=Sum('score', filter=scored),
+            score_count=Count('id', filter=scored),
+            **status_counts,
+        )
+    ):
+        key = (item['enterprise_id'], item['test_project_id'], item['day'])
+        rows[key].update({
+            'invited_count': item['invited_count'],
+            'score_sum': item['score_sum'] or 0.0,
+            'score_count': item['score_count'],
+            **{field: item[field] for field in STATUS_FIELDS.values()},
+        })
+    for item in (
+        completed.annotate(day=TruncDate('completed_at'))
+        .values('enterprise_id', 'test_project_id', 'day')
+        .annotate(completed_count=Count('id'))
+    ):
+        key = (item['enterprise_id'], item['test_project_id'], item['day'])
+        rows[key]['completed_count'] = item['completed_count']
+
+    InvitationDailyStats.objects.bulk_create(
+        [
+            InvitationDailyStats(enterprise_id=enterprise_id, test_project_id=project_id, date=day, **fields)
+            for (enterprise_id, project_id, day), fields in rows.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_testprojectresult_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvitationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('invited_count', models.IntegerField(default=0, verbose_name='邀請數')),
+                ('pending_count', models.IntegerField(default=0, verbose_name='待執行數')),
+                ('in_progress_count', models.IntegerField(default=0, verbose_name='進行中數')),
+                ('invited_completed_count', models.IntegerField(default=0, verbose_name='已完成數')),
+                ('expired_count', models.IntegerField(default=0, verbose_name='已過期數')),
+                ('cancelled_count', models.IntegerField(default=0, verbose_name='已取消數')),
+                ('score_sum', models.FloatField(default=0.0, verbose_name='分數總和')),
+                ('score_count', models.IntegerField(default=0, verbose_name='計分筆數')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='完成數')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('enterprise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invitation_daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='企業')),
+                ('test_project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.testproject', verbose_name='測驗項目')),
+            ],
+            options={
+                'verbose_name': '測驗邀請每日彙總',
+                'verbose_name_plural': '測驗邀請每日彙總',
+                'db_table': 'invitation_daily_stats',
+                'indexes': [models.Index(fields=['enterprise', 'date'], name='invitation_daily_ent_date_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('test_project__isnull', False)), fields=('enterprise', 'test_project', 'date'), name='invitation_daily_unique_project'), models.UniqueConstraint(condition=models.Q(('test_project__isnull', True)), fields=('enterprise', 'date'), name='invitation_daily_unique_no_project')],
+            },
+        ),
+        migrations.RunPython(backfill_invitation_rollups, migrations.RunPython.noop),
+    ]
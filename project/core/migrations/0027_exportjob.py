@@ -0,0 +1,40 @@
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_invitationdailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('export_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=10, verbose_name='匯出格式')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='篩選條件')),
+                ('status', models.CharField(choices=[('pending', '排隊中'), ('running', '生成中'), ('completed', '已完成'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='狀態')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='進度')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='資料筆數')),
+                ('file', models.FileField(blank=True, upload_to='export_jobs/%Y/%m/', verbose_name='匯出檔案')),
+                ('download_filename', models.CharField(blank=True, max_length=255, verbose_name='下載檔名')),
+                ('display_filename', models.CharField(blank=True, max_length=255, verbose_name='顯示檔名')),
+                ('error_message', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='建立時間')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='請求者')),
+            ],
+            options={
+                'verbose_name': '匯出任務',
+                'verbose_name_plural': '匯出任務',
+                'db_table': 'export_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,227 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# 以下比對邏輯凍結自建立本遷移時的 core.services.project_scoring_graph 與
+# core.services.trait_search_index；之後服務程式的修改不會影響本遷移
+
+# 爬蟲回傳的特質名稱與系統設定不一致時使用的別名
+TRAIT_NAME_ALIASES = {
+    '準確嚴謹度': ['注重細節', 'Attention to Detail'],
+    '認知彈性': ['認知靈活性', 'Cognitive Flexibility'],
+    '適應敏捷力': ['變化敏捷性', 'Change Agility'],
+    '卓越驅動力': ['成就動機', 'Achievement Motivation'],
+    '自主領導力': ['自我領導力', 'Self-Leadership'],
+    '創造性思考': ['創意思考', 'Creative Thinking'],
+    '分析性思考': ['分析思考能力', 'Analytical Thinking'],
+    '系統性思考': ['系統性思維', 'Systems Thinking'],
+    '高效決策力': ['決策能力', 'Decision-Making'],
+    '溝通協調力': ['人際溝通', 'Interpersonal Communication'],
+    '協商談判力': ['談判技巧', 'Negotiation Skills'],
+    '社交智商': ['社會智能', 'Social Intelligence'],
+    'AI素養': ['AI Literacy'],
+    '自我意識': ['Self-Awareness'],
+    '自我批評': ['Self-Criticism'],
+    '自我反思': ['Self-Reflection'],
+    '社會期望反應': ['Social Desirability'],
+    '反饋尋求': ['Feedback Seeking'],
+    '洞察力': ['Insight'],
+    '差異察覺': ['Difference Awareness'],
+    '好奇心': ['Curiosity'],
+    '終身學習': ['Lifelong Learning'],
+    '批判性思考': ['Critical Thinking'],
+    '同理心': ['Empathy'],
+    '社會影響力': ['Social Influence'],
+    '韌性': ['Resilience'],
+    '積極傾聽': ['Active Listening'],
+    '可靠性': ['Dependability'],
+}
+
+TRAIT_NAME_GROUPS = {}
+for _chinese_name, _aliases in TRAIT_NAME_ALIASES.items():
+    _group = [_chinese_name, *_aliases]
+    for _name in _group:
+        TRAIT_NAME_GROUPS.setdefault(_name, _group)
+
+BATCH_SIZE = 500
+
+
+def _normalize(key):
+    return str(key).strip().lower().replace(' ', '_')
+
+
+def _aliases_for(trait):
+    chinese_name = trait.chinese_name or ''
+    aliases = []
+    for name in (chinese_name, trait.system_name or ''):
+        for alias in TRAIT_NAME_GROUPS.get(name, []):
+            if alias != chinese_name and alias not in aliases:
+                aliases.append(alias)
+    return aliases
+
+
+class TraitMatcher:
+    """特質名稱比對：系統名稱與中文名稱優先於別名"""
+
+    def __init__(self, traits):
+        self.traits = sorted(traits, key=lambda trait: trait.id)
+        self.aliases = {trait.id: _aliases_for(trait) for trait in self.traits}
+        self.index = {}
+        for trait in self.traits:
+            for key in (trait.system_name, trait.chinese_name):
+                if key:
+                    self.index.setdefault(_normalize(key), trait.id)
+        for trait in self.traits:
+            for alias in self.aliases[trait.id]:
+                self.index.setdefault(_normalize(alias), trait.id)
+
+    def match(self, key, chinese_name=None):
+        for candidate in (key, chinese_name):
+            if candidate:
+                trait_id = self.index.get(_normalize(candidate))
+                if trait_id is not None:
+                    return trait_id
+        return None
+
+    def trait_scores(self, raw_data):
+        """特質ID -> 分數"""
+        scores = {}
+        if not isinstance(raw_data, dict):
+            return scores
+
+        trait_scores_data = raw_data.get('trait_scores')
+        if isinstance(trait_scores_data, dict):
+            for key, value in trait_scores_data.items():
+                value_dict = value if isinstance(value, dict) else None
+                score = value_dict.get('score') if value_dict else value
+                if not isinstance(score, (int, float)):
+                    continue
+                trait_id = self.match(key, value_dict.get('chinese_name') if value_dict else None)
+                if trait_id is None or trait_id in scores:
+                    continue
+                scores[trait_id] = float(score)
+
+        # 舊格式：分數直接存放在原始資料根目錄
+        for trait in self.traits:
+            if trait.id in scores:
+                continue
+            system_key = (trait.system_name or '').lower().replace(' ', '_')
+            for key in (trait.system_name, trait.chinese_name, system_key, *self.aliases[trait.id]):
+                if not key:
+                    continue
+                value = raw_data.get(key)
+                if isinstance(value, dict):
+                    value = value.get('score')
+                if isinstance(value, (int, float)):
+                    scores[trait.id] = float(value)
+                    break
+        return scores
+
+    def result_scores(self, trait_results, raw_data):
+        """優先使用整理後的 trait_results，沒有時改由原始資料比對"""
+        scores = {}
+        if isinstance(trait_results, dict) and trait_results:
+            scores = self.trait_scores({'trait_scores': trait_results})
+        return scores or self.trait_scores(raw_data)
+
+
+def _project_rows(result, matcher, ResultTraitScore):
+    if result.crawl_status != 'completed':
+        return []
+    invitation = result.test_invitation
+    completed_at = invitation.completed_at or result.crawled_at
+    return [
+        ResultTraitScore(
+            project_result_id=result.pk,
+            enterprise_id=invitation.enterprise_id,
+            invitee_id=invitation.invitee_id,
+            test_project_id=result.test_project_id,
+            trait_id=trait_id,
+            score=score,
+            completed_at=completed_at,
+        )
+        for trait_id, score in matcher.result_scores(result.trait_results, result.raw_data).items()
+    ]
+
+
+def _individual_rows(result, matcher, ResultTraitScore):
+    # 與人才搜尋條件一致，僅索引結果完整的個人測驗
+    if result.result_status != 'completed':
+        return []
+    completed_at = result.test_completion_date or result.crawled_at
+    return [
+        ResultTraitScore(
+            individual_result_id=result.pk,
+            user_id=result.user_id,
+            test_project_id=result.test_project_id,
+            trait_id=trait_id,
+            score=score,
+            completed_at=completed_at,
+        )
+        for trait_id, score in matcher.result_scores(result.trait_results, result.raw_data).items()
+    ]
+
+
+def backfill_trait_scores(apps, schema_editor):
+    """由既有的企業與個人測驗結果建立特質分數索引列"""
+    ResultTraitScore = apps.get_model('core', 'ResultTraitScore')
+    TestProjectResult = apps.get_model('core', 'TestProjectResult')
+    IndividualTestResult = apps.get_model('core', 'IndividualTestResult')
+    matcher = TraitMatcher(apps.get_model('core', 'Trait').objects.all())
+
+    sources = (
+        (
+            TestProjectResult.objects.select_related('test_invitation').only(
+                'id', 'test_project_id', 'crawl_status', 'crawled_at', 'trait_results', 'raw_data',
+                'test_invitation__enterprise_id', 'test_invitation__invitee_id', 'test_invitation__completed_at',
+            ),
+            _project_rows,
+        ),
+        (
+            IndividualTestResult.objects.only(
+                'id', 'user_id', 'test_project_id', 'result_status', 'test_completion_date',
+                'crawled_at', 'trait_results', 'raw_data',
+            ),
+            _individual_rows,
+        ),
+    )
+    for queryset, build_rows in sources:
+        rows = []
+        for result in queryset.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            rows.extend(build_rows(result, matcher, ResultTraitScore))
+            if len(rows) >= BATCH_SIZE:
+                ResultTraitScore.objects.bulk_create(rows)
+                rows = []
+        ResultTraitScore.objects.bulk_create(rows)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultTraitScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='分數')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+                ('enterprise', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='邀請企業')),
+                ('individual_result', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trait_score_rows', to='core.individualtestresult', verbose_name='個人測驗結果')),
+                ('invitee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trait_score_rows', to='core.testinvitee', verbose_name='受測人員')),
+                ('project_result', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trait_score_rows', to='core.testprojectresult', verbose_name='企業測驗結果')),
+                ('test_project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.testproject', verbose_name='測驗項目')),
+                ('trait', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_scores', to='core.trait', verbose_name='特質')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trait_score_rows', to=settings.AUTH_USER_MODEL, verbose_name='個人用戶')),
+            ],
+            options={
+                'verbose_name': '特質分數索引',
+                'verbose_name_plural': '特質分數索引',
+                'db_table': 'result_trait_score',
+                'indexes': [models.Index(fields=['trait', 'score'], name='result_trait_score_idx'), models.Index(fields=['test_project', 'trait', 'score'], name='result_trait_project_idx'), models.Index(fields=['enterprise', 'trait', 'score'], name='result_trait_enterprise_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('project_result__isnull', False)), fields=('project_result', 'trait'), name='result_trait_unique_project'), models.UniqueConstraint(condition=models.Q(('individual_result__isnull', False)), fields=('individual_result', 'trait'), name='result_trait_unique_individual')],
+            },
+        ),
+        migrations.RunPython(backfill_trait_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_resulttraitscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultScoreContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('values', models.JSONField(default=dict, verbose_name='分數')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('test_project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.testproject', verbose_name='測驗項目')),
+                ('test_result', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score_contribution', to='core.testprojectresult', verbose_name='測驗結果')),
+            ],
+            options={
+                'verbose_name': '分數分佈明細',
+                'verbose_name_plural': '分數分佈明細',
+                'db_table': 'result_score_contribution',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScoreHistogramBin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50, verbose_name='指標')),
+                ('bin', models.IntegerField(verbose_name='區間')),
+                ('count', models.IntegerField(default=0, verbose_name='筆數')),
+                ('test_project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_histogram_bins', to='core.testproject', verbose_name='測驗項目')),
+            ],
+            options={
+                'verbose_name': '分數分佈',
+                'verbose_name_plural': '分數分佈',
+                'db_table': 'score_histogram_bin',
+                'constraints': [models.UniqueConstraint(fields=('test_project', 'metric', 'bin'), name='uniq_score_histogram_bin')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_score_histograms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvitationEmailJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('invitation_ids', models.JSONField(default=list, verbose_name='邀請ID')),
+                ('status', models.CharField(choices=[('pending', '排隊中'), ('running', '寄送中'), ('completed', '已完成'), ('failed', '失敗')], default='pending', max_length=20, verbose_name='狀態')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='進度')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='總筆數')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='成功筆數')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='失敗筆數')),
+                ('error_message', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='建立時間')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invitation_email_jobs', to=settings.AUTH_USER_MODEL, verbose_name='請求者')),
+            ],
+            options={
+                'verbose_name': '邀請信寄送任務',
+                'verbose_name_plural': '邀請信寄送任務',
+                'db_table': 'invitation_email_job',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
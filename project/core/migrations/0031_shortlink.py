@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_short_links(apps, schema_editor):
+    """由 TestInvitation.result_data 中既有的短碼建立短網址列（短碼重複時保留最新的邀請）"""
+    TestInvitation = apps.get_model('core', 'TestInvitation')
+    ShortLink = apps.get_model('core', 'ShortLink')
+
+    invitations = TestInvitation.objects.filter(result_data__has_key='short_code').select_related(
+        'test_project'
+    ).order_by('-id')
+
+    seen = set()
+    batch = []
+    for invitation in invitations.iterator(chunk_size=1000):
+        code = (invitation.result_data or {}).get('short_code')
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        original_url = invitation.result_data.get('original_url') or (
+            invitation.test_project.test_link if invitation.test_project else ''
+        )
+        batch.append(ShortLink(code=code, invitation_id=invitation.id, original_url=original_url))
+        if len(batch) >= 1000:
+            ShortLink.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        ShortLink.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_invitationemailjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=16, unique=True, verbose_name='短碼')),
+                ('original_url', models.TextField(verbose_name='原始網址')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('invitation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='short_links', to='core.testinvitation', verbose_name='測驗邀請')),
+            ],
+            options={
+                'verbose_name': '短網址',
+                'verbose_name_plural': '短網址',
+                'db_table': 'short_link',
+            },
+        ),
+        migrations.RunPython(backfill_short_links, migrations.RunPython.noop),
+    ]
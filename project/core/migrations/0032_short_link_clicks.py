@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_shortlink'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortlink',
+            name='click_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='點擊次數'),
+        ),
+        migrations.AddField(
+            model_name='shortlink',
+            name='last_clicked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='最後點擊時間'),
+        ),
+        migrations.CreateModel(
+            name='ShortLinkDailyClicks',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('clicks', models.PositiveIntegerField(default=0, verbose_name='點擊次數')),
+                ('short_link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_clicks', to='core.shortlink', verbose_name='短網址')),
+            ],
+            options={
+                'verbose_name': '短網址每日點擊',
+                'verbose_name_plural': '短網址每日點擊',
+                'db_table': 'short_link_daily_clicks',
+                'constraints': [models.UniqueConstraint(fields=('short_link', 'date'), name='uniq_short_link_daily_clicks')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_short_link_clicks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger_total', models.IntegerField(default=0, verbose_name='帳本加總')),
+                ('last_transaction_id', models.BigIntegerField(default=0, verbose_name='最後計入的交易ID')),
+                ('difference', models.IntegerField(default=0, verbose_name='餘額與帳本差額')),
+                ('checked_at', models.DateTimeField(verbose_name='對帳時間')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='point_snapshot', to=settings.AUTH_USER_MODEL, verbose_name='用戶')),
+            ],
+            options={
+                'verbose_name': '點數帳本快照',
+                'verbose_name_plural': '點數帳本快照',
+                'db_table': 'point_balance_snapshot',
+            },
+        ),
+    ]
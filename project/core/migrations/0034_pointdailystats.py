@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_point_rollups(apps, schema_editor):
+    """由既有的點數交易建立每日彙總列
+
+    彙總邏輯凍結自建立本遷移時的 core.services.point_rollup；之後服務程式的修改不會影響本遷移。
+    """
+    PointTransaction = apps.get_model('core', 'PointTransaction')
+    PointDailyStats = apps.get_model('core', 'PointDailyStats')
+
+    # metadata 的 action_type 與 virtual 在 Python 中取出，不依賴資料庫的 JSON 函式
+    rows = defaultdict(lambda: [0, 0])
+    for item in (
+        PointTransaction.objects.filter(status='completed').order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day', 'transaction_type', 'metadata')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    ):
+        metadata = item['metadata'] or {}
+        key = (
+            item['user_id'], item['day'], item['transaction_type'],
+            metadata.get('action_type') or '', bool(metadata.get('virtual')),
+        )
+        rows[key][0] += item['total']
+        rows[key][1] += item['count']
+
+    PointDailyStats.objects.bulk_create(
+        [
+            PointDailyStats(
+                user_id=user_id, date=day, transaction_type=transaction_type, action_type=action_type,
+                is_virtual=is_virtual, amount=amount, transaction_count=count,
+            )
+            for (user_id, day, transaction_type, action_type, is_virtual), (amount, count) in rows.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_pointbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('transaction_type', models.CharField(max_length=20, verbose_name='交易類型')),
+                ('action_type', models.CharField(blank=True, default='', max_length=50, verbose_name='消費動作')),
+                ('is_virtual', models.BooleanField(default=False, verbose_name='虛擬交易')),
+                ('amount', models.IntegerField(default=0, verbose_name='點數合計')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='交易筆數')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='用戶')),
+            ],
+            options={
+                'verbose_name': '點數交易每日彙總',
+                'verbose_name_plural': '點數交易每日彙總',
+                'db_table': 'point_daily_stats',
+                'indexes': [models.Index(fields=['date', 'transaction_type'], name='point_daily_date_type_idx'), models.Index(fields=['user', 'date'], name='point_daily_user_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date', 'transaction_type', 'action_type', 'is_virtual'), name='unique_point_daily_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_point_rollups, migrations.RunPython.noop),
+    ]
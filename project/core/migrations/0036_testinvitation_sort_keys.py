@@ -0,0 +1,100 @@
+import datetime
+
+from django.db import migrations, models
+
+# 以下排序鍵計算凍結自建立本遷移時的 core.services.test_result_listing 與 core.models 的常數
+SORT_KEY_FIELDS = ('sort_completion_desc', 'sort_completion_asc', 'sort_score_desc', 'sort_score_asc')
+SORT_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+SORT_FAR_FUTURE = datetime.datetime(9999, 12, 31, tzinfo=datetime.timezone.utc)
+SCORE_TIER = 1e9
+SCORE_LIMIT = 1e8
+
+
+def listing_sort_keys(completed_at, prediction, ci):
+    """有預測分數 > 只有 CI 分數 > 無分數；未完成者排在最後"""
+    primary = prediction if prediction is not None else ci
+    tier = 1 if prediction is not None else 0 if ci is not None else -1
+    score = 0.0 if primary is None else max(-SCORE_LIMIT, min(SCORE_LIMIT, primary))
+    return {
+        'sort_completion_desc': completed_at or SORT_EPOCH,
+        'sort_completion_asc': completed_at or SORT_FAR_FUTURE,
+        'sort_score_desc': tier * SCORE_TIER + score,
+        'sort_score_asc': -tier * SCORE_TIER + score,
+    }
+
+
+def backfill_sort_keys(apps, schema_editor):
+    """依既有的完成時間與測驗結果分數計算邀請的結果列表排序鍵"""
+    TestInvitation = apps.get_model('core', 'TestInvitation')
+    TestProjectResult = apps.get_model('core', 'TestProjectResult')
+
+    results = {
+        row['test_invitation_id']: row
+        for row in TestProjectResult.objects.values(
+            'test_invitation_id', 'prediction_score', 'ci_score', 'crawled_at'
+        ).iterator(chunk_size=1000)
+    }
+    batch = []
+    for invitation in TestInvitation.objects.only('id', 'completed_at', 'score').order_by('id').iterator(chunk_size=1000):
+        result = results.get(invitation.id, {})
+        ci = result.get('ci_score')
+        keys = listing_sort_keys(
+            invitation.completed_at or result.get('crawled_at'),
+            result.get('prediction_score'),
+            ci if ci is not None else invitation.score,
+        )
+        for field_name, value in keys.items():
+            setattr(invitation, field_name, value)
+        batch.append(invitation)
+        if len(batch) >= 1000:
+            TestInvitation.objects.bulk_update(batch, SORT_KEY_FIELDS)
+            batch = []
+    if batch:
+        TestInvitation.objects.bulk_update(batch, SORT_KEY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_notification_expires_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testinvitation',
+            name='sort_completion_asc',
+            field=models.DateTimeField(default=datetime.datetime(9999, 12, 31, 0, 0, tzinfo=datetime.timezone.utc), verbose_name='排序鍵（完成時間遞增）'),
+        ),
+        migrations.AddField(
+            model_name='testinvitation',
+            name='sort_completion_desc',
+            field=models.DateTimeField(default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc), verbose_name='排序鍵（完成時間遞減）'),
+        ),
+        migrations.AddField(
+            model_name='testinvitation',
+            name='sort_score_asc',
+            field=models.FloatField(default=1000000000.0, verbose_name='排序鍵（分數遞增）'),
+        ),
+        migrations.AddField(
+            model_name='testinvitation',
+            name='sort_score_desc',
+            field=models.FloatField(default=-1000000000.0, verbose_name='排序鍵（分數遞減）'),
+        ),
+        migrations.RunPython(backfill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='testinvitation',
+            index=models.Index(fields=['sort_completion_desc', 'id'], name='invitation_sort_cdesc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testinvitation',
+            index=models.Index(fields=['sort_completion_asc', 'id'], name='invitation_sort_casc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testinvitation',
+            index=models.Index(fields=['sort_score_desc', 'id'], name='invitation_sort_sdesc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testinvitation',
+            index=models.Index(fields=['sort_score_asc', 'id'], name='invitation_sort_sasc_idx'),
+        ),
+    ]
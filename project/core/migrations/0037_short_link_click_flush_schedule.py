@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils import timezone
+
+TASK_NAME = '短網址點擊數寫入'
+
+
+def register_flush_schedule(apps, schema_editor):
+    """建立每分鐘將快取中的點擊數寫入資料庫的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    schedule = IntervalSchedule.objects.filter(every=1, period='minutes').first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=1, period='minutes')
+    _, created = PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={
+            'task': 'core.tasks.flush_short_link_clicks',
+            'interval': schedule,
+            'enabled': True,
+            'description': '將快取中的短網址點擊數批次寫入短網址與每日點擊表',
+        },
+    )
+    if created:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_flush_schedule(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_testinvitation_sort_keys'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(register_flush_schedule, remove_flush_schedule),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.utils import timezone
+
+# 排程名稱 -> (工作, 間隔, 間隔單位, 說明)
+SCHEDULES = {
+    '過期通知清除': (
+        'core.tasks.cleanup_expired_notifications', 1, 'hours',
+        '分批刪除已過期的通知並扣除未讀計數',
+    ),
+    '未讀通知計數對帳': (
+        'core.tasks.reconcile_notification_counts', 1, 'days',
+        '比對快取中的未讀通知計數與資料庫，清除不一致的計數',
+    ),
+}
+
+
+def register_notification_schedules(apps, schema_editor):
+    """建立過期通知清除（每小時）與未讀計數對帳（每日）的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    changed = False
+    for name, (task, every, period, description) in SCHEDULES.items():
+        schedule = IntervalSchedule.objects.filter(every=every, period=period).first()
+        if schedule is None:
+            schedule = IntervalSchedule.objects.create(every=every, period=period)
+        _, created = PeriodicTask.objects.get_or_create(
+            name=name,
+            defaults={'task': task, 'interval': schedule, 'enabled': True, 'description': description},
+        )
+        changed = changed or created
+    if changed:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_notification_schedules(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name__in=list(SCHEDULES)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_short_link_click_flush_schedule'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(register_notification_schedules, remove_notification_schedules),
+    ]
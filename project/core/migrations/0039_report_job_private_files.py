@@ -0,0 +1,71 @@
+import os
+import uuid
+
+import utils.private_storage
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.utils import timezone
+
+TASK_NAME = '報告任務清除'
+
+
+def move_report_files(apps, schema_editor):
+    """將既有報告檔案由 MEDIA_ROOT 移至私有儲存並改用隨機檔名（原檔已不存在時清空欄位）"""
+    ReportJob = apps.get_model('core', 'ReportJob')
+    storage = ReportJob._meta.get_field('file').storage
+
+    for job in ReportJob.objects.exclude(file='').only('pk', 'file').iterator():
+        old_name = job.file.name
+        new_name = ''
+        if default_storage.exists(old_name):
+            extension = os.path.splitext(old_name)[1].lower()
+            path = f"report_jobs/{timezone.now():%Y/%m}/{uuid.uuid4().hex}{extension}"
+            with default_storage.open(old_name, 'rb') as fh:
+                new_name = storage.save(path, fh)
+            default_storage.delete(old_name)
+        ReportJob.objects.filter(pk=job.pk).update(file=new_name)
+
+
+def register_cleanup_schedule(apps, schema_editor):
+    """建立每日清除舊報告任務與檔案的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    schedule = IntervalSchedule.objects.filter(every=1, period='days').first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=1, period='days')
+    _, created = PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={
+            'task': 'core.tasks.cleanup_report_jobs',
+            'interval': schedule,
+            'enabled': True,
+            'description': '刪除超過保留期間的報告生成任務與檔案',
+        },
+    )
+    if created:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_cleanup_schedule(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_notification_maintenance_schedule'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='file',
+            field=models.FileField(blank=True, storage=utils.private_storage.PrivateFileStorage(), upload_to=utils.private_storage.report_job_upload_to, verbose_name='報告檔案'),
+        ),
+        migrations.RunPython(move_report_files, migrations.RunPython.noop),
+        migrations.RunPython(register_cleanup_schedule, remove_cleanup_schedule),
+    ]
@@ -0,0 +1,71 @@
+import os
+import uuid
+
+import utils.private_storage
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.utils import timezone
+
+TASK_NAME = '匯出任務清除'
+
+
+def move_export_files(apps, schema_editor):
+    """將既有匯出檔案由 MEDIA_ROOT 移至私有儲存並改用隨機檔名（原檔已不存在時清空欄位）"""
+    ExportJob = apps.get_model('core', 'ExportJob')
+    storage = ExportJob._meta.get_field('file').storage
+
+    for job in ExportJob.objects.exclude(file='').only('pk', 'file').iterator():
+        old_name = job.file.name
+        new_name = ''
+        if default_storage.exists(old_name):
+            extension = os.path.splitext(old_name)[1].lower()
+            path = f"export_jobs/{timezone.now():%Y/%m}/{uuid.uuid4().hex}{extension}"
+            with default_storage.open(old_name, 'rb') as fh:
+                new_name = storage.save(path, fh)
+            default_storage.delete(old_name)
+        ExportJob.objects.filter(pk=job.pk).update(file=new_name)
+
+
+def register_cleanup_schedule(apps, schema_editor):
+    """建立每日清除舊匯出任務與檔案的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    schedule = IntervalSchedule.objects.filter(every=1, period='days').first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=1, period='days')
+    _, created = PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={
+            'task': 'core.tasks.cleanup_export_jobs',
+            'interval': schedule,
+            'enabled': True,
+            'description': '刪除超過保留期間的匯出任務與檔案',
+        },
+    )
+    if created:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_cleanup_schedule(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_report_job_private_files'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, storage=utils.private_storage.PrivateFileStorage(), upload_to=utils.private_storage.export_job_upload_to, verbose_name='匯出檔案'),
+        ),
+        migrations.RunPython(move_export_files, migrations.RunPython.noop),
+        migrations.RunPython(register_cleanup_schedule, remove_cleanup_schedule),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils import timezone
+
+TASK_NAME = '角色指數統計更新'
+
+
+def register_refresh_schedule(apps, schema_editor):
+    """建立每小時增量更新角色指數統計的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    schedule = IntervalSchedule.objects.filter(every=1, period='hours').first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=1, period='hours')
+    _, created = PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={
+            'task': 'core.tasks.refresh_role_index_stats',
+            'interval': schedule,
+            'enabled': True,
+            'description': '增量更新各測驗項目的角色指數統計，並重新計算分類設定變更後標記需要重建的項目',
+        },
+    )
+    if created:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_refresh_schedule(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_export_job_private_files'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(register_refresh_schedule, remove_refresh_schedule),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils import timezone
+
+TASK_NAME = '邀請信寄送任務清除'
+
+
+def register_cleanup_schedule(apps, schema_editor):
+    """建立每日清除舊邀請信寄送任務的排程（已存在同名排程時保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    schedule = IntervalSchedule.objects.filter(every=1, period='days').first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=1, period='days')
+    _, created = PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={
+            'task': 'core.tasks.cleanup_invitation_email_jobs',
+            'interval': schedule,
+            'enabled': True,
+            'description': '刪除超過保留期間的邀請信寄送任務',
+        },
+    )
+    if created:
+        # 通知執行中的 beat 重新載入排程
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def remove_cleanup_schedule(apps, schema_editor):
+    apps.get_model('django_celery_beat', 'PeriodicTask').objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_role_index_stats_schedule'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(register_cleanup_schedule, remove_cleanup_schedule),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.utils import timezone
+
+TASK_NAME = '過期通知清除'
+
+
+def _move_schedule(apps, old, new):
+    """排程仍使用 old 間隔時改為 new 間隔（已手動調整的排程保留其設定）"""
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    task = PeriodicTask.objects.filter(
+        name=TASK_NAME, interval__every=old[0], interval__period=old[1],
+    ).first()
+    if task is None:
+        return
+    schedule = IntervalSchedule.objects.filter(every=new[0], period=new[1]).first()
+    if schedule is None:
+        schedule = IntervalSchedule.objects.create(every=new[0], period=new[1])
+    task.interval = schedule
+    task.save(update_fields=['interval'])
+    # 通知執行中的 beat 重新載入排程
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+def prune_every_minute(apps, schema_editor):
+    """未讀徽章計入尚未刪除的過期通知，而列表會將其過濾；每分鐘清除使兩者的差異不超過一分鐘"""
+    _move_schedule(apps, (1, 'hours'), (1, 'minutes'))
+
+
+def prune_every_hour(apps, schema_editor):
+    _move_schedule(apps, (1, 'minutes'), (1, 'hours'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_point_reconcile_schedule'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_every_minute, prune_every_hour),
+    ]
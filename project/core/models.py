@@ -4,6 +4,9 @@ from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from utils.private_storage import export_job_upload_to, private_storage, report_job_upload_to
 
 # ==================== 用戶系統 ====================
 
@@ -202,6 +205,51 @@ class PointTransaction(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_transaction_type_display()} - {self.amount}"
 
+class PointBalanceSnapshot(models.Model):
+    """點數帳本快照：截至某筆交易為止的帳本加總，對帳時只需加總之後的交易"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='point_snapshot', verbose_name='用戶')
+    ledger_total = models.IntegerField(default=0, verbose_name='帳本加總')
+    last_transaction_id = models.BigIntegerField(default=0, verbose_name='最後計入的交易ID')
+    difference = models.IntegerField(default=0, verbose_name='餘額與帳本差額')
+    checked_at = models.DateTimeField(verbose_name='對帳時間')
+
+    class Meta:
+        verbose_name = '點數帳本快照'
+        verbose_name_plural = '點數帳本快照'
+        db_table = 'point_balance_snapshot'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.ledger_total} 點 (至 #{self.last_transaction_id})"
+
+class PointDailyStats(models.Model):
+    """點數交易每日彙總（依用戶、日期、交易類型與消費動作，交易寫入時增量更新，供消費統計查詢）"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='point_daily_stats', verbose_name='用戶')
+    date = models.DateField(verbose_name='日期')
+    transaction_type = models.CharField(max_length=20, verbose_name='交易類型')
+    action_type = models.CharField(max_length=50, blank=True, default='', verbose_name='消費動作')
+    is_virtual = models.BooleanField(default=False, verbose_name='虛擬交易')
+    amount = models.IntegerField(default=0, verbose_name='點數合計')
+    transaction_count = models.IntegerField(default=0, verbose_name='交易筆數')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '點數交易每日彙總'
+        verbose_name_plural = '點數交易每日彙總'
+        db_table = 'point_daily_stats'
+        indexes = [
+            models.Index(fields=['date', 'transaction_type'], name='point_daily_date_type_idx'),
+            models.Index(fields=['user', 'date'], name='point_daily_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'transaction_type', 'action_type', 'is_virtual'],
+                name='unique_point_daily_stats',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} - {self.transaction_type} {self.action_type}: {self.amount}"
+
 class PointPackage(models.Model):
     """點數套餐"""
     name = models.CharField(max_length=100, verbose_name='套餐名稱')
@@ -338,6 +386,8 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['created_at']),
             models.Index(fields=['notification_type']),
+            # 定期清除過期通知時使用
+            models.Index(fields=['expires_at'], name='notification_expires_idx'),
         ]
     
     def __str__(self):
@@ -912,6 +962,32 @@ class TestTemplate(models.Model):
     def __str__(self):
         return self.name
 
+class TestInviteeQuerySet(models.QuerySet):
+    """受測人員查詢集"""
+
+    def with_progress(self):
+        """以子查詢附加完成邀請數、最新邀請狀態與時間（列表頁一次查詢取得，避免逐列查詢）"""
+        from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+
+        invitations = TestInvitation.objects.filter(invitee=OuterRef('pk'))
+        latest = invitations.order_by('-invited_at', '-id')
+        completed = (
+            invitations.filter(status='completed')
+            .order_by()
+            .values('invitee')
+            .annotate(count=Count('id'))
+            .values('count')[:1]
+        )
+        return self.annotate(
+            completed_invitation_count=Coalesce(
+                Subquery(completed, output_field=IntegerField()), Value(0)
+            ),
+            latest_invitation_status=Subquery(latest.values('status')[:1]),
+            latest_invited_at=Subquery(latest.values('invited_at')[:1]),
+        )
+
+
 class TestInvitee(models.Model):
     """受測人員"""
     STATUS_CHOICES = [
@@ -942,6 +1018,8 @@ class TestInvitee(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
     
+    objects = TestInviteeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '受測人員'
         verbose_name_plural = '受測人員'
@@ -953,15 +1031,16 @@ class TestInvitee(models.Model):
     
     @property
     def completion_rate(self):
-        """完成率 - 動態計算"""
+        """完成率（有 with_progress() 附加的數值時直接使用）"""
         if self.invited_count == 0:
             return 0
         
-        # 動態計算完成的邀請數量
-        completed_invitations = TestInvitation.objects.filter(
-            invitee=self,
-            status='completed'
-        ).count()
+        completed_invitations = getattr(self, 'completed_invitation_count', None)
+        if completed_invitations is None:
+            completed_invitations = TestInvitation.objects.filter(
+                invitee=self,
+                status='completed'
+            ).count()
         
         return round((completed_invitations / self.invited_count) * 100, 1)
     
@@ -971,12 +1050,14 @@ class TestInvitee(models.Model):
         if self.invited_count == 0:
             return "未受邀"
         
-        # 獲取最新的邀請記錄
-        latest_invitation = TestInvitation.objects.filter(
-            invitee=self
-        ).order_by('-invited_at').first()
+        if 'latest_invitation_status' in self.__dict__:
+            latest_status = self.latest_invitation_status
+        else:
+            latest_status = TestInvitation.objects.filter(
+                invitee=self
+            ).order_by('-invited_at', '-id').values_list('status', flat=True).first()
         
-        if not latest_invitation:
+        if not latest_status:
             return "未受邀"
         
         status_map = {
@@ -986,7 +1067,15 @@ class TestInvitee(models.Model):
             'failed': '失敗'
         }
         
-        return status_map.get(latest_invitation.status, '未知狀態')
+        return status_map.get(latest_status, '未知狀態')
+
+# 結果列表排序鍵的哨兵值：沒有完成時間或分數的邀請在兩種方向都排在最後
+LISTING_SORT_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+LISTING_SORT_FAR_FUTURE = datetime(9999, 12, 31, tzinfo=dt_timezone.utc)
+# 分數排序鍵的層級間距（有預測分數 > 只有 CI 分數 > 無分數）；分數截斷在 ±LISTING_SCORE_LIMIT 內以免跨越層級
+LISTING_SCORE_TIER = 1e9
+LISTING_SCORE_LIMIT = 1e8
+
 
 class TestInvitation(models.Model):
     """測驗邀請"""
@@ -1030,7 +1119,16 @@ class TestInvitation(models.Model):
     # 測驗結果（簡化版）
     score = models.FloatField(null=True, blank=True, verbose_name='測驗分數')
     result_data = models.JSONField(default=dict, blank=True, verbose_name='測驗結果資料')
-    
+
+    # 結果列表排序鍵（每種排序一欄、皆不為 NULL，與 id 組成索引供 keyset 分頁；
+    # 由 core.services.test_result_listing.listing_sort_keys 計算，儲存邀請或測驗結果時更新）
+    sort_completion_desc = models.DateTimeField(default=LISTING_SORT_EPOCH, verbose_name='排序鍵（完成時間遞減）')
+    sort_completion_asc = models.DateTimeField(default=LISTING_SORT_FAR_FUTURE, verbose_name='排序鍵（完成時間遞增）')
+    sort_score_desc = models.FloatField(default=-LISTING_SCORE_TIER, verbose_name='排序鍵（分數遞減）')
+    sort_score_asc = models.FloatField(default=LISTING_SCORE_TIER, verbose_name='排序鍵（分數遞增）')
+
+    LISTING_SORT_SOURCE_FIELDS = {'completed_at', 'score'}
+
     class Meta:
         verbose_name = '測驗邀請'
         verbose_name_plural = '測驗邀請'
@@ -1041,6 +1139,10 @@ class TestInvitation(models.Model):
             models.Index(fields=['invitee']),
             models.Index(fields=['invitation_code']),
             models.Index(fields=['test_project']),
+            models.Index(fields=['sort_completion_desc', 'id'], name='invitation_sort_cdesc_idx'),
+            models.Index(fields=['sort_completion_asc', 'id'], name='invitation_sort_casc_idx'),
+            models.Index(fields=['sort_score_desc', 'id'], name='invitation_sort_sdesc_idx'),
+            models.Index(fields=['sort_score_asc', 'id'], name='invitation_sort_sasc_idx'),
         ]
     
     def __str__(self):
@@ -1051,6 +1153,18 @@ class TestInvitation(models.Model):
         else:
             return f"測驗邀請 - {self.invitee.name}"
     
+    def save(self, *args, **kwargs):
+        """重寫 save 方法，完成時間或分數變更時一併更新結果列表排序鍵"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.LISTING_SORT_SOURCE_FIELDS & set(update_fields):
+            from core.services.test_result_listing import SORT_KEY_FIELDS, invitation_sort_keys
+
+            for field_name, value in invitation_sort_keys(self).items():
+                setattr(self, field_name, value)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *SORT_KEY_FIELDS}
+        super().save(*args, **kwargs)
+
     @property
     def is_completed(self):
         """是否已完成測驗"""
@@ -1089,6 +1203,11 @@ class TestProjectResult(models.Model):
     prediction_value = models.TextField(blank=True, verbose_name='預測值')
     category_results = models.JSONField(default=dict, verbose_name='分類結果')
     trait_results = models.JSONField(default=dict, verbose_name='特質結果')
+    # 儲存時依測驗項目特質比對 raw_data 後的結果（特質ID -> {score, headsupflag}）
+    trait_score_map = models.JSONField(default=dict, blank=True, verbose_name='特質分數對照')
+    # 儲存時由 raw_data 解析的數值分數，供結果列表於資料庫端排序與分頁
+    prediction_score = models.FloatField(null=True, blank=True, db_index=True, verbose_name='預測分數')
+    ci_score = models.FloatField(null=True, blank=True, db_index=True, verbose_name='CI分數')
     
     # 爬蟲相關
     crawled_at = models.DateTimeField(null=True, blank=True, verbose_name='爬蟲時間')
@@ -1115,6 +1234,410 @@ class TestProjectResult(models.Model):
     def __str__(self):
         return f"{self.test_project.name} - {self.test_invitation.invitee.email}"
     
+    SCORE_SOURCE_FIELDS = {'raw_data', 'score_value', 'prediction_value'}
+
+    def save(self, *args, **kwargs):
+        """重寫 save 方法，儲存時預先比對特質分數並解析排序用分數，供報告、詳情頁與列表直接查詢"""
+        update_fields = kwargs.get('update_fields')
+        if self.test_project_id and (update_fields is None or 'raw_data' in update_fields):
+            from core.services.project_scoring_graph import get_project_scoring_graph
+
+            self.trait_score_map = get_project_scoring_graph(self.test_project_id).canonical_trait_scores(self.raw_data)
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'trait_score_map'}
+        if self.test_project_id and (update_fields is None or self.SCORE_SOURCE_FIELDS & set(update_fields)):
+            from core.services.test_result_listing import extract_ci_score, extract_prediction_score
+
+            self.prediction_score = extract_prediction_score(self, self.test_project)
+            self.ci_score = extract_ci_score(self, self.test_project)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'prediction_score', 'ci_score'}
+        super().save(*args, **kwargs)
+    
+
+class ProjectRoleIndexStats(models.Model):
+    """測驗項目角色指數分佈統計（Welford 累計，供 z 值校正使用）"""
+    test_project = models.OneToOneField(
+        TestProject,
+        on_delete=models.CASCADE,
+        related_name='role_index_stats',
+        verbose_name='測驗項目'
+    )
+    sample_count = models.PositiveIntegerField(default=0, verbose_name='樣本數')
+    mean = models.FloatField(default=0.0, verbose_name='平均值')
+    m2 = models.FloatField(default=0.0, verbose_name='離均差平方和')
+    synced_through = models.DateTimeField(null=True, blank=True, verbose_name='已同步至')
+    needs_rebuild = models.BooleanField(default=False, verbose_name='需要重新計算')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '角色指數統計'
+        verbose_name_plural = '角色指數統計'
+        db_table = 'project_role_index_stats'
+
+    def __str__(self):
+        return f"{self.test_project.name} - {self.sample_count} 筆"
+
+    @property
+    def std(self):
+        """樣本標準差（樣本不足時為 None）"""
+        if self.sample_count < 2:
+            return None
+        return (max(self.m2, 0.0) / (self.sample_count - 1)) ** 0.5
+
+    def add_sample(self, value):
+        """Welford 累加一筆數值"""
+        self.sample_count += 1
+        delta = value - self.mean
+        self.mean += delta / self.sample_count
+        self.m2 += delta * (value - self.mean)
+
+    def remove_sample(self, value):
+        """Welford 反向移除一筆先前累加的數值"""
+        if self.sample_count <= 1:
+            self.reset()
+            return
+        previous_mean = self.mean
+        self.sample_count -= 1
+        self.mean = (previous_mean * (self.sample_count + 1) - value) / self.sample_count
+        self.m2 = max(self.m2 - (value - previous_mean) * (value - self.mean), 0.0)
+
+    def reset(self):
+        self.sample_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+
+class InvitationDailyStats(models.Model):
+    """測驗邀請每日彙總（依企業、測驗項目與日期，邀請異動時增量更新，供統計圖表查詢）"""
+    enterprise = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='invitation_daily_stats',
+        verbose_name='企業'
+    )
+    test_project = models.ForeignKey(
+        TestProject,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='測驗項目'
+    )
+    date = models.DateField(verbose_name='日期')
+
+    # 以邀請日期歸類：當日發出的邀請數與其目前狀態
+    invited_count = models.IntegerField(default=0, verbose_name='邀請數')
+    pending_count = models.IntegerField(default=0, verbose_name='待執行數')
+    in_progress_count = models.IntegerField(default=0, verbose_name='進行中數')
+    invited_completed_count = models.IntegerField(default=0, verbose_name='已完成數')
+    expired_count = models.IntegerField(default=0, verbose_name='已過期數')
+    cancelled_count = models.IntegerField(default=0, verbose_name='已取消數')
+    score_sum = models.FloatField(default=0.0, verbose_name='分數總和')
+    score_count = models.IntegerField(default=0, verbose_name='計分筆數')
+    # 以完成日期歸類：當日完成的測驗數
+    completed_count = models.IntegerField(default=0, verbose_name='完成數')
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '測驗邀請每日彙總'
+        verbose_name_plural = '測驗邀請每日彙總'
+        db_table = 'invitation_daily_stats'
+        indexes = [
+            models.Index(fields=['enterprise', 'date'], name='invitation_daily_ent_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['enterprise', 'test_project', 'date'],
+                condition=models.Q(test_project__isnull=False),
+                name='invitation_daily_unique_project',
+            ),
+            models.UniqueConstraint(
+                fields=['enterprise', 'date'],
+                condition=models.Q(test_project__isnull=True),
+                name='invitation_daily_unique_no_project',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.enterprise_id} - {self.test_project_id or '-'} - {self.date}"
+
+
+class ReportJob(models.Model):
+    """PDF 報告背景生成任務（同一結果的並行請求共用同一任務）"""
+    RESULT_TYPE_CHOICES = [
+        ('project', '企業測驗結果'),
+        ('individual', '個人測驗結果'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '排隊中'),
+        ('running', '生成中'),
+        ('completed', '已完成'),
+        ('failed', '失敗'),
+    ]
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    result_type = models.CharField(max_length=20, choices=RESULT_TYPE_CHOICES, verbose_name='結果類型')
+    result_id = models.BigIntegerField(verbose_name='結果ID')
+    # 建立任務時結果的更新時間；結果未變動時可直接沿用已完成的報告
+    source_updated_at = models.DateTimeField(null=True, blank=True, verbose_name='結果更新時間')
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name='請求者'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='進度')
+    # 私有儲存、隨機檔名：只經由 report_job_download 檢查權限後提供
+    file = models.FileField(
+        upload_to=report_job_upload_to, storage=private_storage, blank=True, verbose_name='報告檔案'
+    )
+    download_filename = models.CharField(max_length=255, blank=True, verbose_name='下載檔名')
+    display_filename = models.CharField(max_length=255, blank=True, verbose_name='顯示檔名')
+    error_message = models.TextField(blank=True, verbose_name='錯誤訊息')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='建立時間')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='開始時間')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+
+    class Meta:
+        verbose_name = '報告生成任務'
+        verbose_name_plural = '報告生成任務'
+        db_table = 'report_job'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['result_type', 'result_id', 'status'], name='report_job_result_idx'),
+        ]
+        constraints = [
+            # 同一結果同時只允許一個進行中的任務，重複請求改為共用
+            models.UniqueConstraint(
+                fields=['result_type', 'result_id'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='report_job_single_active',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_result_type_display()} {self.result_id} - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class ExportJob(models.Model):
+    """測驗結果匯出背景任務（資料量大時改由背景產生檔案）"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+    STATUS_CHOICES = ReportJob.STATUS_CHOICES
+    ACTIVE_STATUSES = ReportJob.ACTIVE_STATUSES
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name='請求者'
+    )
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv', verbose_name='匯出格式')
+    # 建立任務時的篩選條件（查詢字串參數）
+    params = models.JSONField(default=dict, blank=True, verbose_name='篩選條件')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='進度')
+    row_count = models.PositiveIntegerField(default=0, verbose_name='資料筆數')
+    # 私有儲存、隨機檔名：只經由 export_job_download 檢查權限後提供
+    file = models.FileField(
+        upload_to=export_job_upload_to, storage=private_storage, blank=True, verbose_name='匯出檔案'
+    )
+    download_filename = models.CharField(max_length=255, blank=True, verbose_name='下載檔名')
+    display_filename = models.CharField(max_length=255, blank=True, verbose_name='顯示檔名')
+    error_message = models.TextField(blank=True, verbose_name='錯誤訊息')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='建立時間')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='開始時間')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+
+    class Meta:
+        verbose_name = '匯出任務'
+        verbose_name_plural = '匯出任務'
+        db_table = 'export_job'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.requested_by} {self.get_export_format_display()} - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class InvitationEmailJob(models.Model):
+    """邀請信背景寄送任務（批量邀請建立後由 Celery 分批寄送）"""
+    STATUS_CHOICES = [
+        ('pending', '排隊中'),
+        ('running', '寄送中'),
+        ('completed', '已完成'),
+        ('failed', '失敗'),
+    ]
+    ACTIVE_STATUSES = ReportJob.ACTIVE_STATUSES
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='invitation_email_jobs',
+        verbose_name='請求者'
+    )
+    invitation_ids = models.JSONField(default=list, verbose_name='邀請ID')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='進度')
+    total_count = models.PositiveIntegerField(default=0, verbose_name='總筆數')
+    sent_count = models.PositiveIntegerField(default=0, verbose_name='成功筆數')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='失敗筆數')
+    error_message = models.TextField(blank=True, verbose_name='錯誤訊息')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='建立時間')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='開始時間')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+
+    class Meta:
+        verbose_name = '邀請信寄送任務'
+        verbose_name_plural = '邀請信寄送任務'
+        db_table = 'invitation_email_job'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.requested_by} {self.sent_count}/{self.total_count} - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class ResultRoleIndexContribution(models.Model):
+    """單筆測驗結果已計入角色指數統計的數值（重新爬取或刪除時用於扣除舊值）"""
+    test_result = models.OneToOneField(
+        TestProjectResult,
+        on_delete=models.CASCADE,
+        related_name='role_index_contribution',
+        verbose_name='測驗結果'
+    )
+    test_project = models.ForeignKey(TestProject, on_delete=models.CASCADE, verbose_name='測驗項目')
+    # 分類名稱 -> 角色指數
+    values = models.JSONField(default=dict, verbose_name='角色指數')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '角色指數統計明細'
+        verbose_name_plural = '角色指數統計明細'
+        db_table = 'result_role_index_contribution'
+
+    def __str__(self):
+        return f"{self.test_result_id} - {self.values}"
+
+
+class ScoreHistogramBin(models.Model):
+    """測驗項目分數分佈（固定寬度直方圖，結果儲存時增量更新，供百分位查詢）"""
+    test_project = models.ForeignKey(
+        TestProject,
+        on_delete=models.CASCADE,
+        related_name='score_histogram_bins',
+        verbose_name='測驗項目'
+    )
+    # ci、prediction 或 trait:<特質ID>
+    metric = models.CharField(max_length=50, verbose_name='指標')
+    # floor(分數 / 區間寬度)
+    bin = models.IntegerField(verbose_name='區間')
+    count = models.IntegerField(default=0, verbose_name='筆數')
+
+    class Meta:
+        verbose_name = '分數分佈'
+        verbose_name_plural = '分數分佈'
+        db_table = 'score_histogram_bin'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['test_project', 'metric', 'bin'],
+                name='uniq_score_histogram_bin'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.test_project_id} {self.metric} [{self.bin}] {self.count}"
+
+
+class ResultScoreContribution(models.Model):
+    """單筆測驗結果已計入分數分佈的數值（重新爬取或刪除時用於扣除舊值）"""
+    test_result = models.OneToOneField(
+        TestProjectResult,
+        on_delete=models.CASCADE,
+        related_name='score_contribution',
+        verbose_name='測驗結果'
+    )
+    test_project = models.ForeignKey(TestProject, on_delete=models.CASCADE, verbose_name='測驗項目')
+    # 指標 -> 分數
+    values = models.JSONField(default=dict, verbose_name='分數')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+
+    class Meta:
+        verbose_name = '分數分佈明細'
+        verbose_name_plural = '分數分佈明細'
+        db_table = 'result_score_contribution'
+
+    def __str__(self):
+        return f"{self.test_result_id} - {self.values}"
+
+
+class ShortLink(models.Model):
+    """短網址（短碼唯一索引，重新導向時以短碼查詢一次即可取得邀請）"""
+    code = models.CharField(max_length=16, unique=True, verbose_name='短碼')
+    invitation = models.ForeignKey(
+        TestInvitation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='short_links',
+        verbose_name='測驗邀請'
+    )
+    original_url = models.TextField(verbose_name='原始網址')
+    # 點擊數先累計在快取，由排程批次寫入
+    click_count = models.PositiveIntegerField(default=0, verbose_name='點擊次數')
+    last_clicked_at = models.DateTimeField(null=True, blank=True, verbose_name='最後點擊時間')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+
+    class Meta:
+        verbose_name = '短網址'
+        verbose_name_plural = '短網址'
+        db_table = 'short_link'
+
+    def __str__(self):
+        return f"{self.code} -> {self.original_url}"
+
+
+class ShortLinkDailyClicks(models.Model):
+    """短網址每日點擊數"""
+    short_link = models.ForeignKey(
+        ShortLink,
+        on_delete=models.CASCADE,
+        related_name='daily_clicks',
+        verbose_name='短網址'
+    )
+    date = models.DateField(verbose_name='日期')
+    clicks = models.PositiveIntegerField(default=0, verbose_name='點擊次數')
+
+    class Meta:
+        verbose_name = '短網址每日點擊'
+        verbose_name_plural = '短網址每日點擊'
+        db_table = 'short_link_daily_clicks'
+        constraints = [
+            models.UniqueConstraint(fields=['short_link', 'date'], name='uniq_short_link_daily_clicks'),
+        ]
+
+    def __str__(self):
+        return f"{self.short_link_id} {self.date}: {self.clicks}"
+
 
 # ==================== 邀請模板系統 ====================
 
@@ -1612,8 +2135,10 @@ class IndividualTestResult(models.Model):
         from django.utils import timezone
         return (timezone.now() - self.test_completion_date).days
     
+    TRAIT_INDEX_FIELDS = {'trait_results', 'raw_data', 'result_status', 'test_completion_date', 'crawled_at'}
+
     def save(self, *args, **kwargs):
-        """重寫 save 方法，在結果完成時自動更新測驗記錄狀態"""
+        """重寫 save 方法，在結果完成時自動更新測驗記錄狀態與特質搜尋索引"""
         # 檢查是否是新建立的結果或結果狀態變為 completed
         is_new = self.pk is None
         old_status = None
@@ -1644,6 +2169,12 @@ class IndividualTestResult(models.Model):
                     test_record.save()
             except IndividualTestRecord.DoesNotExist:
                 pass
+        
+        # 更新特質搜尋索引
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.TRAIT_INDEX_FIELDS & set(update_fields):
+            from core.services.trait_search_index import index_individual_result
+            index_individual_result(self)
     
     @property
     def overall_score(self):
@@ -1659,6 +2190,79 @@ class IndividualTestResult(models.Model):
         
         return None
 
+
+class ResultTraitScore(models.Model):
+    """特質分數搜尋索引：每筆已完成測驗結果的每個特質一列，供特質門檻搜尋與統計以索引範圍查詢"""
+    project_result = models.ForeignKey(
+        TestProjectResult,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='trait_score_rows',
+        verbose_name='企業測驗結果'
+    )
+    individual_result = models.ForeignKey(
+        IndividualTestResult,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='trait_score_rows',
+        verbose_name='個人測驗結果'
+    )
+    enterprise = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='邀請企業'
+    )
+    invitee = models.ForeignKey(
+        TestInvitee,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='trait_score_rows',
+        verbose_name='受測人員'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='trait_score_rows',
+        verbose_name='個人用戶'
+    )
+    test_project = models.ForeignKey(TestProject, on_delete=models.CASCADE, verbose_name='測驗項目')
+    trait = models.ForeignKey(Trait, on_delete=models.CASCADE, related_name='result_scores', verbose_name='特質')
+    score = models.FloatField(verbose_name='分數')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+
+    class Meta:
+        verbose_name = '特質分數索引'
+        verbose_name_plural = '特質分數索引'
+        db_table = 'result_trait_score'
+        indexes = [
+            models.Index(fields=['trait', 'score'], name='result_trait_score_idx'),
+            models.Index(fields=['test_project', 'trait', 'score'], name='result_trait_project_idx'),
+            models.Index(fields=['enterprise', 'trait', 'score'], name='result_trait_enterprise_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project_result', 'trait'],
+                condition=models.Q(project_result__isnull=False),
+                name='result_trait_unique_project',
+            ),
+            models.UniqueConstraint(
+                fields=['individual_result', 'trait'],
+                condition=models.Q(individual_result__isnull=False),
+                name='result_trait_unique_individual',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.trait_id}: {self.score}"
+
 # ==================== 爬蟲管理 ====================
 
 class CrawlerLog(models.Model):
@@ -60,19 +60,14 @@ class NotificationService:
     
     @classmethod
     def get_unread_count(cls, user):
-        """獲取未讀通知數量"""
-        from core.models import Notification  # 加入這行
+        """獲取未讀通知數量（快取中的計數）"""
+        from core.services.notification_counters import get_unread_count
         
-        return Notification.objects.filter(
-            recipient=user,
-            is_read=False
-        ).filter(
-            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now())
-        ).count()
+        return get_unread_count(user)
     
     @classmethod
     def mark_as_read(cls, notification_id, user=None):
-        """標記通知為已讀"""
+        """標記通知為已讀（未讀計數由 signal 調整）"""
         try:
             from core.models import Notification  # 加入這行
             
@@ -90,15 +85,9 @@ class NotificationService:
     def mark_all_as_read(cls, user):
         """標記所有通知為已讀"""
         try:
-            from core.models import Notification  # 加入這行
+            from core.services.notification_counters import mark_all_as_read
             
-            Notification.objects.filter(
-                recipient=user,
-                is_read=False
-            ).update(
-                is_read=True,
-                read_at=timezone.now()
-            )
+            mark_all_as_read(user)
             return True
         except Exception as e:
             logger.error(f"標記所有通知已讀失敗：{str(e)}")
@@ -107,18 +96,14 @@ class NotificationService:
     @classmethod
     def delete_notification(cls, notification_id, user=None):
         """刪除通知"""
-        try:
-            from core.models import Notification  # 加入這行
-            
-            filters = {'id': notification_id}
-            if user:
-                filters['recipient'] = user
-            
-            notification = Notification.objects.get(**filters)
-            notification.delete()
-            return True
-        except Notification.DoesNotExist:
-            return False
+        from core.models import Notification  # 加入這行
+        from core.services.notification_counters import delete_notifications
+        
+        filters = {'id': notification_id}
+        if user:
+            filters['recipient'] = user
+        
+        return delete_notifications(Notification.objects.filter(**filters)) > 0
     
     # 便捷方法
     @classmethod
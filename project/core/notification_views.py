@@ -1,11 +1,15 @@
 #通知功能Views
 # views/notification_views.py
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, Http404
+from django.conf import settings
+from django.http import JsonResponse, Http404, StreamingHttpResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.utils import timezone
 from utils.notification import NotificationService
+from core.services.notification_counters import delete_notifications, get_unread_count, mark_all_as_read
+import json
 import logging
+import time
 from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
@@ -17,6 +21,7 @@ def notification_list(request):
     """顯示所有通知"""
     from .models import Notification
 
+    # 排除過期通知（排程任務刪除前仍可能存在）
     notifications = Notification.objects.filter(
         recipient=request.user
     ).filter(
@@ -34,7 +39,7 @@ def notification_list(request):
     except EmptyPage:
         page_obj = paginator.page(paginator.num_pages)
     
-    unread_count = notifications.filter(is_read=False).count()
+    unread_count = get_unread_count(request.user)
 
     return render(request, 'notification/notification_list.html', {
         'page_obj': page_obj,
@@ -67,14 +72,7 @@ def mark_notification_read(request, notification_id):
 @require_POST
 def mark_all_read(request):
     """將所有通知標記為已讀"""
-    from .models import Notification
-
-    qs = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    )
-
-    updated = qs.update(is_read=True, read_at=timezone.now())
+    updated = mark_all_as_read(request.user)
     success = updated >= 0
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -88,14 +86,11 @@ def delete_notification(request, notification_id):
     """刪除通知"""
     from .models import Notification
 
-    try:
-        notification = Notification.objects.get(id=notification_id, recipient=request.user)
-    except Notification.DoesNotExist:
+    if not delete_notifications(Notification.objects.filter(id=notification_id, recipient=request.user)):
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return JsonResponse({'status': 'error', 'message': '通知不存在'}, status=404)
         raise Http404
 
-    notification.delete()
     success = True
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -120,12 +115,7 @@ def get_notification_dropdown(request):
             Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
         )[:10]
         
-        unread_count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).filter(
-            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-        ).count()
+        unread_count = get_unread_count(request.user)
         
         # 渲染模板
         from django.template.loader import render_to_string
@@ -148,25 +138,48 @@ def get_notification_dropdown(request):
         })
 
 def get_notification_count(request):
-    """獲取未讀通知數量"""
+    """獲取未讀通知數量（stream 表示可改用 notification_stream 接收推送）"""
     if not request.user.is_authenticated:
         return JsonResponse({'unread_count': 0})
     
+    stream = getattr(settings, 'NOTIFICATION_SSE_ENABLED', False)
     try:
-        from .models import Notification  # 修改這行
-        from django.db.models import Q  # 加入這行
-        
-        unread_count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).filter(
-            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-        ).count()
-        
-        return JsonResponse({'unread_count': unread_count})
+        return JsonResponse({'unread_count': get_unread_count(request.user), 'stream': stream})
     except Exception as e:
         logger.error(f"獲取通知數量失敗：{str(e)}")
-        return JsonResponse({'unread_count': 0})
+        return JsonResponse({'unread_count': 0, 'stream': stream})
+
+@login_required
+def notification_stream(request):
+    """以 Server-Sent Events 推送未讀通知數量的變化
+
+    每隔 NOTIFICATION_SSE_INTERVAL 秒讀取快取中的計數，有變化時送出 unread 事件；
+    連線在 NOTIFICATION_SSE_MAX_SECONDS 後結束，由瀏覽器依 retry 重新連線，避免長期佔用 worker。
+    """
+    if not getattr(settings, 'NOTIFICATION_SSE_ENABLED', False):
+        raise Http404
+
+    user_id = request.user.pk
+    interval = getattr(settings, 'NOTIFICATION_SSE_INTERVAL', 5)
+    max_seconds = getattr(settings, 'NOTIFICATION_SSE_MAX_SECONDS', 55)
+
+    def events():
+        yield f"retry: {interval * 1000}\n\n"
+        deadline = time.monotonic() + max_seconds
+        last_count = None
+        while True:
+            count = get_unread_count(user_id)
+            if count != last_count:
+                last_count = count
+                yield f"event: unread\ndata: {json.dumps({'unread_count': count})}\n\n"
+            if time.monotonic() + interval > deadline:
+                break
+            time.sleep(interval)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # ===== 待辦事項視圖 =====
 
@@ -9,6 +9,7 @@ from django.utils import timezone
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
 from utils.point_service import PointService, require_points
+from core.services import point_rollup
 from core.models import (
     PointTransaction,
     User,
@@ -177,6 +178,26 @@ def api_consume_points(request):
 
 # ==================== 管理員功能 ====================
 
+def _balance_totals():
+    """全站與各用戶類型的點數總計（單一查詢）"""
+    from django.db.models import Count, Q, Sum
+    
+    individual = Q(user__user_type='individual')
+    enterprise = Q(user__user_type='enterprise')
+    totals = UserPointBalance.objects.aggregate(
+        total_users=Count('id'),
+        individual_count=Count('id', filter=individual),
+        enterprise_count=Count('id', filter=enterprise),
+        total_points_issued=Sum('total_earned'),
+        total_points_consumed=Sum('total_consumed'),
+        total_points_balance=Sum('balance'),
+        individual_total_points=Sum('total_earned', filter=individual),
+        enterprise_total_points=Sum('total_earned', filter=enterprise),
+        individual_balance_points=Sum('balance', filter=individual),
+        enterprise_balance_points=Sum('balance', filter=enterprise),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
 @login_required
 def admin_point_overview(request):
     """管理員點數總覽頁面"""
@@ -195,33 +216,9 @@ def admin_point_overview(request):
         user__user_type='enterprise'
     ).select_related('user', 'user__enterprise_profile').order_by('-total_earned')
     
-    # 統計數據
-    stats = {
-        'total_users': UserPointBalance.objects.count(),
-        'individual_count': individual_users.count(),
-        'enterprise_count': enterprise_users.count(),
-        'total_points_issued': UserPointBalance.objects.aggregate(
-            total=Sum('total_earned')
-        )['total'] or 0,
-        'total_points_consumed': UserPointBalance.objects.aggregate(
-            total=Sum('total_consumed')
-        )['total'] or 0,
-        'total_points_balance': UserPointBalance.objects.aggregate(
-            total=Sum('balance')
-        )['total'] or 0,
-        'individual_total_points': individual_users.aggregate(
-            total=Sum('total_earned')
-        )['total'] or 0,
-        'enterprise_total_points': enterprise_users.aggregate(
-            total=Sum('total_earned')
-        )['total'] or 0,
-        'individual_balance_points': individual_users.aggregate(
-            total=Sum('balance')
-        )['total'] or 0,
-        'enterprise_balance_points': enterprise_users.aggregate(
-            total=Sum('balance')
-        )['total'] or 0,
-    }
+    # 統計數據：餘額以單一條件加總查詢，消費統計取自每日彙總
+    stats = _balance_totals()
+    consumption_windows = point_rollup.get_consumption_windows()
     
     # 搜尋功能
     search_query = request.GET.get('search', '')
@@ -254,6 +251,7 @@ def admin_point_overview(request):
         'individual_users': individual_users[:20],  # 限制顯示數量
         'enterprise_users': enterprise_users[:20],   # 限制顯示數量
         'recent_transactions': recent_transactions,
+        'consumption_windows': consumption_windows,
         'search_query': search_query,
         'user_type_filter': user_type_filter,
     }
@@ -322,18 +320,13 @@ def admin_point_management(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # 獲取統計數據
+    # 獲取統計數據（交易筆數沿用分頁已取得的總數）
+    totals = _balance_totals()
     stats = {
-        'total_transactions': transactions.count(),
-        'total_points_issued': UserPointBalance.objects.aggregate(
-            total=Sum('total_earned')
-        )['total'] or 0,
-        'total_points_consumed': UserPointBalance.objects.aggregate(
-            total=Sum('total_consumed')
-        )['total'] or 0,
-        'system_balance': UserPointBalance.objects.aggregate(
-            total=Sum('balance')
-        )['total'] or 0,
+        'total_transactions': paginator.count,
+        'total_points_issued': totals['total_points_issued'],
+        'total_points_consumed': totals['total_points_consumed'],
+        'system_balance': totals['total_points_balance'],
     }
     
     # 交易類型選項
@@ -0,0 +1,101 @@
+# core/report_job_views.py
+"""PDF 報告背景生成：建立任務、查詢進度與下載"""
+import logging
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from .models import IndividualTestResult, ReportJob, TestProjectResult
+from .services.report_jobs import enqueue_report_job, user_can_access_job
+from .test_result_views import enterprise_required
+from utils.pdf_report_generator import build_content_disposition
+
+logger = logging.getLogger(__name__)
+
+
+def _job_payload(job):
+    payload = {
+        'success': job.status != 'failed',
+        'job_id': str(job.pk),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'status_url': reverse('report_job_status', args=[job.pk]),
+        'download_url': None,
+        'error': job.error_message or None,
+        # 未能排入背景佇列（從未開始執行）時，頁面改用同步下載
+        'fallback': job.status == 'failed' and job.started_at is None,
+    }
+    if job.status == 'completed':
+        payload['download_url'] = reverse('report_job_download', args=[job.pk])
+    return payload
+
+
+def _get_accessible_job(request, job_id):
+    job = get_object_or_404(ReportJob, pk=job_id)
+    if not user_can_access_job(request.user, job):
+        return None
+    return job
+
+
+@login_required
+@enterprise_required
+@require_POST
+def request_test_result_pdf_job(request, result_id):
+    """建立企業測驗結果的 PDF 生成任務"""
+    user = request.user
+
+    # 權限檢查
+    if user.user_type == 'admin':
+        result = get_object_or_404(TestProjectResult, id=result_id)
+    else:
+        result = get_object_or_404(TestProjectResult, id=result_id, test_invitation__enterprise=user)
+
+    job = enqueue_report_job('project', result, user)
+    logger.info(f"PDF 報告任務 job={job.pk} result={result_id} status={job.status}")
+    return JsonResponse(_job_payload(job), status=202 if job.is_active else 200)
+
+
+@login_required
+@require_POST
+def request_individual_test_result_pdf_job(request, result_id):
+    """建立個人測驗結果的 PDF 生成任務"""
+    if request.user.user_type != 'individual':
+        return JsonResponse({'success': False, 'error': '此功能僅開放給個人用戶使用'}, status=403)
+
+    result = get_object_or_404(IndividualTestResult, id=result_id, user=request.user)
+
+    job = enqueue_report_job('individual', result, request.user)
+    logger.info(f"個人 PDF 報告任務 job={job.pk} result={result_id} status={job.status}")
+    return JsonResponse(_job_payload(job), status=202 if job.is_active else 200)
+
+
+@login_required
+@require_GET
+def report_job_status(request, job_id):
+    """查詢報告生成進度"""
+    job = _get_accessible_job(request, job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': '無權限查看此任務'}, status=403)
+    return JsonResponse(_job_payload(job))
+
+
+@login_required
+@require_GET
+def report_job_download(request, job_id):
+    """下載已完成的報告"""
+    job = _get_accessible_job(request, job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': '無權限下載此報告'}, status=403)
+    if job.status != 'completed' or not job.file:
+        return JsonResponse({'success': False, 'error': '報告尚未生成完成', **_job_payload(job)}, status=409)
+
+    response = FileResponse(job.file.open('rb'), content_type='application/pdf')
+    response['Content-Disposition'] = build_content_disposition(
+        job.download_filename or 'report.pdf',
+        job.display_filename or job.download_filename or 'report.pdf',
+    )
+    return response
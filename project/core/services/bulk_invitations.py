@@ -0,0 +1,287 @@
+"""Batched bulk invitation creation and background invitation e-mail jobs."""
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import (
+    EnterpriseQuotaUsageLog,
+    InvitationEmailJob,
+    TestInvitation,
+    TestInvitee,
+    TestProjectAssignment,
+)
+from core.services.dashboard_metrics import invalidate_dashboard_metrics
+from core.services.invitation_rollup import apply_invitation_changes, invitation_snapshot
+from utils.url_shortener import URLShortenerService
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = getattr(settings, 'BULK_INVITATION_MAX_ROWS', 5000)
+BATCH_SIZE = getattr(settings, 'BULK_INVITATION_BATCH_SIZE', 500)
+# 寄送任務每段處理的邀請數（每段為一個 Celery 任務，段內依 EMAIL_BULK_BATCH_SIZE 共用 SMTP 連線）
+EMAIL_CHUNK_SIZE = getattr(settings, 'INVITATION_EMAIL_CHUNK_SIZE', 200)
+
+INVITEE_FIELDS = ('name', 'email', 'phone', 'position', 'company')
+OPEN_STATUSES = ('pending', 'in_progress')
+
+
+def _normalize_row(row_data) -> Dict[str, str]:
+    data = {field: (row_data.get(field) or '').strip() for field in INVITEE_FIELDS}
+    data['email'] = data['email'].lower()
+    return data
+
+
+def create_bulk_invitations(enterprise_user, test_project, rows, *, expires_at, custom_message='',
+                            skip_duplicates=False) -> Tuple[Dict[str, object], List[TestInvitation]]:
+    """依 CSV 資料批次建立受測者與邀請
+
+    既有受測者與進行中的邀請各以一次查詢取得；受測者、邀請與份數使用紀錄以 bulk_create 寫入，
+    份數只扣除一次。需在交易中呼叫。回傳 (統計, 新建立的邀請)。
+    """
+    stats = {'total': len(rows), 'created': 0, 'updated': 0, 'skipped': 0, 'invited': 0, 'errors': []}
+    normalized = [_normalize_row(row) for row in rows]
+    emails = {row['email'] for row in normalized}
+
+    existing = {
+        invitee.email: invitee
+        for invitee in TestInvitee.objects.filter(enterprise=enterprise_user, email__in=emails)
+    }
+    open_invitee_ids = set(
+        TestInvitation.objects.filter(
+            enterprise=enterprise_user,
+            test_project=test_project,
+            invitee__in=list(existing.values()),
+            status__in=OPEN_STATUSES,
+        ).values_list('invitee_id', flat=True)
+    )
+
+    assignment = TestProjectAssignment.objects.select_for_update().filter(
+        test_project=test_project,
+        enterprise_user=enterprise_user
+    ).first()
+
+    new_invitees: Dict[str, TestInvitee] = {}
+    updated_invitees: Dict[str, TestInvitee] = {}
+    invite_emails: List[str] = []
+    seen = set()
+
+    for row in normalized:
+        email = row['email']
+        invitee = existing.get(email) or new_invitees.get(email)
+
+        if email in seen:
+            # 同一檔案中重複的 Email：第一筆已處理
+            if skip_duplicates:
+                stats['skipped'] += 1
+            else:
+                stats['errors'].append(f"{row['name']}({email}) 在檔案中重複")
+            continue
+        seen.add(email)
+
+        if invitee is None:
+            invitee = TestInvitee(enterprise=enterprise_user, **row)
+            new_invitees[email] = invitee
+            stats['created'] += 1
+        elif skip_duplicates:
+            stats['skipped'] += 1
+            continue
+        else:
+            invitee.name = row['name']
+            invitee.phone = row['phone'] or invitee.phone
+            invitee.position = row['position'] or invitee.position
+            invitee.company = row['company'] or invitee.company
+            updated_invitees[email] = invitee
+            stats['updated'] += 1
+
+        if invitee.pk and invitee.pk in open_invitee_ids:
+            stats['errors'].append(f'{invitee.name}({invitee.email}) 已有進行中的邀請')
+            continue
+
+        if assignment and not assignment.has_available_quota(len(invite_emails) + 1):
+            remaining = max((assignment.remaining_quota or 0) - len(invite_emails), 0)
+            stats['errors'].append(f'可用份數不足（剩餘 {remaining} 份），停止後續邀請。')
+            break
+
+        invite_emails.append(email)
+
+    if updated_invitees:
+        TestInvitee.objects.bulk_update(
+            list(updated_invitees.values()), ['name', 'phone', 'position', 'company'], batch_size=BATCH_SIZE
+        )
+    if new_invitees:
+        TestInvitee.objects.bulk_create(list(new_invitees.values()), batch_size=BATCH_SIZE)
+
+    invitees = {**existing, **new_invitees}
+    invitations = TestInvitation.objects.bulk_create(
+        [
+            TestInvitation(
+                enterprise=enterprise_user,
+                invitee=invitees[email],
+                test_project=test_project,
+                invitation_code=uuid.uuid4(),
+                custom_message=custom_message,
+                expires_at=expires_at,
+                points_consumed=1,
+                status='pending',
+            )
+            for email in invite_emails
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    if invitations:
+        short_urls = URLShortenerService.generate_short_urls(
+            test_project.test_link, [invitation.id for invitation in invitations]
+        )
+        for invitation in invitations:
+            short_url_data = short_urls[invitation.id]
+            invitation.result_data = {
+                'short_url': short_url_data['short_url'],
+                'short_code': short_url_data['short_code'],
+                'original_url': short_url_data['original_url']
+            }
+        TestInvitation.objects.bulk_update(invitations, ['result_data'], batch_size=BATCH_SIZE)
+
+        TestInvitee.objects.filter(pk__in=[invitation.invitee_id for invitation in invitations]).update(
+            invited_count=F('invited_count') + 1
+        )
+        if assignment:
+            _consume_quota(assignment, invitations, enterprise_user)
+
+        # bulk_create 不觸發 signal，手動更新每日彙總與儀表板快取
+        apply_invitation_changes([(None, invitation_snapshot(invitation)) for invitation in invitations])
+
+    if invitations or new_invitees or updated_invitees:
+        invalidate_dashboard_metrics(enterprise_id=enterprise_user.pk)
+
+    stats['invited'] = len(invitations)
+    return stats, invitations
+
+
+def _consume_quota(assignment, invitations, created_by):
+    """一次扣除份數，並為每筆邀請寫入使用紀錄（剩餘份數依序遞減，與逐筆扣除時相同）"""
+    used_before = assignment.used_quota
+    assignment.consume_quota(amount=len(invitations))
+
+    logs = []
+    for index, invitation in enumerate(invitations, start=1):
+        remaining = None
+        if not assignment.is_unlimited:
+            remaining = max(assignment.assigned_quota - (used_before + index), 0)
+        logs.append(EnterpriseQuotaUsageLog(
+            assignment=assignment,
+            enterprise_user_id=assignment.enterprise_user_id,
+            test_project_id=assignment.test_project_id,
+            invitation=invitation,
+            action='consume',
+            quantity=1,
+            invitee_name=invitation.invitee.name or '',
+            invitee_email=invitation.invitee.email or '',
+            remaining_quota=remaining,
+            created_by=created_by,
+        ))
+    EnterpriseQuotaUsageLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
+
+
+# ===== 背景寄送邀請信 =====
+
+def dispatch_invitation_email_chunk(job_id, offset=0):
+    """將寄送任務的下一段排入佇列"""
+    from core.tasks import send_invitation_emails
+
+    try:
+        send_invitation_emails.delay(str(job_id), offset)
+    except Exception as e:
+        logger.error(f"邀請信任務排入佇列失敗 job={job_id}：{str(e)}")
+        InvitationEmailJob.objects.filter(pk=job_id).update(
+            status='failed', error_message=f'無法排入背景佇列：{str(e)}', finished_at=timezone.now()
+        )
+
+
+def enqueue_invitation_emails(user, invitations) -> InvitationEmailJob:
+    """建立邀請信寄送任務（交易提交後才排入佇列）"""
+    invitation_ids = [invitation.pk for invitation in invitations]
+    job = InvitationEmailJob.objects.create(
+        requested_by=user,
+        invitation_ids=invitation_ids,
+        total_count=len(invitation_ids),
+    )
+    job_id = job.pk
+    transaction.on_commit(lambda: dispatch_invitation_email_chunk(job_id))
+    return job
+
+
+def run_invitation_email_chunk(job_id, offset=0) -> Tuple[InvitationEmailJob, Optional[int]]:
+    """寄送任務中的一段邀請信；回傳 (任務, 下一段起點)，全部處理完畢時下一段起點為 None"""
+    from utils.email_service import EmailService
+
+    if offset == 0:
+        claimed = InvitationEmailJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if not claimed:
+            job = InvitationEmailJob.objects.get(pk=job_id)
+            logger.info(f"邀請信任務已由其他 worker 處理 job={job_id} status={job.status}")
+            return job, None
+
+    job = InvitationEmailJob.objects.get(pk=job_id)
+    if job.status != 'running':
+        return job, None
+
+    chunk_ids = job.invitation_ids[offset:offset + EMAIL_CHUNK_SIZE]
+    try:
+        invitations = TestInvitation.objects.filter(pk__in=chunk_ids).select_related(
+            'invitee', 'test_project', 'enterprise__enterprise_profile'
+        ).order_by('pk')
+        results = EmailService.send_test_invitation_emails(invitations)
+    except Exception as e:
+        logger.error(f"邀請信任務失敗 job={job_id}：{str(e)}", exc_info=True)
+        InvitationEmailJob.objects.filter(pk=job_id).update(
+            status='failed', error_message=str(e), finished_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return job, None
+
+    sent = sum(1 for success in results.values() if success)
+    # 已刪除的邀請視為寄送失敗
+    failed = len(chunk_ids) - sent
+    processed = offset + len(chunk_ids)
+    done = processed >= len(job.invitation_ids)
+
+    updates = {'sent_count': F('sent_count') + sent, 'failed_count': F('failed_count') + failed}
+    if done:
+        updates.update(status='completed', progress=100, finished_at=timezone.now())
+    else:
+        updates['progress'] = min(99, processed * 100 // max(job.total_count, 1))
+    InvitationEmailJob.objects.filter(pk=job_id).update(**updates)
+    job.refresh_from_db()
+
+    if done:
+        logger.info(f"邀請信任務結束 job={job_id} sent={job.sent_count} failed={job.failed_count}")
+        return job, None
+    return job, processed
+
+
+def run_invitation_email_job(job_id) -> InvitationEmailJob:
+    """在目前程序中依序寄完所有段落（無法使用 Celery 或測試時使用）"""
+    job, offset = run_invitation_email_chunk(job_id)
+    while offset is not None:
+        job, offset = run_invitation_email_chunk(job_id, offset)
+    return job
+
+
+def cleanup_invitation_email_jobs(days=30) -> int:
+    """刪除舊的寄送任務紀錄"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = InvitationEmailJob.objects.filter(created_at__lt=cutoff).exclude(
+        status__in=InvitationEmailJob.ACTIVE_STATUSES
+    ).delete()
+    return deleted
@@ -0,0 +1,28 @@
+"""Atomic increment-or-create for the counter rows kept by the rollup services."""
+from __future__ import annotations
+
+from typing import Dict, Type
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+
+def increment_or_create(model: Type[models.Model], lookup: Dict[str, object], deltas: Dict[str, float],
+                        create=True) -> bool:
+    """以 F() 原子累加 lookup 對應列的欄位，沒有該列時以 deltas 為初值建立；回傳是否寫入
+
+    create 為 False 時只更新既有列。建立時與另一交易同時建立同一列（唯一限制衝突），
+    改為累加到對方建立的列上。
+    """
+    rows = model.objects.filter(**lookup)
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if rows.update(**updates):
+        return True
+    if not create:
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        return bool(rows.update(**updates))
+    return True
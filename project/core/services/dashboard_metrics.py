@@ -0,0 +1,201 @@
+"""Cached dashboard counters computed with one grouped query per model."""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.models import (
+    InvitationTemplate,
+    TestInvitation,
+    TestInvitee,
+    TestProject,
+    TestProjectResult,
+    User,
+)
+
+ENTERPRISE_TIMEOUT = getattr(settings, 'DASHBOARD_METRICS_TIMEOUT', 60)
+ADMIN_TIMEOUT = getattr(settings, 'DASHBOARD_ADMIN_METRICS_TIMEOUT', 120)
+
+# 測驗項目或指派變更會影響所有企業的可用項目數，以版本號一次失效所有企業快取
+VERSION_KEY = 'dashboard_metrics:version'
+ENTERPRISE_KEY = 'dashboard_metrics:enterprise:{user_id}:v{version}'
+ADMIN_KEY = 'dashboard_metrics:admin'
+TEST_RESULT_KEY = 'dashboard_metrics:test_results'
+
+CRAWL_STATUSES = ('pending', 'crawling', 'completed', 'failed')
+
+
+def _version() -> int:
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _cached(key, timeout, compute):
+    metrics = cache.get(key)
+    if metrics is None:
+        metrics = compute()
+        cache.set(key, metrics, timeout)
+    return metrics
+
+
+def get_enterprise_metrics(user) -> Dict[str, Any]:
+    """企業儀表板計數（邀請、受測者、各測驗項目進度）"""
+    key = ENTERPRISE_KEY.format(user_id=user.pk, version=_version())
+    return _cached(key, ENTERPRISE_TIMEOUT, lambda: _compute_enterprise_metrics(user))
+
+
+def _compute_enterprise_metrics(user) -> Dict[str, Any]:
+    week_ago = timezone.localdate() - timedelta(days=7)
+
+    invitations = TestInvitation.objects.filter(enterprise=user).order_by().aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+        pending=Count('id', filter=Q(status='pending')),
+        week_invitations=Count('id', filter=Q(invited_at__date__gte=week_ago)),
+        week_completions=Count('id', filter=Q(status='completed', completed_at__date__gte=week_ago)),
+    )
+    invitees = TestInvitee.objects.filter(enterprise=user).order_by().aggregate(
+        total=Count('id'),
+        week_new=Count('id', filter=Q(created_at__date__gte=week_ago)),
+    )
+    project_progress = {
+        item['test_project_id']: {
+            'pending_count': item['pending_count'],
+            'completed_count': item['completed_count'],
+        }
+        for item in TestInvitation.objects.filter(enterprise=user, test_project__isnull=False)
+        .order_by()
+        .values('test_project_id')
+        .annotate(
+            pending_count=Count('id', filter=Q(status__in=['pending', 'in_progress'])),
+            completed_count=Count('id', filter=Q(status='completed')),
+        )
+    }
+
+    total = invitations['total']
+    return {
+        'stats': {
+            'total_invitations': total,
+            'total_invitees': invitees['total'],
+            'completed_tests': invitations['completed'],
+            'pending_tests': invitations['pending'],
+            'completion_rate': (invitations['completed'] / total * 100) if total > 0 else 0,
+        },
+        'week_stats': {
+            'invitations': invitations['week_invitations'],
+            'completions': invitations['week_completions'],
+            'new_invitees': invitees['week_new'],
+        },
+        'template_count': InvitationTemplate.objects.filter(enterprise=user, is_active=True).order_by().count(),
+        'available_projects': TestProject.get_available_projects_for_user(user).order_by().count(),
+        'project_progress': project_progress,
+    }
+
+
+def get_admin_metrics() -> Dict[str, Any]:
+    """管理員儀表板計數（使用者、邀請與活躍企業排行）"""
+    return _cached(ADMIN_KEY, ADMIN_TIMEOUT, _compute_admin_metrics)
+
+
+def _compute_admin_metrics() -> Dict[str, Any]:
+    month_start = timezone.now().replace(day=1)
+
+    users = User.objects.order_by().aggregate(
+        total=Count('id'),
+        enterprise=Count('id', filter=Q(user_type='enterprise')),
+        individual=Count('id', filter=Q(user_type='individual')),
+        new_this_month=Count('id', filter=Q(date_joined__gte=month_start)),
+        pending_enterprises=Count(
+            'id',
+            filter=Q(user_type='enterprise', enterprise_profile__verification_status='pending'),
+        ),
+    )
+    invitations = TestInvitation.objects.order_by().aggregate(
+        total=Count('id'),
+        month_new=Count('id', filter=Q(invited_at__gte=month_start)),
+        month_completed=Count('id', filter=Q(status='completed', completed_at__gte=month_start)),
+    )
+    top_enterprises = list(
+        User.objects.filter(user_type='enterprise')
+        .values('id', 'username', 'email')
+        .annotate(invitation_count=Count('sent_invitations'))
+        .order_by('-invitation_count', 'id')[:5]
+    )
+
+    return {
+        'stats': {
+            'total_users': users['total'],
+            'enterprise_users': users['enterprise'],
+            'individual_users': users['individual'],
+            'total_projects': TestProject.objects.order_by().count(),
+            'total_invitations': invitations['total'],
+            'total_invitees': TestInvitee.objects.order_by().count(),
+        },
+        'month_stats': {
+            'new_users': users['new_this_month'],
+            'new_invitations': invitations['month_new'],
+            'completed_tests': invitations['month_completed'],
+        },
+        'pending_enterprises': users['pending_enterprises'],
+        'top_enterprises': top_enterprises,
+    }
+
+
+def get_test_result_metrics() -> Dict[str, Any]:
+    """測驗結果管理儀表板計數（爬蟲狀態分佈與測驗項目使用統計）"""
+    return _cached(TEST_RESULT_KEY, ADMIN_TIMEOUT, _compute_test_result_metrics)
+
+
+def _compute_test_result_metrics() -> Dict[str, Any]:
+    invitations = TestInvitation.objects.order_by().aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+    results = TestProjectResult.objects.order_by().aggregate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(crawl_status=status)) for status in CRAWL_STATUSES},
+    )
+    project_stats = list(
+        TestInvitation.objects.values('test_project__name')
+        .annotate(
+            invitation_count=Count('id'),
+            completed_count=Count('id', filter=Q(status='completed')),
+        )
+        .order_by('-invitation_count')[:10]
+    )
+
+    total = invitations['total']
+    completed = invitations['completed']
+    return {
+        'stats': {
+            'total_invitations': total,
+            'completed_invitations': completed,
+            'crawled_results': results['total'],
+            'failed_results': results['failed'],
+            'completion_rate': (completed / total * 100) if total > 0 else 0,
+            'crawl_rate': (results['total'] / completed * 100) if completed > 0 else 0,
+        },
+        'crawl_status_stats': {status: results[status] for status in CRAWL_STATUSES},
+        'project_stats': project_stats,
+    }
+
+
+def invalidate_dashboard_metrics(enterprise_id: Optional[int] = None, all_enterprises=False):
+    """資料異動後清除儀表板快取（交易提交後才執行）"""
+    def _invalidate():
+        keys = [ADMIN_KEY, TEST_RESULT_KEY]
+        if enterprise_id:
+            keys.append(ENTERPRISE_KEY.format(user_id=enterprise_id, version=_version()))
+        cache.delete_many(keys)
+        if all_enterprises:
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.set(VERSION_KEY, 2, None)
+
+    transaction.on_commit(_invalidate)
@@ -0,0 +1,246 @@
+"""Daily invitation rollups backing the statistics dashboards."""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import InvitationDailyStats, TestInvitation
+from core.services.counter_rows import increment_or_create
+
+logger = logging.getLogger(__name__)
+
+# 邀請狀態 -> 彙總欄位（依邀請日期歸類）
+STATUS_FIELDS = {
+    'pending': 'pending_count',
+    'in_progress': 'in_progress_count',
+    'completed': 'invited_completed_count',
+    'expired': 'expired_count',
+    'cancelled': 'cancelled_count',
+}
+SNAPSHOT_FIELDS = ('enterprise_id', 'test_project_id', 'invited_at', 'completed_at', 'status', 'score')
+
+RollupKey = Tuple[int, Optional[int], object]
+
+
+def invitation_snapshot(invitation) -> Dict[str, object]:
+    """擷取影響彙總的欄位"""
+    if isinstance(invitation, dict):
+        return {field: invitation.get(field) for field in SNAPSHOT_FIELDS}
+    return {field: getattr(invitation, field) for field in SNAPSHOT_FIELDS}
+
+
+def _contributions(snapshot) -> Dict[RollupKey, Dict[str, float]]:
+    """單筆邀請對各日彙總列的貢獻"""
+    if not snapshot or not snapshot['invited_at'] or not snapshot['enterprise_id']:
+        return {}
+
+    enterprise_id = snapshot['enterprise_id']
+    project_id = snapshot['test_project_id']
+    invited_key = (enterprise_id, project_id, timezone.localdate(snapshot['invited_at']))
+    contributions = {invited_key: {'invited_count': 1}}
+
+    status_field = STATUS_FIELDS.get(snapshot['status'])
+    if status_field:
+        contributions[invited_key][status_field] = 1
+
+    if snapshot['status'] == 'completed':
+        # 與既有統計一致：分數為 0 或空值不列入平均
+        if snapshot['score']:
+            contributions[invited_key]['score_sum'] = float(snapshot['score'])
+            contributions[invited_key]['score_count'] = 1
+        if snapshot['completed_at']:
+            completed_key = (enterprise_id, project_id, timezone.localdate(snapshot['completed_at']))
+            entry = contributions.setdefault(completed_key, {})
+            entry['completed_count'] = entry.get('completed_count', 0) + 1
+
+    return contributions
+
+
+def apply_invitation_change(previous, current):
+    """依邀請異動前後的快照增量更新彙總（新增時 previous 為 None，刪除時 current 為 None）"""
+    apply_invitation_changes([(previous, current)])
+
+
+def apply_invitation_changes(changes):
+    """合併多筆邀請的前後快照再更新彙總，同一天的邀請只寫入一次（批次建立邀請時使用）"""
+    deltas: Dict[RollupKey, Dict[str, float]] = defaultdict(dict)
+    creatable = set()
+    for previous, current in changes:
+        for sign, snapshot in ((-1, previous), (1, current)):
+            for key, fields in _contributions(snapshot).items():
+                for field, value in fields.items():
+                    deltas[key][field] = deltas[key].get(field, 0) + sign * value
+                if current is not None:
+                    creatable.add(key)
+
+    for key, fields in deltas.items():
+        fields = {field: value for field, value in fields.items() if value}
+        if fields:
+            enterprise_id, project_id, day = key
+            # 刪除時只扣除既有列：連帶刪除企業或測驗項目時不可再建立新列
+            increment_or_create(
+                InvitationDailyStats,
+                {'enterprise_id': enterprise_id, 'test_project_id': project_id, 'date': day},
+                fields,
+                create=key in creatable,
+            )
+
+
+def aggregate_invitation_rollups(invitations, since=None) -> Dict[RollupKey, Dict[str, float]]:
+    """以分組查詢計算邀請的每日彙總列（since 為日期時只計算該日（含）之後）"""
+    invited = invitations.order_by()
+    completed = invited.filter(status='completed', completed_at__isnull=False)
+    if since:
+        invited = invited.filter(invited_at__date__gte=since)
+        completed = completed.filter(completed_at__date__gte=since)
+
+    scored = Q(status='completed', score__isnull=False) & ~Q(score=0)
+    status_counts = {
+        field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+    }
+
+    rows: Dict[RollupKey, Dict[str, float]] = defaultdict(dict)
+    for item in (
+        invited.annotate(day=TruncDate('invited_at'))
+        .values('enterprise_id', 'test_project_id', 'day')
+        .annotate(
+            invited_count=Count('id'),
+            score_sum=Sum('score', filter=scored),
+            score_count=Count('id', filter=scored),
+            **status_counts,
+        )
+    ):
+        key = (item['enterprise_id'], item['test_project_id'], item['day'])
+        rows[key].update({
+            'invited_count': item['invited_count'],
+            'score_sum': item['score_sum'] or 0.0,
+            'score_count': item['score_count'],
+            **{field: item[field] for field in STATUS_FIELDS.values()},
+        })
+
+    for item in (
+        completed.annotate(day=TruncDate('completed_at'))
+        .values('enterprise_id', 'test_project_id', 'day')
+        .annotate(completed_count=Count('id'))
+    ):
+        key = (item['enterprise_id'], item['test_project_id'], item['day'])
+        rows[key]['completed_count'] = item['completed_count']
+    return rows
+
+
+def rebuild_invitation_rollups(enterprise_id=None, since=None) -> int:
+    """刪除並重建企業（或全部）的彙總列，用於校正以批次 SQL 修改邀請後的偏差
+
+    since 為日期時只重建該日（含）之後的彙總列。
+    """
+    invitations = TestInvitation.objects.all()
+    if enterprise_id:
+        invitations = invitations.filter(enterprise_id=enterprise_id)
+    rows = aggregate_invitation_rollups(invitations, since)
+
+    with transaction.atomic():
+        existing = InvitationDailyStats.objects.all()
+        if enterprise_id:
+            existing = existing.filter(enterprise_id=enterprise_id)
+        if since:
+            existing = existing.filter(date__gte=since)
+        existing.delete()
+
+        InvitationDailyStats.objects.bulk_create(
+            [
+                InvitationDailyStats(
+                    enterprise_id=enterprise_id_, test_project_id=project_id, date=day, **fields
+                )
+                for (enterprise_id_, project_id, day), fields in rows.items()
+            ],
+            batch_size=1000,
+        )
+
+    logger.info(f"測驗邀請每日彙總重建完成 enterprise={enterprise_id} since={since} rows={len(rows)}")
+    return len(rows)
+
+
+# ===== 查詢 =====
+
+def rollup_queryset(enterprise, start_date=None, end_date=None):
+    """企業的彙總列（start_date/end_date 為日期，含端點）"""
+    rollups = InvitationDailyStats.objects.filter(enterprise=enterprise).order_by()
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+    return rollups
+
+
+def get_status_totals(enterprise, start_date=None) -> Dict[str, int]:
+    """邀請總數與各狀態數量（依邀請日期篩選）"""
+    totals = rollup_queryset(enterprise, start_date).aggregate(
+        total=Sum('invited_count'),
+        **{status: Sum(field) for status, field in STATUS_FIELDS.items()},
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def get_daily_series(enterprise, start_date, days) -> List[Dict[str, object]]:
+    """start_date 起連續 days 天的每日邀請、完成與依邀請日的完成數（缺少的日期補 0）"""
+    end_date = start_date + timedelta(days=days - 1)
+    by_date = {
+        item['date']: item
+        for item in rollup_queryset(enterprise, start_date, end_date)
+        .values('date')
+        .annotate(
+            invitations=Sum('invited_count'),
+            completions=Sum('completed_count'),
+            invited_completed=Sum('invited_completed_count'),
+        )
+    }
+
+    series = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        item = by_date.get(day, {})
+        series.append({
+            'date': day,
+            'invitations': item.get('invitations') or 0,
+            'completions': item.get('completions') or 0,
+            'invited_completed': item.get('invited_completed') or 0,
+        })
+    return series
+
+
+def get_project_totals(enterprise, start_date=None) -> List[Dict[str, object]]:
+    """各測驗項目的邀請數、完成數、完成率與平均分數（依邀請數排序）"""
+    project_totals = []
+    for item in (
+        rollup_queryset(enterprise, start_date)
+        .filter(test_project__isnull=False)
+        .values('test_project_id', 'test_project__name')
+        .annotate(
+            total=Sum('invited_count'),
+            completed=Sum('invited_completed_count'),
+            score_sum=Sum('score_sum'),
+            score_count=Sum('score_count'),
+        )
+    ):
+        total = item['total'] or 0
+        if not total:
+            continue
+        completed = item['completed'] or 0
+        score_count = item['score_count'] or 0
+        project_totals.append({
+            'project_id': item['test_project_id'],
+            'name': item['test_project__name'],
+            'total_invitations': total,
+            'completed_count': completed,
+            'completion_rate': round(completed / total * 100, 1),
+            'avg_score': round(item['score_sum'] / score_count, 1) if score_count else 0,
+        })
+    project_totals.sort(key=lambda item: item['total_invitations'], reverse=True)
+    return project_totals
@@ -0,0 +1,215 @@
+"""Write-behind short link click counters kept in the shared cache."""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from datetime import date as date_type
+from typing import Dict, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveIntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from core.models import ShortLink, ShortLinkDailyClicks
+from core.services.counter_rows import increment_or_create
+from utils.tiered_cache import l2_is_shared, namespace
+
+logger = logging.getLogger(__name__)
+
+# 計數器需所有 worker 一致，只存放在共用的 L2
+click_cache = namespace('link_clicks', use_l1=False, versioned=False)
+
+# (日期, 短碼) 的待寫入點擊數
+COUNTER_KEY = '{date}:{code}'
+# 有待寫入點擊的 (短碼, 日期) 以遞增序號登記，供排程找出需要寫入的計數器
+DIRTY_SEQ_KEY = 'dirty_seq'
+DIRTY_KEY = 'dirty:{seq}'
+CURSOR_KEY = 'cursor'
+FLUSH_LOCK_KEY = 'flush_lock'
+
+# 排程中斷時計數器保留的時間
+COUNTER_TIMEOUT = 60 * 60 * 24 * 7
+FLUSH_LOCK_TIMEOUT = 60 * 5
+# 序號已取得但尚未寫入登記的時間差：最近這些序號缺少登記時下次重新讀取
+RECENT_SEQ_WINDOW = 100
+# 每個 UPDATE 陳述式涵蓋的短網址數（每個短網址一個 WHEN 分支）
+WRITE_BATCH_SIZE = 300
+
+Pending = Dict[Tuple[str, str], int]
+
+
+def _incr(key, delta=1, timeout=COUNTER_TIMEOUT) -> int:
+    return click_cache.incr(key, delta, timeout)
+
+
+def _mark_dirty(code, day: str):
+    seq = _incr(DIRTY_SEQ_KEY, timeout=None)
+    click_cache.set(DIRTY_KEY.format(seq=seq), (code, day), COUNTER_TIMEOUT)
+
+
+def _write_click(code, day: date_type):
+    link_id = ShortLink.objects.filter(code=code).values_list('id', flat=True).first()
+    if link_id is None:
+        return
+    with transaction.atomic():
+        ShortLink.objects.filter(pk=link_id).update(
+            click_count=F('click_count') + 1, last_clicked_at=timezone.now()
+        )
+        increment_or_create(ShortLinkDailyClicks, {'short_link_id': link_id, 'date': day}, {'clicks': 1})
+
+
+def record_click(code, today: date_type = None) -> int:
+    """記錄一次點擊：只遞增快取計數器，不寫入資料庫；回傳尚未寫入的當日點擊數
+
+    L2 只在單一程序內有效時，執行寫入排程的 Celery 程序看不到 web worker 的計數器，
+    改為直接以 F() 寫入資料庫並回傳 0。
+    """
+    if not l2_is_shared():
+        _write_click(code, today or timezone.localdate())
+        return 0
+    day = (today or timezone.localdate()).isoformat()
+    count = _incr(COUNTER_KEY.format(date=day, code=code))
+    if count == 1:
+        # 計數器由 0 開始累計時登記一次，之後的點擊只需遞增
+        _mark_dirty(code, day)
+    return count
+
+
+def pending_clicks(code, today: date_type = None) -> int:
+    """尚未寫入資料庫的當日點擊數"""
+    day = (today or timezone.localdate()).isoformat()
+    return click_cache.get(COUNTER_KEY.format(date=day, code=code)) or 0
+
+
+def _collect_dirty(max_events) -> Tuple[set, int]:
+    cursor = click_cache.get(CURSOR_KEY) or 0
+    end = min(click_cache.get(DIRTY_SEQ_KEY) or 0, cursor + max_events)
+    dirty = set()
+    missing = []
+    for start in range(cursor + 1, end + 1, 1000):
+        keys = [DIRTY_KEY.format(seq=seq) for seq in range(start, min(start + 1000, end + 1))]
+        found = click_cache.get_many(keys)
+        for seq, key in enumerate(keys, start=start):
+            if key in found:
+                dirty.add(tuple(found[key]))
+            else:
+                missing.append(seq)
+        click_cache.delete_many(list(found))
+
+    # 最近的序號可能尚未寫入登記，下次由該處重新讀取；較舊的缺漏視為已過期
+    recent_missing = [seq for seq in missing if seq > end - RECENT_SEQ_WINDOW]
+    next_cursor = recent_missing[0] - 1 if recent_missing else end
+    return dirty, next_cursor
+
+
+def _take_counts(dirty) -> Pending:
+    """取出計數器的值並原子扣除（取出期間新增的點擊留待下次寫入）"""
+    keys = {COUNTER_KEY.format(date=day, code=code): (code, day) for code, day in dirty}
+    counts: Pending = {}
+    for key, value in click_cache.get_many(list(keys)).items():
+        if not value:
+            continue
+        remaining = click_cache.decr(key, value)
+        counts[keys[key]] = value
+        if remaining > 0:
+            _mark_dirty(*keys[key])
+    return counts
+
+
+def _restore_counts(counts: Pending):
+    for (code, day), value in counts.items():
+        if _incr(COUNTER_KEY.format(date=day, code=code), value) == value:
+            _mark_dirty(code, day)
+
+
+def _write_counts(counts: Pending) -> int:
+    link_ids = dict(
+        ShortLink.objects.filter(code__in={code for code, _ in counts}).values_list('code', 'id')
+    )
+    per_link = Counter()
+    per_day = Counter()
+    for (code, day), value in counts.items():
+        link_id = link_ids.get(code)
+        if link_id is None:
+            # 短網址已刪除
+            continue
+        per_link[link_id] += value
+        per_day[(link_id, date_type.fromisoformat(day))] += value
+    if not per_link:
+        return 0
+
+    now = timezone.now()
+    link_counts = list(per_link.items())
+    with transaction.atomic():
+        for start in range(0, len(link_counts), WRITE_BATCH_SIZE):
+            batch = link_counts[start:start + WRITE_BATCH_SIZE]
+            ShortLink.objects.filter(pk__in=[link_id for link_id, _ in batch]).update(
+                click_count=F('click_count') + Case(
+                    *[When(pk=link_id, then=Value(value)) for link_id, value in batch],
+                    default=Value(0),
+                    output_field=PositiveIntegerField(),
+                ),
+                # 寫入時間，與實際點擊時間的誤差在排程間隔內
+                last_clicked_at=now,
+            )
+
+        existing = {
+            (row.short_link_id, row.date): row
+            for row in ShortLinkDailyClicks.objects.filter(
+                short_link_id__in=list(per_link), date__in={day for _, day in per_day}
+            )
+        }
+        updated = []
+        created = []
+        for (link_id, day), value in per_day.items():
+            row = existing.get((link_id, day))
+            if row is None:
+                created.append(ShortLinkDailyClicks(short_link_id=link_id, date=day, clicks=value))
+            else:
+                row.clicks += value
+                updated.append(row)
+        ShortLinkDailyClicks.objects.bulk_update(updated, ['clicks'], batch_size=1000)
+        ShortLinkDailyClicks.objects.bulk_create(created, batch_size=1000)
+    return sum(per_link.values())
+
+
+def flush_click_counters(max_events=10000) -> Dict[str, int]:
+    """將快取中的點擊數批次寫入短網址與每日點擊表（由 Celery 排程定期執行）"""
+    if not click_cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        logger.info("點擊數寫入已由其他 worker 執行中")
+        return {'counters': 0, 'clicks': 0}
+
+    try:
+        dirty, next_cursor = _collect_dirty(max_events)
+        counts = _take_counts(dirty)
+        try:
+            clicks = _write_counts(counts)
+        except Exception:
+            _restore_counts(counts)
+            raise
+        click_cache.set(CURSOR_KEY, next_cursor, None)
+    finally:
+        click_cache.delete(FLUSH_LOCK_KEY)
+
+    totals = {'counters': len(counts), 'clicks': clicks}
+    if counts:
+        logger.info(f"短網址點擊數寫入完成 {totals}")
+    return totals
+
+
+# ===== 查詢 =====
+
+def get_open_stats(invitations) -> Dict[str, float]:
+    """邀請開啟統計：邀請數、已開啟數（點擊過短網址或已開始測驗）、開啟率與總點擊數"""
+    stats = invitations.order_by().aggregate(
+        total=Count('id', distinct=True),
+        opened=Count(
+            'id',
+            distinct=True,
+            filter=Q(short_links__click_count__gt=0) | Q(started_at__isnull=False)
+        ),
+        clicks=Sum('short_links__click_count'),
+    )
+    stats['clicks'] = stats['clicks'] or 0
+    stats['open_rate'] = round(stats['opened'] / stats['total'] * 100, 1) if stats['total'] else 0
+    return stats
@@ -0,0 +1,150 @@
+"""Per-user unread notification counters kept in the shared cache."""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import Notification, User
+from utils.tiered_cache import namespace
+
+logger = logging.getLogger(__name__)
+
+# 計數需所有 worker 一致，只使用 L2
+counter_cache = namespace('notifications', use_l1=False, versioned=False)
+UNREAD_KEY = 'unread:{user_id}'
+# 計數在快取中保留的秒數；過期後下次讀取時由資料庫重新計算
+COUNTER_TIMEOUT = getattr(settings, 'NOTIFICATION_COUNTER_TIMEOUT', 60 * 60 * 24)
+# 調整時計數不在快取中即遞增的版本；重新計算期間版本改變代表計算結果可能未含該次調整
+MISSED_KEY = 'unread_missed:{user_id}'
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def _count_unread(user_id) -> int:
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user) -> int:
+    """未讀通知數量：快取命中時不查詢資料庫"""
+    user_id = _user_id(user)
+    key = UNREAD_KEY.format(user_id=user_id)
+    count = counter_cache.get(key)
+    if count is None:
+        missed_key = MISSED_KEY.format(user_id=user_id)
+        missed = counter_cache.get(missed_key)
+        count = _count_unread(user_id)
+        # 以 add 寫入：並行的讀取已寫入時保留先寫入的值；
+        # 計數期間有調整因鍵不存在而略過時捨棄剛寫入的值，由下次讀取重新計算
+        if counter_cache.add(key, count, COUNTER_TIMEOUT) and counter_cache.get(missed_key) != missed:
+            counter_cache.delete(key)
+    return max(count, 0)
+
+
+def _apply_adjustment(user_id, delta):
+    key = UNREAD_KEY.format(user_id=user_id)
+    if counter_cache.incr(key, delta, COUNTER_TIMEOUT, create=False) is None:
+        # 先遞增版本再刪除：並行讀取在刪除前寫入的值由此刪除，刪除後才寫入者由讀取端比對版本捨棄
+        counter_cache.incr(MISSED_KEY.format(user_id=user_id), 1, COUNTER_TIMEOUT)
+        counter_cache.delete(key)
+
+
+def adjust_unread_count(user, delta):
+    """交易提交後原子增減未讀計數；快取中沒有計數時不建立，留待下次讀取重新計算"""
+    if not delta:
+        return
+    user_id = _user_id(user)
+    transaction.on_commit(lambda: _apply_adjustment(user_id, delta))
+
+
+def forget_unread_counts(user_ids: Iterable[int]):
+    """刪除計數，下次讀取時重新計算"""
+    counter_cache.delete_many([UNREAD_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def _unread_by_recipient(notifications) -> Dict[int, int]:
+    return dict(
+        notifications.filter(is_read=False)
+        .order_by()
+        .values('recipient_id')
+        .annotate(total=Count('id'))
+        .values_list('recipient_id', 'total')
+    )
+
+
+def mark_all_as_read(user) -> int:
+    """將用戶所有未讀通知標記為已讀，回傳更新筆數"""
+    with transaction.atomic():
+        updated = Notification.objects.filter(recipient=user, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
+        adjust_unread_count(user, -updated)
+    return updated
+
+
+def delete_notifications(notifications) -> int:
+    """刪除通知並扣除其中未讀的計數（queryset.delete 不觸發 signal，刪除維持單一查詢）"""
+    with transaction.atomic():
+        unread = _unread_by_recipient(notifications)
+        deleted, _ = notifications.delete()
+        for user_id, count in unread.items():
+            adjust_unread_count(user_id, -count)
+    return deleted
+
+
+def prune_expired_notifications(batch_size=1000) -> int:
+    """分批刪除已過期的通知並扣除未讀計數
+
+    未讀計數包含尚未刪除的過期通知，列表則將其過濾；排程每分鐘執行，兩者的差異不超過一分鐘。
+    """
+    now = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            Notification.objects.filter(expires_at__lte=now).order_by().values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        total += delete_notifications(Notification.objects.filter(id__in=ids))
+
+    logger.info(f"已刪除 {total} 則過期通知")
+    return total
+
+
+def reconcile_unread_counts(batch_size=1000) -> Dict[str, int]:
+    """比對快取中的未讀計數與資料庫，不一致時刪除計數（由下次讀取重新計算）
+
+    修正以 queryset.update、後台刪除或用戶連帶刪除等方式繞過計數維護造成的差異；
+    刪除而非覆寫，避免蓋掉比對期間的遞增。
+    """
+    totals = {'checked': 0, 'corrected': 0}
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_user_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            break
+        cached = counter_cache.get_many([UNREAD_KEY.format(user_id=user_id) for user_id in user_ids])
+        if cached:
+            actual = _unread_by_recipient(Notification.objects.filter(recipient_id__in=user_ids))
+            stale = [
+                user_id for user_id in user_ids
+                if UNREAD_KEY.format(user_id=user_id) in cached
+                and cached[UNREAD_KEY.format(user_id=user_id)] != actual.get(user_id, 0)
+            ]
+            if stale:
+                logger.warning(f"未讀通知計數不一致，已清除：users={stale}")
+                forget_unread_counts(stale)
+            totals['checked'] += len(cached)
+            totals['corrected'] += len(stale)
+        last_user_id = user_ids[-1]
+
+    logger.info(f"未讀通知計數對帳完成 checked={totals['checked']} corrected={totals['corrected']}")
+    return totals
@@ -0,0 +1,126 @@
+"""Point ledger reconciliation against incrementally maintained balance snapshots."""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db.models import BigIntegerField, F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import PointBalanceSnapshot, PointTransaction, UserPointBalance
+from utils.tiered_cache import namespace
+
+logger = logging.getLogger(__name__)
+
+ledger_cache = namespace('point_ledger', use_l1=False, versioned=False)
+RECONCILE_LOCK_KEY = 'reconcile_lock'
+RECONCILE_LOCK_TIMEOUT = 60 * 60
+
+# 快照只計入這段時間以前的交易：較新的交易可能尚未提交，ID 順序與提交順序不一定相同
+SNAPSHOT_LAG = timedelta(seconds=getattr(settings, 'POINT_SNAPSHOT_LAG_SECONDS', 600))
+
+
+def ledger_entries():
+    """計入餘額的帳本紀錄（排除無限制模式下帶有 virtual 標記的虛擬交易）"""
+    return PointTransaction.objects.filter(status='completed').exclude(metadata__has_key='virtual')
+
+
+def _balances_with_ledger(user_ids=None):
+    """餘額與帳本加總在同一個查詢中取得，兩者出自同一時間點"""
+    recent = (
+        ledger_entries()
+        .filter(user_id=OuterRef('user_id'), id__gt=OuterRef('snapshot_last_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    balances = UserPointBalance.objects.annotate(
+        snapshot_id=F('user__point_snapshot__id'),
+        snapshot_total=Coalesce(F('user__point_snapshot__ledger_total'), Value(0)),
+        snapshot_last_id=Coalesce(F('user__point_snapshot__last_transaction_id'), Value(0)),
+        recent_total=Coalesce(Subquery(recent, output_field=IntegerField()), Value(0)),
+    )
+    if user_ids is not None:
+        balances = balances.filter(user_id__in=user_ids)
+    return balances.order_by('user_id').values(
+        'user_id', 'balance', 'snapshot_id', 'snapshot_total', 'snapshot_last_id', 'recent_total'
+    )
+
+
+def _advance_snapshots(rows, differences: Dict[int, int], now):
+    """將快照推進到 SNAPSHOT_LAG 以前的最後一筆交易"""
+    cutoff = now - SNAPSHOT_LAG
+    user_ids = [row['user_id'] for row in rows]
+    snapshot_last_id = PointBalanceSnapshot.objects.filter(user_id=OuterRef('user_id')).values('last_transaction_id')
+    settled = {
+        entry['user_id']: entry
+        for entry in ledger_entries()
+        .filter(user_id__in=user_ids, created_at__lt=cutoff)
+        .filter(id__gt=Coalesce(Subquery(snapshot_last_id, output_field=BigIntegerField()), Value(0)))
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('amount'), last_id=Max('id'))
+    }
+
+    created: List[PointBalanceSnapshot] = []
+    updated: List[PointBalanceSnapshot] = []
+    for row in rows:
+        user_id = row['user_id']
+        entry = settled.get(user_id)
+        snapshot = PointBalanceSnapshot(
+            id=row['snapshot_id'],
+            user_id=user_id,
+            ledger_total=row['snapshot_total'] + (entry['total'] if entry else 0),
+            last_transaction_id=entry['last_id'] if entry else row['snapshot_last_id'],
+            difference=differences[user_id],
+            checked_at=now,
+        )
+        (updated if row['snapshot_id'] else created).append(snapshot)
+
+    PointBalanceSnapshot.objects.bulk_update(
+        updated, ['ledger_total', 'last_transaction_id', 'difference', 'checked_at'], batch_size=1000
+    )
+    PointBalanceSnapshot.objects.bulk_create(created, batch_size=1000)
+
+
+def reconcile_point_balances(user_ids=None, batch_size=1000) -> Dict[str, object]:
+    """比對每位用戶的餘額與帳本加總（快照加上之後的交易），並推進快照
+
+    只回報差異，不自動修正餘額；差額記錄在快照的 difference 欄位。
+    """
+    totals = {'checked': 0, 'mismatched': 0, 'mismatches': []}
+    # 兩個對帳同時推進快照會重複計入交易
+    if not ledger_cache.add(RECONCILE_LOCK_KEY, 1, RECONCILE_LOCK_TIMEOUT):
+        logger.info("點數對帳已由其他 worker 執行中")
+        return totals
+
+    now = timezone.now()
+    last_user_id = 0
+    try:
+        while True:
+            batch = list(_balances_with_ledger(user_ids).filter(user_id__gt=last_user_id)[:batch_size])
+            if not batch:
+                break
+            differences = {}
+            for row in batch:
+                ledger_total = row['snapshot_total'] + row['recent_total']
+                difference = row['balance'] - ledger_total
+                differences[row['user_id']] = difference
+                if difference:
+                    totals['mismatched'] += 1
+                    totals['mismatches'].append({'user_id': row['user_id'], 'difference': difference})
+                    logger.error(
+                        f"點數餘額與帳本不符：user={row['user_id']} balance={row['balance']} ledger={ledger_total}"
+                    )
+            _advance_snapshots(batch, differences, now)
+            totals['checked'] += len(batch)
+            last_user_id = batch[-1]['user_id']
+    finally:
+        ledger_cache.delete(RECONCILE_LOCK_KEY)
+
+    logger.info(f"點數對帳完成 checked={totals['checked']} mismatched={totals['mismatched']}")
+    return totals
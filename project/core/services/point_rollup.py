@@ -0,0 +1,217 @@
+"""Daily point transaction rollups backing the consumption statistics."""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import PointDailyStats, PointTransaction
+from core.services.counter_rows import increment_or_create
+
+logger = logging.getLogger(__name__)
+
+# 統計頁面提供的查詢區間（天）
+CONSUMPTION_WINDOWS = (7, 30, 90)
+
+# (user_id, 日期, 交易類型, 消費動作, 是否虛擬)
+RollupKey = Tuple[int, object, str, str, bool]
+
+
+def _rollup_key(item) -> Optional[RollupKey]:
+    if item.status != 'completed' or not item.created_at:
+        return None
+    metadata = item.metadata or {}
+    return (
+        item.user_id,
+        timezone.localdate(item.created_at),
+        item.transaction_type,
+        metadata.get('action_type') or '',
+        bool(metadata.get('virtual')),
+    )
+
+
+def record_point_transactions(transactions: Iterable[PointTransaction]):
+    """將交易依彙總鍵合併後計入每日彙總，每個彙總列只寫入一次（PointService 以 bulk_create 寫入交易後呼叫）"""
+    deltas: Dict[RollupKey, List[int]] = defaultdict(lambda: [0, 0])
+    for item in transactions:
+        key = _rollup_key(item)
+        if key is not None:
+            deltas[key][0] += item.amount
+            deltas[key][1] += 1
+
+    for (user_id, day, transaction_type, action_type, is_virtual), (amount, count) in deltas.items():
+        increment_or_create(
+            PointDailyStats,
+            {'user_id': user_id, 'date': day, 'transaction_type': transaction_type,
+             'action_type': action_type, 'is_virtual': is_virtual},
+            {'amount': amount, 'transaction_count': count},
+        )
+
+
+def aggregate_point_rollups(entries) -> Dict[RollupKey, List[int]]:
+    """已完成交易的每日彙總：彙總鍵 -> [點數合計, 筆數]"""
+    # metadata 的 action_type 與 virtual 在 Python 中取出，不依賴資料庫的 JSON 函式
+    rows: Dict[RollupKey, List[int]] = defaultdict(lambda: [0, 0])
+    for item in (
+        entries.filter(status='completed').order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day', 'transaction_type', 'metadata')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    ):
+        metadata = item['metadata'] or {}
+        key = (
+            item['user_id'], item['day'], item['transaction_type'],
+            metadata.get('action_type') or '', bool(metadata.get('virtual')),
+        )
+        rows[key][0] += item['total']
+        rows[key][1] += item['count']
+    return rows
+
+
+def rebuild_point_rollups(user_id=None, since=None) -> int:
+    """由交易帳本重建每日彙總列（rebuild_point_rollups 指令於交易以批次 SQL 修改後使用）
+
+    since 為日期時只重建該日（含）之後的彙總列。
+    """
+    entries = PointTransaction.objects.all()
+    if user_id:
+        entries = entries.filter(user_id=user_id)
+    if since:
+        entries = entries.filter(created_at__date__gte=since)
+    rows = aggregate_point_rollups(entries)
+
+    with transaction.atomic():
+        existing = PointDailyStats.objects.all()
+        if user_id:
+            existing = existing.filter(user_id=user_id)
+        if since:
+            existing = existing.filter(date__gte=since)
+        existing.delete()
+
+        PointDailyStats.objects.bulk_create(
+            [
+                PointDailyStats(
+                    user_id=user_id_, date=day, transaction_type=transaction_type, action_type=action_type,
+                    is_virtual=is_virtual, amount=amount, transaction_count=count,
+                )
+                for (user_id_, day, transaction_type, action_type, is_virtual), (amount, count) in rows.items()
+            ],
+            batch_size=1000,
+        )
+
+    logger.info(f"點數交易每日彙總重建完成 user={user_id} since={since} rows={len(rows)}")
+    return len(rows)
+
+
+# ===== 查詢 =====
+
+def rollup_queryset(user=None, start_date=None, end_date=None, transaction_type=None, action_type=None):
+    """彙總列（user 為 None 時為全站；start_date/end_date 為日期，含端點）"""
+    rollups = PointDailyStats.objects.order_by()
+    if user is not None:
+        rollups = rollups.filter(user=user)
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+    if transaction_type:
+        rollups = rollups.filter(transaction_type=transaction_type)
+    if action_type:
+        rollups = rollups.filter(action_type=action_type)
+    return rollups
+
+
+def window_start(days, today=None):
+    """最近 days 天（含今天）的起始日期"""
+    return (today or timezone.localdate()) - timedelta(days=days - 1)
+
+
+def get_consumption_stats(user=None, days=30, action_type=None) -> Dict[str, object]:
+    """最近 days 天的消費點數、筆數與各消費動作的統計（單一查詢）"""
+    end_date = timezone.localdate()
+    start_date = window_start(days, end_date)
+
+    action_stats = {}
+    for item in (
+        rollup_queryset(user, start_date, end_date, 'consumption', action_type)
+        .values('action_type')
+        .annotate(total=Sum('amount'), count=Sum('transaction_count'))
+        .order_by('action_type')
+    ):
+        action_stats[item['action_type'] or 'unknown'] = {'count': item['count'], 'total': -item['total']}
+
+    return {
+        'total_consumed': sum(stats['total'] for stats in action_stats.values()),
+        'transaction_count': sum(stats['count'] for stats in action_stats.values()),
+        'period_days': days,
+        'action_stats': action_stats,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+
+
+def get_consumption_windows(user=None, windows=CONSUMPTION_WINDOWS, action_type=None) -> Dict[int, Dict[str, object]]:
+    """多個區間的消費統計，以條件加總在單一查詢中取得
+
+    回傳 {天數: {'total_consumed', 'transaction_count', 'virtual_consumed', 'action_stats'}}，
+    virtual_consumed 為其中無限制模式下的虛擬消費。
+    """
+    today = timezone.localdate()
+    starts = {days: window_start(days, today) for days in windows}
+    aggregates = {}
+    for days, start in starts.items():
+        in_window = Q(date__gte=start)
+        aggregates[f'total_{days}'] = Sum('amount', filter=in_window)
+        aggregates[f'count_{days}'] = Sum('transaction_count', filter=in_window)
+        aggregates[f'virtual_{days}'] = Sum('amount', filter=in_window & Q(is_virtual=True))
+
+    result = {
+        days: {'total_consumed': 0, 'transaction_count': 0, 'virtual_consumed': 0, 'action_stats': {}}
+        for days in windows
+    }
+    for item in (
+        rollup_queryset(user, min(starts.values()), today, 'consumption', action_type)
+        .values('action_type')
+        .annotate(**aggregates)
+        .order_by('action_type')
+    ):
+        for days in windows:
+            count = item[f'count_{days}'] or 0
+            if not count:
+                continue
+            total = -(item[f'total_{days}'] or 0)
+            window = result[days]
+            window['total_consumed'] += total
+            window['transaction_count'] += count
+            window['virtual_consumed'] -= item[f'virtual_{days}'] or 0
+            window['action_stats'][item['action_type'] or 'unknown'] = {'count': count, 'total': total}
+    return result
+
+
+def get_daily_series(user=None, days=30, action_type=None) -> List[Dict[str, object]]:
+    """最近 days 天每日的消費點數與筆數（缺少的日期補 0）"""
+    end_date = timezone.localdate()
+    start_date = window_start(days, end_date)
+    by_date = {
+        item['date']: item
+        for item in rollup_queryset(user, start_date, end_date, 'consumption', action_type)
+        .values('date')
+        .annotate(total=Sum('amount'), count=Sum('transaction_count'))
+    }
+
+    series = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        item = by_date.get(day, {})
+        series.append({
+            'date': day,
+            'total_consumed': -(item.get('total') or 0),
+            'transaction_count': item.get('count') or 0,
+        })
+    return series
@@ -0,0 +1,287 @@
+"""Per-project scoring graph shared by report and detail rendering."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import ProjectRoleIndexStats, TestProjectCategory, TestProjectCategoryTrait, TestProjectResult
+
+GRAPH_CACHE_KEY = 'project_scoring_graph:{project_id}'
+GRAPH_CACHE_TIMEOUT = 60 * 60 * 6
+
+# 爬蟲回傳的特質名稱與系統設定不一致時使用的別名
+TRAIT_NAME_ALIASES = {
+    '準確嚴謹度': ['注重細節', 'Attention to Detail'],
+    '認知彈性': ['認知靈活性', 'Cognitive Flexibility'],
+    '適應敏捷力': ['變化敏捷性', 'Change Agility'],
+    '卓越驅動力': ['成就動機', 'Achievement Motivation'],
+    '自主領導力': ['自我領導力', 'Self-Leadership'],
+    '創造性思考': ['創意思考', 'Creative Thinking'],
+    '分析性思考': ['分析思考能力', 'Analytical Thinking'],
+    '系統性思考': ['系統性思維', 'Systems Thinking'],
+    '高效決策力': ['決策能力', 'Decision-Making'],
+    '溝通協調力': ['人際溝通', 'Interpersonal Communication'],
+    '協商談判力': ['談判技巧', 'Negotiation Skills'],
+    '社交智商': ['社會智能', 'Social Intelligence'],
+    'AI素養': ['AI Literacy'],
+    '自我意識': ['Self-Awareness'],
+    '自我批評': ['Self-Criticism'],
+    '自我反思': ['Self-Reflection'],
+    '社會期望反應': ['Social Desirability'],
+    '反饋尋求': ['Feedback Seeking'],
+    '洞察力': ['Insight'],
+    '差異察覺': ['Difference Awareness'],
+    '好奇心': ['Curiosity'],
+    '終身學習': ['Lifelong Learning'],
+    '批判性思考': ['Critical Thinking'],
+    '同理心': ['Empathy'],
+    '社會影響力': ['Social Influence'],
+    '韌性': ['Resilience'],
+    '積極傾聽': ['Active Listening'],
+    '可靠性': ['Dependability'],
+}
+
+# 任一名稱 -> 同義名稱群組（中文名稱、其他翻譯與英文系統名稱）
+TRAIT_NAME_GROUPS: Dict[str, List[str]] = {}
+for _chinese_name, _aliases in TRAIT_NAME_ALIASES.items():
+    _group = [_chinese_name, *_aliases]
+    for _name in _group:
+        TRAIT_NAME_GROUPS.setdefault(_name, _group)
+
+
+def normalize_trait_key(key) -> str:
+    """特質名稱正規化（小寫、空白轉底線），作為比對索引的鍵"""
+    return str(key).strip().lower().replace(' ', '_')
+
+
+@dataclass
+class ProjectScoringGraph:
+    """測驗項目的分類、特質與權重關係（建立一次，供報告與詳情頁共用）"""
+    project_id: int
+    categories: List[TestProjectCategory] = field(default_factory=list)
+    traits: Dict[int, object] = field(default_factory=dict)
+    # category_id -> [(trait_id, weight)]，依 sort_order 排序
+    category_relations: Dict[int, List[Tuple[int, Decimal]]] = field(default_factory=dict)
+    # category_id -> [trait_id]，依特質 system_name 排序（等同 category.traits.all()）
+    category_trait_ids: Dict[int, List[int]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._category_by_name = {}
+        for category in self.categories:
+            self._category_by_name.setdefault(category.name, category)
+
+        # 正規化名稱 -> 特質ID；系統名稱與中文名稱優先於別名
+        self._trait_index: Dict[str, int] = {}
+        ordered_traits = sorted(self.traits.values(), key=lambda trait: trait.id)
+        for trait in ordered_traits:
+            for key in (trait.system_name, trait.chinese_name):
+                if key:
+                    self._trait_index.setdefault(normalize_trait_key(key), trait.id)
+        for trait in ordered_traits:
+            for alias in self.aliases_for(trait):
+                self._trait_index.setdefault(normalize_trait_key(alias), trait.id)
+
+    def category(self, name) -> Optional[TestProjectCategory]:
+        return self._category_by_name.get(name)
+
+    def category_map(self) -> Dict[str, TestProjectCategory]:
+        return dict(self._category_by_name)
+
+    def traits_for(self, category) -> list:
+        return [self.traits[trait_id] for trait_id in self.category_trait_ids.get(category.id, [])]
+
+    def relations_for(self, category) -> List[Tuple[object, Decimal]]:
+        return [
+            (self.traits[trait_id], weight)
+            for trait_id, weight in self.category_relations.get(category.id, [])
+        ]
+
+    @staticmethod
+    def aliases_for(trait) -> List[str]:
+        chinese_name = getattr(trait, 'chinese_name', '') or ''
+        aliases = []
+        for name in (chinese_name, getattr(trait, 'system_name', '') or ''):
+            for alias in TRAIT_NAME_GROUPS.get(name, []):
+                if alias != chinese_name and alias not in aliases:
+                    aliases.append(alias)
+        return aliases
+
+    def match_trait(self, key, chinese_name=None) -> Optional[int]:
+        """以爬蟲資料的鍵（或其中文名稱）查詢對應的特質ID"""
+        for candidate in (key, chinese_name):
+            if candidate:
+                trait_id = self._trait_index.get(normalize_trait_key(candidate))
+                if trait_id is not None:
+                    return trait_id
+        return None
+
+    def canonical_trait_scores(self, raw_data) -> Dict[str, Dict[str, float]]:
+        """將爬蟲原始資料轉為 特質ID -> {score, headsupflag}（JSON 儲存格式，鍵為字串）"""
+        scores: Dict[str, Dict[str, float]] = {}
+        if not isinstance(raw_data, dict):
+            return scores
+
+        trait_scores_data = raw_data.get('trait_scores')
+        if isinstance(trait_scores_data, dict):
+            for key, value in trait_scores_data.items():
+                value_dict = value if isinstance(value, dict) else None
+                score = value_dict.get('score') if value_dict else value
+                if not isinstance(score, (int, float)):
+                    continue
+                trait_id = self.match_trait(key, value_dict.get('chinese_name') if value_dict else None)
+                if trait_id is None or str(trait_id) in scores:
+                    continue
+                scores[str(trait_id)] = {
+                    'score': float(score),
+                    'headsupflag': (value_dict.get('headsupflag') or 0) if value_dict else 0,
+                }
+
+        # 舊格式：分數直接存放在原始資料根目錄
+        for trait_id, trait in self.traits.items():
+            if str(trait_id) in scores:
+                continue
+            system_key = (trait.system_name or '').lower().replace(' ', '_')
+            for key in (trait.system_name, trait.chinese_name, system_key, *self.aliases_for(trait)):
+                if not key:
+                    continue
+                value = raw_data.get(key)
+                if isinstance(value, dict):
+                    value = value.get('score')
+                if isinstance(value, (int, float)):
+                    scores[str(trait_id)] = {'score': float(value), 'headsupflag': 0}
+                    break
+        return scores
+
+    def role_inputs(self, score_for: Callable[[object], Optional[float]]) -> Dict[str, Dict[str, float]]:
+        """依特質分數計算各分類的加權原始分數與角色指數（compute_role_based_scores 的輸入）"""
+        role_inputs: Dict[str, Dict[str, float]] = {}
+        for category in self.categories:
+            trait_score_map: Dict[int, float] = {}
+            for trait in self.traits_for(category):
+                score = score_for(trait)
+                if score is not None:
+                    trait_score_map[trait.id] = score
+
+            if not trait_score_map:
+                continue
+
+            raw_score = Decimal('0')
+            weight_sum = Decimal('0')
+            for trait, relation_weight in self.relations_for(category):
+                if not trait or trait.id not in trait_score_map:
+                    continue
+                try:
+                    weight = Decimal(str(relation_weight))
+                except (InvalidOperation, TypeError, ValueError):
+                    continue
+                raw_score += Decimal(str(trait_score_map[trait.id])) * weight
+                weight_sum += weight
+
+            max_score = weight_sum * Decimal('100')
+            role_index = Decimal('0')
+            if max_score != 0:
+                role_index = (raw_score / max_score) * Decimal('100')
+
+            role_inputs[category.name] = {
+                'raw_score': float(raw_score),
+                'max_score': float(max_score),
+                'role_index': float(role_index),
+                'weight_sum': float(weight_sum),
+            }
+        return role_inputs
+
+
+def build_project_scoring_graph(project_id) -> ProjectScoringGraph:
+    """以兩次查詢建立分類與特質關係"""
+    categories = list(TestProjectCategory.objects.filter(test_project_id=project_id))
+    relations = (
+        TestProjectCategoryTrait.objects
+        .filter(category__test_project_id=project_id)
+        .select_related('trait')
+        .order_by('category_id', 'sort_order', 'id')
+    )
+
+    traits = {}
+    category_relations: Dict[int, List[Tuple[int, Decimal]]] = {}
+    for relation in relations:
+        trait = relation.trait
+        if trait is None:
+            continue
+        traits[trait.id] = trait
+        category_relations.setdefault(relation.category_id, []).append((trait.id, relation.weight))
+
+    category_trait_ids = {
+        category_id: sorted(
+            {trait_id for trait_id, _ in entries},
+            key=lambda trait_id: (traits[trait_id].system_name, trait_id),
+        )
+        for category_id, entries in category_relations.items()
+    }
+
+    return ProjectScoringGraph(
+        project_id=project_id,
+        categories=categories,
+        traits=traits,
+        category_relations=category_relations,
+        category_trait_ids=category_trait_ids,
+    )
+
+
+def get_project_scoring_graph(project) -> ProjectScoringGraph:
+    """取得測驗項目的計分關係（優先使用快取）"""
+    project_id = getattr(project, 'pk', project)
+    cache_key = GRAPH_CACHE_KEY.format(project_id=project_id)
+    graph = cache.get(cache_key)
+    if graph is None:
+        graph = build_project_scoring_graph(project_id)
+        cache.set(cache_key, graph, GRAPH_CACHE_TIMEOUT)
+    return graph
+
+
+def get_result_trait_scores(result, graph=None) -> Dict[int, Dict[str, float]]:
+    """取得測驗結果的 特質ID -> {score, headsupflag}（優先使用儲存於結果的對照表）"""
+    # 個人測驗結果（IndividualTestResult 適配器）沒有儲存對照表，每次即時比對
+    stored = getattr(result, 'trait_score_map', None)
+    if not stored and result.raw_data and result.test_project_id:
+        graph = graph or get_project_scoring_graph(result.test_project_id)
+        stored = graph.canonical_trait_scores(result.raw_data)
+        if isinstance(result, TestProjectResult):
+            if stored and result.pk:
+                # 設定變更後對照表會被清空，於此補回，避免每次重新比對
+                TestProjectResult.objects.filter(pk=result.pk).update(trait_score_map=stored)
+            result.trait_score_map = stored
+    return {int(trait_id): entry for trait_id, entry in (stored or {}).items()}
+
+
+def invalidate_project_scoring_graph(project_id):
+    """測驗項目設定變更後清除快取（交易提交後才執行）"""
+    cache_key = GRAPH_CACHE_KEY.format(project_id=project_id)
+    transaction.on_commit(lambda: cache.delete(cache_key))
+    # 分類與權重變更後，既有的特質分數對照表與角色指數統計需重新計算
+    # （同一次編輯會逐筆觸發 signal，已清除的列不再重複寫入）
+    TestProjectResult.objects.filter(test_project_id=project_id).exclude(trait_score_map={}).update(trait_score_map={})
+    ProjectRoleIndexStats.objects.filter(test_project_id=project_id, needs_rebuild=False).update(needs_rebuild=True)
+
+
+def invalidate_category_scoring_graph(category_id):
+    """分類的特質對應變更時，清除所屬測驗項目的快取（分類已連帶刪除時由分類的 signal 處理）"""
+    project_id = (
+        TestProjectCategory.objects.filter(pk=category_id).values_list('test_project_id', flat=True).first()
+    )
+    if project_id is not None:
+        invalidate_project_scoring_graph(project_id)
+
+
+def invalidate_trait_scoring_graphs(trait_id):
+    """特質資料變更時，清除所有使用該特質的測驗項目快取"""
+    project_ids = set(
+        TestProjectCategoryTrait.objects
+        .filter(trait_id=trait_id)
+        .values_list('category__test_project_id', flat=True)
+    )
+    for project_id in project_ids:
+        invalidate_project_scoring_graph(project_id)
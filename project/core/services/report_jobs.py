@@ -0,0 +1,183 @@
+"""Background PDF report jobs shared by enterprise and individual result pages."""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import IndividualTestResult, ReportJob, TestProjectResult
+
+logger = logging.getLogger(__name__)
+
+# 進行中的任務超過此時間仍未完成，視為 worker 中斷，允許重新排入
+STALE_AFTER = timedelta(seconds=getattr(settings, 'REPORT_JOB_STALE_SECONDS', 15 * 60))
+# 已完成的報告在此時間內且結果未變動時直接沿用
+REUSE_WITHIN = timedelta(seconds=getattr(settings, 'REPORT_JOB_REUSE_SECONDS', 60 * 60))
+
+
+def get_job_result(result_type, result_id):
+    """載入任務對應的測驗結果"""
+    if result_type == 'individual':
+        return IndividualTestResult.objects.select_related(
+            'test_project', 'user', 'individual_test_record'
+        ).get(pk=result_id)
+    return TestProjectResult.objects.select_related(
+        'test_project', 'test_invitation__invitee'
+    ).get(pk=result_id)
+
+
+def user_can_access_job(user, job) -> bool:
+    """權限規則與同步下載相同：管理員、邀請所屬企業或個人結果本人"""
+    if not user.is_authenticated:
+        return False
+    if job.result_type == 'individual':
+        return IndividualTestResult.objects.filter(pk=job.result_id, user=user).exists()
+    if user.user_type == 'admin':
+        return True
+    return TestProjectResult.objects.filter(
+        pk=job.result_id, test_invitation__enterprise=user
+    ).exists()
+
+
+def _find_reusable_job(result_type, result):
+    jobs = ReportJob.objects.filter(result_type=result_type, result_id=result.pk)
+
+    active = jobs.filter(status__in=ReportJob.ACTIVE_STATUSES).first()
+    if active:
+        if active.created_at >= timezone.now() - STALE_AFTER:
+            return active
+        logger.warning(f"報告任務逾時，改為重新排入 job={active.pk}")
+        ReportJob.objects.filter(pk=active.pk, status__in=ReportJob.ACTIVE_STATUSES).update(
+            status='failed', error_message='任務逾時', finished_at=timezone.now()
+        )
+
+    completed = (
+        jobs.filter(
+            status='completed',
+            source_updated_at=getattr(result, 'updated_at', None),
+            finished_at__gte=timezone.now() - REUSE_WITHIN,
+        )
+        .exclude(file='')
+        .first()
+    )
+    if completed and completed.file.storage.exists(completed.file.name):
+        return completed
+    return None
+
+
+def _dispatch(job_id):
+    from core.tasks import generate_report_pdf
+
+    try:
+        generate_report_pdf.delay(str(job_id))
+    except Exception as e:
+        logger.error(f"報告任務排入佇列失敗 job={job_id}：{str(e)}")
+        ReportJob.objects.filter(pk=job_id).update(
+            status='failed', error_message=f'無法排入背景佇列：{str(e)}', finished_at=timezone.now()
+        )
+
+
+def enqueue_report_job(result_type, result, user=None) -> ReportJob:
+    """建立報告生成任務；同一結果已有進行中或可沿用的任務時直接回傳該任務"""
+    while True:
+        job = _find_reusable_job(result_type, result)
+        if job:
+            return job
+
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    result_type=result_type,
+                    result_id=result.pk,
+                    source_updated_at=getattr(result, 'updated_at', None),
+                    requested_by=user,
+                )
+        except IntegrityError:
+            # 並行請求已建立進行中的任務（report_job_single_active），改為共用；
+            # 該任務在讀取前已結束時重新查找可沿用的任務或再建立
+            job = ReportJob.objects.filter(
+                result_type=result_type, result_id=result.pk, status__in=ReportJob.ACTIVE_STATUSES
+            ).first()
+            if job:
+                return job
+            continue
+
+        job_id = job.pk
+        transaction.on_commit(lambda: _dispatch(job_id))
+        return job
+
+
+def run_report_job(job_id) -> ReportJob:
+    """執行報告生成（由 Celery 任務呼叫）"""
+    from core.individual_test_views import IndividualTestResultAdapter
+    from utils.pdf_report_generator import PDFReportGenerator, generate_test_result_pdf
+
+    # 以條件更新取得執行權，避免重複投遞時生成兩次
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), progress=5
+    )
+    job = ReportJob.objects.get(pk=job_id)
+    if not claimed:
+        logger.info(f"報告任務已由其他 worker 處理 job={job_id} status={job.status}")
+        return job
+
+    def update_progress(percent):
+        ReportJob.objects.filter(pk=job_id).update(progress=percent)
+
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        result = get_job_result(job.result_type, job.result_id)
+        report_result = IndividualTestResultAdapter(result) if job.result_type == 'individual' else result
+
+        generate_test_result_pdf(report_result, output_path=temp_path, progress_callback=update_progress)
+        safe_filename, display_filename = PDFReportGenerator.build_report_filenames(report_result)
+
+        with open(temp_path, 'rb') as fh:
+            job.file.save(safe_filename, File(fh), save=False)
+        job.download_filename = safe_filename
+        job.display_filename = display_filename
+        job.status = 'completed'
+        job.progress = 100
+        job.finished_at = timezone.now()
+        job.save()
+
+        if job.result_type == 'individual':
+            # 使用 update 避免異動 updated_at，否則之後的請求無法沿用此報告
+            IndividualTestResult.objects.filter(pk=job.result_id).update(
+                report_generated=True, report_generated_at=job.finished_at
+            )
+        logger.info(f"報告任務完成 job={job_id}")
+
+    except Exception as e:
+        logger.error(f"報告任務失敗 job={job_id}：{str(e)}", exc_info=True)
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return job
+
+
+def cleanup_report_jobs(days=7) -> int:
+    """刪除舊的報告任務與檔案"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    for job in ReportJob.objects.filter(created_at__lt=cutoff).exclude(
+        status__in=ReportJob.ACTIVE_STATUSES
+    ).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
@@ -0,0 +1,134 @@
+"""Per-project role index distribution used to calibrate radar z-scores."""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ProjectRoleIndexStats, ResultRoleIndexContribution, TestProjectResult
+from core.services.project_scoring_graph import build_project_scoring_graph, get_result_trait_scores
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = 'role_index_stats:{project_id}'
+STATS_CACHE_TIMEOUT = 60 * 60 * 6
+# 樣本數不足時不做母體校正，沿用 RADAR_ROLE_INDEX_MEAN/STD 或個人內部分佈
+MIN_CALIBRATION_SAMPLES = getattr(settings, 'RADAR_STATS_MIN_SAMPLES', 30)
+# updated_at 為儲存時間而非提交時間：同步點只推進到這段時間以前，較晚提交的結果下次仍會被處理
+SYNC_LAG = timedelta(seconds=getattr(settings, 'ROLE_INDEX_SYNC_LAG_SECONDS', 600))
+
+
+def compute_result_role_indexes(result, graph) -> Dict[str, float]:
+    """計算單筆測驗結果各分類的角色指數（限制於 0-100，與雷達圖計算一致）"""
+    if result.crawl_status != 'completed' or not result.raw_data:
+        return {}
+    trait_scores = get_result_trait_scores(result, graph)
+    role_inputs = graph.role_inputs(lambda trait: trait_scores.get(trait.id, {}).get('score'))
+    return {
+        name: max(0.0, min(100.0, payload['role_index']))
+        for name, payload in role_inputs.items()
+    }
+
+
+def update_project_role_index_stats(project_id, full=False) -> ProjectRoleIndexStats:
+    """以 Welford 增量更新測驗項目的角色指數統計
+
+    只處理上次同步後有異動的結果：先扣除該結果先前計入的數值，再加入新值。
+    full=True（或分類設定變更後）則歸零並重新累計所有結果。
+    """
+    graph = build_project_scoring_graph(project_id)
+    sync_point = timezone.now() - SYNC_LAG
+
+    with transaction.atomic():
+        stats, _ = ProjectRoleIndexStats.objects.select_for_update().get_or_create(
+            test_project_id=project_id
+        )
+        full = full or stats.needs_rebuild
+
+        results = TestProjectResult.objects.filter(test_project_id=project_id)
+        if full:
+            stats.reset()
+        elif stats.synced_through:
+            # 使用 >= 避免漏掉同一時間戳記的結果；重複處理時新舊明細相同不會影響統計
+            results = results.filter(updated_at__gte=stats.synced_through)
+
+        processed = 0
+        results = results.select_related('role_index_contribution').only(
+            'id', 'test_project_id', 'raw_data', 'trait_score_map', 'crawl_status', 'updated_at',
+            'role_index_contribution__id', 'role_index_contribution__values',
+        ).order_by('updated_at', 'id')
+
+        for result in results.iterator(chunk_size=500):
+            contribution = getattr(result, 'role_index_contribution', None)
+            stored = contribution.values if contribution else {}
+            previous = {} if full else stored
+            current = compute_result_role_indexes(result, graph)
+
+            if current != previous:
+                for value in previous.values():
+                    stats.remove_sample(float(value))
+                for value in current.values():
+                    stats.add_sample(value)
+                processed += 1
+
+            if contribution is None:
+                if current:
+                    ResultRoleIndexContribution.objects.create(
+                        test_result_id=result.pk, test_project_id=project_id, values=current
+                    )
+            elif current != stored:
+                # 不刪除明細列，避免觸發 post_delete 重複扣除
+                ResultRoleIndexContribution.objects.filter(pk=contribution.pk).update(values=current)
+
+        # 重複處理落在延遲區間內的結果時新舊明細相同，不影響統計
+        if stats.synced_through is None or sync_point > stats.synced_through:
+            stats.synced_through = sync_point
+        stats.needs_rebuild = False
+        stats.save()
+
+        cache_key = STATS_CACHE_KEY.format(project_id=project_id)
+        transaction.on_commit(lambda: cache.delete(cache_key))
+
+    logger.info(
+        f"角色指數統計更新完成 project={project_id} full={full} "
+        f"processed={processed} samples={stats.sample_count}"
+    )
+    return stats
+
+
+def forget_role_index_contribution(contribution):
+    """測驗結果刪除時扣除其先前計入的角色指數"""
+    if not contribution.values:
+        return
+    with transaction.atomic():
+        stats = (
+            ProjectRoleIndexStats.objects.select_for_update()
+            .filter(test_project_id=contribution.test_project_id)
+            .first()
+        )
+        if stats is None:
+            return
+        for value in contribution.values.values():
+            stats.remove_sample(float(value))
+        stats.save(update_fields=['sample_count', 'mean', 'm2', 'updated_at'])
+        cache_key = STATS_CACHE_KEY.format(project_id=contribution.test_project_id)
+        transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+def get_role_index_calibration(project) -> Dict[str, Optional[float]]:
+    """取得 compute_role_based_scores 的 role_index_mean/std 參數（樣本不足時回傳空 dict）"""
+    project_id = getattr(project, 'pk', project)
+    cache_key = STATS_CACHE_KEY.format(project_id=project_id)
+    calibration = cache.get(cache_key)
+    if calibration is None:
+        stats = ProjectRoleIndexStats.objects.filter(test_project_id=project_id).first()
+        calibration = {}
+        if stats and stats.sample_count >= MIN_CALIBRATION_SAMPLES and stats.std:
+            calibration = {'role_index_mean': stats.mean, 'role_index_std': stats.std}
+        cache.set(cache_key, calibration, STATS_CACHE_TIMEOUT)
+    return calibration
@@ -0,0 +1,243 @@
+"""Per-project score histograms answering percentile queries."""
+from __future__ import annotations
+
+import logging
+import math
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import ResultScoreContribution, ScoreHistogramBin, TestProjectResult
+from core.services.counter_rows import increment_or_create
+
+logger = logging.getLogger(__name__)
+
+# 區間寬度：0-100 分的指標約 200 個區間，百分位誤差在半個區間以內
+BIN_WIDTH = getattr(settings, 'SCORE_HISTOGRAM_BIN_WIDTH', 0.5)
+# 樣本數不足時不提供百分位
+MIN_SAMPLES = getattr(settings, 'SCORE_PERCENTILE_MIN_SAMPLES', 10)
+HISTOGRAM_CACHE_KEY = 'score_histogram:{project_id}:{metric}'
+HISTOGRAM_CACHE_TIMEOUT = 60 * 10
+
+CI_METRIC = 'ci'
+PREDICTION_METRIC = 'prediction'
+
+# 這些欄位變更時才需要重新計算分數分佈
+SOURCE_FIELDS = {'raw_data', 'crawl_status', 'trait_score_map', 'ci_score', 'prediction_score'}
+
+Histogram = List[Tuple[int, int]]
+
+
+def trait_metric(trait_id) -> str:
+    return f'trait:{trait_id}'
+
+
+def _bin(value: float) -> int:
+    return int(math.floor(value / BIN_WIDTH))
+
+
+def result_metric_values(result) -> Dict[str, float]:
+    """單筆測驗結果計入分佈的數值（僅限已完成的結果）"""
+    if result.crawl_status != 'completed':
+        return {}
+    values = {}
+    if result.ci_score is not None:
+        values[CI_METRIC] = float(result.ci_score)
+    if result.prediction_score is not None:
+        values[PREDICTION_METRIC] = float(result.prediction_score)
+    for trait_id, entry in (result.trait_score_map or {}).items():
+        score = entry.get('score') if isinstance(entry, dict) else None
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            values[trait_metric(trait_id)] = float(score)
+    return values
+
+
+def _bin_counts(values: Dict[str, float]) -> Counter:
+    return Counter((metric, _bin(value)) for metric, value in values.items())
+
+
+def _apply_changes(project_id, previous, current, create=True):
+    deltas = _bin_counts(current)
+    deltas.subtract(_bin_counts(previous))
+    for (metric, bin_index), delta in deltas.items():
+        if delta:
+            # 扣除時不建立區間（筆數不可為負）
+            increment_or_create(
+                ScoreHistogramBin,
+                {'test_project_id': project_id, 'metric': metric, 'bin': bin_index},
+                {'count': delta},
+                create=create and delta > 0,
+            )
+    _invalidate(project_id, {metric for metric, _ in deltas})
+
+
+def _invalidate(project_id, metrics):
+    keys = [HISTOGRAM_CACHE_KEY.format(project_id=project_id, metric=metric) for metric in metrics]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def record_result_scores(result) -> bool:
+    """測驗結果儲存後增量更新分數分佈：扣除先前計入的數值、加入新值（有異動時回傳 True）"""
+    current = result_metric_values(result)
+    with transaction.atomic():
+        contribution = (
+            ResultScoreContribution.objects.select_for_update()
+            .filter(test_result_id=result.pk)
+            .first()
+        )
+        if contribution is None:
+            if not current:
+                return False
+            ResultScoreContribution.objects.create(
+                test_result_id=result.pk, test_project_id=result.test_project_id, values=current
+            )
+            _apply_changes(result.test_project_id, {}, current)
+            return True
+
+        if contribution.values == current and contribution.test_project_id == result.test_project_id:
+            return False
+        if contribution.test_project_id != result.test_project_id:
+            _apply_changes(contribution.test_project_id, contribution.values, {}, create=False)
+            _apply_changes(result.test_project_id, {}, current)
+        else:
+            _apply_changes(result.test_project_id, contribution.values, current)
+        # 不刪除明細列，避免觸發 post_delete 重複扣除
+        ResultScoreContribution.objects.filter(pk=contribution.pk).update(
+            test_project_id=result.test_project_id, values=current
+        )
+    return True
+
+
+def forget_score_contribution(contribution):
+    """測驗結果刪除時扣除其先前計入的分數"""
+    if contribution.values:
+        # 只扣除既有區間：連帶刪除測驗項目時不可再建立新列
+        _apply_changes(contribution.test_project_id, contribution.values, {}, create=False)
+
+
+def rebuild_score_histograms(project_id=None, batch_size=500) -> Dict[str, int]:
+    """由測驗結果全量重算直方圖區間與各結果的計入明細（backfill_score_histograms 指令使用）"""
+    results = TestProjectResult.objects.select_related('score_contribution').only(
+        'id', 'test_project_id', 'crawl_status', 'ci_score', 'prediction_score', 'trait_score_map',
+        'score_contribution__id', 'score_contribution__values', 'score_contribution__test_project_id',
+    )
+    if project_id:
+        results = results.filter(test_project_id=project_id)
+
+    totals = {'results': 0, 'changed': 0, 'bins': 0}
+    bins: Dict[Tuple[int, str, int], int] = Counter()
+    new_contributions = []
+    with transaction.atomic():
+        for result in results.order_by('pk').iterator(chunk_size=batch_size):
+            current = result_metric_values(result)
+            for (metric, bin_index), count in _bin_counts(current).items():
+                bins[(result.test_project_id, metric, bin_index)] += count
+            contribution = getattr(result, 'score_contribution', None)
+            if contribution is None:
+                if current:
+                    new_contributions.append(ResultScoreContribution(
+                        test_result_id=result.pk, test_project_id=result.test_project_id, values=current
+                    ))
+                    totals['changed'] += 1
+            elif contribution.values != current or contribution.test_project_id != result.test_project_id:
+                ResultScoreContribution.objects.filter(pk=contribution.pk).update(
+                    test_project_id=result.test_project_id, values=current
+                )
+                totals['changed'] += 1
+            totals['results'] += 1
+
+        ResultScoreContribution.objects.bulk_create(new_contributions, batch_size=1000)
+        existing = ScoreHistogramBin.objects.all()
+        if project_id:
+            existing = existing.filter(test_project_id=project_id)
+        metrics_by_project: Dict[int, set] = {}
+        for project_id_, metric in existing.values_list('test_project_id', 'metric').distinct():
+            metrics_by_project.setdefault(project_id_, set()).add(metric)
+        existing.delete()
+        ScoreHistogramBin.objects.bulk_create(
+            [
+                ScoreHistogramBin(test_project_id=project_id_, metric=metric, bin=bin_index, count=count)
+                for (project_id_, metric, bin_index), count in bins.items()
+            ],
+            batch_size=1000,
+        )
+        totals['bins'] = len(bins)
+
+        for project_id_, metric, _ in bins:
+            metrics_by_project.setdefault(project_id_, set()).add(metric)
+        for project_id_, metrics in metrics_by_project.items():
+            _invalidate(project_id_, metrics)
+
+    logger.info(f"分數分佈重建完成 project={project_id} {totals}")
+    return totals
+
+
+# ===== 查詢 =====
+
+def get_histogram(project_id, metric) -> Histogram:
+    """測驗項目指標的 (區間, 筆數) 列表（依區間排序）"""
+    key = HISTOGRAM_CACHE_KEY.format(project_id=project_id, metric=metric)
+    histogram = cache.get(key)
+    if histogram is None:
+        histogram = list(
+            ScoreHistogramBin.objects.filter(test_project_id=project_id, metric=metric, count__gt=0)
+            .order_by('bin')
+            .values_list('bin', 'count')
+        )
+        cache.set(key, histogram, HISTOGRAM_CACHE_TIMEOUT)
+    return histogram
+
+
+def _rank_in(histogram: Histogram, total: int, value: float) -> float:
+    target = _bin(value)
+    below = 0
+    for bin_index, count in histogram:
+        if bin_index < target:
+            below += count
+        elif bin_index == target:
+            # 區間內假設均勻分佈
+            fraction = (value - bin_index * BIN_WIDTH) / BIN_WIDTH
+            below += count * min(max(fraction, 0.0), 1.0)
+            break
+        else:
+            break
+    return below / total * 100
+
+
+def percentile_ranks(project_id, metric, values: Dict[Hashable, Optional[float]],
+                     min_samples=MIN_SAMPLES) -> Dict[Hashable, Optional[float]]:
+    """多筆分數的百分位等級（0-100，低於該分數的比例）；只讀取一次直方圖，供搜尋結果排序"""
+    histogram = get_histogram(project_id, metric)
+    total = sum(count for _, count in histogram)
+    return {
+        key: round(_rank_in(histogram, total, float(value)), 1)
+        if value is not None and total and total >= min_samples else None
+        for key, value in values.items()
+    }
+
+
+def percentile_rank(project_id, metric, value, min_samples=MIN_SAMPLES) -> Optional[float]:
+    """單筆分數的百分位等級（樣本不足或無分數時回傳 None）"""
+    return percentile_ranks(project_id, metric, {None: value}, min_samples)[None]
+
+
+def top_percent(project_id, metric, value, min_samples=MIN_SAMPLES) -> Optional[float]:
+    """分數位於前百分之幾（例如 5.0 表示前 5%）"""
+    rank = percentile_rank(project_id, metric, value, min_samples)
+    if rank is None:
+        return None
+    return max(round(100 - rank, 1), 0.1)
+
+
+def get_result_percentiles(result, min_samples=MIN_SAMPLES) -> Dict[str, Optional[float]]:
+    """測驗結果 CI 與預測分數在同測驗項目中位於前百分之幾（供詳情頁與報告顯示）"""
+    values = result_metric_values(result)
+    return {
+        metric: top_percent(result.test_project_id, metric, values.get(metric), min_samples)
+        if values.get(metric) is not None else None
+        for metric in (CI_METRIC, PREDICTION_METRIC)
+    }
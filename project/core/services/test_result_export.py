@@ -0,0 +1,260 @@
+"""Streaming CSV/XLSX export of filtered test results."""
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from typing import Iterator, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core.models import ExportJob, TestInvitation, TestInvitee
+from utils.export_utils import XLSX_CONTENT_TYPE, iter_csv, iter_xlsx
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'xlsx': ('xlsx', XLSX_CONTENT_TYPE),
+}
+EXPORT_HEADER = ['評鑑別', '受試者名字', '電子郵件', '身份別', 'CI分數', '預測值分數']
+
+# 超過此筆數的匯出改由背景任務產生檔案
+ASYNC_THRESHOLD = getattr(settings, 'EXPORT_ASYNC_THRESHOLD', 5000)
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# 只讀取匯出需要的欄位；分數使用已實體化的 ci_score/prediction_score，不載入 raw_data
+_ROW_FIELDS = (
+    'test_project__name',
+    'invitee__name',
+    'invitee__email',
+    'invitee__status',
+    'testprojectresult__crawl_status',
+    'testprojectresult__ci_score',
+    'testprojectresult__prediction_score',
+)
+
+
+def normalize_format(value) -> str:
+    """匯出格式（excel 視為 xlsx，未知格式退回 csv）"""
+    value = (value or 'csv').lower()
+    if value == 'excel':
+        value = 'xlsx'
+    return value if value in EXPORT_FORMATS else 'csv'
+
+
+def filter_export_invitations(user, params):
+    """依列表頁的篩選條件取得要匯出的邀請（params 為查詢字串參數）"""
+    if user.user_type == 'admin':
+        invitations = TestInvitation.objects.all()
+    else:
+        invitations = TestInvitation.objects.filter(enterprise=user)
+
+    search = (params.get('search') or '').strip()
+    if search:
+        invitations = invitations.filter(
+            Q(invitee__name__icontains=search) |
+            Q(invitee__email__icontains=search)
+        )
+
+    project_id = params.get('project', '')
+    if project_id:
+        invitations = invitations.filter(test_project__id=project_id)
+
+    identity_filter = params.get('identity', '')
+    if identity_filter:
+        invitations = invitations.filter(invitee__status=identity_filter)
+
+    position_filter = params.get('position', '')
+    if position_filter:
+        invitations = invitations.filter(invitee__position=position_filter)
+
+    status = params.get('status', '')
+    if status:
+        invitations = invitations.filter(status=status)
+
+    crawl_status = params.get('crawl_status', '')
+    if crawl_status == 'pending':
+        invitations = invitations.filter(
+            Q(testprojectresult__isnull=True) |
+            Q(testprojectresult__crawl_status='pending')
+        )
+    elif crawl_status in ['crawling', 'completed', 'failed']:
+        invitations = invitations.filter(testprojectresult__crawl_status=crawl_status)
+
+    order_option = params.get('order', 'completion_desc')
+    if order_option in ('score_desc', 'score_asc'):
+        invitations = invitations.annotate(
+            effective_score=Coalesce(
+                'score',
+                'testprojectresult__score_value',
+                Value(0.0),
+                output_field=FloatField()
+            )
+        )
+
+    if order_option == 'completion_asc':
+        ordering = [F('completed_at').asc(nulls_last=True), '-invited_at']
+    elif order_option == 'score_desc':
+        ordering = [F('effective_score').desc(), F('completed_at').desc(nulls_last=True)]
+    elif order_option == 'score_asc':
+        ordering = [F('effective_score').asc(), F('completed_at').asc(nulls_last=True)]
+    else:
+        ordering = [F('completed_at').desc(nulls_last=True), '-invited_at']
+    # 以 id 作為最後排序鍵，確保分批讀取時順序穩定
+    return invitations.order_by(*ordering, '-id')
+
+
+def iter_export_rows(invitations, chunk_size=CHUNK_SIZE) -> Iterator[list]:
+    """逐批讀取匯出列（server-side cursor，不一次載入全部資料）"""
+    identity_labels = dict(TestInvitee.STATUS_CHOICES)
+    for (project_name, name, email, identity, crawl_status,
+         ci_score, prediction_score) in invitations.values_list(*_ROW_FIELDS).iterator(chunk_size=chunk_size):
+        completed = crawl_status == 'completed'
+        yield [
+            project_name or '',
+            name,
+            email,
+            identity_labels.get(identity, identity),
+            ci_score if completed and ci_score is not None else '',
+            prediction_score if completed and prediction_score is not None else '',
+        ]
+
+
+def iter_export_content(invitations, export_format) -> Iterator:
+    """產生匯出檔案內容（CSV 為字串、XLSX 為位元組）"""
+    rows = iter_export_rows(invitations)
+    if export_format == 'xlsx':
+        return iter_xlsx(rows, header=EXPORT_HEADER, sheet_name='評鑑結果')
+    return iter_csv(rows, header=EXPORT_HEADER)
+
+
+def build_export_filenames(user, invitations, export_format) -> Tuple[str, str]:
+    """(ASCII 檔名, UTF-8 顯示檔名)，以企業名稱加時間戳命名"""
+    extension = EXPORT_FORMATS[export_format][0]
+    timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
+
+    if user.user_type == 'enterprise':
+        company_name = getattr(getattr(user, 'enterprise_profile', None), 'company_name', None)
+    else:
+        first_enterprise = invitations.values_list(
+            'enterprise__enterprise_profile__company_name', 'enterprise__username'
+        ).first()
+        company_name = None
+        if first_enterprise:
+            company_name = first_enterprise[0] or first_enterprise[1]
+
+    if not company_name:
+        company_name = 'test_results'
+
+    safe_ascii = slugify(company_name, allow_unicode=False)
+    if not safe_ascii:
+        safe_ascii = 'test_results'
+    return f'{safe_ascii}_{timestamp}.{extension}', f'{company_name}_{timestamp}.{extension}'
+
+
+# ===== 背景匯出 =====
+
+def _dispatch(job_id):
+    from core.tasks import generate_test_result_export
+
+    try:
+        generate_test_result_export.delay(str(job_id))
+    except Exception as e:
+        logger.error(f"匯出任務排入佇列失敗 job={job_id}：{str(e)}")
+        ExportJob.objects.filter(pk=job_id).update(
+            status='failed', error_message=f'無法排入背景佇列：{str(e)}', finished_at=timezone.now()
+        )
+
+
+def enqueue_export_job(user, params, export_format) -> ExportJob:
+    """建立背景匯出任務（交易提交後才排入佇列）"""
+    job = ExportJob.objects.create(
+        requested_by=user,
+        export_format=export_format,
+        params={key: value for key, value in params.items() if key not in ('after', 'before', 'format')},
+    )
+    job_id = job.pk
+    transaction.on_commit(lambda: _dispatch(job_id))
+    return job
+
+
+def run_export_job(job_id) -> ExportJob:
+    """執行背景匯出（由 Celery 任務呼叫）"""
+    claimed = ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), progress=5
+    )
+    job = ExportJob.objects.select_related('requested_by').get(pk=job_id)
+    if not claimed:
+        logger.info(f"匯出任務已由其他 worker 處理 job={job_id} status={job.status}")
+        return job
+
+    fd, temp_path = tempfile.mkstemp(suffix=f'.{job.export_format}')
+    os.close(fd)
+    try:
+        user = job.requested_by
+        invitations = filter_export_invitations(user, job.params)
+        total = invitations.count()
+        written = 0
+
+        def counted_rows():
+            nonlocal written
+            for row in iter_export_rows(invitations):
+                written += 1
+                if total and written % CHUNK_SIZE == 0:
+                    ExportJob.objects.filter(pk=job_id).update(progress=min(95, 5 + written * 90 // total))
+                yield row
+
+        if job.export_format == 'xlsx':
+            chunks = iter_xlsx(counted_rows(), header=EXPORT_HEADER, sheet_name='評鑑結果')
+        else:
+            chunks = (text.encode('utf-8') for text in iter_csv(counted_rows(), header=EXPORT_HEADER))
+        with open(temp_path, 'wb') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+
+        safe_filename, display_filename = build_export_filenames(user, invitations, job.export_format)
+        with open(temp_path, 'rb') as fh:
+            job.file.save(safe_filename, File(fh), save=False)
+        job.download_filename = safe_filename
+        job.display_filename = display_filename
+        job.row_count = written
+        job.status = 'completed'
+        job.progress = 100
+        job.finished_at = timezone.now()
+        job.save()
+        logger.info(f"匯出任務完成 job={job_id} rows={written}")
+
+    except Exception as e:
+        logger.error(f"匯出任務失敗 job={job_id}：{str(e)}", exc_info=True)
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return job
+
+
+def cleanup_export_jobs(days=3) -> int:
+    """刪除舊的匯出任務與檔案"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    for job in ExportJob.objects.filter(created_at__lt=cutoff).exclude(
+        status__in=ExportJob.ACTIVE_STATUSES
+    ).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
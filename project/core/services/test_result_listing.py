@@ -1,23 +1,28 @@
 """Shared utilities for test result listings."""
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
-
-from django.core.paginator import Paginator
-from django.db.models import (
-    Q,
-    F,
-    FloatField,
-    Value,
-    Case,
-    When,
-    IntegerField,
+from typing import Optional, Dict, Any, List
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q, F, FloatField
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+
+from core.models import (
+    LISTING_SCORE_LIMIT,
+    LISTING_SCORE_TIER,
+    LISTING_SORT_EPOCH,
+    LISTING_SORT_FAR_FUTURE,
+    TestInvitation,
+    TestInvitee,
+    TestProject,
+    TestProjectResult,
 )
-from django.db.models.functions import Coalesce, Cast
-from django.utils import timezone
-
-from core.models import TestInvitation, TestInvitee, TestProject
+from utils.tiered_cache import namespace
 
 CRAWL_STATUS_CHOICES = [
     ('pending', '待取得'),
@@ -40,6 +45,8 @@ class ListingOptions:
     per_page: int = 50
     allow_project_filter: bool = True
     locked_project_id: Optional[int] = None
+    # 是否顯示總筆數（以 cached_count 快取；關閉時不執行 COUNT）
+    count_total: bool = True
 
 
 def _parse_numeric(value):
@@ -62,12 +69,8 @@ def _parse_numeric(value):
     return None
 
 
-def _extract_prediction(invitation):
-    result = getattr(invitation, 'testprojectresult', None)
-    if not result:
-        return None
-
-    project = invitation.test_project
+def extract_prediction_score(result, project):
+    """由測驗結果解析預測分數（依序嘗試 performance_metrics、raw_data 與 prediction_value）"""
     prediction_key = (getattr(project, 'prediction_field_system', '') or '').strip()
     raw_data = result.raw_data if isinstance(result.raw_data, dict) else {}
     performance = raw_data.get('performance_metrics')
@@ -97,31 +100,25 @@ def _extract_prediction(invitation):
     return None
 
 
-def _extract_ci(invitation):
-    result = getattr(invitation, 'testprojectresult', None)
-    project = invitation.test_project
+def extract_ci_score(result, project):
+    """由測驗結果解析 CI 分數（依序嘗試 CI_Raw_Value、評分欄位與 score_value）"""
     score_key = (getattr(project, 'score_field_system', '') or '').strip()
+    raw_data = result.raw_data if isinstance(result.raw_data, dict) else {}
+    performance = raw_data.get('performance_metrics')
 
     candidates = []
 
-    if result:
-        raw_data = result.raw_data if isinstance(result.raw_data, dict) else {}
-        performance = raw_data.get('performance_metrics')
-
-        if isinstance(performance, dict):
-            candidates.append(performance.get('CI_Raw_Value'))
-            if score_key:
-                candidates.append(performance.get(score_key))
-
-        if raw_data:
-            candidates.append(raw_data.get('CI_Raw_Value'))
-            if score_key:
-                candidates.append(raw_data.get(score_key))
+    if isinstance(performance, dict):
+        candidates.append(performance.get('CI_Raw_Value'))
+        if score_key:
+            candidates.append(performance.get(score_key))
 
-        candidates.append(getattr(result, 'score_value', None))
+    if raw_data:
+        candidates.append(raw_data.get('CI_Raw_Value'))
+        if score_key:
+            candidates.append(raw_data.get(score_key))
 
-    candidates.append(getattr(invitation, 'effective_score', None))
-    candidates.append(getattr(invitation, 'score', None))
+    candidates.append(getattr(result, 'score_value', None))
 
     for candidate in candidates:
         numeric = _parse_numeric(candidate)
@@ -130,53 +127,248 @@ def _extract_ci(invitation):
     return None
 
 
-def _normalize_dt(value):
-    if not value:
-        return None
-    if timezone.is_aware(value):
-        return timezone.make_naive(value)
-    return value
-
-
-def _sort_invitations(invitations, order_option):
-    def score_desc_key(invitation):
-        pred = invitation._prediction_score
-        ci = invitation._ci_score
-        has_any = invitation._has_score
-        pred_present = pred is not None
-        ci_val = ci if ci is not None else float('-inf')
-        pred_val = pred if pred_present else (ci if ci is not None else float('-inf'))
-        completed = _normalize_dt(getattr(invitation, 'effective_completed_at', None))
-        completed_ts = completed.timestamp() if completed else float('-inf')
-        return (
-            0 if has_any else 1,
-            0 if pred_present else 1,
-            -pred_val,
-            -ci_val,
-            -completed_ts,
+def refresh_result_scores(queryset, batch_size=500) -> int:
+    """重新計算測驗結果的預測/CI 分數欄位（回填或測驗項目欄位設定變更時使用），並同步邀請的排序鍵"""
+    updated = 0
+    batch = []
+    results = queryset.select_related('test_project').only(
+        'id', 'test_invitation_id', 'raw_data', 'score_value', 'prediction_value', 'prediction_score', 'ci_score',
+        'test_project__prediction_field_system', 'test_project__score_field_system',
+    ).order_by('id')
+
+    def flush():
+        # bulk_update 不經過 save，另行更新邀請上的排序鍵
+        TestProjectResult.objects.bulk_update(batch, ['prediction_score', 'ci_score'])
+        refresh_listing_sort_keys(
+            TestInvitation.objects.filter(pk__in=[result.test_invitation_id for result in batch]),
+            batch_size=batch_size,
         )
 
-    def score_asc_key(invitation):
-        pred = invitation._prediction_score
-        ci = invitation._ci_score
-        has_any = invitation._has_score
-        pred_present = pred is not None
-        ci_val = ci if ci is not None else float('inf')
-        pred_val = pred if pred_present else (ci if ci is not None else float('inf'))
-        completed = _normalize_dt(getattr(invitation, 'effective_completed_at', None))
-        completed_ts = completed.timestamp() if completed else float('inf')
-        return (
-            0 if has_any else 1,
-            0 if pred_present else 1,
-            pred_val,
-            ci_val,
-            completed_ts,
-        )
+    for result in results.iterator(chunk_size=batch_size):
+        prediction = extract_prediction_score(result, result.test_project)
+        ci = extract_ci_score(result, result.test_project)
+        if prediction == result.prediction_score and ci == result.ci_score:
+            continue
+        result.prediction_score = prediction
+        result.ci_score = ci
+        batch.append(result)
+        if len(batch) >= batch_size:
+            flush()
+            updated += len(batch)
+            batch = []
+    if batch:
+        flush()
+        updated += len(batch)
+    return updated
+
+
+# ===== 排序鍵 =====
+
+SORT_KEY_FIELDS = ('sort_completion_desc', 'sort_completion_asc', 'sort_score_desc', 'sort_score_asc')
+# 測驗結果上影響排序鍵的欄位（save 會由 raw_data 等欄位重新解析分數並加入 update_fields）
+RESULT_SORT_SOURCE_FIELDS = {'prediction_score', 'ci_score', 'crawled_at'}
+
+
+def listing_sort_keys(completed_at, prediction, ci) -> Dict[str, Any]:
+    """結果列表排序鍵
+
+    完成時間排序：已完成者依完成時間排列，未完成者以哨兵值排在最後；
+    分數排序：有預測分數者依預測分數、其次只有 CI 分數者依 CI 分數，無分數者排在最後。
+    """
+    primary = prediction if prediction is not None else ci
+    tier = 1 if prediction is not None else 0 if ci is not None else -1
+    score = 0.0 if primary is None else max(-LISTING_SCORE_LIMIT, min(LISTING_SCORE_LIMIT, primary))
+    return {
+        'sort_completion_desc': completed_at or LISTING_SORT_EPOCH,
+        'sort_completion_asc': completed_at or LISTING_SORT_FAR_FUTURE,
+        'sort_score_desc': tier * LISTING_SCORE_TIER + score,
+        'sort_score_asc': -tier * LISTING_SCORE_TIER + score,
+    }
+
+
+def _sort_keys_for(invitation, result) -> Dict[str, Any]:
+    # 與列表顯示一致：完成時間以測驗結果的取得時間遞補，CI 分數以邀請上的分數遞補
+    ci = result.ci_score if result is not None else None
+    return listing_sort_keys(
+        invitation.completed_at or (result.crawled_at if result is not None else None),
+        result.prediction_score if result is not None else None,
+        ci if ci is not None else invitation.score,
+    )
+
+
+def invitation_sort_keys(invitation) -> Dict[str, Any]:
+    """邀請目前的排序鍵（尚未建立的邀請沒有測驗結果，不查詢資料庫）"""
+    try:
+        result = invitation.testprojectresult
+    except TestProjectResult.DoesNotExist:
+        result = None
+    return _sort_keys_for(invitation, result)
+
+
+def sync_result_sort_keys(result, deleted=False):
+    """測驗結果儲存或刪除後更新所屬邀請的排序鍵"""
+    try:
+        invitation = result.test_invitation
+    except TestInvitation.DoesNotExist:
+        return
+    keys = _sort_keys_for(invitation, None if deleted else result)
+    TestInvitation.objects.filter(pk=invitation.pk).update(**keys)
+    for field_name, value in keys.items():
+        setattr(invitation, field_name, value)
+
+
+def refresh_listing_sort_keys(invitations, batch_size=500) -> int:
+    """重新計算邀請的排序鍵並只寫回有變動的列，回傳更新筆數"""
+    updated = 0
+    batch = []
+    rows = invitations.select_related('testprojectresult').only(
+        'id', 'completed_at', 'score', *SORT_KEY_FIELDS,
+        'testprojectresult__prediction_score', 'testprojectresult__ci_score', 'testprojectresult__crawled_at',
+    ).order_by('id')
+    for invitation in rows.iterator(chunk_size=batch_size):
+        keys = invitation_sort_keys(invitation)
+        if all(getattr(invitation, field_name) == value for field_name, value in keys.items()):
+            continue
+        for field_name, value in keys.items():
+            setattr(invitation, field_name, value)
+        batch.append(invitation)
+        if len(batch) >= batch_size:
+            TestInvitation.objects.bulk_update(batch, SORT_KEY_FIELDS)
+            updated += len(batch)
+            batch = []
+    if batch:
+        TestInvitation.objects.bulk_update(batch, SORT_KEY_FIELDS)
+        updated += len(batch)
+    return updated
+
+
+# 排序方式對應的（排序鍵欄位, 是否遞減）；每種排序各有一個不為 NULL 的持久化欄位，最後以 id 確保順序唯一，
+# 兩者皆為原始欄位，keyset 分頁可直接使用 (排序鍵, id) 索引
+LISTING_ORDERINGS = {
+    'completion_desc': [('sort_completion_desc', True), ('id', True)],
+    'completion_asc': [('sort_completion_asc', False), ('id', False)],
+    'score_desc': [('sort_score_desc', True), ('id', True)],
+    'score_asc': [('sort_score_asc', False), ('id', False)],
+}
+_DATETIME_KEYS = {'sort_completion_desc', 'sort_completion_asc'}
+CURSOR_SALT = 'core.test_result_listing.cursor'
+
+# 總筆數依查詢條件快取，翻頁時不重複執行 COUNT
+count_cache = namespace('test_result_listing', use_l1=False, versioned=False)
+COUNT_TIMEOUT = getattr(settings, 'TEST_RESULT_LISTING_COUNT_TIMEOUT', 60)
+
+
+@dataclass
+class CursorPage:
+    """keyset 分頁結果（以游標定位，任何頁面的查詢成本相同）；total_count 為 None 表示未計算總筆數"""
+    object_list: List[Any]
+    total_count: Optional[int] = None
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def cached_count(queryset) -> int:
+    """查詢的總筆數；相同 SQL 在 COUNT_TIMEOUT 秒內共用快取的結果"""
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = 'count:' + hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+    return count_cache.get_or_set(key, queryset.count, COUNT_TIMEOUT)
+
+
+def _order_by(ordering, reverse=False):
+    return [
+        F(field_name).desc() if descending != reverse else F(field_name).asc()
+        for field_name, descending in ordering
+    ]
+
+
+def _after_filter(ordering, values, reverse=False):
+    """排序位置在 values 之後的條件：(k1, k2, ...) 依序比較"""
+    condition = Q()
+    equal_prefix = Q()
+    for (field_name, descending), value in zip(ordering, values):
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition |= equal_prefix & Q(**{f'{field_name}__{lookup}': value})
+        equal_prefix &= Q(**{field_name: value})
+    return condition
+
+
+def encode_cursor(ordering, obj) -> str:
+    values = []
+    for field_name, _ in ordering:
+        value = getattr(obj, field_name)
+        if field_name in _DATETIME_KEYS:
+            value = value.isoformat()
+        values.append(value)
+    return signing.dumps(values, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(ordering, token) -> Optional[list]:
+    """解析游標；游標遭竄改或排序方式已變更時回傳 None（回到第一頁）"""
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    decoded = []
+    for (field_name, _), value in zip(ordering, values):
+        if field_name in _DATETIME_KEYS:
+            value = parse_datetime(value) if isinstance(value, str) else None
+            if value is None:
+                return None
+        decoded.append(value)
+    return decoded
+
 
-    if order_option == 'score_desc':
-        invitations.sort(key=score_desc_key)
-    elif order_option == 'score_asc':
-        invitations.sort(key=score_asc_key)
+def paginate_by_cursor(queryset, ordering, *, per_page, after=None, before=None, total_count=None) -> CursorPage:
+    """依排序鍵進行 keyset 分頁；after 為上一頁最後一筆、before 為下一頁第一筆的游標
+
+    分頁本身不執行 COUNT，需要總筆數時由呼叫端傳入 total_count（例如 cached_count 的結果）。
+    """
+    after_values = decode_cursor(ordering, after) if after else None
+    before_values = decode_cursor(ordering, before) if before and after_values is None else None
+
+    if before_values is not None:
+        rows = list(
+            queryset.filter(_after_filter(ordering, before_values, reverse=True))
+            .order_by(*_order_by(ordering, reverse=True))[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after_values is not None:
+            queryset = queryset.filter(_after_filter(ordering, after_values))
+        rows = list(queryset.order_by(*_order_by(ordering))[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after_values is not None
+
+    page = CursorPage(object_list=rows, total_count=total_count)
+    if rows:
+        page.has_next = has_next
+        page.has_previous = has_previous
+        if has_next:
+            page.next_cursor = encode_cursor(ordering, rows[-1])
+        if has_previous:
+            page.previous_cursor = encode_cursor(ordering, rows[0])
+    return page
 
 
 def build_test_result_listing(request, base_queryset, *, options: ListingOptions) -> Dict[str, Any]:
@@ -221,49 +413,28 @@ def build_test_result_listing(request, base_queryset, *, options: ListingOptions
     if position_filter:
         invitations = invitations.filter(invitee__position=position_filter)
 
-    invitations = invitations.annotate(
-        effective_score=Coalesce(
-            Cast('score', FloatField()),
-            Cast('testprojectresult__score_value', FloatField()),
-        ),
-        has_completion=Case(
-            When(testprojectresult__crawled_at__isnull=False, then=Value(1)),
-            When(completed_at__isnull=False, then=Value(1)),
-            default=Value(0),
-            output_field=IntegerField(),
+    order_option = request.GET.get('order', 'completion_desc')
+    if order_option not in LISTING_ORDERINGS:
+        order_option = 'completion_desc'
+
+    page_obj = paginate_by_cursor(
+        # 顯示用的欄位只對取出的該頁計算，排序與分頁只使用邀請上的排序鍵
+        invitations.annotate(
+            effective_completed_at=Coalesce('completed_at', 'testprojectresult__crawled_at'),
+            listing_prediction=F('testprojectresult__prediction_score'),
+            listing_ci=Coalesce(F('testprojectresult__ci_score'), F('score'), output_field=FloatField()),
         ),
-        effective_completed_at=Coalesce('completed_at', 'testprojectresult__crawled_at'),
+        LISTING_ORDERINGS[order_option],
+        per_page=options.per_page,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        total_count=cached_count(invitations) if options.count_total else None,
     )
 
-    order_option = request.GET.get('order', 'completion_desc')
-    if order_option == 'completion_asc':
-        invitations = invitations.order_by(
-            F('has_completion').desc(),
-            F('effective_completed_at').asc(nulls_last=True),
-            '-invited_at',
-        )
-    else:  # completion_desc default
-        invitations = invitations.order_by(
-            F('has_completion').desc(),
-            F('effective_completed_at').desc(nulls_last=True),
-            '-invited_at',
-        )
-
-    invitations = list(invitations)
-
-    for invitation in invitations:
-        invitation._prediction_score = _extract_prediction(invitation)
-        invitation._ci_score = _extract_ci(invitation)
-        invitation._has_score = (
-            invitation._prediction_score is not None
-            or invitation._ci_score is not None
-        )
-
-    _sort_invitations(invitations, order_option)
-
-    paginator = Paginator(invitations, options.per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    for invitation in page_obj.object_list:
+        invitation._prediction_score = invitation.listing_prediction
+        invitation._ci_score = invitation.listing_ci
+        invitation._has_score = invitation.listing_prediction is not None or invitation.listing_ci is not None
 
     if user.user_type == 'admin':
         project_choices = TestProject.objects.filter(
@@ -289,9 +460,8 @@ def build_test_result_listing(request, base_queryset, *, options: ListingOptions
         )
 
     query_params = request.GET.copy()
-    if 'page' in query_params:
-        query_params = query_params.copy()
-        query_params.pop('page')
+    for key in ('page', 'after', 'before'):
+        query_params.pop(key, None)
 
     context = {
         'page_obj': page_obj,
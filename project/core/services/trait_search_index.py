@@ -0,0 +1,148 @@
+"""Normalized per-trait score rows backing trait threshold searches and statistics."""
+from __future__ import annotations
+
+import logging
+from typing import Dict, List
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import IndividualTestResult, ResultTraitScore, TestProjectResult, Trait
+from core.services.project_scoring_graph import GRAPH_CACHE_TIMEOUT, ProjectScoringGraph
+
+logger = logging.getLogger(__name__)
+
+MATCHER_CACHE_KEY = 'trait_search_index:matcher'
+
+# 企業測驗結果中影響索引列的欄位（以 update_fields 儲存其他欄位時不重建）
+PROJECT_RESULT_SOURCE_FIELDS = {'trait_results', 'raw_data', 'crawl_status', 'crawled_at', 'test_project'}
+
+
+def get_trait_matcher() -> ProjectScoringGraph:
+    """以全域特質建立的名稱比對器（不限測驗項目，與報告使用相同的名稱與別名規則）"""
+    matcher = cache.get(MATCHER_CACHE_KEY)
+    if matcher is None:
+        matcher = ProjectScoringGraph(project_id=0, traits={trait.id: trait for trait in Trait.objects.all()})
+        cache.set(MATCHER_CACHE_KEY, matcher, GRAPH_CACHE_TIMEOUT)
+    return matcher
+
+
+def invalidate_trait_matcher():
+    """特質新增或改名後清除比對器快取（既有索引需以 backfill_result_trait_scores 重建）"""
+    transaction.on_commit(lambda: cache.delete(MATCHER_CACHE_KEY))
+
+
+def extract_trait_scores(trait_results, raw_data, matcher=None) -> Dict[int, float]:
+    """特質ID -> 分數；優先使用整理後的 trait_results，沒有時改由原始資料比對"""
+    matcher = matcher or get_trait_matcher()
+    scores = {}
+    if isinstance(trait_results, dict) and trait_results:
+        scores = matcher.canonical_trait_scores({'trait_scores': trait_results})
+    if not scores:
+        scores = matcher.canonical_trait_scores(raw_data)
+    return {int(trait_id): entry['score'] for trait_id, entry in scores.items()}
+
+
+def _project_rows(result, matcher) -> List[ResultTraitScore]:
+    if result.crawl_status != 'completed':
+        return []
+    invitation = result.test_invitation
+    completed_at = invitation.completed_at or result.crawled_at
+    return [
+        ResultTraitScore(
+            project_result_id=result.pk,
+            enterprise_id=invitation.enterprise_id,
+            invitee_id=invitation.invitee_id,
+            test_project_id=result.test_project_id,
+            trait_id=trait_id,
+            score=score,
+            completed_at=completed_at,
+        )
+        for trait_id, score in extract_trait_scores(result.trait_results, result.raw_data, matcher).items()
+    ]
+
+
+def _individual_rows(result, matcher) -> List[ResultTraitScore]:
+    # 與人才搜尋條件一致，僅索引結果完整的個人測驗
+    if result.result_status != 'completed':
+        return []
+    completed_at = result.test_completion_date or result.crawled_at
+    return [
+        ResultTraitScore(
+            individual_result_id=result.pk,
+            user_id=result.user_id,
+            test_project_id=result.test_project_id,
+            trait_id=trait_id,
+            score=score,
+            completed_at=completed_at,
+        )
+        for trait_id, score in extract_trait_scores(result.trait_results, result.raw_data, matcher).items()
+    ]
+
+
+def index_project_result(result, matcher=None) -> int:
+    """重建單筆企業測驗結果的特質分數列，回傳寫入筆數"""
+    rows = _project_rows(result, matcher or get_trait_matcher())
+    with transaction.atomic():
+        ResultTraitScore.objects.filter(project_result_id=result.pk).delete()
+        ResultTraitScore.objects.bulk_create(rows)
+    return len(rows)
+
+
+def index_individual_result(result, matcher=None) -> int:
+    """重建單筆個人測驗結果的特質分數列，回傳寫入筆數"""
+    rows = _individual_rows(result, matcher or get_trait_matcher())
+    with transaction.atomic():
+        ResultTraitScore.objects.filter(individual_result_id=result.pk).delete()
+        ResultTraitScore.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _rebuild_batch(batch, key_field, build_rows, matcher) -> int:
+    rows = [row for result in batch for row in build_rows(result, matcher)]
+    with transaction.atomic():
+        ResultTraitScore.objects.filter(**{f'{key_field}__in': [result.pk for result in batch]}).delete()
+        ResultTraitScore.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_trait_search_index(project_id=None, batch_size=500) -> Dict[str, int]:
+    """以批次方式重建特質分數索引（回填或特質名稱變更後使用）"""
+    matcher = get_trait_matcher()
+    totals = {'project_results': 0, 'individual_results': 0, 'rows': 0}
+
+    sources = (
+        (
+            'project_results', 'project_result',
+            TestProjectResult.objects.select_related('test_invitation').only(
+                'id', 'test_project_id', 'crawl_status', 'crawled_at', 'trait_results', 'raw_data',
+                'test_invitation__enterprise_id', 'test_invitation__invitee_id', 'test_invitation__completed_at',
+            ),
+            _project_rows,
+        ),
+        (
+            'individual_results', 'individual_result',
+            IndividualTestResult.objects.only(
+                'id', 'user_id', 'test_project_id', 'result_status', 'test_completion_date',
+                'crawled_at', 'trait_results', 'raw_data',
+            ),
+            _individual_rows,
+        ),
+    )
+
+    for total_key, key_field, queryset, build_rows in sources:
+        if project_id:
+            queryset = queryset.filter(test_project_id=project_id)
+        batch = []
+        for result in queryset.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(result)
+            if len(batch) >= batch_size:
+                totals['rows'] += _rebuild_batch(batch, key_field, build_rows, matcher)
+                totals[total_key] += len(batch)
+                batch = []
+        if batch:
+            totals['rows'] += _rebuild_batch(batch, key_field, build_rows, matcher)
+            totals[total_key] += len(batch)
+
+    logger.info(f"特質分數索引重建完成 project={project_id} {totals}")
+    return totals
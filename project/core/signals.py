@@ -1,7 +1,26 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django_celery_beat.models import CrontabSchedule
 
+from core.models import (
+    EnterpriseProfile,
+    InvitationTemplate,
+    Notification,
+    PointTransaction,
+    ResultRoleIndexContribution,
+    ResultScoreContribution,
+    ShortLink,
+    TestInvitation,
+    TestInvitee,
+    TestProject,
+    TestProjectAssignment,
+    TestProjectCategory,
+    TestProjectCategoryTrait,
+    TestProjectResult,
+    Trait,
+    User,
+)
+
 @receiver(pre_save, sender=CrontabSchedule)
 def fix_crontab_empty_fields(sender, instance, **kwargs):
     """
@@ -15,4 +34,235 @@ def fix_crontab_empty_fields(sender, instance, **kwargs):
     if not instance.day_of_month or instance.day_of_month == '':
         instance.day_of_month = '*'
     if not instance.month_of_year or instance.month_of_year == '':
-        instance.month_of_year = '*'
\ No newline at end of file
+        instance.month_of_year = '*'
+
+
+@receiver(post_delete, sender=TestProject)
+@receiver([post_save, post_delete], sender=TestProjectCategory)
+def invalidate_project_scoring_graph_on_change(sender, instance, raw=False, **kwargs):
+    """測驗項目或分類異動時清除計分關係快取（含後台與其他程式路徑的修改）"""
+    from core.services.project_scoring_graph import invalidate_project_scoring_graph
+
+    if raw:
+        return
+    invalidate_project_scoring_graph(instance.pk if sender is TestProject else instance.test_project_id)
+
+
+@receiver([post_save, post_delete], sender=TestProjectCategoryTrait)
+def invalidate_category_trait_scoring_graph(sender, instance, raw=False, **kwargs):
+    """分類與特質的對應或權重異動時清除計分關係快取"""
+    from core.services.project_scoring_graph import invalidate_category_scoring_graph
+
+    if raw:
+        return
+    invalidate_category_scoring_graph(instance.category_id)
+
+
+@receiver(m2m_changed, sender=TestProjectCategory.traits.through)
+def invalidate_category_traits_scoring_graph(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """以 category.traits / trait.categories 的 add、remove、clear 修改對應時清除計分關係快取"""
+    from core.services.project_scoring_graph import (
+        invalidate_category_scoring_graph,
+        invalidate_project_scoring_graph,
+    )
+
+    # clear 之後已查不到原本的對應，於清除前處理
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_category_scoring_graph(instance.pk)
+        return
+    categories = TestProjectCategory.objects.filter(category_traits__trait=instance)
+    if pk_set:
+        categories = TestProjectCategory.objects.filter(pk__in=pk_set)
+    for project_id in set(categories.values_list('test_project_id', flat=True)):
+        invalidate_project_scoring_graph(project_id)
+
+
+@receiver(post_save, sender=Trait)
+def invalidate_trait_scoring_graphs_on_change(sender, instance, created=False, raw=False, **kwargs):
+    """特質名稱變更會影響結果比對，清除使用該特質的測驗項目快取"""
+    from core.services.project_scoring_graph import invalidate_trait_scoring_graphs
+
+    if raw or created:
+        return
+    invalidate_trait_scoring_graphs(instance.pk)
+
+
+@receiver(post_delete, sender=ResultRoleIndexContribution)
+def forget_deleted_role_index_contribution(sender, instance, **kwargs):
+    """測驗結果刪除時，從角色指數統計扣除該筆先前計入的數值"""
+    from core.services.role_index_stats import forget_role_index_contribution
+
+    forget_role_index_contribution(instance)
+
+
+@receiver(post_save, sender=TestProjectResult)
+def update_score_histograms(sender, instance, raw=False, update_fields=None, **kwargs):
+    """測驗結果分數異動時增量更新測驗項目的分數分佈"""
+    from core.services.score_percentiles import SOURCE_FIELDS, record_result_scores
+
+    if raw or (update_fields and not SOURCE_FIELDS & set(update_fields)):
+        return
+    record_result_scores(instance)
+
+
+@receiver([post_save, post_delete], sender=TestProjectResult)
+def update_invitation_sort_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    """測驗結果的分數或取得時間異動、或結果刪除時，更新所屬邀請的結果列表排序鍵"""
+    from core.services.test_result_listing import RESULT_SORT_SOURCE_FIELDS, sync_result_sort_keys
+
+    if raw or (update_fields and not RESULT_SORT_SOURCE_FIELDS & set(update_fields)):
+        return
+    sync_result_sort_keys(instance, deleted=kwargs['signal'] is post_delete)
+
+
+@receiver(post_save, sender=TestProjectResult)
+def update_trait_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """測驗結果的特質分數或狀態異動時重建該筆結果的特質分數索引列（刪除時由外鍵連帶刪除）"""
+    from core.services.trait_search_index import PROJECT_RESULT_SOURCE_FIELDS, index_project_result
+
+    if raw or (update_fields and not PROJECT_RESULT_SOURCE_FIELDS & set(update_fields)):
+        return
+    index_project_result(instance)
+
+
+@receiver(post_delete, sender=ResultScoreContribution)
+def forget_deleted_score_contribution(sender, instance, **kwargs):
+    """測驗結果刪除時，從分數分佈扣除該筆先前計入的數值"""
+    from core.services.score_percentiles import forget_score_contribution
+
+    forget_score_contribution(instance)
+
+
+@receiver(post_delete, sender=ShortLink)
+def invalidate_short_link(sender, instance, **kwargs):
+    """短網址（或其邀請）刪除後清除重新導向快取"""
+    from utils.url_shortener import URLShortenerService
+
+    URLShortenerService.invalidate(instance.code)
+
+
+@receiver(pre_save, sender=TestInvitation)
+def remember_invitation_rollup_snapshot(sender, instance, raw=False, **kwargs):
+    """記錄邀請異動前的狀態，儲存後據以增量更新每日彙總"""
+    from core.services.invitation_rollup import SNAPSHOT_FIELDS, invitation_snapshot
+
+    if raw or instance.pk is None:
+        instance._rollup_snapshot = None
+        return
+    previous = TestInvitation.objects.filter(pk=instance.pk).values(*SNAPSHOT_FIELDS).first()
+    instance._rollup_snapshot = invitation_snapshot(previous) if previous else None
+
+
+@receiver(post_save, sender=TestInvitation)
+def update_invitation_rollup(sender, instance, raw=False, **kwargs):
+    """邀請新增或狀態變更時更新每日彙總"""
+    from core.services.invitation_rollup import apply_invitation_change, invitation_snapshot
+
+    if raw:
+        return
+    apply_invitation_change(getattr(instance, '_rollup_snapshot', None), invitation_snapshot(instance))
+    instance._rollup_snapshot = None
+
+
+@receiver(post_delete, sender=TestInvitation)
+def forget_invitation_rollup(sender, instance, **kwargs):
+    """邀請刪除時從每日彙總扣除"""
+    from core.services.invitation_rollup import apply_invitation_change, invitation_snapshot
+
+    apply_invitation_change(invitation_snapshot(instance), None)
+
+
+@receiver(pre_save, sender=Notification)
+def remember_notification_read_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    """記錄通知儲存前的已讀狀態，儲存後據以調整未讀計數"""
+    instance._was_unread = None
+    if raw or instance.pk is None or (update_fields is not None and 'is_read' not in update_fields):
+        return
+    previous = Notification.objects.filter(pk=instance.pk).values_list('is_read', flat=True).first()
+    if previous is not None:
+        instance._was_unread = not previous
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_notification_count(sender, instance, created=False, raw=False, **kwargs):
+    """通知新增或已讀狀態變更時調整未讀計數"""
+    from core.services.notification_counters import adjust_unread_count
+
+    if raw:
+        return
+    if created:
+        delta = 0 if instance.is_read else 1
+    else:
+        was_unread = getattr(instance, '_was_unread', None)
+        if was_unread is None:
+            return
+        delta = int(not instance.is_read) - int(was_unread)
+    adjust_unread_count(instance.recipient_id, delta)
+    instance._was_unread = None
+
+
+@receiver(post_save, sender=PointTransaction)
+def update_point_rollup(sender, instance, created=False, raw=False, **kwargs):
+    """點數交易寫入時計入每日彙總（交易紀錄寫入後不再修改）"""
+    from core.services.point_rollup import record_point_transactions
+
+    if raw or not created:
+        return
+    record_point_transactions([instance])
+
+
+@receiver([post_save, post_delete], sender=TestInvitation)
+@receiver([post_save, post_delete], sender=TestInvitee)
+@receiver([post_save, post_delete], sender=InvitationTemplate)
+def invalidate_enterprise_dashboard(sender, instance, raw=False, **kwargs):
+    """企業的邀請、受測者或模板異動時清除儀表板快取"""
+    from core.services.dashboard_metrics import invalidate_dashboard_metrics
+
+    if raw:
+        return
+    invalidate_dashboard_metrics(enterprise_id=instance.enterprise_id)
+
+
+@receiver([post_save, post_delete], sender=TestProjectResult)
+@receiver([post_save, post_delete], sender=EnterpriseProfile)
+def invalidate_admin_dashboard(sender, instance, raw=False, **kwargs):
+    """測驗結果或企業審核狀態異動時清除管理員儀表板快取"""
+    from core.services.dashboard_metrics import invalidate_dashboard_metrics
+
+    if raw:
+        return
+    invalidate_dashboard_metrics()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_dashboard(sender, instance, raw=False, created=True, update_fields=None, **kwargs):
+    """新增、刪除用戶或變更用戶類型時清除管理員儀表板快取（登入時更新 last_login 不需處理）"""
+    from core.services.dashboard_metrics import invalidate_dashboard_metrics
+
+    if raw or (not created and update_fields and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_dashboard_metrics()
+
+
+@receiver([post_save, post_delete], sender=TestProject)
+@receiver([post_save, post_delete], sender=TestProjectAssignment)
+def invalidate_project_dashboards(sender, instance, raw=False, **kwargs):
+    """測驗項目或指派異動會影響各企業的可用項目數，清除所有企業的儀表板快取"""
+    from core.services.dashboard_metrics import invalidate_dashboard_metrics
+
+    if raw:
+        return
+    invalidate_dashboard_metrics(all_enterprises=True)
+
+
+@receiver([post_save, post_delete], sender=Trait)
+def invalidate_trait_search_matcher(sender, instance, raw=False, **kwargs):
+    """特質新增、改名或刪除時清除特質搜尋索引的名稱比對器"""
+    from core.services.trait_search_index import invalidate_trait_matcher
+
+    if raw:
+        return
+    invalidate_trait_matcher()
@@ -7,6 +7,7 @@ from django.db.models import Count, Q, Avg, Sum, Case, When, IntegerField, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .decorators import enterprise_required
+from .services.invitation_rollup import get_daily_series, get_project_totals, get_status_totals
 from .models import (
     TestInvitation, TestInvitee, TestProject, TestProjectResult, 
     InvitationTemplate, PointTransaction
@@ -51,32 +52,12 @@ def statistics_dashboard(request):
 def get_basic_statistics(enterprise_user, start_date):
     """取得基本統計數據"""
     
-    # 總邀請數
-    total_invitations = TestInvitation.objects.filter(
-        enterprise=enterprise_user,
-        invited_at__gte=start_date
-    ).order_by().count()
-    
-    # 完成數
-    completed_invitations = TestInvitation.objects.filter(
-        enterprise=enterprise_user,
-        invited_at__gte=start_date,
-        status='completed'
-    ).order_by().count()
-    
-    # 進行中
-    in_progress_invitations = TestInvitation.objects.filter(
-        enterprise=enterprise_user,
-        invited_at__gte=start_date,
-        status='in_progress'
-    ).order_by().count()
-    
-    # 過期數
-    expired_invitations = TestInvitation.objects.filter(
-        enterprise=enterprise_user,
-        invited_at__gte=start_date,
-        status='expired'
-    ).order_by().count()
+    # 邀請數與各狀態數量（每日彙總，一次查詢）
+    status_totals = get_status_totals(enterprise_user, timezone.localdate(start_date))
+    total_invitations = status_totals['total']
+    completed_invitations = status_totals['completed']
+    in_progress_invitations = status_totals['in_progress']
+    expired_invitations = status_totals['expired']
     
     # 完成率
     completion_rate = (completed_invitations / total_invitations * 100) if total_invitations > 0 else 0
@@ -111,35 +92,19 @@ def get_basic_statistics(enterprise_user, start_date):
 def get_chart_data(enterprise_user, start_date, days):
     """取得圖表數據"""
     
-    # 每日邀請趨勢
-    daily_invitations = []
-    daily_completions = []
-    dates = []
-    
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        dates.append(date.strftime('%m/%d'))
-        
-        # 當日邀請數
-        day_invitations = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            invited_at__date=date.date()
-        ).order_by().count()
-        daily_invitations.append(day_invitations)
-        
-        # 當日完成數
-        day_completions = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            completed_at__date=date.date(),
-            status='completed'
-        ).order_by().count()
-        daily_completions.append(day_completions)
+    # 每日邀請趨勢（每日彙總，一次查詢）
+    series = get_daily_series(enterprise_user, timezone.localdate(start_date), days)
+    dates = [item['date'].strftime('%m/%d') for item in series]
+    daily_invitations = [item['invitations'] for item in series]
+    daily_completions = [item['completions'] for item in series]
     
     # 狀態分布
-    status_distribution = TestInvitation.objects.filter(
-        enterprise=enterprise_user,
-        invited_at__gte=start_date
-    ).values('status').annotate(count=Count('id')).order_by()
+    status_totals = get_status_totals(enterprise_user, timezone.localdate(start_date))
+    status_distribution = [
+        {'status': status, 'count': status_totals[status]}
+        for status, _ in TestInvitation.STATUS_CHOICES
+        if status_totals[status]
+    ]
     
     status_labels = []
     status_data = []
@@ -182,57 +147,18 @@ def get_chart_data(enterprise_user, start_date, days):
 def get_project_statistics(enterprise_user, start_date):
     """取得測驗項目統計"""
     
-    try:
-        # 先獲取符合條件的邀請數據，然後按項目分組統計
-        from django.db.models import Case, When, Value
-        
-        invitations = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            invited_at__gte=start_date,
-            test_project__isnull=False
-        ).order_by()
-        
-        # 按測驗項目分組統計
-        project_data = {}
-        for invitation in invitations:
-            project_id = invitation.test_project.id
-            project_name = invitation.test_project.name
-            
-            if project_id not in project_data:
-                project_data[project_id] = {
-                    'name': project_name,
-                    'total_invitations': 0,
-                    'completed_count': 0,
-                    'scores': []
-                }
-            
-            project_data[project_id]['total_invitations'] += 1
-            
-            if invitation.status == 'completed':
-                project_data[project_id]['completed_count'] += 1
-                if invitation.score:
-                    project_data[project_id]['scores'].append(invitation.score)
-        
-        # 轉換為統計結果
-        project_stats = []
-        for project_id, data in project_data.items():
-            completion_rate = (data['completed_count'] / data['total_invitations'] * 100) if data['total_invitations'] > 0 else 0
-            avg_score = sum(data['scores']) / len(data['scores']) if data['scores'] else 0
-            
-            project_stats.append({
-                'name': data['name'],
-                'total_invitations': data['total_invitations'],
-                'completed_count': data['completed_count'],
-                'completion_rate': round(completion_rate, 1),
-                'avg_score': round(avg_score, 1)
-            })
-        
-        # 按邀請數排序，取前5名
-        project_stats.sort(key=lambda x: x['total_invitations'], reverse=True)
-        return project_stats[:5]
-        
-    except Exception as e:
-        return []
+    project_stats = [
+        {
+            'name': item['name'],
+            'total_invitations': item['total_invitations'],
+            'completed_count': item['completed_count'],
+            'completion_rate': item['completion_rate'],
+            'avg_score': item['avg_score'],
+        }
+        for item in get_project_totals(enterprise_user, timezone.localdate(start_date))
+    ]
+    # 按邀請數排序，取前5名
+    return project_stats[:5]
 
 def get_invitee_statistics(enterprise_user, start_date):
     """取得受測者統計"""
@@ -336,24 +262,13 @@ def get_completion_trend(enterprise_user, start_date, days):
     """取得完成率趨勢"""
     
     trend_data = []
-    for i in range(days):
-        date = start_date + timedelta(days=i)
-        
-        total = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            invited_at__date=date.date()
-        ).order_by().count()
-        
-        completed = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            invited_at__date=date.date(),
-            status='completed'
-        ).order_by().count()
-        
+    for item in get_daily_series(enterprise_user, timezone.localdate(start_date), days):
+        total = item['invitations']
+        completed = item['invited_completed']
         completion_rate = (completed / total * 100) if total > 0 else 0
         
         trend_data.append({
-            'date': date.strftime('%Y-%m-%d'),
+            'date': item['date'].strftime('%Y-%m-%d'),
             'completion_rate': round(completion_rate, 1),
             'total': total,
             'completed': completed
@@ -362,87 +277,40 @@ def get_completion_trend(enterprise_user, start_date, days):
     return trend_data
 
 def get_score_distribution(enterprise_user, start_date):
-    """取得分數分布"""
+    """取得分數分布（以條件計數在資料庫端一次彙總，不載入個別分數）"""
+    
+    # 分數區間 -> 條件（上界含端點，超過 80 分全部歸入最後一個區間）
+    buckets = {
+        '0-20': Q(score__lte=20),
+        '21-40': Q(score__gt=20, score__lte=40),
+        '41-60': Q(score__gt=40, score__lte=60),
+        '61-80': Q(score__gt=60, score__lte=80),
+        '81-100': Q(score__gt=80),
+    }
     
-    scores = TestInvitation.objects.filter(
+    distribution = TestInvitation.objects.filter(
         enterprise=enterprise_user,
         invited_at__gte=start_date,
         status='completed',
         score__isnull=False
-    ).order_by().values_list('score', flat=True)
-    
-    # 分數區間統計
-    distribution = {
-        '0-20': 0,
-        '21-40': 0,
-        '41-60': 0,
-        '61-80': 0,
-        '81-100': 0
-    }
-    
-    for score in scores:
-        if score <= 20:
-            distribution['0-20'] += 1
-        elif score <= 40:
-            distribution['21-40'] += 1
-        elif score <= 60:
-            distribution['41-60'] += 1
-        elif score <= 80:
-            distribution['61-80'] += 1
-        else:
-            distribution['81-100'] += 1
+    ).order_by().aggregate(
+        **{f'bucket_{index}': Count('id', filter=condition) for index, condition in enumerate(buckets.values())}
+    )
     
     return {
-        'labels': list(distribution.keys()),
-        'data': list(distribution.values())
+        'labels': list(buckets.keys()),
+        'data': [distribution[f'bucket_{index}'] for index in range(len(buckets))]
     }
 
 def get_project_comparison(enterprise_user, start_date):
     """取得測驗項目比較數據"""
     
-    try:
-        # 獲取符合條件的邀請記錄
-        invitations = TestInvitation.objects.filter(
-            enterprise=enterprise_user,
-            invited_at__gte=start_date,
-            test_project__isnull=False
-        ).order_by()
-        
-        # 按測驗項目分組統計
-        project_data = {}
-        for invitation in invitations:
-            project_id = invitation.test_project.id
-            project_name = invitation.test_project.name
-            
-            if project_id not in project_data:
-                project_data[project_id] = {
-                    'name': project_name,
-                    'total_invitations': 0,
-                    'completed_count': 0,
-                    'scores': []
-                }
-            
-            project_data[project_id]['total_invitations'] += 1
-            
-            if invitation.status == 'completed':
-                project_data[project_id]['completed_count'] += 1
-                if invitation.score:
-                    project_data[project_id]['scores'].append(invitation.score)
-        
-        # 轉換為比較數據
-        comparison_data = []
-        for project_id, data in project_data.items():
-            completion_rate = (data['completed_count'] / data['total_invitations'] * 100) if data['total_invitations'] > 0 else 0
-            avg_score = sum(data['scores']) / len(data['scores']) if data['scores'] else 0
-            
-            comparison_data.append({
-                'name': data['name'],
-                'total_invitations': data['total_invitations'],
-                'completion_rate': round(completion_rate, 1),
-                'avg_score': round(avg_score, 1)
-            })
-        
-        return comparison_data
-        
-    except Exception as e:
-        return []
\ No newline at end of file
+    return [
+        {
+            'name': item['name'],
+            'total_invitations': item['total_invitations'],
+            'completion_rate': item['completion_rate'],
+            'avg_score': item['avg_score'],
+        }
+        for item in get_project_totals(enterprise_user, timezone.localdate(start_date))
+    ]
\ No newline at end of file
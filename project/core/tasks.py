@@ -318,4 +318,248 @@ def manual_crawl():
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+@shared_task
+def refresh_role_index_stats(project_id=None, full=False):
+    '''增量更新測驗項目的角色指數統計（雷達圖 z 值母體校正，建議每小時執行）'''
+    try:
+        from core.models import TestProjectResult
+        from core.services.role_index_stats import update_project_role_index_stats
+
+        if project_id is None:
+            project_ids = list(
+                TestProjectResult.objects.values_list('test_project_id', flat=True).distinct()
+            )
+        else:
+            project_ids = [project_id]
+
+        updated = {}
+        for pid in project_ids:
+            stats = update_project_role_index_stats(pid, full=full)
+            updated[pid] = stats.sample_count
+
+        return {
+            'success': True,
+            'projects': len(updated),
+            'message': f'已更新 {len(updated)} 個測驗項目的角色指數統計'
+        }
+
+    except Exception as e:
+        logger.error(f"更新角色指數統計失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def generate_report_pdf(job_id):
+    '''背景生成 PDF 報告'''
+    try:
+        from core.services.report_jobs import run_report_job
+
+        job = run_report_job(job_id)
+        return {
+            'success': job.status == 'completed',
+            'job_id': str(job.pk),
+            'status': job.status,
+            'error': job.error_message or None
+        }
+
+    except Exception as e:
+        logger.error(f"背景生成報告失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def cleanup_report_jobs(days=7):
+    '''清理舊的報告生成任務與檔案'''
+    try:
+        from core.services.report_jobs import cleanup_report_jobs as cleanup_jobs
+
+        deleted_count = cleanup_jobs(days=days)
+        logger.info(f"清理了 {deleted_count} 筆舊的報告任務")
+
+        return {
+            'success': True,
+            'deleted_count': deleted_count,
+            'message': f'清理了 {deleted_count} 筆報告任務'
+        }
+
+    except Exception as e:
+        logger.error(f"清理報告任務失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def generate_test_result_export(job_id):
+    '''背景產生測驗結果匯出檔案'''
+    try:
+        from core.services.test_result_export import run_export_job
+
+        job = run_export_job(job_id)
+        return {
+            'success': job.status == 'completed',
+            'job_id': str(job.pk),
+            'status': job.status,
+            'row_count': job.row_count,
+            'error': job.error_message or None
+        }
+
+    except Exception as e:
+        logger.error(f"背景匯出測驗結果失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def cleanup_export_jobs(days=3):
+    '''清理舊的匯出任務與檔案'''
+    try:
+        from core.services.test_result_export import cleanup_export_jobs as cleanup_jobs
+
+        deleted_count = cleanup_jobs(days=days)
+        logger.info(f"清理了 {deleted_count} 筆舊的匯出任務")
+
+        return {
+            'success': True,
+            'deleted_count': deleted_count,
+            'message': f'清理了 {deleted_count} 筆匯出任務'
+        }
+
+    except Exception as e:
+        logger.error(f"清理匯出任務失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def send_invitation_emails(job_id, offset=0):
+    '''背景寄送批量邀請信（每次處理一段，尚有未寄送時排入下一段）'''
+    try:
+        from core.services.bulk_invitations import dispatch_invitation_email_chunk, run_invitation_email_chunk
+
+        job, next_offset = run_invitation_email_chunk(job_id, offset)
+        if next_offset is not None:
+            dispatch_invitation_email_chunk(job.pk, next_offset)
+        return {
+            'success': job.status in ('running', 'completed'),
+            'job_id': str(job.pk),
+            'status': job.status,
+            'sent_count': job.sent_count,
+            'failed_count': job.failed_count,
+            'next_offset': next_offset,
+            'error': job.error_message or None
+        }
+
+    except Exception as e:
+        logger.error(f"背景寄送邀請信失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def cleanup_invitation_email_jobs(days=30):
+    '''清理舊的邀請信寄送任務（建議每日執行）'''
+    try:
+        from core.services.bulk_invitations import cleanup_invitation_email_jobs as cleanup_jobs
+
+        deleted_count = cleanup_jobs(days=days)
+        logger.info(f"清理了 {deleted_count} 筆舊的邀請信寄送任務")
+
+        return {
+            'success': True,
+            'deleted_count': deleted_count,
+            'message': f'清理了 {deleted_count} 筆邀請信寄送任務'
+        }
+
+    except Exception as e:
+        logger.error(f"清理邀請信寄送任務失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def flush_short_link_clicks():
+    '''將快取中的短網址點擊數批次寫入資料庫（建議每分鐘執行）'''
+    try:
+        from core.services.link_clicks import flush_click_counters
+
+        totals = flush_click_counters()
+        return {
+            'success': True,
+            **totals
+        }
+
+    except Exception as e:
+        logger.error(f"寫入短網址點擊數失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def reconcile_point_balances():
+    '''比對點數餘額與交易帳本並推進帳本快照（建議每日執行）'''
+    try:
+        from core.services.point_ledger import reconcile_point_balances as reconcile
+
+        totals = reconcile()
+        return {
+            'success': True,
+            'checked': totals['checked'],
+            'mismatched': totals['mismatched'],
+        }
+
+    except Exception as e:
+        logger.error(f"點數對帳失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def cleanup_expired_notifications():
+    '''刪除已過期的通知並扣除未讀計數（建議每分鐘執行，未讀徽章與列表的差異不超過一個間隔）'''
+    try:
+        from core.services.notification_counters import prune_expired_notifications
+
+        return {
+            'success': True,
+            'deleted': prune_expired_notifications(),
+        }
+
+    except Exception as e:
+        logger.error(f"清除過期通知失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def reconcile_notification_counts():
+    '''比對快取中的未讀通知計數與資料庫，清除不一致的計數（建議每日執行）'''
+    try:
+        from core.services.notification_counters import reconcile_unread_counts
+
+        totals = reconcile_unread_counts()
+        return {
+            'success': True,
+            'checked': totals['checked'],
+            'corrected': totals['corrected'],
+        }
+
+    except Exception as e:
+        logger.error(f"未讀通知計數對帳失敗：{str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
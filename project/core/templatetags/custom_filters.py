@@ -128,68 +128,14 @@ def get_headsupflag(raw_data, trait_name):
     if not trait_scores:
         return 0
     
-    # 方法1: 直接匹配 trait_name
-    if trait_name in trait_scores:
-        trait_data = trait_scores[trait_name]
+    # 依特質同義名稱群組（中文名稱、其他翻譯、英文系統名稱）查找
+    from core.services.project_scoring_graph import TRAIT_NAME_GROUPS
+
+    for name in [trait_name, *TRAIT_NAME_GROUPS.get(trait_name, [])]:
+        trait_data = trait_scores.get(name)
         if isinstance(trait_data, dict):
             return trait_data.get('headsupflag', 0)
     
-    # 方法2: 嘗試通過中文名稱映射匹配
-    chinese_name_mapping = {
-        'Analytical Thinking': ['分析思考能力', '分析性思考'],
-        'Curiosity': ['好奇心'],
-        'Lifelong Learning': ['終身學習'],
-        'Systems Thinking': ['系統性思維', '系統性思考'],
-        'Attention to Detail': ['注重細節', '準確嚴謹度'],
-        'Critical Thinking': ['批判性思考'],
-        'Cognitive Flexibility': ['認知靈活性', '認知彈性'],
-        'Change Agility': ['變化敏捷性', '適應敏捷力'],
-        'Self-Leadership': ['自我領導力', '自主領導力'],
-        'Creative Thinking': ['創意思考', '創造性思考'],
-        'Empathy': ['同理心'],
-        'Social Influence': ['社會影響力'],
-        'Achievement Motivation': ['成就動機', '卓越驅動力'],
-        'Decision-Making': ['決策能力', '高效決策力'],
-        'Resilience': ['韌性'],
-        'Active Listening': ['積極傾聽'],
-        'Interpersonal Communication': ['人際溝通', '溝通協調力'],
-        'Negotiation Skills': ['談判技巧', '協商談判力'],
-        'Social Intelligence': ['社會智能', '社交智商'],
-        'Dependability': ['可靠性'],
-        'AI Literacy': ['AI素養'],
-        'Self-Awareness': ['自我意識'],
-        'Self-Criticism': ['自我批評'],
-        'Self-Reflection': ['自我反思'],
-        'Social Desirability': ['社會期望反應'],
-        'Feedback Seeking': ['反饋尋求'],
-        'Insight': ['洞察力'],
-        'Difference Awareness': ['差異察覺']
-    }
-    
-    # 如果 trait_name 是英文（system_name），尋找對應的中文名稱
-    if trait_name in chinese_name_mapping:
-        alternative_names = chinese_name_mapping[trait_name]
-        for alt_name in alternative_names:
-            if alt_name in trait_scores:
-                trait_data = trait_scores[alt_name]
-                if isinstance(trait_data, dict):
-                    return trait_data.get('headsupflag', 0)
-    
-    # 方法3: 反向查找，如果 trait_name 是中文，查找是否有英文對應
-    for english_name, chinese_alternatives in chinese_name_mapping.items():
-        if trait_name in chinese_alternatives:
-            # 嘗試用英文名稱查找
-            if english_name in trait_scores:
-                trait_data = trait_scores[english_name]
-                if isinstance(trait_data, dict):
-                    return trait_data.get('headsupflag', 0)
-            # 嘗試用其他中文別名查找
-            for alt_name in chinese_alternatives:
-                if alt_name in trait_scores:
-                    trait_data = trait_scores[alt_name]
-                    if isinstance(trait_data, dict):
-                        return trait_data.get('headsupflag', 0)
-    
     return 0
 
 @register.filter
@@ -199,6 +145,7 @@ def get_category_by_name(test_project, category_name):
         return None
     
     try:
-        return test_project.categories.filter(name=category_name).first()
+        from core.services.project_scoring_graph import get_project_scoring_graph
+        return get_project_scoring_graph(test_project).category(category_name)
     except:
         return None
\ No newline at end of file
@@ -5,13 +5,16 @@ from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.db import transaction
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
-from .models import User, TestInvitee, TestInvitation, TestTemplate, TestCategory, Notification, TestProject, TestProjectAssignment
+from .models import User, TestInvitee, TestInvitation, TestTemplate, TestCategory, Notification, TestProject, TestProjectAssignment, InvitationEmailJob
 from .purchase_services import log_quota_usage
+from .services.link_clicks import get_open_stats
 from .services.test_result_listing import build_test_result_listing, ListingOptions
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +72,7 @@ def enterprise_test_dashboard(request):
 def invitee_list(request):
     """受測人員列表"""
     user = request.user
-    invitees = TestInvitee.objects.filter(enterprise=user)
+    invitees = TestInvitee.objects.filter(enterprise=user).with_progress()
     
     # 搜尋功能
     search = request.GET.get('search', '')
@@ -212,7 +215,10 @@ def invitation_list(request):
             Q(invitee__email__icontains=search)
         )
 
-    invitations = invitations.order_by('-invited_at')
+    open_stats = get_open_stats(invitations)
+    invitations = invitations.annotate(
+        link_clicks=Coalesce(Sum('short_links__click_count'), 0)
+    ).order_by('-invited_at')
 
     # 分頁
     paginator = Paginator(invitations, 20)
@@ -224,10 +230,22 @@ def invitation_list(request):
         'status_filter': status,
         'status_choices': TestInvitation.STATUS_CHOICES,
         'search': search,
+        'open_stats': open_stats,
+        'email_job': _get_email_job(user, request.GET.get('email_job')),
     }
     
     return render(request, 'test_management/invitation_list.html', context)
 
+
+def _get_email_job(user, job_id):
+    """批量邀請後顯示的邀請信寄送任務（僅限本人建立的任務）"""
+    if not job_id:
+        return None
+    try:
+        return InvitationEmailJob.objects.filter(pk=uuid.UUID(job_id), requested_by=user).first()
+    except ValueError:
+        return None
+
 @login_required
 @enterprise_required
 def test_templates(request):
@@ -18,6 +18,7 @@ from .models import (
     Notification, TestInvitation, TestProjectResult
 )
 from .purchase_services import record_enterprise_purchase, generate_order_number
+from .services.test_result_listing import refresh_result_scores
 from decimal import Decimal, InvalidOperation
 from django.urls import reverse
 import json
@@ -63,7 +64,9 @@ def _serialize_traits_for_form():
 @admin_required
 def test_project_list(request):
     """測驗項目列表"""
-    projects = TestProject.objects.all().select_related('created_by').prefetch_related('categories__traits')
+    projects = TestProject.objects.all().select_related('created_by').prefetch_related(
+        'categories__traits', 'enterprise_assignments'
+    )
     
     # 搜尋功能
     search = request.GET.get('search', '')
@@ -80,23 +83,23 @@ def test_project_list(request):
     
     projects = projects.order_by('-created_at')
     
-    # 為每個項目添加統計數據
-    for project in projects:
-        project.total_traits_count = sum(cat.traits.count() for cat in project.categories.all())
-    
-    # 分頁
+    # 分頁（只為當頁項目載入分類、特質與指派）
     paginator = Paginator(projects, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # 為每個項目添加統計數據（使用預先載入的資料，不逐一查詢）
+    for project in page_obj:
+        project.total_traits_count = sum(len(cat.traits.all()) for cat in project.categories.all())
+    
     # 統計數據（移除啟用/停用統計）
-    stats = {
-        'total': TestProject.objects.count(),
-        'all_open': TestProject.objects.filter(assignment_type='all_open').count(),
-        'enterprise_only': TestProject.objects.filter(assignment_type='enterprise_only').count(),
-        'individual_only': TestProject.objects.filter(assignment_type='individual_only').count(),
-        'specific_assignment': TestProject.objects.filter(assignment_type='specific_assignment').count(),
-    }
+    stats = TestProject.objects.order_by().aggregate(
+        total=Count('id'),
+        **{
+            assignment_type: Count('id', filter=Q(assignment_type=assignment_type))
+            for assignment_type in ('all_open', 'enterprise_only', 'individual_only', 'specific_assignment')
+        },
+    )
     
     context = {
         'page_obj': page_obj,
@@ -365,6 +368,7 @@ def test_project_edit(request, project_id):
                 # 新增：個人分享共同資訊
                 project.personal_share_title = request.POST.get('personal_share_title', '')
                 project.personal_share_footer_content = request.POST.get('personal_share_footer_content', '')
+                previous_score_fields = (project.score_field_system, project.prediction_field_system)
                 project.score_field_chinese = request.POST.get('score_field_chinese')
                 project.score_field_system = request.POST.get('score_field_system')
                 project.prediction_field_chinese = request.POST.get('prediction_field_chinese')
@@ -382,6 +386,10 @@ def test_project_edit(request, project_id):
                 
                 project.save()
 
+                # 分數欄位設定變更時，重新解析既有結果的排序用分數
+                if previous_score_fields != (project.score_field_system, project.prediction_field_system):
+                    refresh_result_scores(TestProjectResult.objects.filter(test_project=project))
+
                 # 更新測驗特質設定
                 project.project_trait_relations.all().delete()
                 project_traits_data = json.loads(request.POST.get('project_traits_data', '[]'))
@@ -14,7 +14,6 @@ from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
-from django.utils.text import slugify
 from .models import (
     TestInvitation, TestProjectResult, 
     TestProject, TestInvitee
@@ -23,6 +22,17 @@ from utils.crawler_service import PITestResultCrawler
 from utils.pdf_report_generator import generate_test_result_pdf
 from utils.radar_calculations import compute_role_based_scores
 from .services.test_result_listing import build_test_result_listing, ListingOptions
+from .services.dashboard_metrics import get_test_result_metrics
+from .services.test_result_export import (
+    EXPORT_FORMATS,
+    build_export_filenames,
+    filter_export_invitations,
+    iter_export_content,
+    normalize_format as normalize_export_format,
+)
+from .services.project_scoring_graph import get_project_scoring_graph, get_result_trait_scores
+from .services.role_index_stats import get_role_index_calibration
+from .services.score_percentiles import get_result_percentiles
 
 logger = logging.getLogger(__name__)
 
@@ -342,73 +352,32 @@ def test_result_detail(request, result_id):
 
     role_based_metrics = None
     mixed_roles = None
+    category_map = {}
 
     if result.raw_data and result.test_project:
         radar_mode = getattr(result.test_project, 'radar_mode', 'role')
         use_weighted = radar_mode == 'score'
         show_mixed_role = getattr(result.test_project, 'show_mixed_role', False)
 
-        matched_raw_keys = set()
-
-        def resolve_trait_score(trait):
-            trait_score = None
-            trait_scores_data = result.raw_data.get('trait_scores') if isinstance(result.raw_data, dict) else None
-            if isinstance(trait_scores_data, dict):
-                for key, value in trait_scores_data.items():
-                    value_dict = value if isinstance(value, dict) else None
-                    candidate_score = (
-                        value_dict.get('score') if value_dict and isinstance(value_dict.get('score'), (int, float))
-                        else value if isinstance(value, (int, float)) else None
-                    )
-                    if candidate_score is None:
-                        continue
-                    key_normalized = key.lower().replace(' ', '_')
-                    if (
-                        key == trait.system_name
-                        or key == trait.chinese_name
-                        or key_normalized == (trait.system_name or '').lower().replace(' ', '_')
-                    ):
-                        trait_score = float(candidate_score)
-                        matched_raw_keys.add(key)
-                        break
-
-            if trait_score is None and isinstance(result.raw_data, dict):
-                direct_keys = [
-                    trait.system_name,
-                    trait.chinese_name,
-                    (trait.system_name or '').lower().replace(' ', '_'),
-                ]
-                for key in direct_keys:
-                    if not key:
-                        continue
-                    value = result.raw_data.get(key)
-                    if isinstance(value, (int, float)):
-                        trait_score = float(value)
-                        matched_raw_keys.add(key)
-                        break
-                    if isinstance(value, dict) and isinstance(value.get('score'), (int, float)):
-                        trait_score = float(value['score'])
-                        matched_raw_keys.add(key)
-                        break
-            return trait_score
-
-        categories = result.test_project.categories.prefetch_related('category_traits__trait', 'traits').all()
-        category_map = {category.name: category for category in categories}
+        graph = get_project_scoring_graph(result.test_project)
+        category_map = graph.category_map()
+        trait_scores = get_result_trait_scores(result, graph)
         role_inputs = {}
         debug_project_traits = {}
 
-        for category in categories:
+        for category in graph.categories:
             category_trait_list = []
             trait_score_map = {}
 
-            for trait in category.traits.all():
-                score = resolve_trait_score(trait)
-                if isinstance(score, (int, float)):
-                    trait_score_map[trait.id] = score
+            for trait in graph.traits_for(category):
+                entry = trait_scores.get(trait.id)
+                if entry:
+                    trait_score_map[trait.id] = entry['score']
                     category_trait_list.append({
                         'name': trait.chinese_name,
-                        'score': score,
-                        'system_name': trait.system_name
+                        'score': entry['score'],
+                        'system_name': trait.system_name,
+                        'headsupflag': entry.get('headsupflag', 0),
                     })
 
             if not trait_score_map:
@@ -418,8 +387,7 @@ def test_result_detail(request, result_id):
 
             debug_traits_entries = []
             has_missing_trait = False
-            for relation in category.category_traits.select_related('trait').all():
-                trait = relation.trait
+            for trait, relation_weight in graph.relations_for(category):
                 if not trait:
                     continue
                 trait_score = float(trait_score_map[trait.id]) if trait.id in trait_score_map else None
@@ -430,7 +398,7 @@ def test_result_detail(request, result_id):
                     'trait_id': trait.id,
                     'system_name': trait.system_name,
                     'chinese_name': trait.chinese_name,
-                    'weight': float(relation.weight or 0),
+                    'weight': float(relation_weight or 0),
                     'matched': matched,
                     'score': trait_score,
                 })
@@ -445,12 +413,11 @@ def test_result_detail(request, result_id):
 
             raw_score = Decimal('0')
             weight_sum = Decimal('0')
-            for relation in category.category_traits.select_related('trait').all():
-                trait = relation.trait
+            for trait, relation_weight in graph.relations_for(category):
                 if not trait or trait.id not in trait_score_map:
                     continue
                 try:
-                    weight = Decimal(str(relation.weight))
+                    weight = Decimal(str(relation_weight))
                 except (InvalidOperation, TypeError, ValueError):
                     continue
                 score_value = Decimal(str(trait_score_map[trait.id]))
@@ -473,6 +440,7 @@ def test_result_detail(request, result_id):
             role_based_metrics = compute_role_based_scores(
                 role_inputs,
                 show_mixed_role=show_mixed_role,
+                **get_role_index_calibration(result.test_project_id),
             )
             if use_weighted:
                 category_scores = {
@@ -528,24 +496,18 @@ def test_result_detail(request, result_id):
             key_traits[trait_name] = trait_data
 
     debug_raw_traits = []
-    if isinstance(result.raw_data, dict):
+    if isinstance(result.raw_data, dict) and result.test_project:
         trait_scores_data = result.raw_data.get('trait_scores')
         if isinstance(trait_scores_data, dict):
+            graph = get_project_scoring_graph(result.test_project)
             for trait_key, trait_value in trait_scores_data.items():
-                if isinstance(trait_value, dict):
-                    debug_raw_traits.append({
-                        'key': trait_key,
-                        'chinese_name': trait_value.get('chinese_name', ''),
-                        'score': trait_value.get('score'),
-                        'matched': trait_key in matched_raw_keys or trait_value.get('chinese_name', '') in matched_raw_keys,
-                    })
-                else:
-                    debug_raw_traits.append({
-                        'key': trait_key,
-                        'chinese_name': '',
-                        'score': trait_value,
-                        'matched': trait_key in matched_raw_keys,
-                    })
+                chinese_name = trait_value.get('chinese_name', '') if isinstance(trait_value, dict) else ''
+                debug_raw_traits.append({
+                    'key': trait_key,
+                    'chinese_name': chinese_name,
+                    'score': trait_value.get('score') if isinstance(trait_value, dict) else trait_value,
+                    'matched': graph.match_trait(trait_key, chinese_name) is not None,
+                })
 
     debug_summary_json = ''
     show_debug = request.GET.get('debug') == '1'
@@ -591,6 +553,13 @@ def test_result_detail(request, result_id):
     logger.info(f"Final category_values: {category_values}")
     if role_based_metrics:
         logger.info(f"Role-based metrics: {role_based_metrics}")
+
+    # 最高/最低分類直接由同一測驗項目的分類對應取得，不再於模板中逐一查詢
+    highest_category = None
+    lowest_category = None
+    if category_scores:
+        highest_category = category_map.get(max(category_scores, key=category_scores.get))
+        lowest_category = category_map.get(min(category_scores, key=category_scores.get))
     
     context = {
         'result': result,
@@ -605,6 +574,10 @@ def test_result_detail(request, result_id):
         'role_based_metrics': role_based_metrics,
         'mixed_role_categories': mixed_role_categories,
         'mixed_role_sentence': mixed_role_sentence,
+        'category_objects': category_map,
+        'highest_category': highest_category,
+        'lowest_category': lowest_category,
+        'score_percentiles': get_result_percentiles(result),
         'debug_project_traits': debug_project_traits if show_debug else {},
         'debug_raw_traits': debug_raw_traits if show_debug else [],
         'debug_summary_json': debug_summary_json,
@@ -649,153 +622,22 @@ def view_raw_data(request, result_id):
 @login_required
 @enterprise_required
 def export_filtered_test_results(request):
-    """匯出目前過濾的測驗結果為 CSV"""
-    import csv
-    from django.utils.encoding import smart_str
-    from django.http import HttpResponse
-
-    user = request.user
+    """匯出目前過濾的測驗結果（CSV 或 XLSX，邊查詢邊輸出）"""
+    from django.http import StreamingHttpResponse
+    from utils.pdf_report_generator import build_content_disposition
 
-    if user.user_type == 'admin':
-        invitations = TestInvitation.objects.select_related('invitee', 'test_project', 'testprojectresult')
-    else:
-        invitations = TestInvitation.objects.filter(enterprise=user).select_related('invitee', 'test_project', 'testprojectresult')
+    export_format = normalize_export_format(request.GET.get('format'))
+    invitations = filter_export_invitations(request.user, request.GET)
+    ascii_filename, utf8_filename = build_export_filenames(request.user, invitations, export_format)
 
-    search = request.GET.get('search', '').strip()
-    if search:
-        invitations = invitations.filter(
-            Q(invitee__name__icontains=search) |
-            Q(invitee__email__icontains=search)
-        )
-
-    project_id = request.GET.get('project', '')
-    if project_id:
-        invitations = invitations.filter(test_project__id=project_id)
-
-    identity_filter = request.GET.get('identity', '')
-    if identity_filter:
-        invitations = invitations.filter(invitee__status=identity_filter)
-
-    position_filter = request.GET.get('position', '')
-    if position_filter:
-        invitations = invitations.filter(invitee__position=position_filter)
-
-    status = request.GET.get('status', '')
-    if status:
-        invitations = invitations.filter(status=status)
-
-    crawl_status = request.GET.get('crawl_status', '')
-    if crawl_status == 'pending':
-        invitations = invitations.filter(
-            Q(testprojectresult__isnull=True) |
-            Q(testprojectresult__crawl_status='pending')
-        )
-    elif crawl_status in ['crawling', 'completed', 'failed']:
-        invitations = invitations.filter(testprojectresult__crawl_status=crawl_status)
-
-    invitations = invitations.annotate(
-        effective_score=Coalesce(
-            'score',
-            'testprojectresult__score_value',
-            Value(0.0),
-            output_field=FloatField()
-        )
+    response = StreamingHttpResponse(
+        iter_export_content(invitations, export_format),
+        content_type=EXPORT_FORMATS[export_format][1]
     )
+    response['Content-Disposition'] = build_content_disposition(ascii_filename, utf8_filename)
+    return response
 
-    order_option = request.GET.get('order', 'completion_desc')
-    if order_option == 'completion_asc':
-        invitations = invitations.order_by(
-            F('completed_at').asc(nulls_last=True),
-            '-invited_at'
-        )
-    elif order_option == 'score_desc':
-        invitations = invitations.order_by(
-            F('effective_score').desc(),
-            F('completed_at').desc(nulls_last=True)
-        )
-    elif order_option == 'score_asc':
-        invitations = invitations.order_by(
-            F('effective_score').asc(),
-            F('completed_at').asc(nulls_last=True)
-        )
-    else:
-        invitations = invitations.order_by(
-            F('completed_at').desc(nulls_last=True),
-            '-invited_at'
-        )
-
-    response = HttpResponse(content_type='text/csv')
-    timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-
-    if user.user_type == 'enterprise':
-        company_name = getattr(getattr(user, 'enterprise_profile', None), 'company_name', None)
-    else:
-        first_invitation = invitations.first()
-        company_name = None
-        if first_invitation and first_invitation.enterprise:
-            company_profile = getattr(getattr(first_invitation.enterprise, 'enterprise_profile', None), 'company_name', None)
-            company_name = company_profile or first_invitation.enterprise.username
-
-    if not company_name:
-        company_name = 'test_results'
-
-    safe_ascii = slugify(company_name, allow_unicode=False)
-    if not safe_ascii:
-        safe_ascii = 'test_results'
-    ascii_filename = f'{safe_ascii}_{timestamp}.csv'
-
-    from urllib.parse import quote
-    utf8_filename = f'{company_name}_{timestamp}.csv'
-    quoted_utf8 = quote(utf8_filename)
-
-    response['Content-Disposition'] = (
-        f"attachment; filename={ascii_filename}; filename*=UTF-8''{quoted_utf8}"
-    )
-
-    writer = csv.writer(response)
-    writer.writerow([
-        smart_str('評鑑別'),
-        smart_str('受試者名字'),
-        smart_str('電子郵件'),
-        smart_str('身份別'),
-        smart_str('CI分數'),
-        smart_str('預測值分數'),
-    ])
-
-    for invitation in invitations:
-        project_name = invitation.test_project.name if invitation.test_project else ''
-        name = invitation.invitee.name
-        email = invitation.invitee.email
-        identity = invitation.invitee.get_status_display()
-
-        result = getattr(invitation, 'testprojectresult', None)
-        ci_score = ''
-        prediction_score = ''
-
-        if result and result.crawl_status == 'completed':
-            raw = result.raw_data or {}
-            metrics = raw.get('performance_metrics', {})
-
-            ci_score = metrics.get('CI_Raw_Value')
-            if not ci_score:
-                score_field = getattr(invitation.test_project, 'score_field_system', None)
-                if score_field:
-                    ci_score = metrics.get(score_field) or raw.get(score_field)
-
-            prediction_field = getattr(invitation.test_project, 'prediction_field_system', None)
-            if prediction_field:
-                prediction_score = metrics.get(prediction_field) or raw.get(prediction_field) or ''
-
-        writer.writerow([
-            smart_str(project_name),
-            smart_str(name),
-            smart_str(email),
-            smart_str(identity),
-            smart_str(ci_score if ci_score is not None else ''),
-            smart_str(prediction_score if prediction_score is not None else ''),
-        ])
 
-    return response
 def export_test_result(request, result_id):
     """匯出測驗結果"""
     user = request.user
@@ -1003,46 +845,19 @@ def bulk_crawl_results(request):
 @admin_required
 def test_result_dashboard(request):
     """測驗結果管理儀表板（管理員專用）"""
-    # 統計數據
-    total_invitations = TestInvitation.objects.count()
-    completed_invitations = TestInvitation.objects.filter(status='completed').count()
-    crawled_results = TestProjectResult.objects.count()
-    failed_results = TestProjectResult.objects.filter(crawl_status='failed').count()
+    # 統計數據（快取，資料異動時失效）
+    metrics = get_test_result_metrics()
     
     # 最近的爬蟲活動
     recent_results = TestProjectResult.objects.select_related(
         'test_invitation__invitee', 'test_project'
     ).order_by('-crawled_at')[:10]
     
-    # 爬蟲狀態分佈
-    crawl_status_stats = {
-        'pending': TestProjectResult.objects.filter(crawl_status='pending').count(),
-        'crawling': TestProjectResult.objects.filter(crawl_status='crawling').count(),
-        'completed': TestProjectResult.objects.filter(crawl_status='completed').count(),
-        'failed': TestProjectResult.objects.filter(crawl_status='failed').count(),
-    }
-    
-    # 測驗項目使用統計
-    from django.db.models import Count
-    project_stats = TestInvitation.objects.values(
-        'test_project__name'
-    ).annotate(
-        invitation_count=Count('id'),
-        completed_count=Count('id', filter=Q(status='completed'))
-    ).order_by('-invitation_count')[:10]
-    
     context = {
-        'stats': {
-            'total_invitations': total_invitations,
-            'completed_invitations': completed_invitations,
-            'crawled_results': crawled_results,
-            'failed_results': failed_results,
-            'completion_rate': (completed_invitations / total_invitations * 100) if total_invitations > 0 else 0,
-            'crawl_rate': (crawled_results / completed_invitations * 100) if completed_invitations > 0 else 0,
-        },
+        'stats': metrics['stats'],
         'recent_results': recent_results,
-        'crawl_status_stats': crawl_status_stats,
-        'project_stats': project_stats,
+        'crawl_status_stats': metrics['crawl_status_stats'],
+        'project_stats': metrics['project_stats'],
     }
     
     return render(request, 'admin/test_result_dashboard.html', context)
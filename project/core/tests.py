@@ -1,20 +1,183 @@
+import math
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
 from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
 
-from django.test import TestCase
+import numpy as np
+
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends import locmem
+from django.core.cache import cache, caches
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection
+from django.db.models import F, QuerySet
 from django.urls import reverse
 from django.utils import timezone
 
 from .models import (
+    EnterpriseProfile,
+    EnterpriseQuotaUsageLog,
+    IndividualTestRecord,
+    IndividualTestResult,
+    InvitationDailyStats,
+    InvitationEmailJob,
+    Notification,
+    PointBalanceSnapshot,
+    PointDailyStats,
+    PointTransaction,
+    ProjectRoleIndexStats,
+    ReportJob,
+    ResultTraitScore,
     TestInvitation,
     TestInvitee,
     TestProject,
+    TestProjectCategory,
+    ShortLink,
+    ShortLinkDailyClicks,
+    TestProjectAssignment,
+    TestProjectCategoryTrait,
     TestProjectResult,
+    Trait,
     User,
+    UserPointBalance,
+)
+from .decorators import check_permission
+from .notification_service import NotificationService
+from .middleware import RateLimitMiddleware, SecurityMiddleware, set_blocked_ips
+from .services.bulk_invitations import (
+    create_bulk_invitations,
+    enqueue_invitation_emails,
+    run_invitation_email_chunk,
+    run_invitation_email_job,
+)
+from .services.point_ledger import reconcile_point_balances
+from .services.point_rollup import get_consumption_windows, rebuild_point_rollups
+from .services.counter_rows import increment_or_create
+from .services.notification_counters import (
+    get_unread_count,
+    prune_expired_notifications,
+    reconcile_unread_counts,
+)
+from .services.link_clicks import flush_click_counters, get_open_stats, record_click
+from .services.dashboard_metrics import get_admin_metrics, get_enterprise_metrics
+from .services.invitation_rollup import (
+    get_daily_series,
+    get_project_totals,
+    get_status_totals,
+    rebuild_invitation_rollups,
+)
+from .services.project_scoring_graph import (
+    get_project_scoring_graph,
+    get_result_trait_scores,
+    invalidate_project_scoring_graph,
+)
+from .services.report_jobs import enqueue_report_job, run_report_job
+from .services.test_result_export import run_export_job
+from .services.trait_search_index import rebuild_trait_search_index
+from .services.test_result_listing import ListingOptions, build_test_result_listing
+from .services.role_index_stats import (
+    get_role_index_calibration,
+    update_project_role_index_stats,
+)
+from .services.score_percentiles import (
+    get_histogram,
+    percentile_rank,
+    rebuild_score_histograms,
+    top_percent,
 )
+from .statistics_views import get_score_distribution
+from .views import permission_context_processor
+from utils.email_service import BulkMailer
+from utils.url_shortener import URLShortenerService
+from utils.ip_blocklist import IPBlocklist
+from utils.permission_handler import PermissionHandler
+from utils.point_service import PointService
+from utils.rate_limit import MemoryCounterStore, PrefixTrie, Rate, SlidingWindowLimiter
+from utils.tiered_cache import (
+    CacheNamespace,
+    check_l2_backend,
+    clear_local_cache,
+    get_cache_metrics,
+    l2_is_shared,
+    namespace,
+)
+from utils.radar_calculations import (
+    _vector_erf,
+    compute_role_based_scores,
+    compute_role_based_scores_batch,
+    stack_role_inputs,
+    unpack_role_based_batch,
+)
+
+
+class InvitationFixtureMixin:
+    """建立用戶、測驗項目、邀請與測驗結果的共用測試資料（邀請預設屬於 self.enterprise 與 self.project）"""
+
+    def create_user(self, username, user_type='enterprise', **kwargs):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password',
+            user_type=user_type,
+            **kwargs
+        )
+
+    def create_project(self, name, created_by, **kwargs):
+        fields = {
+            'test_link': 'https://example.com/test',
+            'score_field_chinese': 'CI Score',
+            'score_field_system': 'ci_score',
+            'prediction_field_chinese': 'Prediction Score',
+            'prediction_field_system': 'pred_score',
+            **kwargs,
+        }
+        return TestProject.objects.create(name=name, created_by=created_by, **fields)
+
+    def invite(self, name, status='pending', *, enterprise=None, project=None, invitee=None, **kwargs):
+        """建立邀請；未指定 invitee 時以 name 建立新的受測者"""
+        enterprise = enterprise or self.enterprise
+        if invitee is None:
+            invitee = TestInvitee.objects.create(
+                enterprise=enterprise,
+                name=name,
+                email=f"{name.lower().replace(' ', '_')}@example.com",
+            )
+        kwargs.setdefault('expires_at', timezone.now() + timedelta(days=7))
+        return TestInvitation.objects.create(
+            enterprise=enterprise,
+            invitee=invitee,
+            test_project=project or self.project,
+            status=status,
+            points_consumed=1,
+            **kwargs
+        )
+
+    def create_result(self, invitation, **kwargs):
+        kwargs.setdefault('crawl_status', 'completed')
+        return TestProjectResult.objects.create(
+            test_invitation=invitation,
+            test_project=invitation.test_project,
+            **kwargs
+        )
 
 
 class TestResultListSortingTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.now = timezone.now()
         self.enterprise = User.objects.create_user(
             username='enterprise_user',
@@ -188,3 +351,1571 @@ class TestResultListSortingTests(TestCase):
         self.assertEqual(scores['Charlie'][1], 63.0)  # falls back to score field
         self.assertEqual(scores['Echo'][0], 42.0)  # prediction_value fallback
         self.assertEqual(scores['Echo'][1], 42.0)  # score_value fallback when CI absent
+
+    def test_scores_are_materialized_on_save_and_backfilled(self):
+        result = TestProjectResult.objects.get(test_invitation=self.charlie)
+        self.assertEqual((result.prediction_score, result.ci_score), (55.0, 63.0))
+
+        TestProjectResult.objects.update(prediction_score=None, ci_score=None)
+        call_command('backfill_result_scores', stdout=StringIO())
+        result.refresh_from_db()
+        self.assertEqual((result.prediction_score, result.ci_score), (55.0, 63.0))
+
+        result.prediction_value = ''
+        result.raw_data = {}
+        result.save(update_fields=['raw_data', 'prediction_value'])
+        result.refresh_from_db()
+        self.assertEqual((result.prediction_score, result.ci_score), (None, 63.0))
+
+    def test_cursor_pages_follow_full_ordering(self):
+        invitations = TestInvitation.objects.filter(enterprise=self.enterprise).select_related(
+            'invitee', 'test_project', 'testprojectresult'
+        )
+        options = ListingOptions(user=self.enterprise, per_page=2)
+
+        def fetch_page(params):
+            request = RequestFactory().get(reverse('test_result_list'), params)
+            return build_test_result_listing(request, invitations, options=options)['page_obj']
+
+        for order_option in ('score_desc', 'score_asc', 'completion_desc', 'completion_asc'):
+            expected, _ = self._fetch_ordered_names(order_option)
+
+            names = []
+            params = {'order': order_option}
+            while True:
+                page = fetch_page(params)
+                names.extend(inv.invitee.name for inv in page.object_list)
+                if not page.has_next:
+                    break
+                params = {'order': order_option, 'after': page.next_cursor}
+
+            self.assertEqual(names, expected, order_option)
+            self.assertEqual(page.total_count, 5)
+
+            # 由最後一頁往回取上一頁
+            previous = fetch_page({'order': order_option, 'before': page.previous_cursor})
+            self.assertEqual([inv.invitee.name for inv in previous.object_list], expected[2:4])
+            self.assertTrue(previous.has_previous)
+            self.assertTrue(previous.has_next)
+
+        # 遭竄改的游標回到第一頁
+        page = fetch_page({'order': 'score_desc', 'after': 'invalid'})
+        self.assertEqual([inv.invitee.name for inv in page.object_list], ['Alpha', 'Charlie'])
+        self.assertFalse(page.has_previous)
+
+    def test_sort_keys_follow_result_changes(self):
+        bravo_result = TestProjectResult.objects.get(test_invitation=self.bravo)
+        bravo_result.prediction_value = '99'
+        bravo_result.save(update_fields=['prediction_value'])
+        TestProjectResult.objects.get(test_invitation=self.echo).delete()
+
+        names, _ = self._fetch_ordered_names('score_desc')
+        self.assertEqual(names, ['Bravo', 'Alpha', 'Charlie', 'Delta', 'Echo'])
+
+        # 繞過 save 的更新由 backfill 指令修復
+        TestInvitation.objects.filter(pk=self.alpha.pk).update(sort_score_desc=0)
+        call_command('backfill_result_scores', stdout=StringIO())
+        names, _ = self._fetch_ordered_names('score_desc')
+        self.assertEqual(names, ['Bravo', 'Alpha', 'Charlie', 'Delta', 'Echo'])
+
+    def test_total_count_is_cached_or_skipped(self):
+        invitations = TestInvitation.objects.filter(enterprise=self.enterprise)
+        request = RequestFactory().get(reverse('test_result_list'))
+        options = ListingOptions(user=self.enterprise, per_page=2)
+        build_test_result_listing(request, invitations, options=options)
+
+        with self.assertNumQueries(1):  # 只查詢該頁，總筆數取自快取
+            page = build_test_result_listing(request, invitations, options=options)['page_obj']
+        self.assertEqual(page.total_count, 5)
+
+        options.count_total = False
+        page = build_test_result_listing(request, invitations, options=options)['page_obj']
+        self.assertIsNone(page.total_count)
+
+
+class ProjectScoringGraphTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        creator = self.create_user('graph_admin', user_type='admin', is_staff=True)
+        self.project = self.create_project('Graph Project', creator)
+        self.leader = TestProjectCategory.objects.create(
+            test_project=self.project,
+            name='領導者',
+            test_link='https://example.com/leader',
+            advantage_analysis='',
+            disadvantage_analysis='',
+        )
+        self.analyst = TestProjectCategory.objects.create(
+            test_project=self.project,
+            name='分析師',
+            test_link='https://example.com/analyst',
+            advantage_analysis='',
+            disadvantage_analysis='',
+            sort_order=1,
+        )
+        self.decision = Trait.objects.create(chinese_name='高效決策力', system_name='Decision-Making')
+        self.analysis = Trait.objects.create(chinese_name='分析性思考', system_name='Analytical Thinking')
+        TestProjectCategoryTrait.objects.create(category=self.leader, trait=self.decision, weight=Decimal('2.00'))
+        TestProjectCategoryTrait.objects.create(category=self.leader, trait=self.analysis, weight=Decimal('1.00'), sort_order=1)
+        TestProjectCategoryTrait.objects.create(category=self.analyst, trait=self.analysis, weight=Decimal('1.50'))
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_graph_is_built_with_constant_queries_and_cached(self):
+        with self.assertNumQueries(2):
+            graph = get_project_scoring_graph(self.project)
+
+        self.assertEqual([category.name for category in graph.categories], ['領導者', '分析師'])
+        self.assertEqual(
+            [trait.system_name for trait in graph.traits_for(self.leader)],
+            ['Analytical Thinking', 'Decision-Making'],
+        )
+        self.assertEqual(
+            [(trait.id, weight) for trait, weight in graph.relations_for(self.leader)],
+            [(self.decision.id, Decimal('2.00')), (self.analysis.id, Decimal('1.00'))],
+        )
+        self.assertEqual(graph.category('分析師').id, self.analyst.id)
+        self.assertIn('Decision-Making', graph.aliases_for(self.decision))
+
+        with self.assertNumQueries(0):
+            get_project_scoring_graph(self.project.id)
+
+    def test_invalidation_rebuilds_after_commit(self):
+        get_project_scoring_graph(self.project)
+        self.analyst.name = '策略分析師'
+        self.analyst.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_project_scoring_graph(self.project.id)
+
+        graph = get_project_scoring_graph(self.project)
+        self.assertIsNotNone(graph.category('策略分析師'))
+        self.assertIsNone(graph.category('分析師'))
+
+    def test_model_changes_invalidate_through_signals(self):
+        get_project_scoring_graph(self.project)
+        relation = TestProjectCategoryTrait.objects.get(category=self.analyst, trait=self.analysis)
+        with self.captureOnCommitCallbacks(execute=True):
+            relation.weight = Decimal('3.00')
+            relation.save()
+        self.assertEqual(
+            get_project_scoring_graph(self.project).relations_for(self.analyst)[0][1], Decimal('3.00')
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.analyst.traits.remove(self.analysis)
+        self.assertEqual(get_project_scoring_graph(self.project).relations_for(self.analyst), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leader.delete()
+        self.assertIsNone(get_project_scoring_graph(self.project).category('領導者'))
+
+    def _create_result(self, raw_data):
+        invitation = self.invite('Graph Invitee', 'completed', enterprise=self.project.created_by)
+        return self.create_result(invitation, raw_data=raw_data)
+
+    def test_result_save_stores_canonical_trait_scores(self):
+        result = self._create_result({
+            'trait_scores': {
+                '決策能力': {'chinese_name': '決策能力', 'score': 80, 'headsupflag': 1},
+                'analytical thinking': 65,
+                'Unknown Trait': {'chinese_name': '未知特質', 'score': 10},
+            },
+        })
+
+        self.assertEqual(result.trait_score_map, {
+            str(self.decision.id): {'score': 80.0, 'headsupflag': 1},
+            str(self.analysis.id): {'score': 65.0, 'headsupflag': 0},
+        })
+        with self.assertNumQueries(0):
+            trait_scores = get_result_trait_scores(result)
+        self.assertEqual(trait_scores[self.decision.id]['score'], 80.0)
+
+    def test_legacy_root_scores_are_matched(self):
+        result = self._create_result({'decision-making': 72, '分析性思考': {'score': 58}})
+
+        self.assertEqual(result.trait_score_map, {
+            str(self.decision.id): {'score': 72.0, 'headsupflag': 0},
+            str(self.analysis.id): {'score': 58.0, 'headsupflag': 0},
+        })
+
+    def test_invalidation_clears_stored_trait_scores(self):
+        result = self._create_result({'trait_scores': {'Decision-Making': 70}})
+        new_trait = Trait.objects.create(chinese_name='好奇心', system_name='Curiosity')
+        TestProjectCategoryTrait.objects.create(category=self.analyst, trait=new_trait, weight=Decimal('1.00'))
+        result.raw_data['trait_scores']['Curiosity'] = 90
+        TestProjectResult.objects.filter(pk=result.pk).update(raw_data=result.raw_data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_project_scoring_graph(self.project.id)
+
+        result.refresh_from_db()
+        self.assertEqual(result.trait_score_map, {})
+        self.assertEqual(
+            {trait_id: entry['score'] for trait_id, entry in get_result_trait_scores(result).items()},
+            {self.decision.id: 70.0, new_trait.id: 90.0},
+        )
+        result.refresh_from_db()
+        self.assertIn(str(new_trait.id), result.trait_score_map)
+
+
+class RoleBasedScoresBatchTests(SimpleTestCase):
+    ROLE_NAMES = ['領導者', '分析師', '協調者', '創新者', '執行者']
+
+    def _random_cohort(self, rng, size):
+        cohort = []
+        for _ in range(size):
+            role_inputs = {}
+            for name in rng.sample(self.ROLE_NAMES, rng.randint(0, len(self.ROLE_NAMES))):
+                max_score = rng.choice([0.0, 50.0, 100.0, 120.0])
+                raw_score = rng.uniform(0, max_score) if max_score else 0.0
+                role_inputs[name] = {
+                    'raw_score': raw_score,
+                    'max_score': max_score,
+                    'weight_sum': rng.uniform(0, 5),
+                    'role_index': raw_score / max_score * 100 if max_score else 0.0,
+                }
+            cohort.append(role_inputs)
+        return cohort
+
+    def _assert_matches_scalar(self, cohort, show_mixed_role, **kwargs):
+        role_names, raw, maximum, weights, role_index, mask, order = stack_role_inputs(cohort)
+        batch = compute_role_based_scores_batch(
+            role_names, raw, maximum, weights, show_mixed_role,
+            role_index=role_index, mask=mask, order=order, **kwargs
+        )
+        for row, role_inputs in enumerate(cohort):
+            expected = compute_role_based_scores(role_inputs, show_mixed_role[row], **kwargs)
+            actual = unpack_role_based_batch(batch, row)
+            self.assertEqual(actual.keys(), expected.keys())
+            for key, value in expected.items():
+                if isinstance(value, dict):
+                    # numpy 的 exp 與向量化 erf 可能與 math 差數個 ulp
+                    self.assertEqual(list(actual[key]), list(value))
+                    np.testing.assert_allclose(
+                        list(actual[key].values()), list(value.values()), rtol=1e-12, atol=1e-12
+                    )
+                else:
+                    self.assertEqual(actual[key], value, key)
+
+    def test_batch_matches_scalar_results(self):
+        rng = random.Random(20240601)
+        cohort = self._random_cohort(rng, 200)
+        show_mixed_role = [rng.random() < 0.8 for _ in cohort]
+
+        self._assert_matches_scalar(cohort, show_mixed_role)
+        self._assert_matches_scalar(cohort, show_mixed_role, role_index_mean=60.0, role_index_std=10.0)
+        self._assert_matches_scalar(
+            cohort, show_mixed_role, tau=3.0, mix_threshold=15.0, double_role_threshold=3.0
+        )
+
+    def test_vector_erf_within_one_ulp_of_math_erf(self):
+        values = np.concatenate([
+            np.random.default_rng(20240601).uniform(-7.0, 7.0, 20000),
+            [0.0, -0.0, 0.84375, 1.25, 1 / 0.35, 6.0, -6.0, 1e-300],
+        ])
+        np.testing.assert_array_max_ulp(_vector_erf(values), np.array([math.erf(v) for v in values]), maxulp=1)
+
+    def test_mixed_roles_selected_for_aligned_top_roles(self):
+        batch = compute_role_based_scores_batch(
+            ['領導者', '分析師', '協調者'],
+            [[80.0, 79.0, 78.0], [90.0, 40.0, 20.0]],
+            [[100.0, 100.0, 100.0], [100.0, 100.0, 100.0]],
+            show_mixed_role=True,
+            tau=20.0,
+        )
+        self.assertEqual(batch['mixed_roles'], [['領導者', '分析師', '協調者'], None])
+
+
+class RoleIndexStatsTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.enterprise = self.create_user('stats_enterprise')
+        self.project = self.create_project('Stats Project', self.enterprise)
+        leader = TestProjectCategory.objects.create(
+            test_project=self.project,
+            name='領導者',
+            test_link='https://example.com/leader',
+            advantage_analysis='',
+            disadvantage_analysis='',
+        )
+        analyst = TestProjectCategory.objects.create(
+            test_project=self.project,
+            name='分析師',
+            test_link='https://example.com/analyst',
+            advantage_analysis='',
+            disadvantage_analysis='',
+        )
+        decision = Trait.objects.create(chinese_name='高效決策力', system_name='Decision-Making')
+        analysis = Trait.objects.create(chinese_name='分析性思考', system_name='Analytical Thinking')
+        TestProjectCategoryTrait.objects.create(category=leader, trait=decision, weight=Decimal('3.00'))
+        TestProjectCategoryTrait.objects.create(category=leader, trait=analysis, weight=Decimal('1.00'))
+        TestProjectCategoryTrait.objects.create(category=analyst, trait=analysis, weight=Decimal('1.00'))
+
+    def tearDown(self):
+        cache.clear()
+
+    def _create_result(self, name, decision, analysis):
+        return self.create_result(
+            self.invite(name, 'completed'),
+            raw_data={'trait_scores': {'Decision-Making': decision, '分析思考能力': analysis}},
+        )
+
+    @staticmethod
+    def _role_indexes(decision, analysis):
+        return [(decision * 3 + analysis) / 4, analysis]
+
+    def _assert_stats(self, stats, values):
+        self.assertEqual(stats.sample_count, len(values))
+        self.assertAlmostEqual(stats.mean, statistics.mean(values), places=9)
+        self.assertAlmostEqual(stats.std, statistics.stdev(values), places=9)
+
+    def test_welford_add_and_remove_match_batch_statistics(self):
+        values = [62.5, 71.0, 48.25, 90.0, 55.5]
+        stats = ProjectRoleIndexStats()
+        for value in values:
+            stats.add_sample(value)
+        self._assert_stats(stats, values)
+
+        stats.remove_sample(90.0)
+        self._assert_stats(stats, [62.5, 71.0, 48.25, 55.5])
+
+    def test_incremental_update_follows_recrawled_and_deleted_results(self):
+        alpha = self._create_result('Alpha', 80, 60)
+        self._create_result('Bravo', 40, 70)
+        charlie = self._create_result('Charlie', 65, 50)
+
+        stats = update_project_role_index_stats(self.project.id)
+        self._assert_stats(
+            stats,
+            self._role_indexes(80, 60) + self._role_indexes(40, 70) + self._role_indexes(65, 50),
+        )
+
+        alpha.raw_data = {'trait_scores': {'Decision-Making': 90, '分析思考能力': 30}}
+        alpha.save()
+        stats = update_project_role_index_stats(self.project.id)
+        expected = self._role_indexes(90, 30) + self._role_indexes(40, 70) + self._role_indexes(65, 50)
+        self._assert_stats(stats, expected)
+
+        rebuilt = update_project_role_index_stats(self.project.id, full=True)
+        self._assert_stats(rebuilt, expected)
+
+        charlie.delete()
+        self._assert_stats(
+            ProjectRoleIndexStats.objects.get(test_project=self.project),
+            self._role_indexes(90, 30) + self._role_indexes(40, 70),
+        )
+
+    def test_results_committed_after_a_refresh_are_not_skipped(self):
+        self._create_result('Alpha', 80, 60)
+        stats = update_project_role_index_stats(self.project.id)
+        self.assertLess(stats.synced_through, timezone.now())
+
+        # 在上次同步前儲存、同步後才提交的結果：updated_at 早於已處理的結果
+        bravo = self._create_result('Bravo', 40, 70)
+        TestProjectResult.objects.filter(pk=bravo.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        stats = update_project_role_index_stats(self.project.id)
+        self._assert_stats(stats, self._role_indexes(80, 60) + self._role_indexes(40, 70))
+
+    def test_calibration_requires_minimum_samples_and_is_cached(self):
+        self._create_result('Alpha', 80, 60)
+        self._create_result('Bravo', 40, 70)
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = update_project_role_index_stats(self.project.id)
+
+        self.assertEqual(get_role_index_calibration(self.project), {})
+
+        cache.clear()
+        with mock.patch('core.services.role_index_stats.MIN_CALIBRATION_SAMPLES', 4):
+            calibration = get_role_index_calibration(self.project)
+        self.assertEqual(
+            calibration,
+            {'role_index_mean': stats.mean, 'role_index_std': stats.std},
+        )
+        with self.assertNumQueries(0):
+            get_role_index_calibration(self.project.id)
+
+
+
+class ReportJobTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.media_root, 'public'),
+            PRIVATE_MEDIA_ROOT=os.path.join(self.media_root, 'private'),
+        )
+        self.settings_override.enable()
+
+        self.enterprise = self.create_user('report_enterprise')
+        self.other_enterprise = self.create_user('report_other')
+        self.project = self.create_project('Report Project', self.enterprise, name_abbreviation='RPT')
+        self.result = self.create_result(
+            self.invite('Report Invitee', 'completed'),
+            raw_data={'trait_scores': {}},
+        )
+        self.client.force_login(self.enterprise)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_concurrent_requests_share_one_job(self):
+        url = reverse('request_test_result_pdf_job', args=[self.result.id])
+        with mock.patch('core.tasks.generate_report_pdf.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post(url)
+                second = self.client.post(url)
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['job_id'], second.json()['job_id'])
+        self.assertEqual(ReportJob.objects.count(), 1)
+        delay.assert_called_once_with(first.json()['job_id'])
+
+    def test_retries_when_competing_job_finishes_before_it_is_read(self):
+        create = ReportJob.objects.create
+        attempts = []
+
+        def create_once_conflicting(**kwargs):
+            # 第一次建立撞上並行任務的唯一約束，但該任務在讀取前已結束
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise IntegrityError('report_job_single_active')
+            return create(**kwargs)
+
+        with mock.patch.object(ReportJob.objects, 'create', side_effect=create_once_conflicting) as patched:
+            with mock.patch('core.tasks.generate_report_pdf.delay'):
+                job = enqueue_report_job('project', self.result, self.enterprise)
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(ReportJob.objects.get().pk, job.pk)
+
+    def test_dispatch_failure_asks_page_to_fall_back(self):
+        url = reverse('request_test_result_pdf_job', args=[self.result.id])
+        with mock.patch('core.tasks.generate_report_pdf.delay', side_effect=ConnectionError('broker down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                job_id = self.client.post(url).json()['job_id']
+
+        status = self.client.get(reverse('report_job_status', args=[job_id])).json()
+        self.assertEqual((status['status'], status['fallback']), ('failed', True))
+
+    def test_completed_job_is_downloadable_by_owner_only(self):
+        url = reverse('request_test_result_pdf_job', args=[self.result.id])
+        with mock.patch('core.tasks.generate_report_pdf.delay'):
+            job_id = self.client.post(url).json()['job_id']
+
+        job = run_report_job(job_id)
+        self.assertEqual(job.status, 'completed', job.error_message)
+        self.assertEqual(job.progress, 100)
+        # 報告存放於 MEDIA_ROOT 之外的私有儲存，檔名為隨機值
+        self.assertTrue(job.file.path.startswith(os.path.join(self.media_root, 'private')))
+        self.assertNotIn('rpt', job.file.name)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'public')))
+
+        status = self.client.get(reverse('report_job_status', args=[job_id])).json()
+        self.assertEqual(status['status'], 'completed')
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertIn('traitty_result_report_rpt', response['Content-Disposition'])
+
+        # 結果未變動時直接沿用已完成的報告
+        with mock.patch('core.tasks.generate_report_pdf.delay') as delay:
+            reused = self.client.post(url)
+        self.assertEqual(reused.json()['job_id'], job_id)
+        delay.assert_not_called()
+
+        self.client.force_login(self.other_enterprise)
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job_id])).status_code, 403)
+        self.assertEqual(self.client.get(status['download_url']).status_code, 403)
+
+
+class InvitationRollupTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.enterprise = self.create_user('rollup_enterprise')
+        self.project = self.create_project('Rollup Project', self.enterprise)
+        self.today = timezone.localdate()
+
+    def _snapshot(self):
+        return sorted(
+            InvitationDailyStats.objects.filter(enterprise=self.enterprise).values_list(
+                'test_project_id', 'date', 'invited_count', 'pending_count', 'in_progress_count',
+                'invited_completed_count', 'expired_count', 'cancelled_count',
+                'score_sum', 'score_count', 'completed_count',
+            )
+        )
+
+    def test_incremental_rollup_matches_rebuild(self):
+        alpha = self.invite('Alpha')
+        bravo = self.invite('Bravo')
+        charlie = self.invite('Charlie', status='in_progress')
+        yesterday = timezone.now() - timedelta(days=1)
+        TestInvitation.objects.filter(pk=charlie.pk).update(invited_at=yesterday)
+        rebuild_invitation_rollups(enterprise_id=self.enterprise.id)
+
+        alpha.status = 'completed'
+        alpha.completed_at = timezone.now()
+        alpha.score = 80
+        alpha.save()
+        charlie.refresh_from_db()
+        charlie.status = 'completed'
+        charlie.completed_at = timezone.now()
+        charlie.score = 60
+        charlie.save()
+        bravo.status = 'expired'
+        bravo.save()
+        self.invite('Delta', status='cancelled').delete()
+
+        incremental = self._snapshot()
+        rebuild_invitation_rollups(enterprise_id=self.enterprise.id)
+        self.assertEqual(incremental, self._snapshot())
+
+        totals = get_status_totals(self.enterprise, self.today - timedelta(days=1))
+        self.assertEqual((totals['total'], totals['completed'], totals['expired']), (3, 2, 1))
+
+        with self.assertNumQueries(1):
+            series = get_daily_series(self.enterprise, self.today - timedelta(days=89), 90)
+        self.assertEqual(len(series), 90)
+        self.assertEqual((series[-1]['invitations'], series[-1]['completions']), (2, 2))
+        self.assertEqual((series[-2]['invitations'], series[-2]['invited_completed']), (1, 1))
+
+        project_totals = get_project_totals(self.enterprise)
+        self.assertEqual(project_totals[0]['completion_rate'], 66.7)
+        self.assertEqual(project_totals[0]['avg_score'], 70.0)
+
+    def test_deleting_enterprise_does_not_recreate_rollup_rows(self):
+        self.invite('Alpha', status='completed', completed_at=timezone.now(), score=70)
+        self.enterprise.delete()
+        self.assertFalse(InvitationDailyStats.objects.exists())
+
+
+class DashboardMetricsTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterprise = self.create_user('dashboard_enterprise')
+        self.project = self.create_project('Dashboard Project', self.enterprise)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_enterprise_metrics_cached_until_invitation_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invitation = self.invite('Alpha')
+
+        metrics = get_enterprise_metrics(self.enterprise)
+        self.assertEqual(metrics['stats']['total_invitations'], 1)
+        self.assertEqual(metrics['project_progress'][self.project.id]['pending_count'], 1)
+        with self.assertNumQueries(0):
+            get_enterprise_metrics(self.enterprise)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invitation.status = 'completed'
+            invitation.completed_at = timezone.now()
+            invitation.save()
+
+        metrics = get_enterprise_metrics(self.enterprise)
+        self.assertEqual(metrics['stats']['completed_tests'], 1)
+        self.assertEqual(metrics['stats']['completion_rate'], 100)
+        self.assertEqual(metrics['project_progress'][self.project.id]['completed_count'], 1)
+
+    def test_project_change_invalidates_every_enterprise(self):
+        before = get_enterprise_metrics(self.enterprise)['available_projects']
+        with self.captureOnCommitCallbacks(execute=True):
+            TestProject.objects.create(
+                name='Public Project',
+                test_link='https://example.com/public',
+                assignment_type='all_open',
+                created_by=self.enterprise
+            )
+        after = get_enterprise_metrics(self.enterprise)['available_projects']
+        self.assertEqual(after, before + 1)
+
+    def test_admin_metrics_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invite('Alpha')
+        metrics = get_admin_metrics()
+        self.assertEqual(metrics['stats']['total_invitations'], 1)
+        self.assertEqual(metrics['top_enterprises'][0]['invitation_count'], 1)
+        with self.assertNumQueries(0):
+            get_admin_metrics()
+
+
+class TestResultExportTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.media_root, 'public'),
+            PRIVATE_MEDIA_ROOT=os.path.join(self.media_root, 'private'),
+        )
+        self.settings_override.enable()
+
+        self.enterprise = self.create_user('export_enterprise')
+        self.other_enterprise = self.create_user('export_other')
+        self.project = self.create_project('Export Project', self.enterprise)
+        self.create_result(
+            self.invite('Alpha', 'completed', completed_at=timezone.now()),
+            raw_data={'performance_metrics': {'CI_Raw_Value': 85.5, 'pred_score': 70}},
+        )
+        self.invite('Bravo')
+        self.invite('Other', enterprise=self.other_enterprise)
+        self.client.force_login(self.enterprise)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get(reverse('export_filtered_test_results'), {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], '評鑑別,受試者名字,電子郵件,身份別,CI分數,預測值分數')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('Export Project,Alpha,alpha@example.com,在職,85.5,70.0', lines)
+        self.assertNotIn('Other', ''.join(lines))
+
+    def test_xlsx_export_is_valid_workbook(self):
+        response = self.client.get(reverse('export_filtered_test_results'), {'format': 'xlsx', 'search': 'Alpha'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('alpha@example.com', sheet)
+        self.assertIn('<v>85.5</v>', sheet)
+        self.assertNotIn('Bravo', sheet)
+
+    def test_large_export_runs_in_background_job(self):
+        url = f"{reverse('request_test_result_export_job')}?format=csv&status=completed"
+        with mock.patch('core.export_job_views.ASYNC_THRESHOLD', 0), \
+                mock.patch('core.tasks.generate_test_result_export.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url)
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        delay.assert_called_once_with(job_id)
+
+        job = run_export_job(job_id)
+        self.assertEqual(job.status, 'completed', job.error_message)
+        self.assertEqual(job.row_count, 1)
+        # 匯出檔案存放於 MEDIA_ROOT 之外的私有儲存，檔名為隨機值
+        self.assertTrue(job.file.path.startswith(os.path.join(self.media_root, 'private')))
+        self.assertRegex(os.path.basename(job.file.name), r'^[0-9a-f]{32}\.csv$')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'public')))
+
+        status = self.client.get(reverse('export_job_status', args=[job_id])).json()
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('Alpha', b''.join(download.streaming_content).decode('utf-8'))
+
+        self.client.force_login(self.other_enterprise)
+        self.assertEqual(self.client.get(status['download_url']).status_code, 403)
+
+    def test_small_export_downloads_directly(self):
+        response = self.client.post(f"{reverse('request_test_result_export_job')}?format=xlsx")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('format=xlsx', response.json()['download_url'])
+
+
+class InviteeProgressTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.enterprise = self.create_user('progress_enterprise')
+        self.project = self.create_project('Progress Project', self.enterprise)
+        for index in range(3):
+            invitee = TestInvitee.objects.create(
+                enterprise=self.enterprise,
+                name=f'Invitee {index}',
+                email=f'invitee{index}@example.com',
+            )
+            for status in ('completed', 'in_progress')[:index]:
+                self.invite(invitee.name, status, invitee=invitee)
+            TestInvitee.objects.filter(pk=invitee.pk).update(invited_count=index)
+
+    def test_with_progress_matches_properties_in_one_query(self):
+        expected = {
+            invitee.name: (invitee.completion_rate, invitee.latest_test_status)
+            for invitee in TestInvitee.objects.all()
+        }
+
+        with self.assertNumQueries(1):
+            annotated = {
+                invitee.name: (invitee.completion_rate, invitee.latest_test_status)
+                for invitee in TestInvitee.objects.filter(enterprise=self.enterprise).with_progress()
+            }
+
+        self.assertEqual(annotated, expected)
+        self.assertEqual(annotated['Invitee 0'], (0, '未受邀'))
+        self.assertEqual(annotated['Invitee 1'], (100.0, '已完成'))
+        self.assertEqual(annotated['Invitee 2'][0], 50.0)
+
+
+class TraitSearchIndexTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.enterprise = self.create_user('trait_index_enterprise')
+        self.individual = self.create_user('trait_index_individual', user_type='individual')
+        self.project = self.create_project('Trait Index Project', self.enterprise)
+        self.empathy = Trait.objects.create(system_name='Empathy', chinese_name='同理心')
+        self.resilience = Trait.objects.create(system_name='Resilience', chinese_name='韌性')
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _project_result(self, name, trait_results, crawl_status='completed'):
+        return self.create_result(
+            self.invite(name, 'completed', completed_at=timezone.now()),
+            trait_results=trait_results,
+            crawl_status=crawl_status,
+        )
+
+    def _indexed(self, **filters):
+        return set(ResultTraitScore.objects.filter(**filters).values_list(
+            'project_result_id', 'individual_result_id', 'trait_id', 'score'
+        ))
+
+    def test_rebuild_indexes_completed_results(self):
+        strong = self._project_result('Strong', {
+            'Empathy': {'score': 82.0, 'chinese_name': '同理心'},
+            '韌性': {'score': 75.0},
+        })
+        partial = self._project_result('Partial', {'Empathy': {'score': 90.0}, 'Resilience': {'score': 40.0}})
+        self._project_result('Pending', {'Empathy': {'score': 99.0}}, crawl_status='pending')
+
+        totals = rebuild_trait_search_index()
+        self.assertEqual((totals['project_results'], totals['rows']), (3, 4))
+
+        self.assertEqual(self._indexed(enterprise=self.enterprise), {
+            (strong.id, None, self.empathy.id, 82.0),
+            (strong.id, None, self.resilience.id, 75.0),
+            (partial.id, None, self.empathy.id, 90.0),
+            (partial.id, None, self.resilience.id, 40.0),
+        })
+
+        # 資料遷移凍結的比對邏輯，結果與一般重建相同
+        indexed = self._indexed()
+        ResultTraitScore.objects.all().delete()
+        import_module('core.migrations.0028_resulttraitscore').backfill_trait_scores(django_apps, None)
+        self.assertEqual(self._indexed(), indexed)
+
+    def test_project_result_save_updates_index(self):
+        result = self._project_result('Saved', {'Empathy': {'score': 60.0}}, crawl_status='pending')
+        self.assertFalse(self._indexed(project_result=result))
+
+        result.crawl_status = 'completed'
+        result.save(update_fields=['crawl_status'])
+        self.assertEqual(self._indexed(project_result=result), {(result.id, None, self.empathy.id, 60.0)})
+
+        result.trait_results = {'Empathy': {'score': 65.0}, 'Resilience': {'score': 30.0}}
+        result.save()
+        self.assertEqual(self._indexed(project_result=result), {
+            (result.id, None, self.empathy.id, 65.0),
+            (result.id, None, self.resilience.id, 30.0),
+        })
+
+        # 與索引無關的欄位異動不重建
+        with mock.patch('core.services.trait_search_index.index_project_result') as index:
+            result.save(update_fields=['updated_at'])
+        index.assert_not_called()
+
+    def test_individual_result_save_updates_index(self):
+        record = IndividualTestRecord.objects.create(user=self.individual, test_project=self.project)
+        result = IndividualTestResult.objects.create(
+            individual_test_record=record,
+            test_project=self.project,
+            user=self.individual,
+            trait_results={'Empathy': {'score': 70.0}},
+            result_status='pending',
+        )
+        self.assertFalse(self._indexed(user=self.individual))
+
+        result.result_status = 'completed'
+        result.save(update_fields=['result_status'])
+        self.assertEqual(self._indexed(user=self.individual), {(None, result.id, self.empathy.id, 70.0)})
+
+        result.trait_results = {'Empathy': {'score': 50.0}}
+        result.save()
+        self.assertEqual(self._indexed(user=self.individual), {(None, result.id, self.empathy.id, 50.0)})
+
+
+class ScorePercentileTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        self.enterprise = self.create_user('percentile_enterprise')
+        self.project = self.create_project('Percentile Project', self.enterprise)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _result(self, index, score, crawl_status='completed'):
+        return self.create_result(
+            self.invite(f'Percentile {index}', 'completed', completed_at=timezone.now(), score=score),
+            score_value=score,
+            crawl_status=crawl_status,
+        )
+
+    def test_saving_results_updates_histogram_incrementally(self):
+        results = [self._result(index, score) for index, score in enumerate(range(10, 101, 10))]
+        self._result(99, 100, crawl_status='pending')
+
+        self.assertEqual(sum(count for _, count in get_histogram(self.project.id, 'ci')), 10)
+        self.assertEqual(percentile_rank(self.project.id, 'ci', 55), 50.0)
+        self.assertEqual(top_percent(self.project.id, 'ci', 100), 10.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results[0].score_value = 95
+            results[0].save()
+        self.assertEqual(percentile_rank(self.project.id, 'ci', 55), 40.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results[1].delete()
+        self.assertIsNone(percentile_rank(self.project.id, 'ci', 55))
+        self.assertEqual(percentile_rank(self.project.id, 'ci', 55, min_samples=1), 33.3)
+
+        incremental = get_histogram(self.project.id, 'ci')
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = rebuild_score_histograms(self.project.id)
+        self.assertEqual(totals['changed'], 0)
+        self.assertEqual(get_histogram(self.project.id, 'ci'), incremental)
+
+    def test_score_distribution_is_aggregated_in_database(self):
+        for index, score in enumerate([5, 20, 20.5, 61, 80, 95]):
+            self._result(index, score)
+
+        distribution = get_score_distribution(self.enterprise, timezone.now() - timedelta(days=1))
+        self.assertEqual(distribution['labels'], ['0-20', '21-40', '41-60', '61-80', '81-100'])
+        self.assertEqual(distribution['data'], [2, 1, 0, 2, 1])
+
+
+class BulkInvitationTests(TestCase):
+    def setUp(self):
+        self.enterprise = User.objects.create_user(
+            username='bulk_enterprise',
+            email='bulk_enterprise@example.com',
+            password='password',
+            user_type='enterprise'
+        )
+        EnterpriseProfile.objects.create(
+            user=self.enterprise,
+            company_name='Bulk Co',
+            contact_person='Owner',
+            contact_phone='0212345678',
+            verification_status='approved',
+        )
+        self.project = TestProject.objects.create(
+            name='Bulk Project',
+            test_link='https://example.com/test',
+            score_field_chinese='CI Score',
+            score_field_system='ci_score',
+            prediction_field_chinese='Prediction Score',
+            prediction_field_system='pred_score',
+            created_by=self.enterprise
+        )
+        self.assignment = TestProjectAssignment.objects.create(
+            test_project=self.project,
+            enterprise_user=self.enterprise,
+            assigned_quota=4,
+            assigned_by=self.enterprise,
+        )
+        self.expires_at = timezone.now() + timedelta(days=7)
+
+    def _rows(self, *names):
+        return [{'name': name, 'email': f' {name.upper()}@Example.com '} for name in names]
+
+    def test_bulk_create_batches_writes_and_consumes_quota(self):
+        existing = TestInvitee.objects.create(enterprise=self.enterprise, name='Old', email='alpha@example.com')
+        busy = TestInvitee.objects.create(enterprise=self.enterprise, name='Busy', email='busy@example.com')
+        TestInvitation.objects.create(
+            enterprise=self.enterprise,
+            invitee=busy,
+            test_project=self.project,
+            expires_at=self.expires_at,
+            points_consumed=1,
+        )
+        rows = self._rows('alpha', 'bravo', 'alpha', 'busy', 'charlie', 'delta', 'echo')
+
+        with self.assertNumQueries(14):
+            stats, invitations = create_bulk_invitations(
+                self.enterprise, self.project, rows, expires_at=self.expires_at
+            )
+
+        self.assertEqual((stats['invited'], stats['created'], stats['updated']), (4, 4, 2))
+        self.assertEqual(len(stats['errors']), 3)
+        self.assertIn('在檔案中重複', stats['errors'][0])
+        self.assertIn('已有進行中的邀請', stats['errors'][1])
+        self.assertIn('可用份數不足（剩餘 0 份）', stats['errors'][2])
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, existing.invited_count), ('alpha', 1))
+        self.assertTrue(all(invitation.result_data.get('short_code') for invitation in invitations))
+        self.assertFalse(TestInvitation.objects.filter(invitee__email='echo@example.com').exists())
+
+        self.assignment.refresh_from_db()
+        self.assertEqual(self.assignment.used_quota, 4)
+        self.assertEqual(
+            list(EnterpriseQuotaUsageLog.objects.order_by('id').values_list('invitee_email', 'remaining_quota')),
+            [('alpha@example.com', 3), ('bravo@example.com', 2), ('charlie@example.com', 1), ('delta@example.com', 0)]
+        )
+        self.assertEqual(InvitationDailyStats.objects.get(enterprise=self.enterprise).pending_count, 5)
+
+    def test_email_job_sends_invitations_in_background(self):
+        stats, invitations = create_bulk_invitations(
+            self.enterprise, self.project, self._rows('alpha', 'bravo'), expires_at=self.expires_at
+        )
+        with mock.patch('core.tasks.send_invitation_emails.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                job = enqueue_invitation_emails(self.enterprise, invitations)
+        delay.assert_called_once_with(str(job.pk), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        with mock.patch('core.services.bulk_invitations.EMAIL_CHUNK_SIZE', 1):
+            job, next_offset = run_invitation_email_chunk(job.pk)
+            self.assertEqual((job.status, job.progress, job.sent_count, next_offset), ('running', 50, 1, 1))
+            job, next_offset = run_invitation_email_chunk(job.pk, 1)
+        self.assertIsNone(next_offset)
+        self.assertEqual((job.status, job.progress, job.sent_count, job.failed_count), ('completed', 100, 2, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alpha@example.com', 'bravo@example.com'])
+
+        # 已完成的任務不會重複寄送
+        run_invitation_email_job(job.pk)
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.client.force_login(self.enterprise)
+        response = self.client.get(reverse('invitation_email_job_status', args=[job.pk]))
+        self.assertEqual(response.json()['sent_count'], 2)
+        self.assertEqual(InvitationEmailJob.objects.count(), 1)
+
+
+class ShortLinkRedirectTests(InvitationFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.enterprise = self.create_user('short_enterprise')
+        self.project = self.create_project('Short Project', self.enterprise)
+        self.invitation = self.invite('Alpha', 'in_progress')
+        self.code = URLShortenerService.generate_short_url(self.project.test_link, self.invitation.id)['short_code']
+        self.url = reverse('short_url_redirect', args=[self.code])
+
+    def test_redirect_takes_at_most_one_indexed_lookup(self):
+        self.assertTrue(ShortLink.objects.filter(code=self.code, invitation=self.invitation).exists())
+
+        cache.clear()
+        clear_local_cache()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertRedirects(response, 'https://example.com/test', fetch_redirect_response=False)
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        missing_url = reverse('short_url_redirect', args=['missing1'])
+        self.assertEqual(self.client.get(missing_url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(missing_url).status_code, 404)
+
+    def test_clicks_are_counted_in_cache_and_flushed_in_bulk(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        for _ in range(2):
+            record_click(self.code)
+        self.assertEqual(ShortLink.objects.get(code=self.code).click_count, 0)
+        self.assertEqual(URLShortenerService.get_short_url_stats(self.code)['clicks'], 3)
+
+        self.assertEqual(flush_click_counters(), {'counters': 1, 'clicks': 3})
+        record_click(self.code)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        record_click(self.code, today=yesterday)
+        self.assertEqual(flush_click_counters(), {'counters': 2, 'clicks': 2})
+        self.assertEqual(flush_click_counters(), {'counters': 0, 'clicks': 0})
+
+        link = ShortLink.objects.get(code=self.code)
+        self.assertEqual(link.click_count, 5)
+        self.assertIsNotNone(link.last_clicked_at)
+        self.assertEqual(
+            dict(ShortLinkDailyClicks.objects.values_list('date', 'clicks')),
+            {timezone.localdate(): 4, yesterday: 1}
+        )
+
+        stats = get_open_stats(TestInvitation.objects.filter(enterprise=self.enterprise))
+        self.assertEqual((stats['total'], stats['opened'], stats['clicks'], stats['open_rate']), (1, 1, 5, 100.0))
+
+    def test_flush_updates_links_in_batches(self):
+        codes = [self.code] + [
+            URLShortenerService.generate_short_url(self.project.test_link, self.invite(name).id)['short_code']
+            for name in ('Bravo', 'Charlie')
+        ]
+        for index, code in enumerate(codes, start=1):
+            for _ in range(index):
+                record_click(code)
+
+        with mock.patch('core.services.link_clicks.WRITE_BATCH_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_click_counters(), {'counters': 3, 'clicks': 6})
+        link_updates = [query for query in queries if query['sql'].startswith('UPDATE "short_link"')]
+        self.assertEqual(len(link_updates), 2)
+        self.assertEqual(
+            dict(ShortLink.objects.filter(code__in=codes).values_list('code', 'click_count')),
+            dict(zip(codes, [1, 2, 3]))
+        )
+
+    def test_flush_reads_counters_through_another_cache_connection(self):
+        # 寫入排程在 Celery 程序以自己的快取連線讀取 web worker 記錄的點擊
+        record_click(self.code)
+        celery_cache = caches.create_connection('default')
+        self.assertIsNot(celery_cache, caches['default'])
+        with mock.patch.object(CacheNamespace, 'l2', new_callable=mock.PropertyMock, return_value=celery_cache):
+            self.assertEqual(flush_click_counters(), {'counters': 1, 'clicks': 1})
+        self.assertEqual(ShortLink.objects.get(code=self.code).click_count, 1)
+
+    def test_process_local_cache_writes_clicks_directly(self):
+        local_only = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-l1'},
+        }
+        with override_settings(CACHES=local_only):
+            self.assertEqual(record_click(self.code), 0)
+            self.assertEqual(record_click(self.code), 0)
+            self.assertEqual(flush_click_counters(), {'counters': 0, 'clicks': 0})
+        self.assertEqual(ShortLink.objects.get(code=self.code).click_count, 2)
+        self.assertEqual(
+            dict(ShortLinkDailyClicks.objects.values_list('date', 'clicks')), {timezone.localdate(): 2}
+        )
+
+    def test_deleting_invitation_invalidates_cached_link(self):
+        self.invitation.delete()
+        self.assertFalse(ShortLink.objects.exists())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class ShortCodeEncodingTests(SimpleTestCase):
+    def test_id_codes_are_unique_reversible_and_disjoint_from_legacy_codes(self):
+        ids = list(range(1, 20001)) + [2 ** 40, 2 ** 46 - 1]
+        codes = [URLShortenerService.encode_id(invitation_id) for invitation_id in ids]
+
+        self.assertEqual(len(set(codes)), len(ids))
+        self.assertTrue(all(len(code) == URLShortenerService.SHORT_CODE_LENGTH for code in codes))
+        legacy_chars = set(URLShortenerService.CHARSET[:URLShortenerService.LEGACY_CHARSET_SIZE])
+        self.assertFalse(any(code[0] in legacy_chars for code in codes))
+        self.assertEqual([URLShortenerService.decode_code(code) for code in codes[:100]], ids[:100])
+        # 連號 ID 不會產生相近的短碼
+        self.assertNotEqual(codes[0][:-1], codes[1][:-1])
+
+    def test_decode_rejects_other_codes(self):
+        self.assertIsNone(URLShortenerService.decode_code('dkjdgjbm'))
+        self.assertIsNone(URLShortenerService.decode_code('toolongcode'))
+        with self.assertRaises(ValueError):
+            URLShortenerService.encode_id(0)
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """模擬 SMTP 伺服器：記錄開啟的連線數，並依 failures 依序決定每次寄送拋出的錯誤（None 表示成功）"""
+    opened = 0
+    failures = []
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        error = FlakyEmailBackend.failures.pop(0) if FlakyEmailBackend.failures else None
+        if error:
+            raise error
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.FlakyEmailBackend')
+class BulkMailerTests(SimpleTestCase):
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.failures = []
+        mail.outbox = []
+        self.sleeps = []
+
+    def _messages(self, count):
+        return [
+            EmailMultiAlternatives(subject=f'S{index}', body='body', to=[f'user{index}@example.com'])
+            for index in range(count)
+        ]
+
+    def test_reuses_one_connection_per_batch(self):
+        mailer = BulkMailer(batch_size=2, rate_per_second=0, sleep=self.sleeps.append)
+        self.assertEqual(mailer.send(self._messages(5)), [True] * 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(FlakyEmailBackend.opened, 3)
+
+    def test_retries_transient_errors_but_not_rejected_recipients(self):
+        FlakyEmailBackend.failures = [
+            None,
+            SMTPRecipientsRefused({'user1@example.com': (550, b'no such user')}),
+            SMTPServerDisconnected('gone'),
+        ]
+        mailer = BulkMailer(batch_size=10, rate_per_second=0, retry_delay=1, sleep=self.sleeps.append)
+        self.assertEqual(mailer.send(self._messages(3)), [True, False, True])
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user0@example.com', 'user2@example.com'])
+        self.assertEqual(self.sleeps, [1])
+
+    def test_rate_limit_spaces_out_sends(self):
+        clock = [100.0]
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            clock[0] += seconds
+
+        mailer = BulkMailer(batch_size=10, rate_per_second=2, sleep=sleep)
+        with mock.patch('utils.email_service.time.monotonic', side_effect=lambda: clock[0]):
+            mailer.send(self._messages(3))
+        self.assertEqual(self.sleeps, [0.5, 0.5])
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.ns = CacheNamespace('tiered_test')
+
+    def test_reads_fall_back_from_l1_to_shared_l2(self):
+        self.ns.set('key', {'value': 1})
+        self.assertEqual(self.ns.get('key'), {'value': 1})
+
+        clear_local_cache()
+        self.assertEqual(self.ns.get('key'), {'value': 1})
+        self.assertEqual(self.ns.get('key'), {'value': 1})
+        self.assertIsNone(self.ns.get('other'))
+
+        metrics = self.ns.metrics.snapshot()
+        self.assertEqual((metrics['l1_hits'], metrics['l2_hits'], metrics['misses']), (2, 1, 1))
+        self.assertEqual(metrics['hit_rate'], 75.0)
+
+    def test_invalidate_bumps_namespace_version(self):
+        other = CacheNamespace('tiered_other')
+        self.ns.set_many({'a': 1, 'b': 2})
+        other.set('a', 'kept')
+
+        self.ns.invalidate()
+        self.assertEqual(self.ns.get_many(['a', 'b']), {})
+        self.assertEqual(other.get('a'), 'kept')
+
+        # 其他程序的 L1 仍為舊版本，逾時後改讀 L2 的新版本
+        self.ns.set('a', 3)
+        clear_local_cache()
+        self.assertEqual(self.ns.get('a'), 3)
+
+    def test_incr_is_shared_and_skips_l1(self):
+        counters = CacheNamespace('tiered_counters', use_l1=False, versioned=False)
+        self.assertEqual([counters.incr('hits', timeout=60) for _ in range(3)], [1, 2, 3])
+        self.assertEqual(cache.get('tiered_counters:hits'), 3)
+        self.assertEqual(counters.metrics.snapshot()['l1_hits'], 0)
+
+    def test_rate_limit_counts_in_shared_cache(self):
+        statuses = [
+            self.client.post('/auth/login/', REMOTE_ADDR='10.0.0.9').status_code
+            for _ in range(6)
+        ]
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5], 429)
+        self.assertEqual(namespace('ratelimit').metrics.snapshot()['l1_hits'], 0)
+
+    def test_metrics_endpoint_requires_staff(self):
+        namespace('short_links').get('link:unknown')
+        url = reverse('cache_metrics')
+        user = User.objects.create_user(username='cache_user', password='password', user_type='individual')
+        self.client.force_login(user)
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+
+        user.is_staff = True
+        user.save()
+        data = self.client.get(url).json()
+        self.assertEqual(data['l1']['alias'], 'local')
+        self.assertIn('short_links', data['namespaces'])
+        self.assertEqual(data, {**get_cache_metrics(), 'namespaces': data['namespaces']})
+
+    def test_process_local_l2_is_reported_outside_debug(self):
+        self.assertTrue(l2_is_shared())
+        self.assertEqual(check_l2_backend(), [])
+
+        local_only = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-l1'},
+        }
+        with override_settings(CACHES=local_only):
+            self.assertFalse(l2_is_shared())
+            with override_settings(DEBUG=False):
+                self.assertEqual([message.id for message in check_l2_backend()], ['tiered_cache.W001'])
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        self.limiter = SlidingWindowLimiter(MemoryCounterStore(clock=lambda: self.now[0]), clock=lambda: self.now[0])
+
+    def test_prefix_trie_matches_longest_prefix_by_segment(self):
+        trie = PrefixTrie({'/api/': 'api', '/api/auth/login/': 'login', '/auth/login/': 'web'})
+        self.assertEqual(trie.match('/api/auth/login/extra'), ('/api/auth/login/', 'login'))
+        self.assertEqual(trie.match('/api/auth/logout/'), ('/api/', 'api'))
+        self.assertEqual(trie.match('/auth/login'), ('/auth/login/', 'web'))
+        self.assertIsNone(trie.match('/auth/loginx/'))
+        self.assertEqual(Rate.parse('10/30s'), Rate(limit=10, window=30))
+        with self.assertRaises(ValueError):
+            Rate.parse('ten per minute')
+
+    def test_previous_window_is_weighted_into_the_current_one(self):
+        rate = Rate.parse('4/m')
+        decisions = [self.limiter.hit('client', rate) for _ in range(5)]
+        self.assertEqual([decision.allowed for decision in decisions], [True] * 4 + [False])
+        # 1000 秒位於視窗 [960, 1020) 的 2/3；下一視窗過 40% 後前一視窗的 5 次折算為 3 次
+        self.assertEqual(decisions[-1].retry_after, 44)
+
+        self.now[0] = 1020.0 + 30
+        self.assertTrue(self.limiter.hit('client', rate).allowed)
+        self.assertFalse(self.limiter.hit('client', rate).allowed)
+        self.assertTrue(self.limiter.hit('other', rate).allowed)
+
+    def test_middleware_returns_retry_after(self):
+        request = RequestFactory().post('/api/auth/login/', REMOTE_ADDR='10.0.0.7')
+        middleware = RateLimitMiddleware(lambda request: None)
+        middleware.limiter = self.limiter
+        responses = [middleware.process_request(request) for _ in range(6)]
+        self.assertEqual(responses[:5], [None] * 5)
+        self.assertEqual(responses[5].status_code, 429)
+        self.assertEqual(responses[5]['Retry-After'], '40')
+        self.assertIsNone(middleware.process_request(RequestFactory().get('/dashboard/')))
+
+
+class SecurityMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.middleware = SecurityMiddleware(lambda request: None)
+        self.factory = RequestFactory()
+
+    def test_blocklist_matches_addresses_and_networks(self):
+        blocklist = IPBlocklist(['203.0.113.7', '10.1.0.0/16', '2001:db8::/32'])
+        self.assertIn('203.0.113.7', blocklist)
+        self.assertIn('10.1.255.3', blocklist)
+        self.assertIn('2001:DB8::1', blocklist)
+        self.assertNotIn('10.2.0.1', blocklist)
+        self.assertNotIn('not-an-ip', blocklist)
+        with self.assertRaises(ValueError):
+            IPBlocklist(['10.0.0.300'])
+
+    def test_blocklist_is_reloaded_from_shared_cache_periodically(self):
+        set_blocked_ips(['198.51.100.0/24'])
+        request = self.factory.get('/dashboard/', REMOTE_ADDR='198.51.100.20')
+        self.assertEqual(self.middleware.process_request(request).status_code, 403)
+
+        set_blocked_ips([])
+        self.assertEqual(self.middleware.process_request(request).status_code, 403)
+        self.middleware.blocklist_loaded_at -= self.middleware.refresh_interval
+        self.assertIsNone(self.middleware.process_request(request))
+
+    def test_screening_skips_static_files(self):
+        user_agent = 'sqlmap/1.7'
+        blocked = self.factory.get('/dashboard/', HTTP_USER_AGENT=user_agent)
+        self.assertEqual(self.middleware.process_request(blocked).status_code, 403)
+        static = self.factory.get('/static/css/app.css', HTTP_USER_AGENT=user_agent)
+        self.assertIsNone(self.middleware.process_request(static))
+
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            self.middleware.process_request(self.factory.get('/search/', {'q': "1 UNION SELECT password"}))
+        self.assertIn('Suspicious GET parameter: q=', logs.output[0])
+        with self.assertNoLogs('core.middleware', level='WARNING'):
+            self.middleware.process_request(self.factory.get('/search/', {'q': 'union square'}))
+
+
+class PermissionServiceTests(TestCase):
+    def _request(self, user_type='business', session=None):
+        request = RequestFactory().get('/')
+        request.COOKIES['user_type'] = user_type
+        request.session = session if session is not None else self.client.session
+        return request
+
+    def test_permissions_are_resolved_once_per_request(self):
+        session = self.client.session
+        session.save()
+        with mock.patch.object(PermissionHandler, 'get_permissions', wraps=PermissionHandler.get_permissions) as resolve:
+            request = self._request(session=session)
+            self.assertEqual(
+                PermissionHandler.get_request_permissions(request), frozenset({'quote_manage', 'order_manage'})
+            )
+            self.assertTrue(PermissionHandler.request_has_permission(request, 'order_manage'))
+            self.assertFalse(PermissionHandler.request_has_permission(request, 'shipment_manage'))
+            self.assertEqual(resolve.call_count, 1)
+
+            # 下一個請求重新計算，且不寫入 session
+            self.assertIn('shipment_manage', PermissionHandler.get_request_permissions(self._request('admin', session)))
+            self.assertEqual(resolve.call_count, 2)
+        self.assertEqual(dict(session.items()), {})
+
+    def test_context_processor_is_lazy_and_silent(self):
+        request = self._request('admin')
+        with mock.patch.object(PermissionHandler, 'get_permissions', wraps=PermissionHandler.get_permissions) as resolve, \
+                mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            context = permission_context_processor(request)
+            self.assertEqual(resolve.call_count, 0)
+            self.assertIn('user_manage', context['user_permissions'])
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_check_permission_decorator_uses_request_permissions(self):
+        view = check_permission('shipment_manage')(lambda request: 'ok')
+        self.assertEqual(view(self._request('admin')), 'ok')
+        with self.assertRaises(PermissionDenied):
+            view(self._request('business'))
+
+
+@override_settings(UNLIMITED_POINTS_MODE=False)
+class PointLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='ledger_user', email='ledger_user@example.com', password='password', user_type='individual'
+        )
+        PointService.add_points(self.user, 10, '購買')
+
+    def test_batch_consumption_is_one_conditional_update(self):
+        items = [
+            {'action_type': 'test_invite', 'quantity': 3, 'reference_id': 'a'},
+            {'action_type': 'test_execution', 'quantity': 2, 'reference_id': 'b'},
+            {'action_type': 'report_generation'},
+        ]
+        # UPDATE、讀取餘額、bulk_create 交易紀錄，加上交易的 savepoint；
+        # 每日彙總每個消費動作一次 UPDATE，當日尚無彙總列時再以 savepoint 建立
+        with self.assertNumQueries(13):
+            self.assertTrue(PointService.consume_points_batch(self.user, items))
+
+        balance = UserPointBalance.objects.get(user=self.user)
+        self.assertEqual((balance.balance, balance.total_consumed), (5, 5))
+        self.assertEqual(
+            list(PointTransaction.objects.filter(transaction_type='consumption')
+                 .order_by('id').values_list('reference_id', 'amount', 'balance_before', 'balance_after')),
+            [('a', -3, 10, 7), ('b', -2, 7, 5)]
+        )
+
+        self.assertFalse(PointService.consume_points(self.user, 'test_invite', quantity=6))
+        self.assertEqual(PointService.get_user_balance(self.user), 5)
+
+        PointService.refund_points(self.user, 2, '取消邀請')
+        balance.refresh_from_db()
+        self.assertEqual((balance.balance, balance.total_consumed, balance.total_earned), (7, 3, 10))
+
+    def test_reconciliation_reports_drift_and_advances_snapshots(self):
+        PointService.consume_points(self.user, 'test_invite', quantity=4)
+        PointService.consume_points(self.user, 'test_invite', quantity=1)
+        # 無限制模式的虛擬交易不計入帳本
+        with override_settings(UNLIMITED_POINTS_MODE=True):
+            PointService.consume_points(self.user, 'test_invite')
+        PointTransaction.objects.filter(amount__in=[10, -4]).update(created_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(reconcile_point_balances()['mismatched'], 0)
+        snapshot = PointBalanceSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.ledger_total, 6)
+        self.assertEqual(
+            snapshot.last_transaction_id, PointTransaction.objects.get(amount=-4).pk
+        )
+
+        UserPointBalance.objects.filter(user=self.user).update(balance=F('balance') + 3)
+        with self.assertLogs('core.services.point_ledger', level='ERROR'):
+            totals = reconcile_point_balances()
+        self.assertEqual(totals['mismatches'], [{'user_id': self.user.pk, 'difference': 3}])
+        snapshot.refresh_from_db()
+        self.assertEqual((snapshot.ledger_total, snapshot.difference), (6, 3))
+
+
+@override_settings(UNLIMITED_POINTS_MODE=False)
+class PointRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='rollup_user', email='rollup_user@example.com', password='password', user_type='individual'
+        )
+        self.admin = User.objects.create_user(
+            username='rollup_admin', email='rollup_admin@example.com', password='password',
+            user_type='admin', is_staff=True
+        )
+        PointService.add_points(self.user, 20, '購買')
+        PointService.consume_points_batch(self.user, [
+            {'action_type': 'test_invite', 'quantity': 3},
+            {'action_type': 'test_execution', 'quantity': 2},
+        ])
+        PointService.consume_points(self.user, 'test_invite')
+        with override_settings(UNLIMITED_POINTS_MODE=True):
+            PointService.consume_points(self.user, 'test_execution', quantity=4)
+
+    def _rows(self):
+        return sorted(PointDailyStats.objects.values_list(
+            'transaction_type', 'action_type', 'is_virtual', 'amount', 'transaction_count'
+        ))
+
+    def test_inserts_maintain_rollups_and_rebuild_matches(self):
+        expected = [
+            ('consumption', 'test_execution', False, -2, 1),
+            ('consumption', 'test_execution', True, -4, 1),
+            ('consumption', 'test_invite', False, -4, 2),
+            ('purchase', '', False, 20, 1),
+        ]
+        self.assertEqual(self._rows(), expected)
+
+        PointDailyStats.objects.update(amount=0)
+        self.assertEqual(rebuild_point_rollups(), 4)
+        self.assertEqual(self._rows(), expected)
+
+    def test_consumption_windows_and_stats(self):
+        # 舊交易移到 10 天前，只計入 30/90 天區間
+        old = PointTransaction.objects.get(transaction_type='consumption', amount=-1)
+        PointTransaction.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        rebuild_point_rollups()
+
+        with self.assertNumQueries(1):
+            windows = get_consumption_windows()
+        self.assertEqual(
+            (windows[7]['total_consumed'], windows[7]['transaction_count'], windows[7]['virtual_consumed']), (9, 3, 4)
+        )
+        self.assertEqual(windows[7]['action_stats']['test_invite'], {'count': 1, 'total': 3})
+        self.assertEqual(windows[30]['action_stats']['test_invite'], {'count': 2, 'total': 4})
+        self.assertEqual(windows[90]['total_consumed'], 10)
+        self.assertEqual(get_consumption_windows(action_type='test_execution')[30]['total_consumed'], 6)
+
+        stats = PointService.get_consumption_stats(self.user, days=7)
+        self.assertEqual((stats['total_consumed'], stats['transaction_count']), (9, 3))
+        self.assertEqual(PointService.get_consumption_stats(self.user, days=30, action_type='test_invite')['total_consumed'], 4)
+
+    def test_admin_overview_renders_from_aggregates(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_point_overview'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['stats']['total_points_consumed'], 6)
+        self.assertEqual(response.context['stats']['individual_balance_points'], 14)
+        self.assertEqual(response.context['consumption_windows'][30]['total_consumed'], 10)
+
+        response = self.client.get(reverse('admin_point_management'), {'transaction_type': 'consumption'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['stats']['total_transactions'], 4)
+
+
+class CounterRowsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter_user', password='password', user_type='individual')
+        self.lookup = {
+            'user': self.user, 'date': timezone.localdate(), 'transaction_type': 'consumption',
+            'action_type': 'test_invite', 'is_virtual': False,
+        }
+
+    def _row(self):
+        return PointDailyStats.objects.values_list('amount', 'transaction_count').get()
+
+    def test_creates_then_increments(self):
+        self.assertFalse(increment_or_create(PointDailyStats, self.lookup, {'amount': -2, 'transaction_count': 1},
+                                             create=False))
+        self.assertFalse(PointDailyStats.objects.exists())
+
+        increment_or_create(PointDailyStats, self.lookup, {'amount': -2, 'transaction_count': 1})
+        increment_or_create(PointDailyStats, self.lookup, {'amount': -3, 'transaction_count': 1})
+        self.assertEqual(self._row(), (-5, 2))
+
+    def test_concurrent_create_falls_back_to_increment(self):
+        # 另一交易在本次 UPDATE 之後、INSERT 之前建立了同一列：INSERT 違反唯一限制後改為累加
+        PointDailyStats.objects.create(**self.lookup, amount=-1, transaction_count=1)
+        update = QuerySet.update
+        calls = []
+
+        def update_after_competitor(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=update_after_competitor):
+            self.assertTrue(increment_or_create(PointDailyStats, self.lookup, {'amount': -2, 'transaction_count': 1}))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self._row(), (-3, 2))
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='notify_user', email='notify_user@example.com', password='password', user_type='individual'
+        )
+
+    def _notify(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return NotificationService.create_notification(self.user, '標題', '內容', **kwargs)
+
+    def test_counter_follows_writes_without_counting_queries(self):
+        self.assertEqual(get_unread_count(self.user), 0)
+        first = self._notify()
+        self._notify()
+        self._notify()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(NotificationService.mark_as_read(first.pk, self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            # 已讀通知再次標記不重複扣除
+            NotificationService.mark_as_read(first.pk, self.user)
+        self.assertEqual(get_unread_count(self.user), 2)
+
+        unread = Notification.objects.filter(recipient=self.user, is_read=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(NotificationService.delete_notification(unread.pk, self.user))
+            self.assertTrue(NotificationService.delete_notification(first.pk, self.user))
+        self.assertFalse(NotificationService.delete_notification(first.pk, self.user))
+        self.assertEqual(get_unread_count(self.user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(NotificationService.mark_all_as_read(self.user))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 0)
+
+    def test_prune_and_reconcile(self):
+        self._notify(expires_at=timezone.now() - timedelta(hours=1))
+        self._notify(expires_at=timezone.now() + timedelta(days=1))
+        self._notify()
+        self.assertEqual(get_unread_count(self.user), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(prune_expired_notifications(), 1)
+        self.assertEqual(get_unread_count(self.user), 2)
+
+        # 繞過計數維護的批次更新由對帳清除計數，下次讀取重新計算
+        Notification.objects.filter(recipient=self.user).update(is_read=True)
+        self.assertEqual(reconcile_unread_counts(), {'checked': 1, 'corrected': 1})
+        self.assertEqual(get_unread_count(self.user), 0)
+        self.assertEqual(reconcile_unread_counts(), {'checked': 1, 'corrected': 0})
+
+    def test_expired_notifications_hidden_until_pruned(self):
+        self._notify(expires_at=timezone.now() - timedelta(hours=1))
+        current = self._notify()
+        self.assertEqual(list(NotificationService.get_user_notifications(self.user)), [current])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('get_notification_dropdown'))
+        self.assertEqual(list(response.context['notifications']), [current])
+
+    def test_adjustment_during_recount_is_not_lost(self):
+        def count_then_notify(user_id):
+            # 計數後、寫入快取前另一請求建立通知：遞增時鍵尚不存在
+            count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+            self._notify()
+            return count
+
+        with mock.patch(
+            'core.services.notification_counters._count_unread', side_effect=count_then_notify
+        ):
+            self.assertEqual(get_unread_count(self.user), 0)
+        # 過時的計數已捨棄，下次讀取重新計算
+        self.assertEqual(get_unread_count(self.user), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 1)
+
+    def test_count_endpoint_and_stream(self):
+        self._notify()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('get_notification_count'))
+        self.assertEqual(response.json(), {'unread_count': 1, 'stream': False})
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 404)
+
+        with override_settings(NOTIFICATION_SSE_ENABLED=True, NOTIFICATION_SSE_MAX_SECONDS=0):
+            response = self.client.get(reverse('notification_stream'))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: unread\ndata: {"unread_count": 1}', body)
@@ -13,7 +13,7 @@ from core.activity_log_views import activity_log_list, activity_log_detail, expo
 from core.file_manager_views import file_list, file_detail, update_file, download_file, upload_file, delete_file, generate_test_files, dashboard_recent_files, batch_delete_files
 from core.export_views import export_data, export_custom_data, export_table_data, export_demo
 from core.dashboard_views import get_chart_data
-from core.notification_views import delete_notification, get_notification_count, get_notification_dropdown, mark_all_read, mark_notification_read, notification_list
+from core.notification_views import delete_notification, get_notification_count, get_notification_dropdown, mark_all_read, mark_notification_read, notification_list, notification_stream
 from core.point_views import (
     point_dashboard, point_history, point_purchase, create_point_order,
     point_payment, point_orders, cancel_point_order,
@@ -34,7 +34,7 @@ from core.test_invitation_views import (
     enterprise_test_project_stats, create_invitee, edit_invitee, delete_invitee,
     create_invitation, quick_invitation, invitation_detail, resend_invitation, cancel_invitation
 )
-from core.bulk_invitation_views import bulk_invitation, download_csv_template
+from core.bulk_invitation_views import bulk_invitation, download_csv_template, invitation_email_job_status
 from core.invitation_template_views import (
     invitation_template_list, invitation_template_create, invitation_template_edit,
     invitation_template_detail, invitation_template_delete, invitation_template_set_default,
@@ -67,6 +67,13 @@ from .test_result_views import (
     view_raw_data, export_filtered_test_results
 )
 from .test_pdf_views import test_pdf_generation_view
+from .report_job_views import (
+    request_test_result_pdf_job, request_individual_test_result_pdf_job,
+    report_job_status, report_job_download
+)
+from .export_job_views import (
+    request_test_result_export_job, export_job_status, export_job_download
+)
 
 
 urlpatterns = [
@@ -96,6 +103,9 @@ urlpatterns = [
     path('management/enterprise/<int:user_id>/approve/', views.approve_enterprise, name='approve_enterprise'),
     path('management/enterprise/<int:user_id>/reject/', views.reject_enterprise, name='reject_enterprise'),
     path('management/enterprise/<int:user_id>/detail/', views.enterprise_detail, name='enterprise_detail'),
+
+    # 快取統計
+    path('management/cache-metrics/', views.cache_metrics, name='cache_metrics'),
     
     # 用戶管理
     path('users/', UserListView.as_view(), name='user_list'),
@@ -121,6 +131,15 @@ urlpatterns = [
     path('my-test-results/', individual_test_results_list, name='individual_test_results_list'),
     path('my-test-results/<int:result_id>/', individual_test_result_detail, name='individual_test_result_detail'),
     path('my-test-results/<int:result_id>/pdf/', generate_individual_test_result_pdf, name='generate_individual_test_result_pdf'),
+    path('my-test-results/<int:result_id>/pdf/job/', request_individual_test_result_pdf_job, name='request_individual_test_result_pdf_job'),
+
+    # PDF 報告背景任務
+    path('report-jobs/<uuid:job_id>/', report_job_status, name='report_job_status'),
+    path('report-jobs/<uuid:job_id>/download/', report_job_download, name='report_job_download'),
+
+    # 測驗結果匯出背景任務
+    path('export-jobs/<uuid:job_id>/', export_job_status, name='export_job_status'),
+    path('export-jobs/<uuid:job_id>/download/', export_job_download, name='export_job_download'),
     
     # 其他現有路由...
     
@@ -157,6 +176,7 @@ urlpatterns = [
     # 通知
     path('notifications/dropdown/', get_notification_dropdown, name='get_notification_dropdown'),
     path('notifications/count/', get_notification_count, name='get_notification_count'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
     path('api/check-verification/', views.check_verification_status, name='check_verification_status'),
     # 通知相關
     path('notifications/', notification_list, name='notification_list'),
@@ -205,6 +225,7 @@ urlpatterns = [
     # 批量邀請功能
     path('enterprise/bulk-invitation/', bulk_invitation, name='bulk_invitation'),
     path('enterprise/csv-template/', download_csv_template, name='download_csv_template'),
+    path('enterprise/bulk-invitation/email-jobs/<uuid:job_id>/', invitation_email_job_status, name='invitation_email_job_status'),
     
     # 邀請模板管理
     path('enterprise/templates/', invitation_template_list, name='invitation_template_list'),
@@ -254,10 +275,12 @@ urlpatterns = [
     # 企業功能 - 測驗結果管理
     path('enterprise/test-results/', test_result_list, name='test_result_list'),
     path('enterprise/test-results/export/', export_filtered_test_results, name='export_filtered_test_results'),
+    path('enterprise/test-results/export/job/', request_test_result_export_job, name='request_test_result_export_job'),
 
     path('enterprise/test-results/<int:result_id>/', test_result_detail, name='test_result_detail'),
     path('enterprise/test-results/<int:result_id>/export/', export_test_result, name='export_test_result'),
     path('enterprise/test-results/<int:result_id>/pdf/', generate_test_result_pdf_report, name='generate_test_result_pdf'),
+    path('enterprise/test-results/<int:result_id>/pdf/job/', request_test_result_pdf_job, name='request_test_result_pdf_job'),
     path('enterprise/test-results/<int:result_id>/raw-data/', view_raw_data, name='view_raw_data'),
     path('enterprise/test-results/bulk-crawl/', bulk_crawl_results, name='bulk_crawl_results'),
 
@@ -271,6 +294,7 @@ urlpatterns = [
     path('management/test-results/<int:result_id>/', test_result_detail, name='admin_test_result_detail'),
     path('management/test-results/<int:result_id>/export/', export_test_result, name='admin_export_test_result'),
     path('management/test-results/<int:result_id>/pdf/', generate_test_result_pdf_report, name='admin_generate_test_result_pdf'),
+    path('management/test-results/<int:result_id>/pdf/job/', request_test_result_pdf_job, name='admin_request_test_result_pdf_job'),
     path('management/test-results/<int:result_id>/raw-data/', view_raw_data, name='admin_view_raw_data'),
     
     # 爬蟲管理
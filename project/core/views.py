@@ -116,6 +116,7 @@ def test_login(request, user_type):
         request.session['user_permissions'] = ['quote_manage', 'order_manage', 'shipment_manage']
     return redirect('home')
 
+from django.utils.functional import SimpleLazyObject
 from utils.permission_handler import PermissionHandler
 
 def test_login(request, user_type):
@@ -124,13 +125,10 @@ def test_login(request, user_type):
     response.set_cookie('user_type', user_type)
     return response
 
-# 添加一個上下文處理器，使權限在所有模板中可用
+# 添加一個上下文處理器，使權限在所有模板中可用（模板實際使用時才計算）
 def permission_context_processor(request):
-    user_type = request.COOKIES.get('user_type', '')
-    permissions = PermissionHandler.get_permissions(user_type)
-    print(f"Current user type: {user_type}, Permissions: {permissions}")  # 添加調試輸出
     return {
-        'user_permissions': permissions
+        'user_permissions': SimpleLazyObject(lambda: PermissionHandler.get_request_permissions(request))
     }
 
 
@@ -676,6 +674,16 @@ class EnterpriseApprovalListView(TemplateView):
         
         return context
 
+@login_required
+def cache_metrics(request):
+    """快取命中、未命中與 L2 延遲統計（本 worker 程序自啟動以來的累計）"""
+    if not (request.user.is_staff or request.user.user_type == 'admin'):
+        return JsonResponse({'error': '權限不足'}, status=403)
+
+    from utils.tiered_cache import get_cache_metrics
+
+    return JsonResponse(get_cache_metrics())
+
 @staff_member_required
 def approve_enterprise(request, user_id):
     """核准企業"""
@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import os
+import tempfile
 
 
 def env_list(key: str, default: str = "") -> list[str]:
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.ViewMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "core.middleware.SecurityMiddleware",
@@ -103,6 +105,12 @@ DEFAULT_FROM_EMAIL = "Traitty特質評鑑 <service@traitty.com>"
 EMAIL_USE_SSL = False
 EMAIL_USE_TLS = True
 
+# 批次寄信：每批共用一條 SMTP 連線，並依郵件服務商限制控制速率
+EMAIL_BULK_BATCH_SIZE = int(os.getenv("EMAIL_BULK_BATCH_SIZE", "50"))
+EMAIL_BULK_RATE_PER_SECOND = float(os.getenv("EMAIL_BULK_RATE_PER_SECOND", "5"))
+EMAIL_BULK_MAX_RETRIES = int(os.getenv("EMAIL_BULK_MAX_RETRIES", "2"))
+EMAIL_BULK_RETRY_DELAY = float(os.getenv("EMAIL_BULK_RETRY_DELAY", "2"))
+
 SITE_URL = os.getenv("SITE_URL", "https://dev.traitty.com").rstrip("/")
 # 登入設置
 LOGIN_URL = "login"
@@ -170,6 +178,12 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        # 每個請求的效能量測；設為 DEBUG 可輸出所有請求，預設只記錄超過門檻者
+        "view_metrics": {
+            "handlers": ["console"],
+            "level": os.getenv("VIEW_METRICS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
     },
 }
 
@@ -207,18 +221,61 @@ CELERY_BEAT_SCHEDULE = {}
 #         },
 #     })
 
-# 快取設定 (使用本地記憶體快取)
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
-        "TIMEOUT": 60 * 60 * 24 * 30,  # 30天
-        "OPTIONS": {
-            "MAX_ENTRIES": 10000,
-            "CULL_FREQUENCY": 3,
-        },
+# 快取設定
+# 快取：設定 CACHE_REDIS_URL 時使用 Redis，讓多個 worker 共用快取與失效；
+# 未設定時退回檔案快取：同一台主機上的 web worker 與 Celery 程序仍共用同一份計數與鎖，
+# 但遞增不是原子操作，多台主機或高並行部署需設定 Redis
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "TIMEOUT": 60 * 60 * 24 * 30,  # 30天
+            "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "traitty"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_FILE_PATH", os.path.join(tempfile.gettempdir(), "traitty_cache")),
+            "TIMEOUT": 60 * 60 * 24 * 30,  # 30天
+            "OPTIONS": {
+                "MAX_ENTRIES": 10000,
+                "CULL_FREQUENCY": 3,
+            },
+        }
     }
+
+# 兩層快取（utils/tiered_cache.py）：各 worker 程序內的 L1 在前、上面的 default（L2）在後；
+# 速率限制、IP 封鎖、短網址與點擊計數依子系統使用各自的命名空間
+CACHES["local"] = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "tiered-l1",
+    "OPTIONS": {
+        "MAX_ENTRIES": int(os.getenv("CACHE_L1_MAX_ENTRIES", "5000")),
+        "CULL_FREQUENCY": 3,
+    },
 }
+CACHE_L1_ALIAS = "local"
+CACHE_L2_ALIAS = "default"
+# L1 保留秒數：其他 worker 的寫入與失效最多延遲這麼久才生效
+CACHE_L1_TIMEOUT = int(os.getenv("CACHE_L1_TIMEOUT", "5"))
+
+# Session 寫入資料庫並快取在共用的 L2，各 worker 讀到相同的 session
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+SESSION_CACHE_ALIAS = CACHE_L2_ALIAS
+
+# 儀表板計數快取秒數
+DASHBOARD_METRICS_TIMEOUT = int(os.getenv("DASHBOARD_METRICS_TIMEOUT", "60"))
+DASHBOARD_ADMIN_METRICS_TIMEOUT = int(os.getenv("DASHBOARD_ADMIN_METRICS_TIMEOUT", "120"))
+
+# 視圖效能量測（SQL 次數、資料庫時間、回應大小）；X-View-Metrics 標頭預設只在 DEBUG 時附加
+VIEW_METRICS_ENABLED = os.getenv("VIEW_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+VIEW_METRICS_HEADER = os.getenv("VIEW_METRICS_HEADER", str(DEBUG)).lower() in ("1", "true", "yes")
+VIEW_METRICS_QUERY_WARNING = int(os.getenv("VIEW_METRICS_QUERY_WARNING", "50"))
+VIEW_METRICS_SLOW_MS = int(os.getenv("VIEW_METRICS_SLOW_MS", "1000"))
 
 # REST Framework 設定
 REST_FRAMEWORK = {
@@ -280,9 +337,28 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = "DENY"
 
-# API 速率限制
+# API 速率限制（計數只存放在共用的 L2，所有 worker 一致）
 RATELIMIT_ENABLE = True
-RATELIMIT_USE_CACHE = "default"
+RATELIMIT_USE_CACHE = CACHE_L2_ALIAS
+# RateLimitMiddleware 依路徑前綴套用的滑動視窗限制（格式 "次數/單位"，單位 s、m、h、d，例如 "10/30s"）
+RATE_LIMIT_RULES = {
+    "/auth/login/": os.getenv("RATE_LIMIT_LOGIN", "5/m"),
+    "/auth/register/": os.getenv("RATE_LIMIT_REGISTER", "5/m"),
+    "/api/auth/login/": os.getenv("RATE_LIMIT_LOGIN", "5/m"),
+    "/api/auth/register/": os.getenv("RATE_LIMIT_REGISTER", "5/m"),
+    "/forgot-password/": os.getenv("RATE_LIMIT_FORGOT_PASSWORD", "5/m"),
+}
+
+# SecurityMiddleware 由共用快取重新載入 IP 封鎖名單的間隔秒數
+IP_BLOCKLIST_REFRESH_SECONDS = int(os.getenv("IP_BLOCKLIST_REFRESH_SECONDS", "30"))
+
+# 未讀通知計數在共用快取中保留的秒數（過期後由資料庫重新計算）
+NOTIFICATION_COUNTER_TIMEOUT = int(os.getenv("NOTIFICATION_COUNTER_TIMEOUT", str(60 * 60 * 24)))
+# 以 Server-Sent Events 推送未讀數量；每條連線佔用一個 worker 執行緒，
+# 只在 ASGI 或多執行緒 worker 部署時開啟，否則頁面維持定期輪詢
+NOTIFICATION_SSE_ENABLED = os.getenv("NOTIFICATION_SSE_ENABLED", "false").lower() in ("1", "true", "yes")
+NOTIFICATION_SSE_INTERVAL = int(os.getenv("NOTIFICATION_SSE_INTERVAL", "5"))
+NOTIFICATION_SSE_MAX_SECONDS = int(os.getenv("NOTIFICATION_SSE_MAX_SECONDS", "55"))
 
 # 檔案上傳設定
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -375,6 +451,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# 報告與匯出檔案含受測者資料，存放於 MEDIA_ROOT 之外，只經由有權限檢查的下載視圖提供
+PRIVATE_MEDIA_ROOT = os.getenv("PRIVATE_MEDIA_ROOT", os.path.join(BASE_DIR, "private_media"))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -1,5 +1,5 @@
 # tests/test_views.py
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
@@ -8,12 +8,14 @@ import json
 
 from core.models import (
     TestProject, TestInvitee, TestInvitation, 
-    InvitationTemplate, UserPointBalance
+    InvitationTemplate, UserPointBalance, EnterpriseProfile,
+    TestProjectCategory, Trait
 )
+from utils.view_metrics import METRICS_HEADER, QueryBudgetMixin
 
 User = get_user_model()
 
-class AuthViewsTest(TestCase):
+class AuthViewsTest(QueryBudgetMixin, TestCase):
     """認證視圖測試"""
     
     def setUp(self):
@@ -31,7 +33,8 @@ class AuthViewsTest(TestCase):
     
     def test_login_view_get(self):
         """測試登入頁面 GET 請求"""
-        response = self.client.get(reverse('login'))
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('login'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '登入')
     
@@ -60,7 +63,7 @@ class AuthViewsTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('login'))
 
-class DashboardViewTest(TestCase):
+class DashboardViewTest(QueryBudgetMixin, TestCase):
     """儀表板視圖測試"""
     
     def setUp(self):
@@ -100,25 +103,28 @@ class DashboardViewTest(TestCase):
     def test_enterprise_dashboard(self):
         """測試企業用戶儀表板"""
         self.client.login(username='enterprise', password='Test123!')
-        response = self.client.get(reverse('dashboard'))
+        with self.assertQueryBudget(20):
+            response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '企業用戶儀表板')
     
     def test_individual_dashboard(self):
         """測試個人用戶儀表板"""
         self.client.login(username='individual', password='Test123!')
-        response = self.client.get(reverse('dashboard'))
+        with self.assertQueryBudget(12):
+            response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '個人用戶儀表板')
     
     def test_admin_dashboard(self):
         """測試管理員儀表板"""
         self.client.login(username='admin', password='Test123!')
-        response = self.client.get(reverse('dashboard'))
+        with self.assertQueryBudget(15):
+            response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '管理員儀表板')
 
-class EnterpriseViewsTest(TestCase):
+class EnterpriseViewsTest(QueryBudgetMixin, TestCase):
     """企業功能視圖測試"""
     
     def setUp(self):
@@ -131,11 +137,19 @@ class EnterpriseViewsTest(TestCase):
             user_type='enterprise',
             is_active=True
         )
+        EnterpriseProfile.objects.create(
+            user=self.enterprise_user,
+            company_name='測試企業',
+            contact_person='聯絡人',
+            contact_phone='0212345678',
+            verification_status='approved'
+        )
         
         self.test_project = TestProject.objects.create(
             name='測試項目',
             test_link='https://example.com/test',
-            assignment_type='all_open'
+            assignment_type='all_open',
+            created_by=self.enterprise_user
         )
         
         self.invitee = TestInvitee.objects.create(
@@ -165,7 +179,8 @@ class EnterpriseViewsTest(TestCase):
     def test_invitee_list_for_enterprise(self):
         """測試企業用戶受測者列表"""
         self.client.login(username='enterprise', password='Test123!')
-        response = self.client.get(reverse('invitee_list'))
+        with self.assertQueryBudget(7):
+            response = self.client.get(reverse('invitee_list'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '測試受測者')
     
@@ -189,16 +204,18 @@ class EnterpriseViewsTest(TestCase):
             enterprise=self.enterprise_user,
             test_project=self.test_project,
             invitee=self.invitee,
-            expires_at=timezone.now() + timedelta(days=7)
+            expires_at=timezone.now() + timedelta(days=7),
+            points_consumed=1
         )
         
         self.client.login(username='enterprise', password='Test123!')
-        response = self.client.get(reverse('invitation_list'))
+        with self.assertQueryBudget(9):
+            response = self.client.get(reverse('invitation_list'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '測試項目')
         self.assertContains(response, '測試受測者')
 
-class InvitationTemplateViewsTest(TestCase):
+class InvitationTemplateViewsTest(QueryBudgetMixin, TestCase):
     """邀請模板視圖測試"""
     
     def setUp(self):
@@ -211,13 +228,20 @@ class InvitationTemplateViewsTest(TestCase):
             user_type='enterprise',
             is_active=True
         )
+        EnterpriseProfile.objects.create(
+            user=self.enterprise_user,
+            company_name='測試企業',
+            contact_person='聯絡人',
+            contact_phone='0212345678',
+            verification_status='approved'
+        )
         
         self.template = InvitationTemplate.objects.create(
             enterprise=self.enterprise_user,
             name='測試模板',
-            template_type='general',
-            subject='測試主題',
-            message='測試訊息'
+            template_type='custom',
+            subject_template='測試主題',
+            message_template='測試訊息'
         )
     
     def test_template_list(self):
@@ -260,7 +284,7 @@ class InvitationTemplateViewsTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertFalse(InvitationTemplate.objects.filter(id=self.template.id).exists())
 
-class StatisticsViewsTest(TestCase):
+class StatisticsViewsTest(QueryBudgetMixin, TestCase):
     """統計視圖測試"""
     
     def setUp(self):
@@ -273,11 +297,19 @@ class StatisticsViewsTest(TestCase):
             user_type='enterprise',
             is_active=True
         )
+        EnterpriseProfile.objects.create(
+            user=self.enterprise_user,
+            company_name='測試企業',
+            contact_person='聯絡人',
+            contact_phone='0212345678',
+            verification_status='approved'
+        )
         
         self.test_project = TestProject.objects.create(
             name='測試項目',
             test_link='https://example.com/test',
-            assignment_type='all_open'
+            assignment_type='all_open',
+            created_by=self.enterprise_user
         )
         
         self.invitee = TestInvitee.objects.create(
@@ -292,13 +324,15 @@ class StatisticsViewsTest(TestCase):
             test_project=self.test_project,
             invitee=self.invitee,
             status='completed',
-            expires_at=timezone.now() + timedelta(days=7)
+            expires_at=timezone.now() + timedelta(days=7),
+            points_consumed=1
         )
     
     def test_statistics_dashboard(self):
         """測試統計儀表板"""
         self.client.login(username='enterprise', password='Test123!')
-        response = self.client.get(reverse('statistics_dashboard'))
+        with self.assertQueryBudget(14):
+            response = self.client.get(reverse('statistics_dashboard'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '統計分析')
     
@@ -312,4 +346,61 @@ class StatisticsViewsTest(TestCase):
         self.assertIn('total_invitations', data)
         self.assertIn('completed_tests', data)
         self.assertEqual(data['total_invitations'], 1)
-        self.assertEqual(data['completed_tests'], 1)
\ No newline at end of file
+        self.assertEqual(data['completed_tests'], 1)
+
+
+class ViewMetricsTest(QueryBudgetMixin, TestCase):
+    """視圖效能量測測試"""
+    
+    def setUp(self):
+        """設定測試數據"""
+        self.client = Client()
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='Test123!',
+            user_type='admin',
+            is_active=True,
+            is_staff=True
+        )
+    
+    def _create_project(self, index):
+        project = TestProject.objects.create(
+            name=f'測試項目{index}',
+            test_link='https://example.com/test',
+            assignment_type='all_open',
+            created_by=self.admin_user
+        )
+        category = TestProjectCategory.objects.create(test_project=project, name=f'分類{index}')
+        category.traits.add(Trait.objects.create(system_name=f'Trait{index}', chinese_name=f'特質{index}'))
+        return project
+    
+    @override_settings(VIEW_METRICS_HEADER=True)
+    def test_metrics_header(self):
+        """測試回應附加 X-View-Metrics 標頭"""
+        self.client.login(username='admin', password='Test123!')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries=', response[METRICS_HEADER])
+        self.assertIn('bytes=', response[METRICS_HEADER])
+    
+    def test_project_list_query_budget(self):
+        """測試測驗項目列表的查詢次數不隨項目數增加"""
+        self.client.login(username='admin', password='Test123!')
+        self._create_project(0)
+        with self.assertQueryBudget(12):
+            response = self.client.get(reverse('test_project_list'))
+        self.assertEqual(response.status_code, 200)
+        
+        for index in range(1, 6):
+            self._create_project(index)
+        with self.assertQueryBudget(12):
+            response = self.client.get(reverse('test_project_list'))
+        self.assertContains(response, '測試項目5')
+    
+    def test_budget_exceeded_fails(self):
+        """測試超過查詢預算時測試失敗並列出 SQL"""
+        with self.assertRaisesMessage(AssertionError, '超過預算 1'):
+            with self.assertQueryBudget(1):
+                list(User.objects.all())
+                list(TestProject.objects.all())
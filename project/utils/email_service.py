@@ -1,16 +1,98 @@
 # utils/email_service.py
 
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.template.loader import get_template, render_to_string
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPResponseException
+import time
 import uuid
 import logging
 
 # 設定 logger
 logger = logging.getLogger(__name__)
 
+# 批次寄送：每批共用一條 SMTP 連線
+BULK_BATCH_SIZE = getattr(settings, 'EMAIL_BULK_BATCH_SIZE', 50)
+# 每秒最多寄送封數（0 表示不限，依郵件服務商限制調整）
+BULK_RATE_PER_SECOND = getattr(settings, 'EMAIL_BULK_RATE_PER_SECOND', 5)
+BULK_MAX_RETRIES = getattr(settings, 'EMAIL_BULK_MAX_RETRIES', 2)
+BULK_RETRY_DELAY = getattr(settings, 'EMAIL_BULK_RETRY_DELAY', 2)
+
+
+class BulkMailer:
+    """以單一 SMTP 連線批次寄送郵件，限制寄送速率並重試暫時性錯誤"""
+
+    def __init__(self, batch_size=None, rate_per_second=None, max_retries=None, retry_delay=None,
+                 sleep=time.sleep):
+        self.batch_size = batch_size or BULK_BATCH_SIZE
+        self.rate_per_second = BULK_RATE_PER_SECOND if rate_per_second is None else rate_per_second
+        self.max_retries = BULK_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_delay = BULK_RETRY_DELAY if retry_delay is None else retry_delay
+        self.sleep = sleep
+        self._next_send_at = 0.0
+
+    def send(self, messages):
+        """寄送多封郵件，回傳與 messages 對應的成功與否列表"""
+        results = []
+        for start in range(0, len(messages), self.batch_size):
+            results.extend(self._send_batch(messages[start:start + self.batch_size]))
+        return results
+
+    def _send_batch(self, batch):
+        connection = get_connection(fail_silently=False)
+        results = []
+        try:
+            self._open(connection)
+            for message in batch:
+                results.append(self._send_one(connection, message))
+        finally:
+            connection.close()
+        return results
+
+    def _send_one(self, connection, message):
+        recipients = ', '.join(message.recipients())
+        for attempt in range(self.max_retries + 1):
+            self._throttle()
+            try:
+                return bool(connection.send_messages([message]))
+            except (SMTPException, OSError) as e:
+                if self._is_permanent(e) or attempt == self.max_retries:
+                    logger.error(f"郵件寄送失敗：{recipients} - {str(e)}")
+                    return False
+                logger.warning(f"郵件寄送暫時失敗，重新連線後重試（第 {attempt + 1} 次）：{recipients} - {str(e)}")
+                connection.close()
+                self.sleep(self.retry_delay * (2 ** attempt))
+                self._open(connection)
+        return False
+
+    @staticmethod
+    def _open(connection):
+        # 連線失敗時不中斷整批，留待寄送時重試
+        try:
+            connection.open()
+        except (SMTPException, OSError) as e:
+            logger.warning(f"SMTP 連線失敗：{str(e)}")
+
+    @staticmethod
+    def _is_permanent(error):
+        # 收件者被拒或 5xx 回應重試也不會成功
+        if isinstance(error, SMTPRecipientsRefused):
+            return True
+        return isinstance(error, SMTPResponseException) and error.smtp_code >= 500
+
+    def _throttle(self):
+        if not self.rate_per_second:
+            return
+        now = time.monotonic()
+        wait = self._next_send_at - now
+        if wait > 0:
+            self.sleep(wait)
+            now += wait
+        self._next_send_at = now + 1.0 / self.rate_per_second
+
+
 class EmailService:
     @staticmethod
     def send_verification_email(user):
@@ -185,47 +267,47 @@ Traitty特質評鑑 客服團隊
             return False
 
     @staticmethod
-    def send_test_invitation_email(invitation):
-        """發送測驗邀請郵件"""
-        try:
-            invitee = invitation.invitee
-            project = invitation.test_project
-            enterprise = invitation.enterprise
-            
-            # 獲取短網址
-            test_url = invitation.result_data.get('short_url', project.test_link)
-            
-            subject = f'【{enterprise.enterprise_profile.company_name}】Traitty 特質評鑑邀請'
-            
-            # 計算剩餘天數
-            remaining_days = max(0, (invitation.expires_at - timezone.now()).days)
-            
-            # 取得企業聯絡電話
-            enterprise_phone = enterprise.enterprise_profile.contact_phone
-            logger.info(f"企業聯絡電話: '{enterprise_phone}', 企業: {enterprise.enterprise_profile.company_name}")
-            
-            context = {
-                'invitee_name': invitee.name,
-                'invitee_email': invitee.email,
-                'project_name': project.name,
-                'project_description': project.description,
-                'enterprise_name': enterprise.enterprise_profile.company_name,
-                'test_url': test_url,
-                'expires_at': invitation.expires_at,
-                'remaining_days': remaining_days,
-                'custom_message': invitation.custom_message,
-                'invitation_code': invitation.invitation_code,
-                'enterprise_contact': enterprise.enterprise_profile.contact_person,
-                'enterprise_phone': enterprise_phone or '請聯繫邀請企業',
-                'logo': f"{settings.SITE_URL}/static/img/Traitty logo.png",
-                'header_image_url': f"{settings.SITE_URL}{settings.STATIC_URL}email/emal_header.png?v=2025110401",
-            }
-            
-            # 使用HTML模板
-            html_content = render_to_string('email/test_invitation_email.html', context)
-            
-            # 純文字版本（與HTML版本對應）
-            text_content = f'''親愛的 {invitee.name}，您好！
+    def build_test_invitation_message(invitation, html_template=None):
+        """組成測驗邀請郵件（批次寄送時傳入已載入的模板，避免每封重新載入）"""
+        invitee = invitation.invitee
+        project = invitation.test_project
+        enterprise = invitation.enterprise
+        
+        # 獲取短網址
+        test_url = invitation.result_data.get('short_url', project.test_link)
+        
+        subject = f'【{enterprise.enterprise_profile.company_name}】Traitty 特質評鑑邀請'
+        
+        # 計算剩餘天數
+        remaining_days = max(0, (invitation.expires_at - timezone.now()).days)
+        
+        # 取得企業聯絡電話
+        enterprise_phone = enterprise.enterprise_profile.contact_phone
+        logger.debug(f"企業聯絡電話: '{enterprise_phone}', 企業: {enterprise.enterprise_profile.company_name}")
+        
+        context = {
+            'invitee_name': invitee.name,
+            'invitee_email': invitee.email,
+            'project_name': project.name,
+            'project_description': project.description,
+            'enterprise_name': enterprise.enterprise_profile.company_name,
+            'test_url': test_url,
+            'expires_at': invitation.expires_at,
+            'remaining_days': remaining_days,
+            'custom_message': invitation.custom_message,
+            'invitation_code': invitation.invitation_code,
+            'enterprise_contact': enterprise.enterprise_profile.contact_person,
+            'enterprise_phone': enterprise_phone or '請聯繫邀請企業',
+            'logo': f"{settings.SITE_URL}/static/img/Traitty logo.png",
+            'header_image_url': f"{settings.SITE_URL}{settings.STATIC_URL}email/emal_header.png?v=2025110401",
+        }
+        
+        # 使用HTML模板
+        html_template = html_template or get_template('email/test_invitation_email.html')
+        html_content = html_template.render(context)
+        
+        # 純文字版本（與HTML版本對應）
+        text_content = f'''親愛的 {invitee.name}，您好！
 
 {enterprise.enterprise_profile.company_name} 誠摯邀請您參加以下測驗：
 
@@ -251,23 +333,50 @@ Traitty特質評鑑 客服團隊
 {enterprise.enterprise_profile.company_name}
 此郵件由Traitty特質評鑑自動發送，請勿直接回覆
 如有疑問，請聯繫邀請企業或平台客服'''
+        
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[invitee.email],
+        )
+        message.attach_alternative(html_content, 'text/html')
+        return message
+
+    @staticmethod
+    def send_test_invitation_email(invitation):
+        """發送測驗邀請郵件"""
+        try:
+            EmailService.build_test_invitation_message(invitation).send(fail_silently=False)
             
-            send_mail(
-                subject=subject,
-                message=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[invitee.email],
-                html_message=html_content,
-                fail_silently=False,
-            )
-            
-            logger.info(f"測驗邀請郵件發送成功：{invitee.email} - {project.name}")
+            logger.info(f"測驗邀請郵件發送成功：{invitation.invitee.email} - {invitation.test_project.name}")
             return True
             
         except Exception as e:
             logger.error(f"測驗邀請郵件發送失敗：{str(e)}")
             return False
 
+    @staticmethod
+    def send_test_invitation_emails(invitations, mailer=None):
+        """批次發送測驗邀請郵件：模板只載入一次，每批共用一條 SMTP 連線；回傳 {邀請ID: 是否成功}"""
+        html_template = get_template('email/test_invitation_email.html')
+        results = {}
+        messages = []
+        invitation_ids = []
+        for invitation in invitations:
+            try:
+                messages.append(EmailService.build_test_invitation_message(invitation, html_template))
+                invitation_ids.append(invitation.pk)
+            except Exception as e:
+                logger.error(f"測驗邀請郵件組成失敗 invitation={invitation.pk}：{str(e)}")
+                results[invitation.pk] = False
+        
+        for invitation_id, sent in zip(invitation_ids, (mailer or BulkMailer()).send(messages)):
+            results[invitation_id] = sent
+        
+        logger.info(f"批次測驗邀請郵件發送完成：成功 {sum(results.values())} / {len(results)} 封")
+        return results
+
     @staticmethod
     def resend_test_invitation_email(invitation):
         """重新發送測驗邀請郵件"""
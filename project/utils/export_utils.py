@@ -2,10 +2,217 @@
 import csv
 import io
 import json
-from django.http import HttpResponse
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import HttpResponse, StreamingHttpResponse
 import datetime
 import random
 
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 每累積多少列輸出一次，避免逐列產生過多小區塊
+STREAM_BATCH_ROWS = 500
+
+
+class Echo:
+    """csv.writer 使用的虛擬緩衝區：write 直接回傳內容，供串流輸出"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, header=None):
+    """將列資料逐批轉為 CSV 字串（不在記憶體中保留整份檔案）"""
+    writer = csv.writer(Echo())
+    batch = []
+    if header:
+        batch.append(writer.writerow(header))
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class _StreamBuffer:
+    """僅供寫入的緩衝區：zipfile 寫入後由產生器取出已完成的位元組
+
+    不提供 seek，zipfile 會改用 data descriptor 記錄大小，因此可以邊寫邊輸出。
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# XML 1.0 不允許的控制字元
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# 樣式 0 為一般儲存格，樣式 1 為粗體標題列
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _column_letter(index):
+    """0 起算的欄位序號轉為 Excel 欄名（0 -> A、26 -> AA）"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(ref, value, style=0):
+    style_attr = f' s="{style}"' if style else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"{style_attr}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    if isinstance(value, datetime.datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, datetime.date):
+        value = value.strftime('%Y-%m-%d')
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(row_number, values, style=0):
+    cells = ''.join(
+        _xlsx_cell(f'{_column_letter(index)}{row_number}', value, style)
+        for index, value in enumerate(values)
+        if value is not None and value != ''
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def iter_xlsx(rows, header=None, sheet_name='Sheet1'):
+    """將列資料逐批寫成 XLSX（ZIP 串流），每次產出已壓縮完成的位元組
+
+    儲存格使用 inline string，不需要先收集共用字串表，因此記憶體用量與列數無關。
+    """
+    buffer = _StreamBuffer()
+    sheet_name = escape(_ILLEGAL_XML_CHARS.sub('', sheet_name))[:31] or 'Sheet1'
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(sheet_name=sheet_name))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _XLSX_STYLES)
+        yield buffer.pop()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(_XLSX_SHEET_HEAD.encode('utf-8'))
+            row_number = 0
+            if header:
+                row_number += 1
+                sheet.write(_xlsx_row(row_number, header, style=1).encode('utf-8'))
+            for row in rows:
+                row_number += 1
+                sheet.write(_xlsx_row(row_number, row).encode('utf-8'))
+                if row_number % STREAM_BATCH_ROWS == 0:
+                    chunk = buffer.pop()
+                    if chunk:
+                        yield chunk
+            sheet.write(_XLSX_SHEET_TAIL.encode('utf-8'))
+
+    yield buffer.pop()
+
+
+def _resolve_field(row, field):
+    """取得欄位值，支援巢狀屬性（例如：'user.name'）"""
+    value = row
+    for part in field.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, '')
+        else:
+            try:
+                value = getattr(value, part, '')
+            except Exception:
+                value = ''
+    return value
+
+
+def _iter_header_rows(data, headers):
+    for row in data:
+        yield [_resolve_field(row, field) for field in headers]
+
 class ExportService:
     """匯出服務類 - 提供數據匯出功能"""
     
@@ -20,40 +227,16 @@ class ExportService:
             filename: 下載的檔案名稱 (可選)
         
         返回:
-            HttpResponse 包含CSV數據
+            StreamingHttpResponse 逐批輸出CSV數據
         """
         if filename is None:
             filename = f"export_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
         
-        # 創建一個文件流
-        csv_buffer = io.StringIO()
-        
-        # 創建CSV寫入器
-        writer = csv.writer(csv_buffer)
-        
-        # 寫入標題行
         header_row = [headers[field] for field in headers]
-        writer.writerow(header_row)
-        
-        # 寫入數據行
-        for row in data:
-            row_data = []
-            for field in headers:
-                # 處理嵌套屬性 (例如：'user.name')
-                value = row
-                for part in field.split('.'):
-                    if isinstance(value, dict):
-                        value = value.get(part, '')
-                    else:
-                        try:
-                            value = getattr(value, part, '')
-                        except:
-                            value = ''
-                row_data.append(value)
-            writer.writerow(row_data)
-        
-        # 創建HTTP響應
-        response = HttpResponse(csv_buffer.getvalue(), content_type='text/csv')
+        response = StreamingHttpResponse(
+            iter_csv(_iter_header_rows(data, headers), header=header_row),
+            content_type='text/csv'
+        )
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
         return response
@@ -69,22 +252,16 @@ class ExportService:
             filename: 下載的檔案名稱 (可選)
         
         返回:
-            HttpResponse 包含Excel數據
+            StreamingHttpResponse 逐批輸出Excel數據
         """
         if filename is None:
             filename = f"export_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
         
-        # 這裡模擬匯出，實際應用應使用pandas或openpyxl
-        # 在這個模擬版本中，我們只返回一個空的Excel檔案表示成功
-        
-        # 創建一個文件流
-        excel_buffer = io.BytesIO()
-        
-        # 模擬一些Excel數據
-        excel_buffer.write(b'PK\x03\x04\x14\x00\x00\x00\x08\x00')  # 一些Excel文件頭數據
-        
-        # 創建HTTP響應
-        response = HttpResponse(excel_buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        header_row = [headers[field] for field in headers]
+        response = StreamingHttpResponse(
+            iter_xlsx(_iter_header_rows(data, headers), header=header_row),
+            content_type=XLSX_CONTENT_TYPE
+        )
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
         return response
@@ -0,0 +1,74 @@
+# utils/ip_blocklist.py
+"""
+IP 封鎖名單：單一位址以集合查詢，網段依前綴長度分組後以遮罩查詢
+查詢成本與名單大小無關（最多檢查出現過的前綴長度數）
+"""
+import ipaddress
+from typing import Dict, Iterable, Set, Tuple
+
+
+def normalize_entry(entry) -> str:
+    """驗證並正規化名單項目（單一 IP 或 CIDR 網段），格式錯誤時拋出 ValueError"""
+    entry = str(entry).strip()
+    if '/' in entry:
+        return str(ipaddress.ip_network(entry, strict=False))
+    return str(ipaddress.ip_address(entry))
+
+
+class IPBlocklist:
+    # 網段查詢結果快取的上限（超過時清空）
+    MAX_CACHED = 10000
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self.addresses: Set[str] = set()
+        self._cached: Dict[str, bool] = {}
+        # (IP 版本, 前綴長度) -> 網段位址整數的集合
+        self.networks: Dict[Tuple[int, int], Set[int]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        entry = normalize_entry(entry)
+        self._cached.clear()
+        if '/' not in entry:
+            self.addresses.add(entry)
+            return
+        network = ipaddress.ip_network(entry)
+        if network.num_addresses == 1:
+            self.addresses.add(str(network.network_address))
+            return
+        key = (network.version, network.prefixlen)
+        self.networks.setdefault(key, set()).add(int(network.network_address))
+
+    def __len__(self):
+        return len(self.addresses) + sum(len(networks) for networks in self.networks.values())
+
+    def __contains__(self, ip):
+        if not ip:
+            return False
+        if ip in self.addresses:
+            return True
+        if not self.networks and ':' not in ip:
+            # IPv4 位址字串已是正規形式
+            return False
+        blocked = self._cached.get(ip)
+        if blocked is None:
+            blocked = self._match(ip)
+            if len(self._cached) >= self.MAX_CACHED:
+                self._cached.clear()
+            self._cached[ip] = blocked
+        return blocked
+
+    def _match(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if str(address) in self.addresses:
+            return True
+        value = int(address)
+        bits = address.max_prefixlen
+        for (version, prefixlen), networks in self.networks.items():
+            if version == address.version and (value >> (bits - prefixlen)) << (bits - prefixlen) in networks:
+                return True
+        return False
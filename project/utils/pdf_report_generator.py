@@ -7,13 +7,15 @@ PDF 報告生成器
 import os
 import io
 from typing import Dict
-from decimal import Decimal, InvalidOperation
 from django.conf import settings
 from django.http import HttpResponse
 from django.utils import timezone
 from django.utils.text import slugify
 from django.template import Template, Context
 
+from core.services.project_scoring_graph import get_project_scoring_graph, get_result_trait_scores
+from core.services.role_index_stats import get_role_index_calibration
+from core.services.score_percentiles import get_result_percentiles
 from .radar_calculations import compute_role_based_scores
 
 try:
@@ -86,6 +88,8 @@ class PDFReportGenerator:
             'email': 'info@perception-group.com'
         }
         self._latest_role_based_metrics = None
+        self._scoring_graph = None
+        self._trait_scores = None
     
     def _register_chinese_fonts(self):
         """註冊中文字體"""
@@ -444,22 +448,31 @@ class PDFReportGenerator:
         
         canvas.restoreState()
     
-    def generate_test_result_report(self, test_result, output_path=None):
+    def generate_test_result_report(self, test_result, output_path=None, progress_callback=None):
         """
         生成測驗結果報告
         
         Args:
             test_result: TestProjectResult 物件
             output_path: 輸出路徑，如果為 None 則返回 HttpResponse
+            progress_callback: 進度回報函數（接收 0-100 的整數），供背景任務更新進度
         
         Returns:
             HttpResponse 或 檔案路徑
         """
+        def report_progress(percent):
+            if progress_callback:
+                progress_callback(percent)
+
         # 建立 PDF 文件
         buffer = io.BytesIO()
         
         # 初始化標記
         self.has_development_suggestions = False
+
+        # 分類/特質/權重關係只載入一次，兩階段排版共用
+        self._scoring_graph = get_project_scoring_graph(test_result.test_project)
+        self._trait_scores = None
         
         # 創建story生成函數
         def create_story():
@@ -511,12 +524,15 @@ class PDFReportGenerator:
             self.total_pages_count = max(self.total_pages_count, canvas.getPageNumber())
         
         # 先建立一次來計算總頁數
+        report_progress(20)
         temp_doc.build(create_story(), onFirstPage=count_pages_only, onLaterPages=count_pages_only)
         
         print(f"[DEBUG] 計算得出總頁數: {self.total_pages_count}")
         
         # 第二階段：使用正確的總頁數生成最終PDF
+        report_progress(55)
         doc.build(create_story(), onFirstPage=self._draw_cover_page_header_footer, onLaterPages=self._draw_header_footer)
+        report_progress(90)
         
         # 處理輸出
         if output_path:
@@ -528,35 +544,38 @@ class PDFReportGenerator:
         else:
             # 返回 HTTP 響應
             buffer.seek(0)
-            # 獲取受測者姓名
-            invitee_name = test_result.test_invitation.invitee.name or ''
-            project_abbreviation = (test_result.test_project.name_abbreviation or '').strip()
-            if not project_abbreviation:
-                project_abbreviation = test_result.test_project.name or ''
-
-            # 清理檔案名稱中的特殊字符，避免檔案系統問題
-            import re
-
-            def sanitize_component(value: str) -> str:
-                cleaned = re.sub(r'[\\/:*?"<>|]', '_', value or '')
-                return cleaned.strip().strip('_')
-
-            display_invitee_name = sanitize_component(invitee_name) or f"受測者{test_result.id}"
-            display_project_abbr = sanitize_component(project_abbreviation) or sanitize_component(test_result.test_project.name) or "測驗"
-
-            # ASCII 後備檔名，避免特殊字元導致下載失敗
-            ascii_invitee = slugify(display_invitee_name) or f"user_{test_result.id}"
-            ascii_project = slugify(display_project_abbr) or "project"
-            safe_filename = f"traitty_result_report_{ascii_project}_{ascii_invitee}.pdf"
-            display_filename = f"Traitty結果報告＿{display_project_abbr}＿{display_invitee_name}.pdf"
+            safe_filename, display_filename = self.build_report_filenames(test_result)
             
             response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            # 使用標準的檔名編碼方式
-            import urllib.parse
-            encoded_display_name = urllib.parse.quote(display_filename.encode('utf-8'))
-            response['Content-Disposition'] = f'attachment; filename="{safe_filename}"; filename*=UTF-8\'\'{encoded_display_name}'
+            response['Content-Disposition'] = build_content_disposition(safe_filename, display_filename)
             buffer.close()
             return response
+
+    @staticmethod
+    def build_report_filenames(test_result):
+        """取得報告下載檔名（ASCII 後備檔名, 顯示檔名）"""
+        # 獲取受測者姓名
+        invitee_name = test_result.test_invitation.invitee.name or ''
+        project_abbreviation = (test_result.test_project.name_abbreviation or '').strip()
+        if not project_abbreviation:
+            project_abbreviation = test_result.test_project.name or ''
+
+        # 清理檔案名稱中的特殊字符，避免檔案系統問題
+        import re
+
+        def sanitize_component(value: str) -> str:
+            cleaned = re.sub(r'[\\/:*?"<>|]', '_', value or '')
+            return cleaned.strip().strip('_')
+
+        display_invitee_name = sanitize_component(invitee_name) or f"受測者{test_result.id}"
+        display_project_abbr = sanitize_component(project_abbreviation) or sanitize_component(test_result.test_project.name) or "測驗"
+
+        # ASCII 後備檔名，避免特殊字元導致下載失敗
+        ascii_invitee = slugify(display_invitee_name) or f"user_{test_result.id}"
+        ascii_project = slugify(display_project_abbr) or "project"
+        safe_filename = f"traitty_result_report_{ascii_project}_{ascii_invitee}.pdf"
+        display_filename = f"Traitty結果報告＿{display_project_abbr}＿{display_invitee_name}.pdf"
+        return safe_filename, display_filename
     
     def _create_cover_page(self, test_result):
         """建立封面頁"""
@@ -634,6 +653,18 @@ class PDFReportGenerator:
             ['結果取得時間', completed_time]
         ]
         
+        # 同測驗項目的相對位置（樣本不足時不顯示）
+        percentiles = get_result_percentiles(test_result)
+        percentile_labels = (
+            ('ci', 'CI 分數'),
+            ('prediction', test_result.test_project.prediction_field_chinese or '預測分數'),
+        )
+        percentile_parts = [
+            f"{label} 前 {percentiles[metric]:g}%" for metric, label in percentile_labels if percentiles[metric]
+        ]
+        if percentile_parts:
+            basic_info_data.append(['同測驗項目排名', '、'.join(percentile_parts)])
+        
         # 添加上方水平線
         from reportlab.graphics.shapes import Line, Drawing
         
@@ -840,7 +871,7 @@ class PDFReportGenerator:
         if self._latest_role_based_metrics:
             mixed_roles = self._latest_role_based_metrics.get("mixed_roles") or []
             for role_name in mixed_roles:
-                category = test_result.test_project.categories.filter(name=role_name).first()
+                category = self._get_scoring_graph(test_result).category(role_name)
                 if category:
                     mixed_role_categories.append(category)
             if mixed_role_categories:
@@ -878,7 +909,7 @@ class PDFReportGenerator:
         
         for category_name, score in sorted_categories:
             # 獲取分類物件以取得英文名稱和說明
-            category = test_result.test_project.categories.filter(name=category_name).first()
+            category = self._get_scoring_graph(test_result).category(category_name)
             english_name = ""
             if category and hasattr(category, 'english_name') and category.english_name.strip():
                 english_name = f" ({category.english_name.strip()})"
@@ -981,7 +1012,7 @@ class PDFReportGenerator:
         story.append(Spacer(1, 0.8 * cm))
         
         # 5. 發展建議 - 必須參數名稱和內容都有值才顯示
-        max_category_obj = test_result.test_project.categories.filter(name=max_category_name).first()
+        max_category_obj = self._get_scoring_graph(test_result).category(max_category_name)
         has_development_name = max_category_obj and max_category_obj.development_parameter_name.strip()
         has_development_content = max_category_obj and max_category_obj.development_parameter_content.strip()
         
@@ -1014,35 +1045,12 @@ class PDFReportGenerator:
         # 使用與網頁版 test_result_views.py 相同的邏輯
         category_traits = {}
         
-        # 建立中文名稱映射表
-        chinese_name_mapping = {
-            '準確嚴謹度': ['注重細節', 'Attention to Detail'],
-            '認知彈性': ['認知靈活性', 'Cognitive Flexibility'],
-            '適應敏捷力': ['變化敏捷性', 'Change Agility'],
-            '卓越驅動力': ['成就動機', 'Achievement Motivation'],
-            '自主領導力': ['自我領導力', 'Self-Leadership'],
-            '創造性思考': ['創意思考', 'Creative Thinking'],
-            '分析性思考': ['分析思考能力', 'Analytical Thinking'],
-            '系統性思考': ['系統性思維', 'Systems Thinking'],
-            '高效決策力': ['決策能力', 'Decision-Making'],
-            '溝通協調力': ['人際溝通', 'Interpersonal Communication'],
-            '協商談判力': ['談判技巧', 'Negotiation Skills'],
-            '社交智商': ['社會智能', 'Social Intelligence'],
-            'AI素養': ['AI Literacy'],
-            '自我意識': ['Self-Awareness'],
-            '自我批評': ['Self-Criticism'],
-            '自我反思': ['Self-Reflection'],
-            '社會期望反應': ['Social Desirability'],
-            '反饋尋求': ['Feedback Seeking'],
-            '洞察力': ['Insight'],
-            '差異察覺': ['Difference Awareness']
-        }
-        
         # 獲取所有分類
-        categories = test_result.test_project.categories.prefetch_related('traits').all()
+        graph = self._get_scoring_graph(test_result)
+        trait_scores = self._get_trait_scores(test_result)
         
-        for category in categories:
-            traits = category.traits.all()
+        for category in graph.categories:
+            traits = graph.traits_for(category)
             category_trait_list = []
             
             for trait in traits:
@@ -1051,48 +1059,9 @@ class PDFReportGenerator:
                 if '[社會期望值]' in trait_chinese_name:
                     continue
                 
-                trait_score = None
-                headsupflag = None
-                
-                # 方法1: 從 trait_scores 中查找（新爬蟲數據）
-                if test_result.raw_data.get('trait_scores'):
-                    trait_scores = test_result.raw_data['trait_scores']
-                    # 嘗試用各種方式匹配特質名稱
-                    for key, value in trait_scores.items():
-                        # 如果是字典格式，提取分數
-                        if isinstance(value, dict) and 'chinese_name' in value:
-                            # 直接匹配
-                            if (value.get('chinese_name') == trait.chinese_name or 
-                                key == trait.system_name or
-                                key == trait.chinese_name or
-                                key.lower().replace(' ', '_') == trait.system_name.lower().replace(' ', '_')):
-                                trait_score = value.get('score', 0)
-                                headsupflag = value.get('headsupflag', 0)
-                                break
-                            # 使用映射表匹配
-                            alternative_names = chinese_name_mapping.get(trait.chinese_name, [])
-                            if key in alternative_names or value.get('chinese_name') in alternative_names:
-                                trait_score = value.get('score', 0)
-                                headsupflag = value.get('headsupflag', 0)
-                                break
-                        elif key == trait.system_name or key == trait.chinese_name:
-                            trait_score = value if isinstance(value, (int, float)) else 0
-                            headsupflag = 0
-                            break
-                        # 檢查映射表
-                        elif key in chinese_name_mapping.get(trait.chinese_name, []):
-                            trait_score = value if isinstance(value, (int, float)) else value.get('score', 0)
-                            headsupflag = value.get('headsupflag', 0) if isinstance(value, dict) else 0
-                            break
-                
-                # 方法2: 從原始數據根目錄查找（舊數據格式）
-                if trait_score is None:
-                    trait_score = test_result.raw_data.get(trait.system_name, None)
-                    if trait_score is None:
-                        # 轉換為小寫底線格式
-                        system_name_underscore = trait.system_name.lower().replace(' ', '_')
-                        trait_score = test_result.raw_data.get(system_name_underscore, 0)
-                    headsupflag = 0  # 舊格式預設為 0
+                entry = trait_scores.get(trait.id, {})
+                trait_score = entry.get('score')
+                headsupflag = entry.get('headsupflag', 0)
                 
                 if isinstance(trait_score, (int, float)) and trait_score > 0:
                     category_trait_list.append({
@@ -1247,34 +1216,14 @@ class PDFReportGenerator:
         all_traits_data = []
         
         # 獲取所有分類
-        categories = test_result.test_project.categories.all()
+        graph = self._get_scoring_graph(test_result)
+        trait_scores = self._get_trait_scores(test_result)
         
-        for category in categories:
+        for category in graph.categories:
             # 取得該分類的特質
-            traits = category.traits.all()
+            traits = graph.traits_for(category)
             for trait in traits:
-                trait_score = None
-                
-                # 方法1: 從 trait_scores 中查找（新的爬蟲數據結構）
-                if test_result.raw_data.get('trait_scores'):
-                    trait_scores_data = test_result.raw_data['trait_scores']
-                    for key, value in trait_scores_data.items():
-                        if isinstance(value, dict) and 'chinese_name' in value:
-                            if (value.get('chinese_name') == trait.chinese_name or 
-                                key == trait.system_name or
-                                key.lower().replace(' ', '_') == trait.system_name.lower().replace(' ', '_')):
-                                trait_score = value.get('score', 0)
-                                break
-                        elif key == trait.system_name:
-                            trait_score = value if isinstance(value, (int, float)) else 0
-                            break
-                
-                # 方法2: 從原始數據根目錄查找（原始方式）
-                if trait_score is None:
-                    trait_score = test_result.raw_data.get(trait.system_name, None)
-                    if trait_score is None:
-                        system_name_underscore = trait.system_name.lower().replace(' ', '_')
-                        trait_score = test_result.raw_data.get(system_name_underscore, 0)
+                trait_score = trait_scores.get(trait.id, {}).get('score')
                 
                 if isinstance(trait_score, (int, float)) and trait_score > 0:
                     # 獲取特質描述並清理HTML
@@ -1551,124 +1500,14 @@ class PDFReportGenerator:
         use_weighted = getattr(project, 'radar_mode', 'role') == 'score'
         show_mixed_role = getattr(project, 'show_mixed_role', False)
 
-        categories = project.categories.prefetch_related('traits', 'category_traits__trait').all()
+        graph = self._get_scoring_graph(test_result)
         category_scores = {}
         self._latest_role_based_metrics = None
 
-        # 中文名稱映射表 (用於處理不一致的中文翻譯)
-        chinese_name_mapping = {
-            '準確嚴謹度': ['注重細節', 'Attention to Detail'],
-            '認知彈性': ['認知靈活性', 'Cognitive Flexibility'],
-            '適應敏捷力': ['變化敏捷性', 'Change Agility'],
-            '卓越驅動力': ['成就動機', 'Achievement Motivation'],
-            '自主領導力': ['自我領導力', 'Self-Leadership'],
-            '創造性思考': ['創意思考', 'Creative Thinking'],
-            '分析性思考': ['分析思考能力', 'Analytical Thinking'],
-            '系統性思考': ['系統性思維', 'Systems Thinking'],
-            '高效決策力': ['決策能力', 'Decision-Making'],
-            '溝通協調力': ['人際溝通', 'Interpersonal Communication'],
-            '協商談判力': ['談判技巧', 'Negotiation Skills'],
-            '社交智商': ['社會智能', 'Social Intelligence'],
-        }
-
-        trait_scores_cache: Dict[int, float] = {}
-
-        def get_trait_score(trait):
-            cache_key = trait.id
-            if cache_key in trait_scores_cache:
-                return trait_scores_cache[cache_key]
-
-            trait_score = None
-
-            # 方法1: 從 trait_scores 中查找（新的爬蟲數據結構）
-            trait_scores_data = test_result.raw_data.get('trait_scores') if isinstance(test_result.raw_data, dict) else None
-            if isinstance(trait_scores_data, dict):
-                for key, value in trait_scores_data.items():
-                    value_dict = value if isinstance(value, dict) else None
-                    candidate = (
-                        value_dict.get('score') if value_dict and isinstance(value_dict.get('score'), (int, float))
-                        else value if isinstance(value, (int, float)) else None
-                    )
-                    if candidate is None:
-                        continue
-
-                    key_normalized = key.lower().replace(' ', '_')
-                    alternatives = chinese_name_mapping.get(trait.chinese_name or '', [])
-                    chinese_value = value_dict.get('chinese_name') if value_dict else None
-
-                    if (
-                        key == trait.system_name
-                        or key == trait.chinese_name
-                        or key_normalized == (trait.system_name or '').lower().replace(' ', '_')
-                        or chinese_value == trait.chinese_name
-                        or key in alternatives
-                        or (chinese_value and chinese_value in alternatives)
-                    ):
-                        trait_score = float(candidate)
-                        break
-
-            # 方法2: 從原始數據根目錄查找（原始方式）
-            if trait_score is None and isinstance(test_result.raw_data, dict):
-                direct_keys = [
-                    trait.system_name,
-                    trait.chinese_name,
-                    (trait.system_name or '').lower().replace(' ', '_'),
-                ]
-                for alias in chinese_name_mapping.get(trait.chinese_name or '', []):
-                    direct_keys.append(alias)
-
-                for key in direct_keys:
-                    if not key:
-                        continue
-                    value = test_result.raw_data.get(key)
-                    if isinstance(value, (int, float)):
-                        trait_score = float(value)
-                        break
-                    if isinstance(value, dict) and isinstance(value.get('score'), (int, float)):
-                        trait_score = float(value['score'])
-                        break
-
-            if trait_score is not None:
-                trait_scores_cache[cache_key] = trait_score
-            return trait_score
-
-        role_inputs: Dict[str, Dict[str, float]] = {}
-
-        for category in categories:
-            trait_score_map: Dict[int, float] = {}
-            for trait in category.traits.all():
-                score = get_trait_score(trait)
-                if score is not None:
-                    trait_score_map[trait.id] = score
-
-            if not trait_score_map:
-                continue
-
-            raw_score = Decimal('0')
-            weight_sum = Decimal('0')
-            for relation in category.category_traits.select_related('trait').all():
-                trait = relation.trait
-                if not trait or trait.id not in trait_score_map:
-                    continue
-                try:
-                    weight = Decimal(str(relation.weight))
-                except (InvalidOperation, TypeError, ValueError):
-                    continue
-                score_value = Decimal(str(trait_score_map[trait.id]))
-                raw_score += score_value * weight
-                weight_sum += weight
-
-            max_score = weight_sum * Decimal('100')
-            role_index = Decimal('0')
-            if max_score != 0:
-                role_index = (raw_score / max_score) * Decimal('100')
-
-            role_inputs[category.name] = {
-                'raw_score': float(raw_score),
-                'max_score': float(max_score),
-                'role_index': float(role_index),
-                'weight_sum': float(weight_sum),
-            }
+        trait_scores = self._get_trait_scores(test_result)
+        role_inputs: Dict[str, Dict[str, float]] = graph.role_inputs(
+            lambda trait: trait_scores.get(trait.id, {}).get('score')
+        )
 
         if use_weighted:
             category_scores = {
@@ -1680,16 +1519,33 @@ class PDFReportGenerator:
             role_based_metrics = compute_role_based_scores(
                 role_inputs,
                 show_mixed_role=show_mixed_role,
+                **get_role_index_calibration(test_result.test_project_id),
             )
             category_scores = role_based_metrics["contrast_index"]
             self._latest_role_based_metrics = role_based_metrics
 
         return category_scores
     
+    def _get_scoring_graph(self, test_result):
+        """取得（並暫存）測驗項目的分類與特質關係，避免逐段重複查詢"""
+        graph = getattr(self, '_scoring_graph', None)
+        if graph is None or graph.project_id != test_result.test_project_id:
+            graph = get_project_scoring_graph(test_result.test_project)
+            self._scoring_graph = graph
+        return graph
+
+    def _get_trait_scores(self, test_result):
+        """取得（並暫存）測驗結果的 特質ID -> 分數 對照"""
+        cached = getattr(self, '_trait_scores', None)
+        if cached is None or cached[0] != test_result.pk:
+            cached = (test_result.pk, get_result_trait_scores(test_result, self._get_scoring_graph(test_result)))
+            self._trait_scores = cached
+        return cached[1]
+
     def _get_category_advantage_analysis(self, category_name, test_result):
         """從資料庫獲取分類優勢分析內容"""
         try:
-            category = test_result.test_project.categories.filter(name=category_name).first()
+            category = self._get_scoring_graph(test_result).category(category_name)
             if category and category.advantage_analysis:
                 # 清理HTML標籤和特殊字符
                 content = category.advantage_analysis
@@ -1704,7 +1560,7 @@ class PDFReportGenerator:
     def _get_category_disadvantage_analysis(self, category_name, test_result):
         """從資料庫獲取分類劣勢分析內容"""
         try:
-            category = test_result.test_project.categories.filter(name=category_name).first()
+            category = self._get_scoring_graph(test_result).category(category_name)
             if category and category.disadvantage_analysis:
                 # 清理HTML標籤和特殊字符
                 content = category.disadvantage_analysis
@@ -1889,38 +1745,18 @@ class PDFReportGenerator:
         story.append(Paragraph("分類分析", self.subtitle_style))
         
         # 取得分類資料
-        categories = test_result.test_project.categories.prefetch_related('traits').all()
+        graph = self._get_scoring_graph(test_result)
+        trait_score_map = self._get_trait_scores(test_result)
         
-        if categories:
+        if graph.categories:
             category_data = [['分類名稱', '平均分數', '等級']]
             
-            for category in categories:
-                traits = category.traits.all()
+            for category in graph.categories:
+                traits = graph.traits_for(category)
                 if traits:
                     trait_scores = []
                     for trait in traits:
-                        trait_score = None
-                        
-                        # 方法1: 從 trait_scores 中查找（新的爬蟲數據結構）
-                        if test_result.raw_data.get('trait_scores'):
-                            trait_scores_data = test_result.raw_data['trait_scores']
-                            for key, value in trait_scores_data.items():
-                                if isinstance(value, dict) and 'chinese_name' in value:
-                                    if (value.get('chinese_name') == trait.chinese_name or 
-                                        key == trait.system_name or
-                                        key.lower().replace(' ', '_') == trait.system_name.lower().replace(' ', '_')):
-                                        trait_score = value.get('score', 0)
-                                        break
-                                elif key == trait.system_name:
-                                    trait_score = value if isinstance(value, (int, float)) else 0
-                                    break
-                        
-                        # 方法2: 從原始數據根目錄查找（原始方式）
-                        if trait_score is None:
-                            trait_score = test_result.raw_data.get(trait.system_name, None)
-                            if trait_score is None:
-                                system_name_underscore = trait.system_name.lower().replace(' ', '_')
-                                trait_score = test_result.raw_data.get(system_name_underscore, 0)
+                        trait_score = trait_score_map.get(trait.id, {}).get('score')
                         
                         if isinstance(trait_score, (int, float)) and trait_score > 0:
                             trait_scores.append(trait_score)
@@ -1967,38 +1803,18 @@ class PDFReportGenerator:
         story.append(Paragraph("特質分析", self.subtitle_style))
         
         # 取得特質資料
-        categories = test_result.test_project.categories.prefetch_related('traits').all()
+        graph = self._get_scoring_graph(test_result)
+        trait_scores = self._get_trait_scores(test_result)
         
-        for category in categories:
-            traits = category.traits.all()
+        for category in graph.categories:
+            traits = graph.traits_for(category)
             if traits:
                 story.append(Paragraph(f"<b>{category.name}</b>", self.content_style))
                 
                 trait_data = [['特質名稱', '分數', '等級']]
                 
                 for trait in traits:
-                    trait_score = None
-                    
-                    # 方法1: 從 trait_scores 中查找（新的爬蟲數據結構）
-                    if test_result.raw_data.get('trait_scores'):
-                        trait_scores_data = test_result.raw_data['trait_scores']
-                        for key, value in trait_scores_data.items():
-                            if isinstance(value, dict) and 'chinese_name' in value:
-                                if (value.get('chinese_name') == trait.chinese_name or 
-                                    key == trait.system_name or
-                                    key.lower().replace(' ', '_') == trait.system_name.lower().replace(' ', '_')):
-                                    trait_score = value.get('score', 0)
-                                    break
-                            elif key == trait.system_name:
-                                trait_score = value if isinstance(value, (int, float)) else 0
-                                break
-                    
-                    # 方法2: 從原始數據根目錄查找（原始方式）
-                    if trait_score is None:
-                        trait_score = test_result.raw_data.get(trait.system_name, None)
-                        if trait_score is None:
-                            system_name_underscore = trait.system_name.lower().replace(' ', '_')
-                            trait_score = test_result.raw_data.get(system_name_underscore, 0)
+                    trait_score = trait_scores.get(trait.id, {}).get('score')
                     
                     if isinstance(trait_score, (int, float)) and trait_score > 0:
                         level = self._get_performance_level(trait_score)
@@ -2086,16 +1902,25 @@ class PDFReportGenerator:
 
 
 # 便利函數
-def generate_test_result_pdf(test_result, output_path=None):
+def build_content_disposition(safe_filename, display_filename):
+    """產生下載用的 Content-Disposition（含 UTF-8 顯示檔名）"""
+    # 使用標準的檔名編碼方式
+    import urllib.parse
+    encoded_display_name = urllib.parse.quote(display_filename.encode('utf-8'))
+    return f'attachment; filename="{safe_filename}"; filename*=UTF-8\'\'{encoded_display_name}'
+
+
+def generate_test_result_pdf(test_result, output_path=None, progress_callback=None):
     """
     生成測驗結果 PDF 報告的便利函數
     
     Args:
         test_result: TestProjectResult 物件
         output_path: 輸出路徑，如果為 None 則返回 HttpResponse
+        progress_callback: 進度回報函數（背景任務使用）
     
     Returns:
         HttpResponse 或 檔案路徑
     """
     generator = PDFReportGenerator()
-    return generator.generate_test_result_report(test_result, output_path)
+    return generator.generate_test_result_report(test_result, output_path, progress_callback=progress_callback)
@@ -1,17 +1,39 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 請求上快取權限的屬性
+REQUEST_CACHE_ATTR = '_cached_permissions'
+
+
 class PermissionHandler:
     _permissions = {
-        'business': ['quote_manage', 'order_manage'],
-        'admin': ['quote_manage', 'order_manage', 'shipment_manage', 'user_manage'],
+        'business': frozenset({'quote_manage', 'order_manage'}),
+        'admin': frozenset({'quote_manage', 'order_manage', 'shipment_manage', 'user_manage'}),
     }
 
     @staticmethod
     def get_permissions(user_type):
-        """獲取用戶權限"""
-        permissions = PermissionHandler._permissions.get(user_type, [])
-        print(f"Getting permissions for {user_type}: {permissions}")  # 添加調試輸出
+        """獲取用戶權限（不可變集合）"""
+        permissions = PermissionHandler._permissions.get(user_type, frozenset())
+        logger.debug("permissions resolved", extra={'user_type': user_type, 'permissions': sorted(permissions)})
         return permissions
 
     @staticmethod
     def has_permission(user_type, permission_code):
         """檢查是否有權限"""
-        return permission_code in PermissionHandler._permissions.get(user_type, [])
\ No newline at end of file
+        return permission_code in PermissionHandler._permissions.get(user_type, frozenset())
+
+    @staticmethod
+    def get_request_permissions(request):
+        """目前請求的權限：同一請求只計算一次（對照表查詢成本低，不另存於 session）"""
+        cached = getattr(request, REQUEST_CACHE_ATTR, None)
+        if cached is None:
+            cached = PermissionHandler.get_permissions(request.COOKIES.get('user_type', ''))
+            setattr(request, REQUEST_CACHE_ATTR, cached)
+        return cached
+
+    @staticmethod
+    def request_has_permission(request, permission_code):
+        """檢查目前請求是否有權限"""
+        return permission_code in PermissionHandler.get_request_permissions(request)
@@ -1,9 +1,12 @@
 # utils/point_service.py
 from django.conf import settings
 from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from core.models import User, PointTransaction, UserPointBalance, PointPackage, PointOrder
+from core.services import point_rollup
 import logging
 from functools import wraps
 
@@ -88,68 +91,115 @@ class PointService:
         return current_balance >= required_points
     
     @classmethod
-    @transaction.atomic
     def consume_points(cls, user, action_type, quantity=1, description="", reference_id=""):
         """消費點數"""
-        required_points = cls.POINT_COSTS.get(action_type, 0) * quantity
-        
-        if required_points <= 0:
-            logger.warning(f"無效的點數消費：{action_type}")
+        return cls.consume_points_batch(user, [{
+            'action_type': action_type,
+            'quantity': quantity,
+            'description': description,
+            'reference_id': reference_id,
+        }])
+    
+    @classmethod
+    @transaction.atomic
+    def consume_points_batch(cls, user, items):
+        """一次扣除多筆消費（全部成功或全部不扣）
+        
+        items 為 dict 列表，鍵為 action_type、quantity、description、reference_id。
+        餘額以單一條件式 UPDATE 扣除，交易紀錄以 bulk_create 寫入，不需先鎖定再讀取餘額。
+        """
+        entries = []
+        for item in items:
+            action_type = item['action_type']
+            quantity = item.get('quantity', 1)
+            points = cls.POINT_COSTS.get(action_type, 0) * quantity
+            if points <= 0:
+                logger.warning(f"無效的點數消費：{action_type}")
+                continue
+            entries.append((item, action_type, quantity, points))
+        
+        if not entries:
             return True
         
         # 無限制模式下仍然記錄交易，但不實際扣點
         if getattr(settings, 'UNLIMITED_POINTS_MODE', True):
-            return cls._record_virtual_transaction(
-                user, action_type, required_points, description, reference_id
-            )
-        
-        # 正式模式：檢查餘額並扣點
-        balance_obj = UserPointBalance.objects.select_for_update().get(user=user)
-        
-        if balance_obj.balance < required_points:
-            logger.warning(f"點數不足：用戶 {user.username}，需要 {required_points}，餘額 {balance_obj.balance}")
-            return False
-        
-        # 扣除點數
-        old_balance = balance_obj.balance
-        balance_obj.balance -= required_points
-        balance_obj.total_consumed += required_points
-        balance_obj.save()
-        
-        # 記錄交易
-        PointTransaction.objects.create(
-            user=user,
-            transaction_type='consumption',
-            amount=-required_points,
-            balance_before=old_balance,
-            balance_after=balance_obj.balance,
-            description=description or f"{action_type} 消費",
-            reference_id=reference_id,
-            status='completed',
-            metadata={'action_type': action_type, 'quantity': quantity}
+            return cls._record_virtual_transactions(user, entries)
+        
+        # 正式模式：餘額足夠時才扣點
+        required_points = sum(points for *_, points in entries)
+        balance_after = cls._update_balance(
+            user,
+            -required_points,
+            condition={'balance__gte': required_points},
+            total_consumed=F('total_consumed') + required_points,
         )
+        if balance_after is None:
+            logger.warning(f"點數不足：用戶 {user.username}，需要 {required_points}，餘額 {cls.get_user_balance(user)}")
+            return False
         
-        logger.info(f"點數消費成功：用戶 {user.username}，消費 {required_points}，餘額 {balance_obj.balance}")
+        # 依序記錄交易，餘額逐筆遞減
+        balance = balance_after + required_points
+        transactions = []
+        for item, action_type, quantity, points in entries:
+            transactions.append(PointTransaction(
+                user=user,
+                transaction_type='consumption',
+                amount=-points,
+                balance_before=balance,
+                balance_after=balance - points,
+                description=item.get('description') or f"{action_type} 消費",
+                reference_id=item.get('reference_id', ''),
+                status='completed',
+                metadata={'action_type': action_type, 'quantity': quantity}
+            ))
+            balance -= points
+        PointTransaction.objects.bulk_create(transactions)
+        point_rollup.record_point_transactions(transactions)
+        
+        logger.info(f"點數消費成功：用戶 {user.username}，消費 {required_points}，餘額 {balance_after}")
         return True
     
     @classmethod
-    def _record_virtual_transaction(cls, user, action_type, amount, description, reference_id):
+    def _update_balance(cls, user, delta, condition=None, create=False, **updates):
+        """以單一 UPDATE 調整餘額，回傳調整後餘額；條件不符（或帳戶不存在且 create=False）時回傳 None
+        
+        需在交易中呼叫：UPDATE 會鎖定該列直到交易結束，之後讀到的即為本次調整後的餘額。
+        """
+        rows = UserPointBalance.objects.filter(user=user, **(condition or {}))
+        fields = dict(balance=F('balance') + delta, updated_at=timezone.now(), **updates)
+        if not rows.update(**fields):
+            if not create:
+                return None
+            UserPointBalance.objects.get_or_create(
+                user=user,
+                defaults={'balance': 0, 'total_earned': 0, 'total_consumed': 0}
+            )
+            rows.update(**fields)
+        return UserPointBalance.objects.filter(user=user).values_list('balance', flat=True).get()
+    
+    @classmethod
+    def _record_virtual_transactions(cls, user, entries):
         """記錄虛擬交易（無限制模式下的記錄）"""
         current_balance = cls.get_user_balance(user)
         
-        PointTransaction.objects.create(
-            user=user,
-            transaction_type='consumption',
-            amount=-amount,
-            balance_before=current_balance,
-            balance_after=current_balance,  # 餘額不變
-            description=f"[虛擬] {description or action_type}",
-            reference_id=reference_id,
-            status='completed',
-            metadata={'virtual': True, 'action_type': action_type}
-        )
+        transactions = PointTransaction.objects.bulk_create([
+            PointTransaction(
+                user=user,
+                transaction_type='consumption',
+                amount=-points,
+                balance_before=current_balance,
+                balance_after=current_balance,  # 餘額不變
+                description=f"[虛擬] {item.get('description') or action_type}",
+                reference_id=item.get('reference_id', ''),
+                status='completed',
+                metadata={'virtual': True, 'action_type': action_type}
+            )
+            for item, action_type, quantity, points in entries
+        ])
+        point_rollup.record_point_transactions(transactions)
         
-        logger.info(f"虛擬點數消費記錄：用戶 {user.username}，動作 {action_type}，虛擬消費 {amount}")
+        for item, action_type, quantity, points in entries:
+            logger.info(f"虛擬點數消費記錄：用戶 {user.username}，動作 {action_type}，虛擬消費 {points}")
         return True
     
     @classmethod
@@ -159,29 +209,21 @@ class PointService:
         if amount <= 0:
             raise ValidationError("點數數量必須大於0")
         
-        balance_obj, created = UserPointBalance.objects.get_or_create(
-            user=user,
-            defaults={'balance': 0, 'total_earned': 0, 'total_consumed': 0}
-        )
-        
-        old_balance = balance_obj.balance
-        balance_obj.balance += amount
-        balance_obj.total_earned += amount
-        balance_obj.save()
+        new_balance = cls._update_balance(user, amount, create=True, total_earned=F('total_earned') + amount)
         
         # 記錄交易
         PointTransaction.objects.create(
             user=user,
             transaction_type=transaction_type,
             amount=amount,
-            balance_before=old_balance,
-            balance_after=balance_obj.balance,
+            balance_before=new_balance - amount,
+            balance_after=new_balance,
             description=description,
             reference_id=reference_id,
             status='completed'
         )
         
-        logger.info(f"點數增加：用戶 {user.username}，增加 {amount}，餘額 {balance_obj.balance}")
+        logger.info(f"點數增加：用戶 {user.username}，增加 {amount}，餘額 {new_balance}")
         return True
     
     @classmethod
@@ -195,30 +237,24 @@ class PointService:
         if getattr(settings, 'UNLIMITED_POINTS_MODE', True):
             return cls._record_virtual_refund(user, amount, description, reference_id)
         
-        balance_obj, created = UserPointBalance.objects.get_or_create(
-            user=user,
-            defaults={'balance': 0, 'total_earned': 0, 'total_consumed': 0}
-        )
-        
-        old_balance = balance_obj.balance
-        balance_obj.balance += amount
         # 退款應該減少 total_consumed 而不是增加 total_earned
-        balance_obj.total_consumed = max(0, balance_obj.total_consumed - amount)
-        balance_obj.save()
+        new_balance = cls._update_balance(
+            user, amount, create=True, total_consumed=Greatest(F('total_consumed') - amount, 0)
+        )
         
         # 記錄退款交易
         PointTransaction.objects.create(
             user=user,
             transaction_type='refund',
             amount=amount,
-            balance_before=old_balance,
-            balance_after=balance_obj.balance,
+            balance_before=new_balance - amount,
+            balance_after=new_balance,
             description=description or "點數退還",
             reference_id=reference_id,
             status='completed'
         )
         
-        logger.info(f"點數退還：用戶 {user.username}，退還 {amount}，餘額 {balance_obj.balance}")
+        logger.info(f"點數退還：用戶 {user.username}，退還 {amount}，餘額 {new_balance}")
         return True
     
     @classmethod
@@ -266,39 +302,9 @@ class PointService:
         return queryset.order_by('-created_at')[:limit]
     
     @classmethod
-    def get_consumption_stats(cls, user, days=30):
-        """獲取消費統計"""
-        from datetime import timedelta
-        
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        
-        transactions = PointTransaction.objects.filter(
-            user=user,
-            transaction_type='consumption',
-            created_at__range=[start_date, end_date]
-        )
-        
-        total_consumed = sum(abs(t.amount) for t in transactions)
-        transaction_count = transactions.count()
-        
-        # 按動作類型分組統計
-        action_stats = {}
-        for transaction in transactions:
-            action_type = transaction.metadata.get('action_type', 'unknown')
-            if action_type not in action_stats:
-                action_stats[action_type] = {'count': 0, 'total': 0}
-            action_stats[action_type]['count'] += 1
-            action_stats[action_type]['total'] += abs(transaction.amount)
-        
-        return {
-            'total_consumed': total_consumed,
-            'transaction_count': transaction_count,
-            'period_days': days,
-            'action_stats': action_stats,
-            'start_date': start_date,
-            'end_date': end_date
-        }
+    def get_consumption_stats(cls, user, days=30, action_type=None):
+        """獲取消費統計（最近 days 天，含今天；由每日彙總查詢，與交易筆數無關）"""
+        return point_rollup.get_consumption_stats(user, days=days, action_type=action_type)
     
     @classmethod
     def get_balance_summary(cls, user):
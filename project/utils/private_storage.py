@@ -0,0 +1,48 @@
+# utils/private_storage.py
+"""
+私有檔案儲存：報告與匯出檔案含受測者資料，存放於 MEDIA_ROOT 之外（不經 /media/ 提供）
+檔名為隨機值，只能經由有權限檢查的下載視圖讀取
+"""
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+@deconstructible
+class PrivateFileStorage(FileSystemStorage):
+    """位置預設為 settings.PRIVATE_MEDIA_ROOT，不提供網址"""
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError('私有檔案不提供網址，請經由下載視圖讀取')
+
+
+private_storage = PrivateFileStorage()
+
+
+def random_upload_path(prefix, filename):
+    """prefix/年/月/隨機檔名（保留副檔名）；下載時的檔名另存於模型欄位"""
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{prefix}/{timezone.now():%Y/%m}/{uuid.uuid4().hex}{extension}"
+
+
+def report_job_upload_to(instance, filename):
+    return random_upload_path('report_jobs', filename)
+
+
+def export_job_upload_to(instance, filename):
+    return random_upload_path('export_jobs', filename)
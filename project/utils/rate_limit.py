@@ -0,0 +1,141 @@
+# utils/rate_limit.py
+"""
+滑動視窗速率限制：以路徑前綴樹找出規則，以共用快取的原子遞增計數
+每個請求只需一次前綴樹查詢與兩次快取操作（遞增本視窗、讀取前一視窗）
+不依賴 Django，計數儲存只需提供 incr(key, delta, timeout) 與 get(key, default)
+BackEnd/rate_limiter.py 也匯入本模組，只能使用標準函式庫
+"""
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+RATE_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$')
+UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int
+    window: int  # 秒
+
+    @classmethod
+    def parse(cls, value):
+        """解析 '5/m'、'100/h'、'10/30s' 格式的速率"""
+        if isinstance(value, cls):
+            return value
+        match = RATE_PATTERN.match(str(value))
+        if not match:
+            raise ValueError(f'無效的速率格式：{value}')
+        limit, count, unit = match.groups()
+        return cls(limit=int(limit), window=int(count or 1) * UNIT_SECONDS[unit])
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0  # 秒，允許時為 0
+
+
+class PrefixTrie:
+    """以路徑片段建立的前綴樹，查詢最長相符前綴（成本與路徑深度成正比，與規則數量無關）"""
+
+    def __init__(self, rules: Optional[Dict[str, object]] = None):
+        self.root = {}
+        for prefix, value in (rules or {}).items():
+            self.insert(prefix, value)
+
+    @staticmethod
+    def _segments(path):
+        return [segment for segment in path.split('/') if segment]
+
+    def insert(self, prefix, value):
+        node = self.root
+        for segment in self._segments(prefix):
+            node = node.setdefault(segment, {})
+        node[None] = (prefix, value)
+
+    def match(self, path):
+        """回傳 (前綴, 值)；沒有相符前綴時回傳 None"""
+        node = self.root
+        found = node.get(None)
+        for segment in self._segments(path):
+            node = node.get(segment)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+class MemoryCounterStore:
+    """單一程序內的計數儲存（開發環境或未設定共用快取時使用）"""
+
+    def __init__(self, clock=time.monotonic):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def incr(self, key, delta=1, timeout=None):
+        now = self._clock()
+        with self._lock:
+            value, expires = self._data.get(key, (0, None))
+            if expires is not None and expires <= now:
+                value, expires = 0, None
+            if not value and timeout:
+                expires = now + timeout
+            value += delta
+            self._data[key] = (value, expires)
+            if len(self._data) > 10000:
+                self._data = {k: v for k, v in self._data.items() if v[1] is None or v[1] > now}
+            return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            value, expires = self._data.get(key, (default, None))
+        if expires is not None and expires <= self._clock():
+            return default
+        return value
+
+
+class SlidingWindowLimiter:
+    """滑動視窗計數：前一視窗的計數依剩餘比例折算後加上本視窗計數
+
+    與逐筆記錄時間的滑動視窗日誌相比只需兩個計數器，且不會像固定視窗在邊界放行兩倍請求。
+    被拒絕的請求同樣計入，持續送出請求的用戶端不會提早解除限制。
+    """
+
+    def __init__(self, store, key_prefix='', clock=time.time):
+        self.store = store
+        self.key_prefix = key_prefix
+        self.clock = clock
+
+    def hit(self, key, rate: Rate) -> Decision:
+        now = self.clock()
+        window_index = int(now // rate.window)
+        elapsed = (now - window_index * rate.window) / rate.window
+        base = f'{self.key_prefix}{key}:{rate.window}'
+
+        current = self.store.incr(f'{base}:{window_index}', 1, rate.window * 2)
+        previous = self.store.get(f'{base}:{window_index - 1}', 0) or 0
+        estimated = previous * (1 - elapsed) + current
+
+        if estimated <= rate.limit:
+            return Decision(True, rate.limit, int(rate.limit - estimated))
+        return Decision(False, rate.limit, 0, self._retry_after(rate, previous, current, elapsed))
+
+    @staticmethod
+    def _retry_after(rate, previous, current, elapsed):
+        """下一個請求可被放行前需等待的秒數（假設期間不再有請求）"""
+        if current + 1 <= rate.limit and previous:
+            # 本視窗內等前一視窗的折算計數降下來
+            target = 1 - (rate.limit - current - 1) / previous
+            wait = (target - elapsed) * rate.window
+        else:
+            # 等到下一視窗，本視窗計數成為前一視窗後再折算
+            target = 1 - (rate.limit - 1) / current
+            wait = (1 - elapsed + target) * rate.window
+        return max(1, math.ceil(round(wait, 6)))
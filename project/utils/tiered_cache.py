@@ -0,0 +1,281 @@
+# utils/tiered_cache.py
+"""
+兩層快取：程序內 L1（短暫快取）在前、多個 worker 共用的 L2（Redis 或本機替代）在後
+各子系統使用獨立的鍵命名空間，以版本號整批失效，並記錄命中、未命中與 L2 延遲
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+L1_ALIAS = getattr(settings, 'CACHE_L1_ALIAS', 'local')
+L2_ALIAS = getattr(settings, 'CACHE_L2_ALIAS', DEFAULT_CACHE_ALIAS)
+# L1 保留秒數：其他 worker 的寫入與失效最多延遲這麼久才看得到
+L1_TIMEOUT = getattr(settings, 'CACHE_L1_TIMEOUT', 5)
+
+VERSION_KEY = 'cache_ns_version:{name}'
+# 只在單一程序內有效的後端：作為 L2 時各 worker 的計數、鎖與失效互不相通
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_MISSING = object()
+
+
+class NamespaceMetrics:
+    """單一命名空間在本程序內的命中、未命中與 L2 延遲統計"""
+
+    FIELDS = ('l1_hits', 'l2_hits', 'misses', 'sets', 'deletes', 'invalidations', 'l2_calls')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zero()
+
+    def _zero(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+        self.l2_time = 0.0
+        self.l2_max = 0.0
+
+    def reset(self):
+        with self._lock:
+            self._zero()
+
+    def add(self, field, count=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + count)
+
+    def record_l2(self, elapsed):
+        with self._lock:
+            self.l2_calls += 1
+            self.l2_time += elapsed
+            self.l2_max = max(self.l2_max, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            data = {field: getattr(self, field) for field in self.FIELDS}
+            l2_time, l2_max = self.l2_time, self.l2_max
+        lookups = data['l1_hits'] + data['l2_hits'] + data['misses']
+        data['hit_rate'] = round((data['l1_hits'] + data['l2_hits']) / lookups * 100, 1) if lookups else None
+        data['l2_avg_ms'] = round(l2_time / data['l2_calls'] * 1000, 3) if data['l2_calls'] else None
+        data['l2_max_ms'] = round(l2_max * 1000, 3)
+        return data
+
+
+class CacheNamespace:
+    """子系統的快取命名空間
+
+    讀取依序查 L1、L2，L2 命中時回填 L1；寫入與刪除同時作用於兩層。
+    use_l1=False 時只使用 L2（計數器、速率限制等需要所有 worker 一致的資料）。
+    versioned=True 時鍵帶有命名空間版本號，invalidate() 遞增版本即可讓所有舊鍵失效。
+    """
+
+    def __init__(self, name, use_l1=True, l1_timeout=None, versioned=True):
+        self.name = name
+        self.use_l1 = use_l1
+        self.l1_timeout = L1_TIMEOUT if l1_timeout is None else l1_timeout
+        self.versioned = versioned
+        self.metrics = NamespaceMetrics()
+
+    @property
+    def l1(self):
+        return caches[L1_ALIAS]
+
+    @property
+    def l2(self):
+        return caches[L2_ALIAS]
+
+    def _key(self, key):
+        return f'{self.name}:{key}'
+
+    def _l2(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return getattr(self.l2, method)(*args, **kwargs)
+        finally:
+            self.metrics.record_l2(time.perf_counter() - start)
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def version(self):
+        """目前的命名空間版本（版本號本身也在 L1 短暫快取）"""
+        if not self.versioned:
+            return None
+        key = VERSION_KEY.format(name=self.name)
+        if self.use_l1:
+            version = self.l1.get(key)
+            if version is not None:
+                return version
+        version = self._l2('get', key)
+        if version is None:
+            self._l2('add', key, 1, None)
+            version = self._l2('get', key) or 1
+        if self.use_l1:
+            self.l1.set(key, version, self.l1_timeout)
+        return version
+
+    def invalidate(self):
+        """遞增版本號，使命名空間內所有鍵失效（其他 worker 的 L1 在 l1_timeout 內跟上）"""
+        key = VERSION_KEY.format(name=self.name)
+        try:
+            version = self._l2('incr', key)
+        except ValueError:
+            if not self._l2('add', key, 2, None):
+                version = self._l2('incr', key)
+            else:
+                version = 2
+        if self.use_l1:
+            self.l1.set(key, version, self.l1_timeout)
+        self.metrics.add('invalidations')
+        return version
+
+    def get(self, key, default=None):
+        full_key, version = self._key(key), self.version()
+        if self.use_l1:
+            value = self.l1.get(full_key, _MISSING, version=version)
+            if value is not _MISSING:
+                self.metrics.add('l1_hits')
+                return value
+        value = self._l2('get', full_key, _MISSING, version=version)
+        if value is _MISSING:
+            self.metrics.add('misses')
+            return default
+        self.metrics.add('l2_hits')
+        if self.use_l1:
+            self.l1.set(full_key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys):
+        keys = list(keys)
+        version = self.version()
+        full_keys = {self._key(key): key for key in keys}
+        found = {}
+        if self.use_l1:
+            found = self.l1.get_many(list(full_keys), version=version)
+            self.metrics.add('l1_hits', len(found))
+        remaining = [full_key for full_key in full_keys if full_key not in found]
+        if remaining:
+            from_l2 = self._l2('get_many', remaining, version=version)
+            self.metrics.add('l2_hits', len(from_l2))
+            self.metrics.add('misses', len(remaining) - len(from_l2))
+            if self.use_l1 and from_l2:
+                self.l1.set_many(from_l2, self.l1_timeout, version=version)
+            found.update(from_l2)
+        return {full_keys[full_key]: value for full_key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        full_key, version = self._key(key), self.version()
+        self._l2('set', full_key, value, timeout, version=version)
+        if self.use_l1:
+            self.l1.set(full_key, value, self._l1_timeout(timeout), version=version)
+        self.metrics.add('sets')
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        version = self.version()
+        data = {self._key(key): value for key, value in mapping.items()}
+        self._l2('set_many', data, timeout, version=version)
+        if self.use_l1:
+            self.l1.set_many(data, self._l1_timeout(timeout), version=version)
+        self.metrics.add('sets', len(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        """鍵不存在時寫入（以 L2 為準，可作為跨 worker 的鎖）"""
+        full_key, version = self._key(key), self.version()
+        added = self._l2('add', full_key, value, timeout, version=version)
+        if added:
+            self.metrics.add('sets')
+            if self.use_l1:
+                self.l1.set(full_key, value, self._l1_timeout(timeout), version=version)
+        return added
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout)
+        return value
+
+    def delete(self, key):
+        full_key, version = self._key(key), self.version()
+        if self.use_l1:
+            self.l1.delete(full_key, version=version)
+        self.metrics.add('deletes')
+        return self._l2('delete', full_key, version=version)
+
+    def delete_many(self, keys):
+        version = self.version()
+        full_keys = [self._key(key) for key in keys]
+        if self.use_l1:
+            self.l1.delete_many(full_keys, version=version)
+        self.metrics.add('deletes', len(full_keys))
+        self._l2('delete_many', full_keys, version=version)
+
+    def incr(self, key, delta=1, timeout=DEFAULT_TIMEOUT, create=True):
+        """在 L2 原子遞增（Redis 為 INCR）；鍵不存在時以 add 建立，並行建立時改為遞增
+
+        create=False 時鍵不存在即回傳 None（計數需由資料重新計算時使用，避免只以增量建立）。
+        """
+        full_key, version = self._key(key), self.version()
+        try:
+            return self._l2('incr', full_key, delta, version=version)
+        except ValueError:
+            if not create:
+                return None
+            if self._l2('add', full_key, delta, timeout, version=version):
+                return delta
+            return self._l2('incr', full_key, delta, version=version)
+
+    def decr(self, key, delta=1):
+        return self._l2('decr', self._key(key), delta, version=self.version())
+
+
+_namespaces = {}
+_registry_lock = threading.Lock()
+
+
+def namespace(name, **options):
+    """取得（或建立）命名空間；同名命名空間在程序內共用同一組統計"""
+    with _registry_lock:
+        if name not in _namespaces:
+            _namespaces[name] = CacheNamespace(name, **options)
+        return _namespaces[name]
+
+
+def clear_local_cache():
+    """清除本程序的 L1（測試或手動排查時使用）"""
+    caches[L1_ALIAS].clear()
+
+
+def get_cache_metrics():
+    """各命名空間的統計與目前使用的快取後端（數值為本程序自啟動以來的累計）"""
+    return {
+        'l1': {'alias': L1_ALIAS, 'backend': settings.CACHES[L1_ALIAS]['BACKEND'], 'timeout': L1_TIMEOUT},
+        'l2': {'alias': L2_ALIAS, 'backend': settings.CACHES[L2_ALIAS]['BACKEND']},
+        'namespaces': {name: ns.metrics.snapshot() for name, ns in sorted(_namespaces.items())},
+    }
+
+
+def l2_is_shared():
+    """L2 是否由多個程序共用（web worker 與 Celery 看得到彼此的寫入）"""
+    return settings.CACHES[L2_ALIAS]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def check_l2_backend(app_configs=None, **kwargs):
+    """系統檢查：非 DEBUG 環境的 L2 只在單一程序內有效時發出警告"""
+    if settings.DEBUG or l2_is_shared():
+        return []
+    return [
+        checks.Warning(
+            f"L2 快取（{L2_ALIAS}）使用單一程序的後端 {settings.CACHES[L2_ALIAS]['BACKEND']}",
+            hint='速率限制、IP 封鎖、短網址點擊與通知計數會在各 worker 間不一致；請設定 CACHE_REDIS_URL 或改用檔案、資料庫快取',
+            id='tiered_cache.W001',
+        )
+    ]
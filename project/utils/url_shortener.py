@@ -4,12 +4,16 @@ import hashlib
 import string
 import random
 from django.conf import settings
-from django.core.cache import cache
-from core.models import TestInvitation
+from django.db import IntegrityError, transaction
+from core.models import ShortLink, TestInvitation
+from utils.tiered_cache import namespace
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 轉址時先查本程序 L1，再查共用 L2
+link_cache = namespace('short_links')
+
 class URLShortenerService:
     """短網址生成服務"""
     
@@ -19,6 +23,9 @@ class URLShortenerService:
     
     SHORT_CODE_LENGTH = 8  # 短碼長度
     CACHE_TIMEOUT = 60 * 60 * 24 * 30  # 快取30天
+    MISSING_CACHE_TIMEOUT = 60  # 不存在的短碼短暫快取，避免重複查詢資料庫
+    LINK_CACHE_KEY = 'link:{code}'
+    MISSING = 'missing'
     
     @classmethod
     def generate_short_url(cls, original_url, invitation_id=None):
@@ -37,33 +44,13 @@ class URLShortenerService:
             }
         """
         try:
-            # 生成短碼
+            # 生成短碼並寫入短網址表
             short_code = cls._generate_short_code(original_url, invitation_id)
-            
-            # 建立完整短網址
-            base_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
-            short_url = f"{base_url}/s/{short_code}"
-            
-            # 快取映射關係
-            cache_key = f"short_url:{short_code}"
-            cache.set(cache_key, original_url, cls.CACHE_TIMEOUT)
-            
-            # 如果有邀請ID，也存儲邀請ID映射
-            if invitation_id:
-                invitation_cache_key = f"short_url_invitation:{short_code}"
-                cache.set(invitation_cache_key, invitation_id, cls.CACHE_TIMEOUT)
-            
-            # 反向快取（用於查找是否已存在）
-            reverse_cache_key = f"reverse_short_url:{cls._hash_url(original_url, invitation_id)}"
-            cache.set(reverse_cache_key, short_code, cls.CACHE_TIMEOUT)
+            short_code = cls._save_link(short_code, original_url, invitation_id)
             
             logger.info(f"生成短網址成功：{short_code} -> {original_url}")
             
-            return {
-                'short_code': short_code,
-                'short_url': short_url,
-                'original_url': original_url
-            }
+            return cls._short_url_data(short_code, original_url)
             
         except Exception as e:
             logger.error(f"生成短網址失敗：{str(e)}")
@@ -75,59 +62,187 @@ class URLShortenerService:
             }
     
     @classmethod
-    def _generate_short_code(cls, original_url, invitation_id=None):
-        """生成短碼"""
-        # 先檢查是否已經有對應的短碼
-        url_hash = cls._hash_url(original_url, invitation_id)
-        reverse_cache_key = f"reverse_short_url:{url_hash}"
-        existing_code = cache.get(reverse_cache_key)
-        
-        if existing_code:
-            return existing_code
-        
-        # 生成新的短碼
-        max_attempts = 10
-        for attempt in range(max_attempts):
-            if invitation_id:
-                # 基於邀請ID生成，確保同一邀請有固定短碼
-                seed = f"{original_url}:{invitation_id}:{attempt}"
-                hash_obj = hashlib.md5(seed.encode())
-                hash_hex = hash_obj.hexdigest()
-                
-                # 將16進制轉換為我們的字符集
-                short_code = cls._hex_to_charset(hash_hex[:cls.SHORT_CODE_LENGTH])
-            else:
-                # 隨機生成
-                short_code = ''.join(random.choices(cls.CHARSET, k=cls.SHORT_CODE_LENGTH))
-            
-            # 檢查是否衝突
-            cache_key = f"short_url:{short_code}"
-            if not cache.get(cache_key):
-                return short_code
+    def generate_short_urls(cls, original_url, invitation_ids):
+        """
+        批次生成多個邀請的短網址（短碼由邀請ID直接計算，只需一次批次寫入）
         
-        # 如果嘗試多次仍衝突，使用時間戳確保唯一性
-        import time
-        timestamp = str(int(time.time()))[-4:]  # 取時間戳後4位
-        return cls._hex_to_charset(timestamp) + ''.join(random.choices(cls.CHARSET, k=4))
+        Returns:
+            dict: {邀請ID: generate_short_url 相同格式的資料}
+        """
+        codes = {invitation_id: cls.encode_id(invitation_id) for invitation_id in invitation_ids}
+        try:
+            with transaction.atomic():
+                ShortLink.objects.bulk_create([
+                    ShortLink(code=code, invitation_id=invitation_id, original_url=original_url)
+                    for invitation_id, code in codes.items()
+                ], batch_size=1000)
+        except IntegrityError:
+            # 邀請已有短網址（或與舊版隨機短碼相同）時改為逐筆處理
+            return {
+                invitation_id: cls.generate_short_url(original_url, invitation_id)
+                for invitation_id in invitation_ids
+            }
+
+        link_cache.set_many({
+            cls.LINK_CACHE_KEY.format(code=code): {'url': original_url, 'invitation_id': invitation_id}
+            for invitation_id, code in codes.items()
+        }, cls.CACHE_TIMEOUT)
+
+        return {
+            invitation_id: cls._short_url_data(code, original_url)
+            for invitation_id, code in codes.items()
+        }
+    
+    @classmethod
+    def _short_url_data(cls, short_code, original_url):
+        # 建立完整短網址
+        base_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
+        return {
+            'short_code': short_code,
+            'short_url': f"{base_url}/s/{short_code}",
+            'original_url': original_url
+        }
+    
+    @classmethod
+    def _generate_short_code(cls, original_url, invitation_id=None):
+        """生成短碼：有邀請ID時由ID計算（同一邀請固定同一短碼），否則為較長的隨機短碼"""
+        if invitation_id:
+            return cls.encode_id(invitation_id)
+        return cls._random_code()
+    
+    @classmethod
+    def _random_code(cls):
+        # 比 ID 短碼多一碼，不會與 encode_id 的結果重複
+        return ''.join(random.choices(cls.CHARSET, k=cls.SHORT_CODE_LENGTH + 1))
+    
+    # ===== ID 短碼 =====
+    # 邀請ID 先以 Feistel 網路置換（避免連號ID產生相近短碼），再以 CHARSET 進位編碼為固定長度。
+    # 置換為一對一，不同ID必定得到不同短碼，不需查詢快取或資料庫。
+    # 第一碼使用 CHARSET[LEGACY_CHARSET_SIZE:]：舊版短碼由16進位轉換，只用到前16個字元，因此不會重複。
+    # 金鑰（SHORT_CODE_KEY，預設為 SECRET_KEY）在發出短碼後不可變更，否則新舊短碼可能重複。
+    
+    LEGACY_CHARSET_SIZE = 16
+    FEISTEL_HALF_BITS = 23
+    FEISTEL_ROUNDS = 4
+    FEISTEL_MASK = (1 << FEISTEL_HALF_BITS) - 1
+    _feistel_key = None
+    
+    @classmethod
+    def _round_key(cls):
+        if cls._feistel_key is None:
+            secret = getattr(settings, 'SHORT_CODE_KEY', settings.SECRET_KEY)
+            cls._feistel_key = hashlib.sha256(secret.encode()).digest()
+        return cls._feistel_key
     
     @classmethod
-    def _hash_url(cls, url, invitation_id=None):
-        """計算URL的hash值"""
-        content = f"{url}:{invitation_id}" if invitation_id else url
-        return hashlib.md5(content.encode()).hexdigest()
+    def _round(cls, round_index, half):
+        digest = hashlib.blake2b(
+            f"{round_index}:{half}".encode(), key=cls._round_key(), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, 'big') & cls.FEISTEL_MASK
     
     @classmethod
-    def _hex_to_charset(cls, hex_string):
-        """將16進制字符串轉換為我們的字符集"""
-        result = ""
-        for char in hex_string:
-            if char.isdigit():
-                index = int(char) % len(cls.CHARSET)
-            else:
-                index = (ord(char.lower()) - ord('a') + 10) % len(cls.CHARSET)
-            result += cls.CHARSET[index]
-        return result
+    def _permute(cls, value):
+        left, right = value >> cls.FEISTEL_HALF_BITS, value & cls.FEISTEL_MASK
+        for round_index in range(cls.FEISTEL_ROUNDS):
+            left, right = right, left ^ cls._round(round_index, right)
+        return (left << cls.FEISTEL_HALF_BITS) | right
     
+    @classmethod
+    def _unpermute(cls, value):
+        left, right = value >> cls.FEISTEL_HALF_BITS, value & cls.FEISTEL_MASK
+        for round_index in reversed(range(cls.FEISTEL_ROUNDS)):
+            left, right = right ^ cls._round(round_index, left), left
+        return (left << cls.FEISTEL_HALF_BITS) | right
+    
+    @classmethod
+    def encode_id(cls, value):
+        """將 ID 編碼為固定長度短碼（不需任何 I/O）"""
+        if not 0 < value < (1 << (2 * cls.FEISTEL_HALF_BITS)):
+            raise ValueError(f"ID 超出短碼範圍：{value}")
+        value = cls._permute(value)
+        base = len(cls.CHARSET)
+        chars = []
+        for _ in range(cls.SHORT_CODE_LENGTH - 1):
+            value, remainder = divmod(value, base)
+            chars.append(cls.CHARSET[remainder])
+        chars.append(cls.CHARSET[cls.LEGACY_CHARSET_SIZE + value])
+        return ''.join(reversed(chars))
+    
+    @classmethod
+    def decode_code(cls, short_code):
+        """encode_id 的反函數；不是 ID 短碼時回傳 None"""
+        if len(short_code) != cls.SHORT_CODE_LENGTH:
+            return None
+        base = len(cls.CHARSET)
+        first = cls.CHARSET.find(short_code[0]) - cls.LEGACY_CHARSET_SIZE
+        if first < 0:
+            return None
+        value = first
+        for char in short_code[1:]:
+            index = cls.CHARSET.find(char)
+            if index < 0:
+                return None
+            value = value * base + index
+        if value >> (2 * cls.FEISTEL_HALF_BITS):
+            return None
+        return cls._unpermute(value)
+    
+    @classmethod
+    def _save_link(cls, short_code, original_url, invitation_id=None):
+        """寫入短網址表並預先放入快取；同一邀請已有短網址時更新原始網址"""
+        for attempt in range(5):
+            try:
+                with transaction.atomic():
+                    ShortLink.objects.create(code=short_code, invitation_id=invitation_id, original_url=original_url)
+                break
+            except IntegrityError:
+                if invitation_id and ShortLink.objects.filter(code=short_code, invitation_id=invitation_id).update(
+                    original_url=original_url
+                ):
+                    break
+                # 與舊版隨機短碼重複
+                short_code = cls._random_code()
+        else:
+            raise IntegrityError(f"無法產生不重複的短碼：{short_code}")
+
+        link_cache.set(
+            cls.LINK_CACHE_KEY.format(code=short_code),
+            {'url': original_url, 'invitation_id': invitation_id},
+            cls.CACHE_TIMEOUT
+        )
+        return short_code
+    
+    @classmethod
+    def lookup(cls, short_code):
+        """
+        查詢短碼（快取優先，未命中時以短碼唯一索引查詢一次）
+        
+        Returns:
+            tuple: ({'url': 原始網址, 'invitation_id': 邀請ID}, 查詢資料庫時一併取得的邀請)；
+                   短碼不存在時回傳 (None, None)
+        """
+        cache_key = cls.LINK_CACHE_KEY.format(code=short_code)
+        link = link_cache.get(cache_key)
+        if link == cls.MISSING:
+            return None, None
+        if link is not None:
+            return link, None
+
+        short_link = ShortLink.objects.select_related('invitation__test_project').filter(code=short_code).first()
+        if short_link is None:
+            link_cache.set(cache_key, cls.MISSING, cls.MISSING_CACHE_TIMEOUT)
+            return None, None
+
+        link = {'url': short_link.original_url, 'invitation_id': short_link.invitation_id}
+        link_cache.set(cache_key, link, cls.CACHE_TIMEOUT)
+        return link, short_link.invitation
+
+    @classmethod
+    def invalidate(cls, short_code):
+        """短網址刪除後清除快取"""
+        link_cache.delete(cls.LINK_CACHE_KEY.format(code=short_code))
+
     @classmethod
     def resolve_short_url(cls, short_code):
         """
@@ -139,66 +254,40 @@ class URLShortenerService:
         Returns:
             str: 原始網址，如果不存在返回None
         """
-        cache_key = f"short_url:{short_code}"
-        original_url = cache.get(cache_key)
-        
-        if original_url:
-            cache.set(cache_key, original_url, cls.CACHE_TIMEOUT)
-            return original_url
-
-        invitation = TestInvitation.objects.filter(result_data__short_code=short_code).select_related('test_project').first()
-        if not invitation:
-            return None
-
-        original_url = invitation.result_data.get('original_url') if invitation.result_data else None
-        if not original_url and invitation.test_project:
-            original_url = invitation.test_project.test_link
-
-        if original_url:
-            cache.set(cache_key, original_url, cls.CACHE_TIMEOUT)
-            invitation_cache_key = f"short_url_invitation:{short_code}"
-            cache.set(invitation_cache_key, invitation.id, cls.CACHE_TIMEOUT)
-        return original_url
+        link, _ = cls.lookup(short_code)
+        return link['url'] if link else None
     
     @classmethod
     def get_short_url_stats(cls, short_code):
         """
-        獲取短網址統計（可以擴展記錄點擊次數等）
+        獲取短網址統計
         
         Args:
             short_code: 短碼
             
         Returns:
-            dict: 統計資訊
+            dict: 統計資訊（點擊數含尚未寫入資料庫的當日點擊）
         """
-        cache_key = f"short_url:{short_code}"
-        original_url = cache.get(cache_key)
+        from core.services.link_clicks import pending_clicks
         
-        if not original_url:
+        short_link = ShortLink.objects.filter(code=short_code).first()
+        if not short_link:
             return None
-            
-        # 可以擴展記錄點擊次數、訪問時間等
-        stats_key = f"short_url_stats:{short_code}"
-        stats = cache.get(stats_key, {'clicks': 0, 'created_at': None})
         
         return {
             'short_code': short_code,
-            'original_url': original_url,
-            'clicks': stats.get('clicks', 0),
-            'created_at': stats.get('created_at'),
+            'original_url': short_link.original_url,
+            'clicks': short_link.click_count + pending_clicks(short_code),
+            'last_clicked_at': short_link.last_clicked_at,
+            'created_at': short_link.created_at,
         }
     
     @classmethod
     def increment_click_count(cls, short_code):
-        """增加點擊計數"""
-        stats_key = f"short_url_stats:{short_code}"
-        stats = cache.get(stats_key, {'clicks': 0})
-        stats['clicks'] = stats.get('clicks', 0) + 1
-        
-        # 設定較長的快取時間用於統計
-        cache.set(stats_key, stats, cls.CACHE_TIMEOUT * 2)
+        """記錄點擊（只遞增共用快取中的計數器，由排程批次寫入資料庫）"""
+        from core.services.link_clicks import record_click
         
-        return stats['clicks']
+        return record_click(short_code)
     
     @classmethod
     def get_invitation_id(cls, short_code):
@@ -211,26 +300,8 @@ class URLShortenerService:
         Returns:
             int: 邀請ID，如果不存在返回None
         """
-        invitation_cache_key = f"short_url_invitation:{short_code}"
-        invitation_id = cache.get(invitation_cache_key)
-        
-        if invitation_id:
-            cache.set(invitation_cache_key, invitation_id, cls.CACHE_TIMEOUT)
-            return invitation_id
-
-        invitation = TestInvitation.objects.filter(result_data__short_code=short_code).first()
-        if not invitation:
-            return None
-
-        cache.set(invitation_cache_key, invitation.id, cls.CACHE_TIMEOUT)
-        original_url = invitation.result_data.get('original_url') if invitation.result_data else None
-        if not original_url and invitation.test_project:
-            original_url = invitation.test_project.test_link
-        if original_url:
-            cache_key = f"short_url:{short_code}"
-            cache.set(cache_key, original_url, cls.CACHE_TIMEOUT)
-
-        return invitation.id
+        link, _ = cls.lookup(short_code)
+        return link['invitation_id'] if link else None
 
 # 短網址重定向視圖
 from django.shortcuts import redirect
@@ -241,13 +312,13 @@ def short_url_redirect(request, short_code):
     from django.http import HttpResponse
     from django.utils import timezone
     
-    # 獲取原始網址
-    original_url = URLShortenerService.resolve_short_url(short_code)
-    if not original_url:
+    # 快取命中時不查詢資料庫；未命中時以短碼索引查詢一次，並一併取得邀請與測驗項目
+    link, invitation = URLShortenerService.lookup(short_code)
+    if not link:
         raise Http404("短網址不存在或已過期")
     
-    # 獲取邀請ID
-    invitation_id = URLShortenerService.get_invitation_id(short_code)
+    original_url = link['url']
+    invitation_id = link['invitation_id']
     
     if not invitation_id:
         # 如果沒有邀請ID，使用原始邏輯
@@ -255,8 +326,9 @@ def short_url_redirect(request, short_code):
         return redirect(original_url)
     
     try:
-        # 獲取邀請記錄
-        invitation = TestInvitation.objects.get(id=invitation_id)
+        # 獲取邀請記錄（查詢短網址時已取得則不再查詢）
+        if invitation is None:
+            invitation = TestInvitation.objects.select_related('test_project').get(id=invitation_id)
         
         # 檢查截止日期
         if invitation.expires_at and timezone.now() > invitation.expires_at:
@@ -286,17 +358,17 @@ def short_url_redirect(request, short_code):
             redirect_url = "https://pi.perception-group.com/"
             return redirect(redirect_url)
         
-        # 記錄點擊並獲取點擊次數
-        click_count = URLShortenerService.increment_click_count(short_code)
+        # 記錄點擊
+        URLShortenerService.increment_click_count(short_code)
         
         # 第一次點擊時更新邀請狀態
-        if click_count == 1 and invitation.status == 'pending':
+        if invitation.status == 'pending':
             invitation.status = 'in_progress'
             invitation.started_at = timezone.now()
-            invitation.save()
+            invitation.save(update_fields=['status', 'started_at'])
             logger.info(f"邀請 {invitation.id} 狀態更新為進行中")
 
-        return redirect(invitation.test_project.test_link)
+        return redirect(invitation.test_project.test_link if invitation.test_project else original_url)
 
         # # 根據點擊次數決定重定向邏輯
         # if click_count == 1:
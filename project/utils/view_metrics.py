@@ -0,0 +1,111 @@
+# utils/view_metrics.py
+"""
+視圖效能量測：SQL 次數、資料庫時間、Python 時間與回應大小
+供 ViewMetricsMiddleware 與測試中的查詢預算檢查使用
+"""
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+METRICS_HEADER = 'X-View-Metrics'
+
+
+class QueryRecorder:
+    """以 execute_wrapper 記錄 SQL 次數與耗時（不需開啟 DEBUG）"""
+
+    def __init__(self, keep_sql=False):
+        self.count = 0
+        self.db_time = 0.0
+        self.keep_sql = keep_sql
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.db_time += elapsed
+            if self.keep_sql:
+                self.statements.append((sql, elapsed))
+
+    def format_statements(self, limit=30):
+        """列出已執行的 SQL（依序編號，供預算超出時排查 N+1）"""
+        lines = [
+            f"{index}. ({elapsed * 1000:.1f}ms) {sql}"
+            for index, (sql, elapsed) in enumerate(self.statements[:limit], start=1)
+        ]
+        if len(self.statements) > limit:
+            lines.append(f"... 另有 {len(self.statements) - limit} 筆")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(keep_sql=False, using=None):
+    """記錄區塊內所有資料庫連線執行的 SQL"""
+    recorder = QueryRecorder(keep_sql=keep_sql)
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def build_view_metrics(request, response, recorder, elapsed):
+    """整理單一請求的量測結果（串流回應無法得知大小，記為 None）"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    db_ms = recorder.db_time * 1000
+    total_ms = elapsed * 1000
+    return {
+        'view': resolver_match.view_name if resolver_match else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': recorder.count,
+        'db_ms': round(db_ms, 1),
+        'python_ms': round(max(total_ms - db_ms, 0.0), 1),
+        'total_ms': round(total_ms, 1),
+        'response_bytes': None if response.streaming else len(response.content),
+    }
+
+
+def format_metrics_header(metrics):
+    """X-View-Metrics 標頭內容，例如 queries=5;db=1.2ms;python=8.3ms;total=9.5ms;bytes=2048"""
+    parts = [
+        f"queries={metrics['queries']}",
+        f"db={metrics['db_ms']}ms",
+        f"python={metrics['python_ms']}ms",
+        f"total={metrics['total_ms']}ms",
+    ]
+    if metrics['response_bytes'] is not None:
+        parts.append(f"bytes={metrics['response_bytes']}")
+    return ';'.join(parts)
+
+
+@contextmanager
+def assert_query_budget(max_queries, max_db_ms=None):
+    """區塊內的 SQL 次數（與資料庫時間）超過預算時使測試失敗
+
+    可用於 unittest 與 pytest：
+        with assert_query_budget(12):
+            response = client.get(url)
+    """
+    with record_queries(keep_sql=True) as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise AssertionError(
+            f"SQL 查詢次數 {recorder.count} 超過預算 {max_queries}：\n{recorder.format_statements()}"
+        )
+    if max_db_ms is not None and recorder.db_time * 1000 > max_db_ms:
+        raise AssertionError(
+            f"資料庫時間 {recorder.db_time * 1000:.1f}ms 超過預算 {max_db_ms}ms：\n{recorder.format_statements()}"
+        )
+
+
+class QueryBudgetMixin:
+    """TestCase 混入：self.assertQueryBudget(n) 檢查區塊內的查詢次數"""
+
+    def assertQueryBudget(self, max_queries, max_db_ms=None):
+        return assert_query_budget(max_queries, max_db_ms=max_db_ms)